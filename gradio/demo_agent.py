@@ -6,7 +6,7 @@ from insta import (
     InstaPipelineOutput
 )
 
-from typing import Tuple
+from typing import Tuple, Generator
 from datetime import datetime
 
 import gradio
@@ -185,11 +185,13 @@ def generate_trajectory(
     url: str, instruction: str,
     output_height: int = DEFAULT_VIDEO_HEIGHT,
     output_width: int = DEFAULT_VIDEO_WIDTH,
-) -> Tuple[str, str]:
+) -> Generator[Tuple[str, str], None, None]:
 
     if instruction is None or len(instruction) == 0:
 
-        return NULL_VIDEO, "No task was entered"
+        yield NULL_VIDEO, "No task was entered"
+
+        return
 
     url = (url or "https://duckduckgo.com/")
 
@@ -211,15 +213,6 @@ def generate_trajectory(
         {"domain": url, "task": instruction}
     ] * args.num_samples
 
-    trajectories = pipeline.launch(
-        dataset = instruction_dataset,
-        num_agents = args.num_agents,
-        playwright_workers = args.playwright_workers,
-        return_trajectories = True
-    )
-
-    print("Finished Data Collection")
-
     def get_trajectory_success(x):
 
         if x is None or not isinstance(x, InstaPipelineOutput):
@@ -246,11 +239,40 @@ def generate_trajectory(
 
         return current_success
 
-    best_trajectory = max(
-        trajectories,
-        key = get_trajectory_success
+    trajectories = pipeline.stream(
+        dataset = instruction_dataset,
+        num_agents = args.num_agents,
+        playwright_workers = args.playwright_workers,
     )
 
+    best_trajectory = None
+
+    for num_finished, trajectory in enumerate(trajectories):
+
+        if get_trajectory_success(trajectory) > \
+                get_trajectory_success(best_trajectory):
+
+            best_trajectory = trajectory
+
+        yield NULL_VIDEO, "Finished {} of {} trajectories".format(
+            num_finished + 1, args.num_samples
+        )
+
+        # stop the remaining agents once one trajectory succeeds
+        if get_trajectory_success(best_trajectory) > 0.5:
+
+            trajectories.close()
+
+            break
+
+    print("Finished Data Collection")
+
+    if best_trajectory is None:
+
+        yield NULL_VIDEO, "Agent did not succeed on this task"
+
+        return
+
     agent_succeeded = (
         best_trajectory.judgment is not None 
         and (best_trajectory.judgment.get("success") or DEFAULT_SUCCESS) > 0.5
@@ -294,9 +316,11 @@ def generate_trajectory(
             video_frames
         )
 
-        return target_video_path, action_summary
+        yield target_video_path, action_summary
+
+        return
     
-    return NULL_VIDEO, "Agent did not succeed on this task"
+    yield NULL_VIDEO, "Agent did not succeed on this task"
 
 
 if __name__ == "__main__":
@@ -527,6 +551,12 @@ if __name__ == "__main__":
         judgments_dir = None
     )
 
+    # keep the agents warm between requests
+    pipeline.start_worker_pool(
+        num_agents = args.num_agents,
+        playwright_workers = args.playwright_workers,
+    )
+
     url_textbox = gradio.Textbox(
         label = "Initial URL",
         placeholder = "Enter an initial URL ...",
@@ -560,4 +590,10 @@ if __name__ == "__main__":
         title = "LLM Agent App",
     )
 
-    gradio_app.launch()
+    try:
+
+        gradio_app.launch()
+
+    finally:
+
+        pipeline.close()
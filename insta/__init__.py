@@ -31,11 +31,13 @@ from insta.configs.task_proposer_config import (
 )
 
 from insta.client import (
-    BrowserClient
+    BrowserClient,
+    AsyncBrowserClient
 )
 
 from insta.gym_env import (
     InstaEnv,
+    AsyncInstaEnv,
     InstaEnvResetOutput,
     InstaEnvStepOutput
 )
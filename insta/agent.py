@@ -4,6 +4,8 @@ from insta.agent_prompts import (
 
 from insta.utils import (
     safe_call,
+    get_timeout_kwargs,
+    merge_timeout_kwargs,
     BrowserStatus
 )
 
@@ -13,6 +15,14 @@ from insta.configs.agent_config import (
     BrowserAction
 )
 
+from insta.inference import (
+    InferenceBroker,
+    InferenceClient,
+    FakeInferenceEngine
+)
+
+from insta.profiling import span
+
 from typing import List, Callable, Tuple, Dict
 from transformers import AutoTokenizer
 
@@ -55,6 +65,10 @@ class BrowserAgent(Callable):
         The OpenAI client for querying the LLM, provides a standard
         interface for connecting to a variety of LLMs, including
         local LLMs served via vLLM, GPT, and Gemini models
+
+    inference_client: InferenceBroker | InferenceClient
+        Optional broker shared by every agent on the node, which batches
+        prompts for a single model, replacing the per-agent llm_client.
     
     """
 
@@ -63,7 +77,8 @@ class BrowserAgent(Callable):
     urls: List[str]
     actions: List[str]
 
-    def __init__(self, config: AgentConfig = DEFAULT_AGENT_CONFIG):
+    def __init__(self, config: AgentConfig = DEFAULT_AGENT_CONFIG,
+                 inference_client: InferenceBroker | InferenceClient = None):
         """Defines an LLM Agent for interacting with a web browsing session,
         served via the OpenAI API---local LLMs can be served using vLLM, 
         and proprietary LLMs can be accessed directly through the OpenAI API.
@@ -74,6 +89,10 @@ class BrowserAgent(Callable):
             The configuration for the agent, which includes the tokenizer
             to use, the client to use, and the generation kwargs to use,
             refer to insta/configs/agent_config.py for more information.
+
+        inference_client: InferenceBroker | InferenceClient
+            Optional broker shared by every agent on the node, which batches
+            prompts for a single model, replacing the per-agent llm_client.
         
         """
 
@@ -89,7 +108,13 @@ class BrowserAgent(Callable):
             self.config.tokenizer
         )
 
-        if self.config.client_type == "vllm":
+        self.inference_client = inference_client
+
+        use_own_client = (
+            self.inference_client is None
+        )
+
+        if use_own_client and self.config.client_type == "vllm":
 
             self.sampling_params = SamplingParams(
                 **self.config.generation_kwargs
@@ -99,12 +124,18 @@ class BrowserAgent(Callable):
                 **self.config.client_kwargs
             )
 
-        elif self.config.client_type == "openai":
+        elif use_own_client and self.config.client_type == "openai":
 
             self.llm_client = openai.OpenAI(
                 **self.config.client_kwargs
             )
 
+        elif use_own_client and self.config.client_type == "fake":
+
+            self.inference_client = InferenceBroker(
+                engine = FakeInferenceEngine()
+            )
+
         self.reset()
 
     def reset(self) -> None:
@@ -166,23 +197,57 @@ class BrowserAgent(Callable):
             last_obs = last_obs
         )
 
-        if self.config.client_type == "vllm":
-
-            response = self.llm_client.chat(
-                messages = messages,
-                sampling_params = self.sampling_params
-            )[0].outputs[0].text
-
-        elif self.config.client_type == "openai":
-
-            response = self.llm_client.chat.completions.create(
-                messages = messages,
-                **self.config.generation_kwargs
-            ).choices[0].message.content
+        response = self.get_response(
+            messages = messages
+        )
 
         return self.agent_prompt.parse_action(
             response = response
         )
+
+    def get_response(self, messages: List[dict]) -> str:
+        """Queries the LLM with a list of chat messages, and returns the
+        text of the response, which is later parsed into an action.
+
+        Arguments:
+
+        messages: List[dict]
+            The system prompt, user prompts, and assistant prompts
+            for the LLM, in the OpenAI chat format.
+
+        Returns:
+
+        response: str
+            The text response generated by the LLM.
+        
+        """
+
+        with span("agent.llm"):
+
+            if self.inference_client is not None:
+
+                response = self.inference_client.generate(
+                    messages = messages,
+                    **get_timeout_kwargs()
+                )
+
+            elif self.config.client_type == "vllm":
+
+                response = self.llm_client.chat(
+                    messages = messages,
+                    sampling_params = self.sampling_params
+                )[0].outputs[0].text
+
+            elif self.config.client_type == "openai":
+
+                response = self.llm_client.chat.completions.create(
+                    messages = messages,
+                    **merge_timeout_kwargs(
+                        self.config.generation_kwargs
+                    )
+                ).choices[0].message.content
+
+        return response
     
     def __call__(
         self, observation: str,
@@ -422,16 +487,18 @@ class BrowserAgent(Callable):
         
         """
 
-        observation = self.tokenizer.encode(
-            observation,
-            max_length = self.config.max_obs_tokens,
-            truncation = True
-        )
+        with span("agent.truncate"):
 
-        observation = self.tokenizer.decode(
-            observation,
-            skip_special_tokens = True
-        )
+            observation = self.tokenizer.encode(
+                observation,
+                max_length = self.config.max_obs_tokens,
+                truncation = True
+            )
+
+            observation = self.tokenizer.decode(
+                observation,
+                skip_special_tokens = True
+            )
 
         return self.user_prompt_template.format(
             observation = observation,
@@ -0,0 +1,1488 @@
+from typing import Tuple, List, Dict, AsyncGenerator, Callable, Any
+
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import replace
+from functools import partial
+
+from insta.configs import (
+    DEFAULT_BROWSER_CONFIG,
+    DEFAULT_AGENT_CONFIG,
+    DEFAULT_JUDGE_CONFIG,
+    DEFAULT_TASK_PROPOSER_CONFIG,
+    BrowserConfig,
+    AgentConfig,
+    JudgeConfig,
+    TaskProposerConfig,
+    get_raw_screenshot,
+)
+
+from insta.gym_env import (
+    AsyncInstaEnv,
+    InstaEnvStepOutput
+)
+
+from insta.client import (
+    close_async_http_sessions
+)
+
+from insta.agent import (
+    BrowserAgent,
+    NULL_ACTION
+)
+
+from insta.judge import (
+    BrowserJudge
+)
+
+from insta.task_proposer import (
+    BrowserTaskProposer
+)
+
+from insta.pipeline import (
+    InstaPipelineOutput,
+    prepare_task,
+    trajectory_exists,
+    save_trajectory,
+    judge_trajectory,
+    propose_task,
+    shard_dataset_ids,
+    open_task_queue,
+    get_lease_poll_interval,
+    AGENT_EXPLORATION_TEMPLATE,
+    JUDGE_EXPLORATION_TEMPLATE,
+    TASK_PROPOSER_EXPLORATION_TEMPLATE,
+    DEFAULT_OBSERVATIONS_DIR,
+    DEFAULT_SCREENSHOT_DIR,
+    DEFAULT_ACTIONS_DIR,
+    DEFAULT_JUDGMENTS_DIR,
+    DEFAULT_TASK_PROPOSALS_DIR,
+    DEFAULT_AGENT_RESPONSE_KEY,
+    DEFAULT_JUDGE_RESPONSE_KEY,
+    DEFAULT_MAX_ACTIONS,
+    DEFAULT_TASK_TIMEOUT,
+    DEFAULT_STEP_TIMEOUT,
+    DEFAULT_SKIP_FINISHED,
+    DEFAULT_PRUNE_OBSERVATIONS,
+    DEFAULT_ADD_STEPS_TO_AGENT,
+    DEFAULT_ADD_CRITERIA_TO_AGENT,
+    DEFAULT_ADD_STEPS_TO_JUDGE,
+    DEFAULT_ADD_CRITERIA_TO_JUDGE,
+    DEFAULT_ADD_STEPS_TO_TASK_PROPOSER,
+    DEFAULT_ADD_CRITERIA_TO_TASK_PROPOSER,
+    DEFAULT_SEED,
+    DEFAULT_RANK,
+    DEFAULT_WORLD_SIZE,
+    DEFAULT_PLAYWRIGHT_WORKERS,
+    DEFAULT_RETURN_TRAJECTORIES,
+    DEFAULT_MAX_CONCURRENCY,
+    DEFAULT_TASK_QUEUE_PATH,
+    DEFAULT_PIPELINE_JUDGING,
+    DEFAULT_REWARD,
+    DEFAULT_DONE,
+    DEFAULT_TRUNCATED,
+    DEFAULT_INFO,
+)
+
+from insta.task_queue import (
+    TaskQueue,
+    DEFAULT_LEASE_TIMEOUT,
+    DEFAULT_SPECULATION_QUANTILE,
+    DEFAULT_MAX_LEASES_PER_DOMAIN,
+    DEFAULT_MIN_DOMAIN_INTERVAL
+)
+
+from insta.profiling import (
+    enable_profiling,
+    disable_profiling,
+    serve_profiles,
+    DEFAULT_PROFILE_DIR,
+    DEFAULT_PROFILE_PORT
+)
+
+from insta.concurrency import (
+    DEFAULT_TARGET_STEP_LATENCY
+)
+
+from insta.step_spool import (
+    StepSpool,
+    remove_spooled_steps,
+    DEFAULT_STEP_SPOOL_DIR
+)
+
+from insta.best_of_n import (
+    BestOfNSampler,
+    DEFAULT_NUM_SAMPLES,
+    DEFAULT_SUCCESS_THRESHOLD,
+    DEFAULT_CONSISTENCY_THRESHOLD
+)
+
+from insta.trajectory_store import (
+    DEFAULT_STORAGE_FORMAT,
+    get_trajectory_stores
+)
+
+from insta.completion_index import (
+    get_completion_indices
+)
+
+from insta.inference import (
+    InferenceBroker,
+    INFERENCE_ENGINES,
+    get_inference_engine
+)
+
+from insta.utils import (
+    METADATA_KEYS,
+    BrowserStatus,
+    time_limit,
+    get_remaining_time,
+    async_safe_call
+)
+
+
+import contextvars
+import asyncio
+
+import tqdm
+import shutil
+import os
+
+
+async def run_blocking(
+    executor: ThreadPoolExecutor,
+    func: Callable, *func_args: Any,
+    **func_kwargs: Any
+) -> Any:
+    """Run a blocking function in a thread pool, and await the result
+    without blocking the event loop, so other trajectories can progress
+    while this call waits on the network or disk.
+
+    The function runs in a copy of the current context, so the deadline
+    of the calling coroutine also bounds the calls made in the thread.
+
+    Arguments:
+
+    executor: ThreadPoolExecutor
+        The thread pool to run the blocking function in.
+
+    func: Callable
+        The blocking function to call.
+
+    Returns:
+
+    Any
+        The result of calling the `func` argument.
+
+    """
+
+    loop = asyncio.get_running_loop()
+
+    return await loop.run_in_executor(
+        executor, partial(
+            contextvars.copy_context().run,
+            func, *func_args,
+            **func_kwargs
+        )
+    )
+
+
+async def async_get_action(
+    agent: BrowserAgent,
+    observations: List[str],
+    instructions: List[str],
+    urls: List[str],
+    actions: List[str],
+    executor: ThreadPoolExecutor = None,
+):
+    """Queries the LLM for the next action to take, where the prompt is
+    built on the event loop, and the LLM call runs in the thread pool,
+    so the agent can be shared between concurrent trajectories.
+
+    Arguments:
+
+    agent: BrowserAgent
+        The LLM agent used to build prompts, and parse actions.
+
+    observations: List[str]
+        Processed observations for this trajectory.
+
+    instructions: List[str]
+        Instructions for each observation in this trajectory.
+
+    urls: List[str]
+        URLs for each observation in this trajectory.
+
+    actions: List[str]
+        Previous agent responses in this trajectory.
+
+    executor: ThreadPoolExecutor
+        The thread pool to run the LLM call in.
+
+    Returns:
+
+    BrowserAction
+        The next action to take in the browser.
+
+    """
+
+    messages = agent.get_prompts(
+        observations = observations,
+        instructions = instructions,
+        urls = urls,
+        actions = actions,
+        last_obs = agent.config.last_obs
+    )
+
+    if isinstance(agent.inference_client, InferenceBroker):
+
+        response = await agent.inference_client.agenerate(
+            messages = messages
+        )
+
+    else:
+
+        response = await run_blocking(
+            executor, agent.get_response,
+            messages = messages
+        )
+
+    return agent.agent_prompt.parse_action(
+        response = response
+    )
+
+
+async def async_generate_trajectory(
+    browser: AsyncInstaEnv,
+    agent: BrowserAgent,
+    judge: BrowserJudge = None,
+    task_proposer: BrowserTaskProposer = None,
+    url: str = None, instruction: str = None,
+    agent_instruction: str = None,
+    judge_instruction: str = None,
+    task_proposer_instruction: str = None,
+    max_actions: int = DEFAULT_MAX_ACTIONS,
+    agent_response_key: str = DEFAULT_AGENT_RESPONSE_KEY,
+    judge_response_key: str = DEFAULT_JUDGE_RESPONSE_KEY,
+    step_timeout: float = DEFAULT_STEP_TIMEOUT,
+    executor: ThreadPoolExecutor = None,
+    step_spool: StepSpool = None,
+) -> Tuple[List[Dict], List[Dict], Dict, Dict]:
+    """Attempt a web navigation task using the LLM agent as a coroutine,
+    where browser calls and LLM calls are awaited independently, and
+    return the observations and actions along the trajectory.
+
+    The agent context is kept local to this coroutine, so a single agent,
+    judge, and task proposer can be shared by many concurrent trajectories.
+
+    Arguments:
+
+    browser: AsyncInstaEnv
+        The web navigation environment running Playwright, which must
+        not be shared with another running trajectory.
+
+    agent: BrowserAgent
+        The LLM agent to use for the task.
+
+    judge: BrowserJudge
+        The LLM judge to evaluate the trajectory.
+
+    task_proposer: BrowserTaskProposer
+        The LLM task proposer to generate tasks for the agent to complete.
+
+    url: str
+        Starting URL for the agent.
+
+    instruction: str
+        Specific instruction for the agent.
+
+    max_actions: int
+        Maximum number of actions per task.
+
+    step_timeout: float
+        Number of seconds for each browser call and each LLM query.
+
+    executor: ThreadPoolExecutor
+        The thread pool to run blocking LLM calls and disk writes in.
+
+    step_spool: StepSpool
+        Spool where the screenshot, raw HTML, and metadata of each step
+        are written as the step finishes, or None to keep them in memory.
+
+    Returns:
+
+    Tuple[List[Dict], List[Dict], Dict, Dict]
+        Tuple containing observations, actions, judgment, and task proposal
+        for the trajectory generated by running the agent with an instruction.
+
+    """
+
+    agent_instruction = (
+        agent_instruction or
+        instruction or
+        AGENT_EXPLORATION_TEMPLATE.format(
+            website = url
+        )
+    )
+
+    judge_instruction = (
+        judge_instruction or
+        instruction or
+        JUDGE_EXPLORATION_TEMPLATE.format(
+            website = url
+        )
+    )
+
+    task_proposer_instruction = (
+        task_proposer_instruction or
+        instruction or
+        TASK_PROPOSER_EXPLORATION_TEMPLATE.format(
+            website = url
+        )
+    )
+
+    context_observations = []
+    context_instructions = []
+    context_urls = []
+    context_actions = []
+
+    observations = []
+    actions = []
+    last_action = NULL_ACTION
+
+    for timestep in range(max_actions):
+
+        outputs = None
+
+        with time_limit(step_timeout):
+
+            if last_action is not NULL_ACTION:
+
+                context_actions.append(
+                    last_action.response
+                )
+
+                outputs = await browser.step(
+                    action = last_action
+                )
+
+            elif timestep == 0:
+
+                outputs = await browser.reset(
+                    url = url
+                )
+
+            else: outputs = InstaEnvStepOutput(
+                observation = await browser.get_obs(),
+                reward = DEFAULT_REWARD,
+                done = DEFAULT_DONE,
+                truncated = DEFAULT_TRUNCATED,
+                info = DEFAULT_INFO
+            )
+
+        is_finished = outputs is None or (
+            isinstance(outputs, InstaEnvStepOutput)
+            and outputs.done
+        )
+
+        if is_finished:
+
+            break
+
+        obs = outputs.observation
+
+        for key, value in (obs.metadata or {}).items():
+
+            obs.metadata[key] = {
+                key: value.get(key)
+                for key in METADATA_KEYS
+            }
+
+        observation = {
+            "current_url": obs.current_url,
+            "processed_text": obs.processed_text,
+            "raw_html": obs.raw_html,
+            "screenshot": get_raw_screenshot(obs),
+            "metadata": obs.metadata
+        }
+
+        if step_spool is not None:
+
+            observation = await run_blocking(
+                executor, step_spool.add, observation
+            )
+
+        observations.append(observation)
+
+        # replace the last observation when the last action failed to parse
+        has_last_observation = (
+            len(context_observations) > 0 and
+            len(context_actions) == (len(context_observations) - 1)
+        )
+
+        if has_last_observation:
+
+            context_observations.pop()
+            context_instructions.pop()
+            context_urls.pop()
+
+        context_observations.append(obs.processed_text)
+        context_instructions.append(agent_instruction)
+        context_urls.append(obs.current_url)
+
+        with time_limit(step_timeout):
+
+            last_action = await async_safe_call(
+                async_get_action, agent = agent,
+                observations = context_observations,
+                instructions = context_instructions,
+                urls = context_urls,
+                actions = context_actions,
+                executor = executor,
+                catch_errors = agent.config.catch_errors,
+                max_errors = agent.config.max_errors,
+                log_errors = agent.config.log_errors
+            )
+
+        if last_action is BrowserStatus.ERROR:
+
+            last_action = NULL_ACTION
+
+        function_calls = [
+            {"dotpath": x.dotpath, "args": x.args}
+            for x in last_action.function_calls
+        ]
+
+        actions.append({
+            "function_calls": function_calls,
+            "response": last_action.response,
+            "matched_response": last_action.matched_response
+        })
+
+    is_truncated = outputs is None or (
+        isinstance(outputs, InstaEnvStepOutput)
+        and outputs.truncated
+    )
+
+    if is_truncated:
+
+        raise RuntimeError(
+            "Failed to generate trajectory:\n{}\n\n"
+            .format(outputs)
+        )
+
+    judgment = {}
+
+    if judge is not None:
+
+        judgment = await run_blocking(
+            executor, judge_trajectory,
+            judge = judge,
+            observations = observations,
+            actions = actions,
+            judge_instruction = judge_instruction,
+            agent_response_key = agent_response_key,
+        )
+
+    task_proposal = {}
+
+    if task_proposer is not None:
+
+        task_proposal = await run_blocking(
+            executor, propose_task,
+            task_proposer = task_proposer,
+            observations = observations,
+            actions = actions,
+            judgment = judgment,
+            url = url,
+            task_proposer_instruction = task_proposer_instruction,
+            agent_response_key = agent_response_key,
+            judge_response_key = judge_response_key,
+        )
+
+    return observations, actions, judgment, task_proposal
+
+
+async def async_iter_trajectories(
+    dataset: List[Dict[str, str]],
+    browser_config: BrowserConfig = DEFAULT_BROWSER_CONFIG,
+    agent: BrowserAgent | AgentConfig = DEFAULT_AGENT_CONFIG,
+    judge: BrowserJudge | JudgeConfig = None,
+    task_proposer: BrowserTaskProposer | TaskProposerConfig = None,
+    seed: int = DEFAULT_SEED,
+    rank: int = DEFAULT_RANK,
+    world_size: int = DEFAULT_WORLD_SIZE,
+    task_queue: TaskQueue = None,
+    worker_id: str = None,
+    observations_dir: str = DEFAULT_OBSERVATIONS_DIR,
+    screenshot_dir: str = DEFAULT_SCREENSHOT_DIR,
+    actions_dir: str = DEFAULT_ACTIONS_DIR,
+    judgments_dir: str = DEFAULT_JUDGMENTS_DIR,
+    task_proposals_dir: str = DEFAULT_TASK_PROPOSALS_DIR,
+    max_actions: int = DEFAULT_MAX_ACTIONS,
+    agent_response_key: str = DEFAULT_AGENT_RESPONSE_KEY,
+    judge_response_key: str = DEFAULT_JUDGE_RESPONSE_KEY,
+    skip_finished: bool = DEFAULT_SKIP_FINISHED,
+    prune_observations: bool = DEFAULT_PRUNE_OBSERVATIONS,
+    storage_format: str = DEFAULT_STORAGE_FORMAT,
+    task_timeout: float = DEFAULT_TASK_TIMEOUT,
+    step_timeout: float = DEFAULT_STEP_TIMEOUT,
+    num_samples: int = DEFAULT_NUM_SAMPLES,
+    success_threshold: float = DEFAULT_SUCCESS_THRESHOLD,
+    consistency_threshold: float = DEFAULT_CONSISTENCY_THRESHOLD,
+    step_spool_dir: str = DEFAULT_STEP_SPOOL_DIR,
+    add_steps_to_agent: bool = DEFAULT_ADD_STEPS_TO_AGENT,
+    add_criteria_to_agent: bool = DEFAULT_ADD_CRITERIA_TO_AGENT,
+    add_steps_to_judge: bool = DEFAULT_ADD_STEPS_TO_JUDGE,
+    add_criteria_to_judge: bool = DEFAULT_ADD_CRITERIA_TO_JUDGE,
+    add_steps_to_task_proposer: bool = DEFAULT_ADD_STEPS_TO_TASK_PROPOSER,
+    add_criteria_to_task_proposer: bool = DEFAULT_ADD_CRITERIA_TO_TASK_PROPOSER,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    playwright_workers: int = DEFAULT_PLAYWRIGHT_WORKERS,
+) -> AsyncGenerator[InstaPipelineOutput, None]:
+    """Run the InSTA pipeline from a single process, where each trajectory
+    is a coroutine, and yield the observations, actions, and judgments
+    for each task as soon as the trajectory is finished.
+
+    Arguments:
+
+    dataset: List[Dict[str, str]]
+        Override the default dataset, and run the pipeline on custom tasks,
+        each entry must be a dictionary with keys "domain" and "task".
+
+    browser_config: BrowserConfig
+        Configuration for the Playwright environment, where sessions are
+        spread over `playwright_workers` ports starting at `playwright_port`.
+
+    agent: BrowserAgent | AgentConfig
+        The LLM agent to use for the task, shared by all trajectories.
+
+    judge: BrowserJudge | JudgeConfig
+        The LLM judge to evaluate the trajectory.
+
+    task_proposer: BrowserTaskProposer | TaskProposerConfig
+        The LLM task proposer to generate tasks for the agent to complete.
+
+    rank: int
+        Rank of the machine.
+
+    world_size: int
+        Number of data collection machines.
+
+    task_queue: TaskQueue
+        Shared queue to pull tasks from on demand, replacing
+        the static shard selected by rank and world_size.
+
+    worker_id: str
+        Unique identifier for this process in the task queue.
+
+    seed: int
+        Seed for the dataset.
+
+    max_actions: int
+        Maximum number of actions per task.
+
+    skip_finished: bool
+        Whether to skip tasks that are already attempted.
+
+    prune_observations: bool
+        Whether to prune observations before saving.
+
+    storage_format: str
+        Either "json" for one file per trajectory, "jsonl" for
+        line-delimited shards, or "jsonl.zst" for compressed shards.
+
+    task_timeout: float
+        Number of seconds for each task, after which the trajectory
+        is cancelled and saved as a failed attempt.
+
+    step_timeout: float
+        Number of seconds for each browser call and each LLM query.
+
+    num_samples: int
+        Maximum number of samples drawn for each task, where each sample
+        is judged as it finishes, and the best sample is saved.
+
+    success_threshold: float
+        A sample with a judged success above this value is saved, and
+        no more samples are drawn for the task.
+
+    consistency_threshold: float
+        Fraction of the samples that must fail before the remaining
+        samples of a task are cancelled, or None to keep sampling.
+
+    step_spool_dir: str
+        Directory where the screenshot, raw HTML, and metadata of each
+        step are written as the step finishes, so memory does not grow
+        with the length of a trajectory, or None to keep them in memory.
+
+    max_concurrency: int
+        Maximum number of trajectories running at the same time.
+
+    playwright_workers: int
+        Number of Playwright workers running.
+
+    Returns:
+
+    AsyncGenerator[InstaPipelineOutput, None]
+        Generator for the observations, actions, and judgments for each task,
+        which are saved to disk for later processing.
+
+    """
+
+    skip_judge = judge is None
+    skip_task_proposer = task_proposer is None
+
+    if num_samples > 1 and skip_judge:
+
+        raise ValueError(
+            "Best-of-N rollouts require a judge to rank the samples"
+        )
+
+    inference_broker = None
+
+    if isinstance(agent, AgentConfig) and \
+            agent.client_type in INFERENCE_ENGINES:
+
+        # one model copy, and prompts from every trajectory are batched
+        inference_broker = InferenceBroker(
+            engine = get_inference_engine(
+                client_type = agent.client_type,
+                client_kwargs = agent.client_kwargs,
+                generation_kwargs = agent.generation_kwargs
+            ),
+            max_batch_size = max_concurrency
+        )
+
+    if isinstance(agent, AgentConfig):
+
+        agent = BrowserAgent(
+            config = agent,
+            inference_client = inference_broker
+        )
+
+    if not skip_judge and isinstance(judge, JudgeConfig):
+
+        judge = BrowserJudge(
+            config = judge
+        )
+
+    if not skip_task_proposer and isinstance(task_proposer, TaskProposerConfig):
+
+        task_proposer = BrowserTaskProposer(
+            config = task_proposer
+        )
+
+    for data_dir in [
+        observations_dir,
+        screenshot_dir,
+        actions_dir,
+        judgments_dir,
+        task_proposals_dir
+    ]:
+
+        if data_dir is not None:
+
+            os.makedirs(
+                data_dir,
+                exist_ok = True
+            )
+
+    trajectory_stores = get_trajectory_stores(
+        observations_dir = observations_dir,
+        actions_dir = actions_dir,
+        storage_format = storage_format,
+    )
+
+    completion_indices = get_completion_indices(
+        observations_dir = observations_dir,
+        actions_dir = actions_dir,
+        judgments_dir = judgments_dir,
+        task_proposals_dir = task_proposals_dir,
+    )
+
+    for completion_index in completion_indices.values():
+
+        if completion_index is not None:
+
+            completion_index.ensure_journal()
+
+    dataset_ids = []
+
+    if task_queue is None:
+
+        dataset_ids = shard_dataset_ids(
+            len(dataset), seed = seed,
+            rank = rank, world_size = world_size
+        )
+
+    executor = ThreadPoolExecutor(
+        max_workers = max_concurrency
+    )
+
+    # the task queue shares one SQLite connection or HTTP session, so
+    # its calls run one at a time, outside the event loop
+    queue_executor = ThreadPoolExecutor(
+        max_workers = 1
+    )
+
+    step_spool = None
+
+    if step_spool_dir is not None:
+
+        step_spool = StepSpool(
+            spool_dir = step_spool_dir
+        )
+
+    browser_pool = asyncio.Queue()
+
+    for slot_idx in range(max_concurrency):
+
+        browser_pool.put_nowait(AsyncInstaEnv(
+            config = replace(
+                browser_config,
+                playwright_port = (
+                    browser_config.playwright_port +
+                    slot_idx % playwright_workers
+                )
+            ),
+            executor = executor
+        ))
+
+    async def run_task(example_id: int) -> InstaPipelineOutput | None:
+
+        task = prepare_task(
+            dataset[example_id],
+            add_steps_to_agent = add_steps_to_agent,
+            add_criteria_to_agent = add_criteria_to_agent,
+            add_steps_to_judge = add_steps_to_judge,
+            add_criteria_to_judge = add_criteria_to_judge,
+            add_steps_to_task_proposer = add_steps_to_task_proposer,
+            add_criteria_to_task_proposer = add_criteria_to_task_proposer,
+        )
+
+        skip_this_task = skip_finished and trajectory_exists(
+            identifier = task["identifier"],
+            observations_dir = observations_dir,
+            actions_dir = actions_dir,
+            judgments_dir = judgments_dir,
+            task_proposals_dir = task_proposals_dir,
+            skip_judge = skip_judge,
+            skip_task_proposer = skip_task_proposer,
+            completion_indices = completion_indices,
+        )
+
+        if skip_this_task:
+
+            if task_queue is not None:
+
+                await run_blocking(
+                    queue_executor, task_queue.complete,
+                    example_id = example_id,
+                    worker_id = worker_id,
+                    skipped = True
+                )
+
+            return None
+
+        try:
+
+            browser = await browser_pool.get()
+
+        except asyncio.CancelledError:
+
+            if task_queue is not None:
+
+                await run_blocking(
+                    queue_executor, task_queue.release,
+                    example_id = example_id,
+                    worker_id = worker_id
+                )
+
+            raise
+
+        sampler = BestOfNSampler(
+            num_samples = num_samples,
+            success_threshold = success_threshold,
+            consistency_threshold = consistency_threshold
+        )
+
+        try:
+
+            # samples are drawn until one succeeds, so easy tasks
+            # cost a single rollout
+            while not sampler.is_finished():
+
+                # the coroutine is cancelled once the task deadline passes
+                with time_limit(task_timeout):
+
+                    trajectory = await async_safe_call(
+                        async_generate_trajectory, browser = browser,
+                        agent = agent, judge = judge,
+                        task_proposer = task_proposer,
+                        url = task["url"],
+                        agent_instruction = task["agent_instruction"],
+                        judge_instruction = task["judge_instruction"],
+                        task_proposer_instruction = task["task_proposer_instruction"],
+                        instruction = task["instruction"],
+                        max_actions = max_actions,
+                        agent_response_key = agent_response_key,
+                        judge_response_key = judge_response_key,
+                        step_timeout = step_timeout,
+                        executor = executor,
+                        step_spool = step_spool,
+                        catch_errors = True,
+                        log_errors = True,
+                        max_errors = 1,
+                    )
+
+                    deadline_passed = (
+                        task_timeout is not None and
+                        get_remaining_time() <= 0
+                    )
+
+                # release the browser session held by an abandoned trajectory
+                if deadline_passed:
+
+                    await browser.client.close()
+
+                sampler.add(trajectory)
+
+                # stop early when another copy of this task has already finished
+                task_complete = task_queue is not None and await run_blocking(
+                    queue_executor, task_queue.is_complete,
+                    example_id
+                )
+
+                if task_complete:
+
+                    break
+
+        except asyncio.CancelledError:
+
+            if task_queue is not None:
+
+                await run_blocking(
+                    queue_executor, task_queue.release,
+                    example_id = example_id,
+                    worker_id = worker_id
+                )
+
+            raise
+
+        finally:
+
+            browser_pool.put_nowait(browser)
+
+        trajectory = sampler.get_best()
+
+        if task_queue is not None:
+
+            # a failed copy leaves the task to the copy that is still running
+            release_task = trajectory is BrowserStatus.ERROR and await run_blocking(
+                queue_executor, task_queue.is_speculated,
+                example_id
+            )
+
+            if release_task:
+
+                await run_blocking(
+                    queue_executor, task_queue.release,
+                    example_id = example_id,
+                    worker_id = worker_id
+                )
+
+                return None
+
+            # the first copy of a task to finish is the one that is saved,
+            # so the task is completed before its trajectory is written
+            finished_first = await run_blocking(
+                queue_executor, task_queue.complete,
+                example_id = example_id,
+                worker_id = worker_id
+            )
+
+            if not finished_first:
+
+                if trajectory is not BrowserStatus.ERROR:
+
+                    remove_spooled_steps(trajectory[0])
+
+                return None
+
+        observations, actions, judgment, task_proposal = [], [], {}, {}
+
+        if trajectory is not BrowserStatus.ERROR:
+
+            observations, actions, judgment, task_proposal = trajectory
+
+        try:
+
+            return await run_blocking(
+                executor, save_trajectory,
+                identifier = task["identifier"],
+                observations = observations,
+                actions = actions,
+                judgment = judgment,
+                task_proposal = task_proposal,
+                observations_dir = observations_dir,
+                screenshot_dir = screenshot_dir,
+                actions_dir = actions_dir,
+                judgments_dir = judgments_dir,
+                task_proposals_dir = task_proposals_dir,
+                prune_observations = prune_observations,
+                completion_indices = completion_indices,
+                trajectory_stores = trajectory_stores,
+            )
+
+        except Exception:
+
+            # a failed write returns the task to the queue for another attempt
+            if task_queue is not None:
+
+                await run_blocking(
+                    queue_executor, task_queue.release,
+                    example_id = example_id,
+                    worker_id = worker_id
+                )
+
+            raise
+
+    progress_bar = tqdm.tqdm(
+        total = (
+            len(dataset_ids)
+            if task_queue is None else None
+        ),
+        desc = "Processing",
+        dynamic_ncols = True
+    )
+
+    pending_example_ids = iter(dataset_ids)
+    running_tasks = set()
+
+    leasing_finished = False
+
+    try:
+
+        while True:
+
+            poll_interval = None
+
+            # keep at most `max_concurrency` trajectories in flight
+            while not leasing_finished and \
+                    len(running_tasks) < max_concurrency:
+
+                if task_queue is None:
+
+                    example_id = next(
+                        pending_example_ids, None
+                    )
+
+                else:
+
+                    example_id = await run_blocking(
+                        queue_executor, task_queue.lease,
+                        worker_id = worker_id
+                    )
+
+                if example_id is not None:
+
+                    running_tasks.add(asyncio.create_task(
+                        run_task(example_id)
+                    ))
+
+                    continue
+
+                # leasing resumes while tasks are throttled by the politeness
+                # limits, or may still be relaunched with speculation
+                if task_queue is not None:
+
+                    poll_interval = await run_blocking(
+                        queue_executor, get_lease_poll_interval,
+                        task_queue = task_queue,
+                        worker_id = worker_id
+                    )
+
+                leasing_finished = poll_interval is None
+
+                break
+
+            if len(running_tasks) == 0:
+
+                if leasing_finished:
+
+                    break
+
+                await asyncio.sleep(poll_interval)
+
+                continue
+
+            finished_tasks, running_tasks = await asyncio.wait(
+                running_tasks,
+                return_when = asyncio.FIRST_COMPLETED,
+                timeout = poll_interval
+            )
+
+            for finished_task in finished_tasks:
+
+                progress_bar.update()
+
+                output = finished_task.result()
+
+                if output is not None:
+
+                    yield output
+
+    finally:
+
+        for running_task in running_tasks:
+
+            running_task.cancel()
+
+        # cancelled tasks return their leases before the executor stops
+        await asyncio.gather(
+            *running_tasks,
+            return_exceptions = True
+        )
+
+        progress_bar.close()
+
+        while not browser_pool.empty():
+
+            browser = browser_pool.get_nowait()
+
+            await browser.client.close()
+
+        await close_async_http_sessions()
+
+        if inference_broker is not None:
+
+            await run_blocking(
+                executor, inference_broker.close
+            )
+
+        executor.shutdown(
+            wait = False
+        )
+
+        queue_executor.shutdown(
+            wait = False
+        )
+
+        if step_spool is not None:
+
+            step_spool.close()
+
+
+async def astream_data_collection(
+    dataset: List[Dict[str, str]],
+    browser_config: BrowserConfig = DEFAULT_BROWSER_CONFIG,
+    agent_config: AgentConfig = DEFAULT_AGENT_CONFIG,
+    judge_config: JudgeConfig = DEFAULT_JUDGE_CONFIG,
+    task_proposer_config: TaskProposerConfig = DEFAULT_TASK_PROPOSER_CONFIG,
+    seed: int = DEFAULT_SEED,
+    rank: int = DEFAULT_RANK,
+    world_size: int = DEFAULT_WORLD_SIZE,
+    observations_dir: str = DEFAULT_OBSERVATIONS_DIR,
+    screenshot_dir: str = DEFAULT_SCREENSHOT_DIR,
+    actions_dir: str = DEFAULT_ACTIONS_DIR,
+    judgments_dir: str = DEFAULT_JUDGMENTS_DIR,
+    task_proposals_dir: str = DEFAULT_TASK_PROPOSALS_DIR,
+    max_actions: int = DEFAULT_MAX_ACTIONS,
+    agent_response_key: str = DEFAULT_AGENT_RESPONSE_KEY,
+    judge_response_key: str = DEFAULT_JUDGE_RESPONSE_KEY,
+    skip_finished: bool = DEFAULT_SKIP_FINISHED,
+    prune_observations: bool = DEFAULT_PRUNE_OBSERVATIONS,
+    storage_format: str = DEFAULT_STORAGE_FORMAT,
+    task_timeout: float = DEFAULT_TASK_TIMEOUT,
+    step_timeout: float = DEFAULT_STEP_TIMEOUT,
+    num_samples: int = DEFAULT_NUM_SAMPLES,
+    success_threshold: float = DEFAULT_SUCCESS_THRESHOLD,
+    consistency_threshold: float = DEFAULT_CONSISTENCY_THRESHOLD,
+    step_spool_dir: str = DEFAULT_STEP_SPOOL_DIR,
+    add_steps_to_agent: bool = DEFAULT_ADD_STEPS_TO_AGENT,
+    add_criteria_to_agent: bool = DEFAULT_ADD_CRITERIA_TO_AGENT,
+    add_steps_to_judge: bool = DEFAULT_ADD_STEPS_TO_JUDGE,
+    add_criteria_to_judge: bool = DEFAULT_ADD_CRITERIA_TO_JUDGE,
+    add_steps_to_task_proposer: bool = DEFAULT_ADD_STEPS_TO_TASK_PROPOSER,
+    add_criteria_to_task_proposer: bool = DEFAULT_ADD_CRITERIA_TO_TASK_PROPOSER,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    playwright_workers: int = DEFAULT_PLAYWRIGHT_WORKERS,
+    task_queue_path: str = DEFAULT_TASK_QUEUE_PATH,
+    lease_timeout: float = DEFAULT_LEASE_TIMEOUT,
+    speculation_quantile: float = DEFAULT_SPECULATION_QUANTILE,
+    max_leases_per_domain: int = DEFAULT_MAX_LEASES_PER_DOMAIN,
+    min_domain_interval: float = DEFAULT_MIN_DOMAIN_INTERVAL,
+    pipeline_judging: bool = DEFAULT_PIPELINE_JUDGING,
+    target_step_latency: float = DEFAULT_TARGET_STEP_LATENCY,
+    profile_dir: str = DEFAULT_PROFILE_DIR,
+    profile_port: int = DEFAULT_PROFILE_PORT,
+) -> AsyncGenerator[InstaPipelineOutput, None]:
+    """Run many concurrent agents from a single process using asyncio,
+    pulling tasks from a task queue shared with other machines, and yield
+    each trajectory as soon as it is finished.
+
+    Arguments:
+
+    dataset: List[Dict[str, str]]
+        Override the default dataset, and run the pipeline on custom tasks,
+        each entry must be a dictionary with keys "domain" and "task".
+
+    browser_config: BrowserConfig
+        Configuration for the Playwright environment.
+
+    agent_config: AgentConfig
+        Configuration for the LLM agent.
+
+    judge_config: JudgeConfig
+        Configuration for the LLM judge.
+
+    task_proposer_config: TaskProposerConfig
+        Configuration for the LLM task proposer.
+
+    max_concurrency: int
+        Maximum number of trajectories running at the same time.
+
+    playwright_workers: int
+        Number of Playwright workers running.
+
+    task_queue_path: str
+        Path to the SQLite file where trajectories pull tasks from on demand,
+        by default a temporary file that is removed when finished, or the
+        URL of a coordinator shared by several machines, which replaces
+        the static sharding by rank and world_size.
+
+    lease_timeout: float
+        Number of seconds before a leased task expires, and the task
+        is handed to another worker.
+
+    speculation_quantile: float
+        Quantile of finished task durations, such as 0.95, after which
+        a running task is also leased to another machine, and the first
+        copy to finish is saved, or None to disable speculation.
+
+    max_leases_per_domain: int
+        Maximum number of running tasks on the same domain, where
+        tasks on other domains are leased while a domain is at the limit.
+
+    min_domain_interval: float
+        Minimum number of seconds between starting two tasks on the
+        same domain, or None to start tasks as soon as a slot is free.
+
+    pipeline_judging: bool
+        Not supported by the asyncio engine, where the judge already runs
+        as a coroutine next to the rollouts, and raises ValueError if set.
+
+    target_step_latency: float
+        Not supported by the asyncio engine, which bounds the trajectories
+        in flight with max_concurrency, and raises ValueError if set.
+
+    profile_dir: str
+        Directory where the duration of every stage of the rollout is
+        saved as JSON lines, or None to disable profiling.
+
+    profile_port: int
+        Port serving the latest durations from profile_dir in the
+        Prometheus text format at /metrics, or None to disable.
+
+    Returns:
+
+    AsyncGenerator[InstaPipelineOutput, None]
+        Generator for the observations, actions, and judgments for each task,
+        in the order that trajectories finish.
+
+    """
+
+    if pipeline_judging:
+
+        raise ValueError(
+            "The asyncio engine judges trajectories as coroutines, "
+            "use rollout_engine=\"multiprocessing\" for pipeline_judging"
+        )
+
+    if target_step_latency is not None:
+
+        raise ValueError(
+            "The asyncio engine bounds concurrency with max_concurrency, "
+            "use rollout_engine=\"multiprocessing\" for target_step_latency"
+        )
+
+    # adding tasks queries SQLite or the coordinator, outside the event loop
+    task_queue, task_queue_dir = await asyncio.to_thread(
+        open_task_queue, dataset = dataset,
+        task_queue_path = task_queue_path,
+        seed = seed, rank = rank,
+        world_size = world_size,
+        skip_finished = skip_finished,
+        lease_timeout = lease_timeout,
+        speculation_quantile = speculation_quantile,
+        max_leases_per_domain = max_leases_per_domain,
+        min_domain_interval = min_domain_interval
+    )
+
+    worker_id = str(rank)
+
+    if profile_dir is not None:
+
+        enable_profiling(
+            worker_id = worker_id,
+            profile_dir = profile_dir
+        )
+
+    profile_server = None
+
+    if profile_dir is not None and profile_port is not None:
+
+        profile_server = serve_profiles(
+            profile_dir = profile_dir,
+            port = profile_port
+        )
+
+    try:
+
+        async for output in async_iter_trajectories(
+            dataset = dataset,
+            browser_config = browser_config,
+            agent = agent_config,
+            judge = judge_config,
+            task_proposer = task_proposer_config,
+            seed = seed, rank = rank, world_size = world_size,
+            task_queue = task_queue, worker_id = worker_id,
+            observations_dir = observations_dir,
+            screenshot_dir = screenshot_dir,
+            actions_dir = actions_dir,
+            judgments_dir = judgments_dir,
+            task_proposals_dir = task_proposals_dir,
+            max_actions = max_actions,
+            agent_response_key = agent_response_key,
+            judge_response_key = judge_response_key,
+            skip_finished = skip_finished,
+            prune_observations = prune_observations,
+            storage_format = storage_format,
+            task_timeout = task_timeout,
+            step_timeout = step_timeout,
+            num_samples = num_samples,
+            success_threshold = success_threshold,
+            consistency_threshold = consistency_threshold,
+            step_spool_dir = step_spool_dir,
+            add_steps_to_agent = add_steps_to_agent,
+            add_criteria_to_agent = add_criteria_to_agent,
+            add_steps_to_judge = add_steps_to_judge,
+            add_criteria_to_judge = add_criteria_to_judge,
+            add_steps_to_task_proposer = add_steps_to_task_proposer,
+            add_criteria_to_task_proposer = add_criteria_to_task_proposer,
+            max_concurrency = max_concurrency,
+            playwright_workers = playwright_workers,
+        ):
+
+            yield output
+
+    finally:
+
+        if profile_server is not None:
+
+            profile_server.shutdown()
+            profile_server.server_close()
+
+        disable_profiling()
+
+        # leases of an interrupted run go back to the queue right away
+        await asyncio.to_thread(
+            task_queue.release_worker,
+            worker_id = worker_id
+        )
+
+        task_queue.close()
+
+        if task_queue_dir is not None:
+
+            shutil.rmtree(
+                task_queue_dir,
+                ignore_errors = True
+            )
+
+
+def launch_async_data_collection(
+    dataset: List[Dict[str, str]],
+    browser_config: BrowserConfig = DEFAULT_BROWSER_CONFIG,
+    agent_config: AgentConfig = DEFAULT_AGENT_CONFIG,
+    judge_config: JudgeConfig = DEFAULT_JUDGE_CONFIG,
+    task_proposer_config: TaskProposerConfig = DEFAULT_TASK_PROPOSER_CONFIG,
+    seed: int = DEFAULT_SEED,
+    rank: int = DEFAULT_RANK,
+    world_size: int = DEFAULT_WORLD_SIZE,
+    observations_dir: str = DEFAULT_OBSERVATIONS_DIR,
+    screenshot_dir: str = DEFAULT_SCREENSHOT_DIR,
+    actions_dir: str = DEFAULT_ACTIONS_DIR,
+    judgments_dir: str = DEFAULT_JUDGMENTS_DIR,
+    task_proposals_dir: str = DEFAULT_TASK_PROPOSALS_DIR,
+    max_actions: int = DEFAULT_MAX_ACTIONS,
+    agent_response_key: str = DEFAULT_AGENT_RESPONSE_KEY,
+    judge_response_key: str = DEFAULT_JUDGE_RESPONSE_KEY,
+    skip_finished: bool = DEFAULT_SKIP_FINISHED,
+    prune_observations: bool = DEFAULT_PRUNE_OBSERVATIONS,
+    storage_format: str = DEFAULT_STORAGE_FORMAT,
+    task_timeout: float = DEFAULT_TASK_TIMEOUT,
+    step_timeout: float = DEFAULT_STEP_TIMEOUT,
+    num_samples: int = DEFAULT_NUM_SAMPLES,
+    success_threshold: float = DEFAULT_SUCCESS_THRESHOLD,
+    consistency_threshold: float = DEFAULT_CONSISTENCY_THRESHOLD,
+    step_spool_dir: str = DEFAULT_STEP_SPOOL_DIR,
+    add_steps_to_agent: bool = DEFAULT_ADD_STEPS_TO_AGENT,
+    add_criteria_to_agent: bool = DEFAULT_ADD_CRITERIA_TO_AGENT,
+    add_steps_to_judge: bool = DEFAULT_ADD_STEPS_TO_JUDGE,
+    add_criteria_to_judge: bool = DEFAULT_ADD_CRITERIA_TO_JUDGE,
+    add_steps_to_task_proposer: bool = DEFAULT_ADD_STEPS_TO_TASK_PROPOSER,
+    add_criteria_to_task_proposer: bool = DEFAULT_ADD_CRITERIA_TO_TASK_PROPOSER,
+    return_trajectories: bool = DEFAULT_RETURN_TRAJECTORIES,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    playwright_workers: int = DEFAULT_PLAYWRIGHT_WORKERS,
+    task_queue_path: str = DEFAULT_TASK_QUEUE_PATH,
+    lease_timeout: float = DEFAULT_LEASE_TIMEOUT,
+    speculation_quantile: float = DEFAULT_SPECULATION_QUANTILE,
+    max_leases_per_domain: int = DEFAULT_MAX_LEASES_PER_DOMAIN,
+    min_domain_interval: float = DEFAULT_MIN_DOMAIN_INTERVAL,
+    pipeline_judging: bool = DEFAULT_PIPELINE_JUDGING,
+    target_step_latency: float = DEFAULT_TARGET_STEP_LATENCY,
+    profile_dir: str = DEFAULT_PROFILE_DIR,
+    profile_port: int = DEFAULT_PROFILE_PORT,
+) -> List[InstaPipelineOutput] | None:
+    """Run many concurrent agents from a single process using asyncio,
+    keeping every Playwright worker and the LLM endpoint busy without
+    starting one heavyweight Python process per agent.
+
+    Arguments:
+
+    dataset: List[Dict[str, str]]
+        Override the default dataset, and run the pipeline on custom tasks,
+        each entry must be a dictionary with keys "domain" and "task".
+
+    browser_config: BrowserConfig
+        Configuration for the Playwright environment.
+
+    agent_config: AgentConfig
+        Configuration for the LLM agent.
+
+    judge_config: JudgeConfig
+        Configuration for the LLM judge.
+
+    task_proposer_config: TaskProposerConfig
+        Configuration for the LLM task proposer.
+
+    return_trajectories: bool
+        Whether to return trajectories or just save them.
+
+    max_concurrency: int
+        Maximum number of trajectories running at the same time.
+
+    playwright_workers: int
+        Number of Playwright workers running.
+
+    task_queue_path: str
+        Path to the SQLite file where trajectories pull tasks from on demand,
+        by default a temporary file that is removed when finished, or the
+        URL of a coordinator shared by several machines, which replaces
+        the static sharding by rank and world_size.
+
+    lease_timeout: float
+        Number of seconds before a leased task expires, and the task
+        is handed to another worker.
+
+    speculation_quantile: float
+        Quantile of finished task durations, such as 0.95, after which
+        a running task is also leased to another machine, and the first
+        copy to finish is saved, or None to disable speculation.
+
+    max_leases_per_domain: int
+        Maximum number of running tasks on the same domain, where
+        tasks on other domains are leased while a domain is at the limit.
+
+    min_domain_interval: float
+        Minimum number of seconds between starting two tasks on the
+        same domain, or None to start tasks as soon as a slot is free.
+
+    pipeline_judging: bool
+        Not supported by the asyncio engine, where the judge already runs
+        as a coroutine next to the rollouts, and raises ValueError if set.
+
+    target_step_latency: float
+        Not supported by the asyncio engine, which bounds the trajectories
+        in flight with max_concurrency, and raises ValueError if set.
+
+    profile_dir: str
+        Directory where the duration of every stage of the rollout is
+        saved as JSON lines, or None to disable profiling.
+
+    profile_port: int
+        Port serving the latest durations from profile_dir in the
+        Prometheus text format at /metrics, or None to disable.
+
+    Returns:
+
+    List[InstaPipelineOutput] | None
+        List with observations, actions, and judgments for each task,
+        which are saved to disk for later processing.
+
+    """
+
+    async def collect_trajectories() -> List[InstaPipelineOutput]:
+
+        pipeline_outputs = []
+
+        async for output in astream_data_collection(
+            dataset = dataset,
+            browser_config = browser_config,
+            agent_config = agent_config,
+            judge_config = judge_config,
+            task_proposer_config = task_proposer_config,
+            seed = seed, rank = rank, world_size = world_size,
+            observations_dir = observations_dir,
+            screenshot_dir = screenshot_dir,
+            actions_dir = actions_dir,
+            judgments_dir = judgments_dir,
+            task_proposals_dir = task_proposals_dir,
+            max_actions = max_actions,
+            agent_response_key = agent_response_key,
+            judge_response_key = judge_response_key,
+            skip_finished = skip_finished,
+            prune_observations = prune_observations,
+            storage_format = storage_format,
+            task_timeout = task_timeout,
+            step_timeout = step_timeout,
+            num_samples = num_samples,
+            success_threshold = success_threshold,
+            consistency_threshold = consistency_threshold,
+            step_spool_dir = step_spool_dir,
+            add_steps_to_agent = add_steps_to_agent,
+            add_criteria_to_agent = add_criteria_to_agent,
+            add_steps_to_judge = add_steps_to_judge,
+            add_criteria_to_judge = add_criteria_to_judge,
+            add_steps_to_task_proposer = add_steps_to_task_proposer,
+            add_criteria_to_task_proposer = add_criteria_to_task_proposer,
+            max_concurrency = max_concurrency,
+            playwright_workers = playwright_workers,
+            task_queue_path = task_queue_path,
+            lease_timeout = lease_timeout,
+            speculation_quantile = speculation_quantile,
+            max_leases_per_domain = max_leases_per_domain,
+            min_domain_interval = min_domain_interval,
+            pipeline_judging = pipeline_judging,
+            target_step_latency = target_step_latency,
+            profile_dir = profile_dir,
+            profile_port = profile_port,
+        ):
+
+            if return_trajectories:
+
+                pipeline_outputs.append(
+                    output
+                )
+
+        return pipeline_outputs
+
+    pipeline_outputs = asyncio.run(
+        collect_trajectories()
+    )
+
+    if return_trajectories:
+
+        return pipeline_outputs
@@ -0,0 +1,181 @@
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Callable, List
+
+import threading
+import traceback
+
+
+DEFAULT_NUM_WRITER_THREADS = 2
+DEFAULT_MAX_PENDING_WRITES = 4
+
+
+class BackgroundWriter(object):
+    """Runs disk writes, such as encoding screenshots and serializing
+    trajectories, on a small pool of threads, so the agent can start the
+    next task while the last one is saved, where submitting blocks once
+    too many writes are pending, to bound the memory held by the pool.
+
+    Attributes:
+
+    num_threads: int
+        Number of writer threads, or 0 to write in the calling thread.
+
+    max_pending: int
+        Maximum number of writes submitted but not yet finished.
+
+    errors: List[BaseException]
+        Errors raised by writes that have finished.
+
+    """
+
+    def __init__(self, num_threads: int = DEFAULT_NUM_WRITER_THREADS,
+                 max_pending: int = DEFAULT_MAX_PENDING_WRITES):
+        """Runs disk writes, such as encoding screenshots and serializing
+        trajectories, on a small pool of threads, so the agent can start the
+        next task while the last one is saved, where submitting blocks once
+        too many writes are pending, to bound the memory held by the pool.
+
+        Arguments:
+
+        num_threads: int
+            Number of writer threads, or 0 to write in the calling thread.
+
+        max_pending: int
+            Maximum number of writes submitted but not yet finished.
+
+        """
+
+        self.num_threads = num_threads
+        self.max_pending = max(max_pending, 1)
+
+        self.errors = []
+
+        self.executor = None
+
+        if num_threads > 0:
+
+            self.executor = ThreadPoolExecutor(
+                max_workers = num_threads,
+                thread_name_prefix = "insta-writer"
+            )
+
+        self.pending = threading.BoundedSemaphore(
+            self.max_pending
+        )
+
+        self.futures = set()
+        self.lock = threading.Lock()
+
+    def finish(self, future: Future) -> None:
+        """Record the result of a finished write, and allow another write
+        to be submitted.
+
+        Arguments:
+
+        future: Future
+            The finished write.
+
+        """
+
+        error = future.exception()
+
+        with self.lock:
+
+            self.futures.discard(future)
+
+            if error is not None:
+
+                self.errors.append(error)
+
+        if error is not None:
+
+            print("Background write failed:\n{}".format(
+                "".join(traceback.format_exception(
+                    type(error), error, error.__traceback__
+                ))
+            ))
+
+        self.pending.release()
+
+    def submit(self, write_fn: Callable, *args, **kwargs) -> Future:
+        """Hand a write to the pool, which takes ownership of the arguments,
+        and block while the maximum number of writes are pending.
+
+        Arguments:
+
+        write_fn: Callable
+            Function that writes data to disk.
+
+        Returns:
+
+        Future
+            Future that resolves to the value returned by write_fn.
+
+        """
+
+        self.pending.acquire()
+
+        if self.executor is None:
+
+            future = Future()
+            future.set_running_or_notify_cancel()
+
+            try:
+
+                future.set_result(
+                    write_fn(*args, **kwargs)
+                )
+
+            except Exception as error:
+
+                future.set_exception(error)
+
+        else:
+
+            future = self.executor.submit(
+                write_fn, *args, **kwargs
+            )
+
+        with self.lock:
+
+            self.futures.add(future)
+
+        future.add_done_callback(self.finish)
+
+        return future
+
+    def flush(self) -> None:
+        """Block until every pending write has finished.
+
+        """
+
+        with self.lock:
+
+            futures = list(self.futures)
+
+        for future in futures:
+
+            future.exception()
+
+    def close(self) -> None:
+        """Finish every pending write, shut down the writer threads, and
+        raise an error if any write failed, since data was lost.
+
+        """
+
+        self.flush()
+
+        if self.executor is not None:
+
+            self.executor.shutdown(
+                wait = True
+            )
+
+        if len(self.errors) > 0:
+
+            raise RuntimeError(
+                "{} background writes failed, first error: {!r}".format(
+                    len(self.errors),
+                    self.errors[0]
+                )
+            )
@@ -0,0 +1,176 @@
+from insta.step_spool import (
+    remove_spooled_steps
+)
+
+from insta.utils import (
+    BrowserStatus
+)
+
+from typing import Dict, List, Tuple
+
+
+DEFAULT_NUM_SAMPLES = 1
+DEFAULT_SUCCESS_THRESHOLD = 0.5
+DEFAULT_CONSISTENCY_THRESHOLD = None
+
+DEFAULT_SUCCESS = 0.0
+
+
+class BestOfNSampler(object):
+    """Tracks the samples drawn for one task in best-of-N rollouts, where
+    each sample is judged as soon as it finishes, and sampling stops once
+    a sample succeeds, or once enough samples fail that the remaining
+    samples are unlikely to help, and the best sample is saved.
+
+    Attributes:
+
+    num_samples: int
+        Maximum number of samples drawn for the task.
+
+    success_threshold: float
+        A sample with a judged success above this value is kept, and
+        no more samples are drawn for the task.
+
+    consistency_threshold: float
+        Fraction of the `num_samples` samples that must fail before
+        the remaining samples are cancelled, or None to draw every sample
+        until one succeeds.
+
+    num_finished: int
+        Number of samples drawn so far.
+
+    num_failed: int
+        Number of samples whose judged success is not above the
+        success threshold, including samples that raised errors.
+
+    best_trajectory: Tuple[List[Dict], List[Dict], Dict, Dict] | BrowserStatus
+        Sample with the highest judged success so far.
+
+    """
+
+    def __init__(self, num_samples: int = DEFAULT_NUM_SAMPLES,
+                 success_threshold: float = DEFAULT_SUCCESS_THRESHOLD,
+                 consistency_threshold: float = DEFAULT_CONSISTENCY_THRESHOLD):
+        """Tracks the samples drawn for one task in best-of-N rollouts, where
+        each sample is judged as soon as it finishes, and sampling stops once
+        a sample succeeds, or once enough samples fail that the remaining
+        samples are unlikely to help, and the best sample is saved.
+
+        Arguments:
+
+        num_samples: int
+            Maximum number of samples drawn for the task.
+
+        success_threshold: float
+            A sample with a judged success above this value is kept, and
+            no more samples are drawn for the task.
+
+        consistency_threshold: float
+            Fraction of the `num_samples` samples that must fail before
+            the remaining samples are cancelled, or None to draw every sample
+            until one succeeds.
+
+        """
+
+        self.num_samples = max(1, num_samples)
+        self.success_threshold = success_threshold
+        self.consistency_threshold = consistency_threshold
+
+        self.num_finished = 0
+        self.num_failed = 0
+
+        self.best_trajectory = BrowserStatus.ERROR
+        self.best_success = None
+
+    def add(self, trajectory: Tuple[List[Dict], List[Dict], Dict, Dict]
+            | BrowserStatus) -> None:
+        """Record a finished sample, and keep it if it has the highest
+        judged success so far.
+
+        Arguments:
+
+        trajectory: Tuple[List[Dict], List[Dict], Dict, Dict] | BrowserStatus
+            Observations, actions, judgment, and task proposal for the
+            sample, or BrowserStatus.ERROR if the sample failed.
+
+        """
+
+        self.num_finished += 1
+
+        success = DEFAULT_SUCCESS
+
+        if trajectory is not BrowserStatus.ERROR:
+
+            success = trajectory[2].get(
+                "success", DEFAULT_SUCCESS
+            ) or DEFAULT_SUCCESS
+
+            is_best = (
+                self.best_trajectory is BrowserStatus.ERROR or
+                success > self.best_success
+            )
+
+            # spooled steps of samples that are not saved are deleted
+            if not is_best:
+
+                remove_spooled_steps(trajectory[0])
+
+            else:
+
+                if self.best_trajectory is not BrowserStatus.ERROR:
+
+                    remove_spooled_steps(self.best_trajectory[0])
+
+                self.best_trajectory = trajectory
+                self.best_success = success
+
+        if success <= self.success_threshold:
+
+            self.num_failed += 1
+
+    def is_finished(self) -> bool:
+        """Check whether more samples should be drawn for the task.
+
+        Returns:
+
+        bool
+            Whether a sample succeeded, enough samples failed to satisfy
+            the consistency threshold, or every sample was drawn.
+
+        """
+
+        succeeded = self.num_finished > self.num_failed
+
+        consistently_failed = (
+            self.consistency_threshold is not None and
+            self.num_failed >= self.consistency_threshold * self.num_samples
+        )
+
+        return (
+            succeeded or consistently_failed or
+            self.num_finished >= self.num_samples
+        )
+
+    def get_best(self) -> Tuple[List[Dict], List[Dict], Dict, Dict] \
+            | BrowserStatus:
+        """Select the sample to save for the task, where the judgment
+        records how many samples were drawn.
+
+        Returns:
+
+        Tuple[List[Dict], List[Dict], Dict, Dict] | BrowserStatus
+            Sample with the highest judged success, or BrowserStatus.ERROR
+            if every sample failed with an error.
+
+        """
+
+        if self.num_samples == 1 or \
+                self.best_trajectory is BrowserStatus.ERROR:
+
+            return self.best_trajectory
+
+        observations, actions, judgment, task_proposal = self.best_trajectory
+
+        return observations, actions, {
+            **judgment, "num_samples": self.num_finished
+        }, task_proposal
@@ -8,38 +8,1177 @@ from insta.configs.browser_config import (
 from insta.utils import (
     BrowserStatus,
     safe_call,
+    async_safe_call,
+    ServerError,
+    METADATA_KEYS,
+    MINIMAL_STYLE_KEYS
+)
+
+from insta.profiling import span
+
+from insta.replay import (
+    RecordedResponse,
+    SessionRecorder,
+    SessionReplayer,
+    RECORDED_ENDPOINTS
+)
+
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from typing import Callable, List, Tuple
+
+from functools import lru_cache
+
+import importlib.util
+import threading
+import requests
+import weakref
+import asyncio
+import gzip
+import json
+import os
+import time
+
+
+ENDPOINTS = {
+    "start": "{server_url}/start?width={width}&height={height}",
+    "close": "{server_url}/close?session_id={session_id}",
+    "goto": "{server_url}/goto?url={url}&session_id={session_id}",
+    "observation": "{server_url}/observation?session_id={session_id}&screenshot={screenshot}&metadata_keys={metadata_keys}&style_keys={style_keys}",
+    "action": "{server_url}/action?session_id={session_id}",
+    "step": "{server_url}/step?session_id={session_id}&settle_time={settle_time}&screenshot={screenshot}&metadata_keys={metadata_keys}&style_keys={style_keys}",
+    "capabilities": "{server_url}/capabilities",
+}
+
+
+ClientError = (
+    BrowserStatus | 
     ServerError
 )
 
-from PIL import Image
-from typing import List
 
-import requests
-import base64
-import io
-import time
+OBSERVATION_CONTENT_TYPE = "application/x-insta-observation"
+OBSERVATION_ACCEPT_ENCODING_HEADER = "X-Observation-Accept-Encoding"
+OBSERVATION_ENCODING_HEADER = "X-Observation-Encoding"
+
+
+@lru_cache(maxsize = 1)
+def get_json_loads() -> Callable:
+    """Select the fastest JSON parser installed, where orjson is used
+    when available, and the standard library parser otherwise.
+
+    Returns:
+
+    Callable
+        Function that parses JSON from bytes or a string.
+
+    """
+
+    if importlib.util.find_spec("orjson") is not None:
+
+        import orjson
+
+        return orjson.loads
+
+    return json.loads
+
+
+@lru_cache(maxsize = 1)
+def get_observation_encodings() -> List[str]:
+    """List the codecs this process can decode for binary observations,
+    in order of preference, where zstd requires the zstandard package.
+
+    Returns:
+
+    List[str]
+        Names of the codecs, such as ["zstd", "gzip"].
+
+    """
+
+    if importlib.util.find_spec("zstandard") is not None:
+
+        return ["zstd", "gzip"]
+
+    return ["gzip"]
+
+
+def is_observation_frame(response: requests.Response) -> bool:
+    """Check whether the Playwright server sent an observation in the
+    binary format, rather than JSON.
+
+    Arguments:
+
+    response: requests.Response
+        The response from the server.
+
+    Returns:
+
+    bool
+        Whether the response holds a binary observation.
+
+    """
+
+    return response.headers.get("Content-Type", "").startswith(
+        OBSERVATION_CONTENT_TYPE
+    )
+
+
+def decode_observation_frame(content: bytes, encoding: str) -> dict:
+    """Decode an observation sent in the binary format, which holds the
+    length of the JSON section in 4 bytes, the compressed JSON section,
+    and the raw bytes of the screenshot.
+
+    Arguments:
+
+    content: bytes
+        Body of the response from the server.
+
+    encoding: str
+        Codec used to compress the JSON section, one of "zstd", "gzip",
+        or "identity".
+
+    Returns:
+
+    dict
+        Observation data, where the screenshot is PNG bytes, or None
+        if the server skipped the screenshot.
+
+    """
+
+    json_section_size = int.from_bytes(
+        content[:4], "big"
+    )
+
+    json_section = content[4:4 + json_section_size]
+
+    if encoding == "zstd":
+
+        import zstandard
+
+        # frames compressed by Node.js do not always store their size
+        json_section = zstandard.ZstdDecompressor() \
+            .decompressobj().decompress(json_section)
+
+    elif encoding == "gzip":
+
+        json_section = gzip.decompress(
+            json_section
+        )
+
+    obs_data = get_json_loads()(json_section)
+
+    obs_data["screenshot"] = content[
+        4 + json_section_size:
+    ] or None
+
+    return obs_data
+
+
+def load_response_data(response: requests.Response) -> dict:
+    """Read the data sent by the Playwright server, where observations
+    in the binary format are decoded, and JSON is parsed with the
+    fastest parser installed.
+
+    Arguments:
+
+    response: requests.Response
+        The response from the server.
+
+    Returns:
+
+    dict
+        The data sent by the server.
+
+    """
+
+    if is_observation_frame(response):
+
+        return decode_observation_frame(
+            response.content,
+            encoding = response.headers.get(
+                OBSERVATION_ENCODING_HEADER, "identity"
+            )
+        )
+
+    return get_json_loads()(
+        response.content
+    )
+
+
+HTTP_SESSIONS = {}
+HTTP_SESSIONS_LOCK = threading.Lock()
+
+
+def get_http_session(
+    server_url: str, pool_size: int = 16,
+    transport_retries: int = 3
+) -> requests.Session:
+    """Select the pooled HTTP session for a Playwright server, which is
+    shared by every client in the process that connects to the server,
+    so connections are kept alive and reused across sessions and steps.
+
+    Sessions are never shared between processes, because connections
+    inherited from a parent process would be used by both processes.
+
+    Arguments:
+
+    server_url: str
+        URL of the Playwright server, such as "http://localhost:3000".
+
+    pool_size: int
+        Maximum number of idle connections kept open to the server.
+
+    transport_retries: int
+        Number of times a failed connection to the server is retried
+        before the request fails, where requests that reached the server
+        are never retried at the transport level.
+
+    Returns:
+
+    requests.Session
+        Session that reuses connections to the server.
+
+    """
+
+    session_key = (
+        os.getpid(),
+        server_url,
+        pool_size,
+        transport_retries
+    )
+
+    with HTTP_SESSIONS_LOCK:
+
+        http_session = HTTP_SESSIONS.get(session_key)
+
+        if http_session is None:
+
+            adapter = HTTPAdapter(
+                pool_connections = 1,
+                pool_maxsize = pool_size,
+                max_retries = Retry(
+                    total = transport_retries,
+                    connect = transport_retries,
+                    read = 0,
+                    status = 0,
+                    backoff_factor = 0.1,
+                    raise_on_status = False
+                )
+            )
+
+            http_session = requests.Session()
+
+            http_session.mount("http://", adapter)
+            http_session.mount("https://", adapter)
+
+            HTTP_SESSIONS[session_key] = http_session
+
+        return http_session
+
+
+ASYNC_HTTP_SESSIONS = weakref.WeakKeyDictionary()
+
+
+def get_async_http_session(
+    server_url: str, pool_size: int = 16,
+    transport_retries: int = 3
+) -> "httpx.AsyncClient":
+    """Select the pooled non-blocking HTTP session for a Playwright server,
+    which is shared by every async client on the running event loop that
+    connects to the server, so connections are kept alive and reused.
+
+    Sessions are never shared between event loops, because connections
+    are bound to the event loop that opened them.
+
+    Arguments:
+
+    server_url: str
+        URL of the Playwright server, such as "http://localhost:3000".
+
+    pool_size: int
+        Maximum number of idle connections kept open to the server.
+
+    transport_retries: int
+        Number of times a failed connection to the server is retried
+        before the request fails.
+
+    Returns:
+
+    httpx.AsyncClient
+        Session that reuses connections to the server.
+
+    """
+
+    import httpx
+
+    loop_sessions = ASYNC_HTTP_SESSIONS.setdefault(
+        asyncio.get_running_loop(), {}
+    )
+
+    session_key = (
+        server_url,
+        pool_size,
+        transport_retries
+    )
+
+    http_session = loop_sessions.get(session_key)
+
+    if http_session is None:
+
+        http_session = loop_sessions[session_key] = httpx.AsyncClient(
+            transport = httpx.AsyncHTTPTransport(
+                retries = transport_retries,
+                limits = httpx.Limits(
+                    max_connections = None,
+                    max_keepalive_connections = pool_size
+                )
+            )
+        )
+
+    return http_session
+
+
+async def close_async_http_sessions() -> None:
+    """Close the pooled non-blocking HTTP sessions opened on the running
+    event loop, which should be awaited before the event loop is closed.
+
+    """
+
+    loop_sessions = ASYNC_HTTP_SESSIONS.pop(
+        asyncio.get_running_loop(), {}
+    )
+
+    for http_session in loop_sessions.values():
+
+        await http_session.aclose()
+
+
+class BrowserClient(object):
+    """Client for connecting to a serving running Playwright that
+    manages web browsing sessions, process observations that
+    contain the full state of webpages, and executing actions in
+    the full Playwright API via a dotpath syntax.
+
+    Attributes:
+
+    config: EnvConfig
+        The configuration for the Playwright environment, refer to
+        insta/configs/env_config.py for more information.
+
+    session_id: str
+        Unique string identifier for the current web browsing session,
+        used to identify which session on the backend server to interact with.
+
+    initialized: bool
+        Check whether the client has a valid session ID, indicating
+        that a web browsing session is currently active.
+
+    recorder: SessionRecorder
+        Saves the server responses for each session to config.record_dir,
+        or None when recording is disabled.
+
+    replayer: SessionReplayer
+        Serves responses recorded in config.replay_dir instead of
+        connecting to the server, or None when replay is disabled.
+
+    server_endpoints: List[str]
+        Endpoints advertised by the Playwright server, or None until
+        the server is first asked for its capabilities.
+
+    """
+
+    def __init__(self, config: BrowserConfig = DEFAULT_BROWSER_CONFIG):
+        """Client for connecting to a serving running Playwright that
+        manages web browsing sessions, process observations that
+        contain the full state of webpages, and executing actions in
+        the full Playwright API via a dotpath syntax.
+
+        Arguments:
+
+        config: EnvConfig
+            The configuration for the Playwright environment, refer to
+            insta/configs/env_config.py for more information.
+        
+        """
+        
+        self.config = config
+
+        self.session_id: str = None
+        self.server_endpoints: List[str] = None
+
+        self.recorder = None
+        self.replayer = None
+
+        if config.record_dir is not None:
+
+            self.recorder = SessionRecorder(
+                record_dir = config.record_dir
+            )
+
+        if config.replay_dir is not None:
+
+            self.replayer = SessionReplayer(
+                replay_dir = config.replay_dir
+            )
+
+    @property
+    def initialized(self) -> bool:
+        """Check whether the client has a valid session ID, indicating
+        that a web browsing session is currently active.
+
+        Returns:
+
+        initialized: bool
+            Whether the client has a valid session ID or not.
+        
+        """
+
+        return self.session_id is not None
+
+    @property
+    def http_session(self) -> requests.Session:
+        """Select the pooled HTTP session for the Playwright server of
+        this client, shared with other clients for the same server.
+
+        Returns:
+
+        requests.Session
+            Session that reuses connections to the server.
+
+        """
+
+        return get_http_session(
+            self.config.playwright_url.format(
+                port = self.config.playwright_port
+            ),
+            pool_size = self.config.pool_size,
+            transport_retries = self.config.transport_retries
+        )
+
+    def send_request(
+        self, endpoint: str,
+        timeout: float = None, **kwargs
+    ) -> requests.Response:
+        """Send a POST request over the pooled HTTP session, bounding the
+        time to connect and the time to read the response separately.
+
+        Arguments:
+
+        endpoint: str
+            Full URL of the endpoint on the Playwright server.
+
+        timeout: float
+            Number of seconds left before the deadline, which shortens
+            both timeouts, or None when no deadline is set.
+
+        Returns:
+
+        requests.Response
+            The response from the server.
+
+        """
+
+        connect_timeout = self.config.connect_timeout
+        read_timeout = self.config.read_timeout
+
+        if timeout is not None:
+
+            connect_timeout = timeout if connect_timeout is None \
+                else min(connect_timeout, timeout)
+
+            read_timeout = timeout if read_timeout is None \
+                else min(read_timeout, timeout)
+
+        return self.http_session.post(
+            endpoint,
+            timeout = (connect_timeout, read_timeout),
+            **kwargs
+        )
+
+    def supports_endpoint(self, endpoint_name: str) -> bool:
+        """Check whether the Playwright server advertises an endpoint, where
+        the server is asked once, and servers without the /capabilities
+        endpoint only serve the original endpoints.
+
+        Recording and replay only use the endpoints in RECORDED_ENDPOINTS,
+        so recordings can be replayed by any server.
+
+        Arguments:
+
+        endpoint_name: str
+            Name of the endpoint, such as "step".
+
+        Returns:
+
+        bool
+            Whether the endpoint can be used with this server.
+
+        """
+
+        if self.recorder is not None or self.replayer is not None:
+
+            return endpoint_name in RECORDED_ENDPOINTS
+
+        if self.server_endpoints is None:
+
+            endpoint = ENDPOINTS["capabilities"].format(
+                server_url = self.config.playwright_url.format(
+                    port = self.config.playwright_port
+                )
+            )
+
+            response = safe_call(
+                self.send_request, endpoint,
+                catch_errors = True,
+                log_errors = False,
+                max_errors = 1,
+                timeout_kwarg = "timeout"
+            )
+
+            # ask again later when the server cannot be reached
+            if response is BrowserStatus.ERROR:
+
+                return False
+
+            self.server_endpoints = (
+                response.json().get("endpoints", [])
+                if response.status_code == 200 else []
+            )
+
+        return endpoint_name in self.server_endpoints
+
+    def get_observation_headers(self) -> dict:
+        """Build the headers that ask the Playwright server for observations
+        in the binary format, which sends the screenshot as raw bytes, and
+        compresses the rest of the observation.
+
+        Recordings store responses as text, so JSON is requested instead
+        when recording.
+
+        Returns:
+
+        dict
+            Headers for requests that return observations.
+
+        """
+
+        if not self.config.binary_observations or self.recorder is not None:
+
+            return {}
+
+        return {
+            "Accept": "{}, application/json".format(
+                OBSERVATION_CONTENT_TYPE
+            ),
+            OBSERVATION_ACCEPT_ENCODING_HEADER: ", ".join(
+                get_observation_encodings()
+            ),
+        }
+
+    def get_observation_query(self) -> dict:
+        """Build the query parameters that select what the Playwright server
+        captures for an observation, where only the metadata fields and
+        computed styles read by the markdown parser are sent by default,
+        instead of every computed style of every node.
+
+        Returns:
+
+        dict
+            Query parameters for requests that return observations.
+
+        """
+
+        metadata_keys = (
+            self.config.metadata_keys
+            if self.config.metadata_keys is not None
+            else METADATA_KEYS
+        )
+
+        style_keys = (
+            self.config.style_keys
+            if self.config.style_keys is not None
+            else MINIMAL_STYLE_KEYS
+        )
+
+        return {
+            "screenshot": "true" if self.config.screenshot else "false",
+            "metadata_keys": ",".join(metadata_keys),
+            "style_keys": ",".join(style_keys),
+        }
+
+    def post(
+        self, endpoint_name: str, endpoint: str,
+        url: str = None, **kwargs
+    ) -> requests.Response | RecordedResponse | BrowserStatus:
+        """Send a request to an endpoint of the Playwright server, where the
+        response is saved when recording, and the recorded response is
+        returned without connecting to the server when replaying.
+
+        Arguments:
+
+        endpoint_name: str
+            Name of the endpoint, such as "observation".
+
+        endpoint: str
+            Full URL of the endpoint on the Playwright server.
+
+        url: str
+            URL requested by a goto, which names the recorded session.
+
+        Returns:
+
+        requests.Response | RecordedResponse | BrowserStatus
+            The response from the server, or an error if every
+            attempt to reach the server failed.
+
+        """
+
+        if self.replayer is not None:
+
+            # sessions need no setup or teardown without a browser
+            if endpoint_name in ["start", "close"]:
+
+                return RecordedResponse(
+                    status_code = 200,
+                    text = "replay"
+                )
+
+            return self.replayer.next(
+                endpoint_name, url = url
+            )
+
+        response = safe_call(
+            self.send_request, endpoint,
+            catch_errors = self.config.catch_errors,
+            log_errors = self.config.log_errors,
+            max_errors = self.config.max_errors,
+            timeout_kwarg = "timeout",
+            **kwargs
+        )
+
+        record_response = (
+            self.recorder is not None and
+            endpoint_name in RECORDED_ENDPOINTS and
+            response is not BrowserStatus.ERROR
+        )
+
+        if record_response:
+
+            self.recorder.add(
+                endpoint_name, response, url = url
+            )
+
+        return response
+
+    def start(
+        self, browser_kwargs: dict = None,
+        context_kwargs: dict = None,
+    ) -> ClientError:
+        """Attempt to start a new web browsing session by connecting to
+        the Playwrightserver via the /start endpoint, this will create a
+        new browser and context for the session, and returns an ID
+        that can be used to interact with the session.
+
+        Arguments:
+
+        browser_kwargs: dict
+            Keyword options to use when starting the Browser instance,
+            refer to the Playwright docs for more information.
+
+        context_kwargs: dict
+            Keyword options to use when starting the BrowserContext instance,
+            refer to the Playwright docs for more information.
+
+        Returns:
+
+        PlaywrightStatus | ServerError
+            The status of the start operation, or an error if the server
+            failed to start a new web browsing session.
+        
+        """
+
+        # close the previous session, do not stop for errors
+        if self.initialized: self.close()
+
+        endpoint = ENDPOINTS["start"].format(
+            server_url = self.config.playwright_url.format(
+                port = self.config.playwright_port
+            ),
+            width = self.config.screen_width,
+            height = self.config.screen_height
+        )
+
+        json_data = None
+
+        if browser_kwargs is not None:
+
+            json_data = json_data or {}
+
+            json_data.update({
+                "browser_kwargs": browser_kwargs
+            })
+
+        if context_kwargs is not None:
+
+            json_data = json_data or {}
+
+            json_data.update({
+                "context_kwargs": context_kwargs
+            })
+
+        with span("browser.start"):
+
+            response = self.post(
+                "start", endpoint, json = json_data
+            )
+
+        if response is BrowserStatus.ERROR:
+
+            return BrowserStatus.ERROR
+
+        if response.status_code != 200:
+
+            return ServerError(
+                message = response.text,
+                status_code = response.status_code
+            )
+
+        self.session_id = response.text
+
+        return BrowserStatus.SUCCESS
+    
+    def close(self) -> ClientError:
+        """Attempt to close the current session by connecting to the
+        Playwright server via the /close endpoint, this will release
+        any resources that were allocated in the backend server.
+        
+        Returns:
+
+        PlaywrightStatus | ServerError
+            The status of the close operation, or an error if the server
+            failed to close the current web browsing session.
+        
+        """
+
+        if not self.initialized:
+
+            return BrowserStatus.SUCCESS
+
+        endpoint = ENDPOINTS["close"].format(
+            server_url = self.config.playwright_url.format(
+                port = self.config.playwright_port
+            ),
+            session_id = self.session_id
+        )
+
+        with span("browser.close"):
+
+            response = self.post(
+                "close", endpoint
+            )
+
+        self.session_id = None
+
+        if self.recorder is not None:
+
+            self.recorder.save()
+        
+        if response is BrowserStatus.ERROR:
+
+            return BrowserStatus.ERROR
+
+        if response.status_code != 200:
+
+            return ServerError(
+                message = response.text,
+                status_code = response.status_code
+            )
+
+        return BrowserStatus.SUCCESS
+    
+    def goto(self, url: str) -> ClientError:
+        """Attempt to navigate to a new URL by connecting to the
+        Playwright server via the /goto endpoint, this will change the
+        current URL of the web browsing session to the new URL.
+
+        Arguments:
+
+        url: str
+            The URL to navigate to in the current web browsing session.
+
+        Returns:
+
+        PlaywrightStatus | ServerError
+            The status of the goto operation, or an error if the server
+            failed to navigate to the new URL.
+        
+        """
+
+        with span("browser.delay"):
+
+            time.sleep(
+                self.config.delays.get("goto", 0)
+                if self.config.delays is not None
+                and self.replayer is None else 0
+            )
+        
+        if not self.initialized:
+            
+            return BrowserStatus.ERROR
+
+        endpoint = ENDPOINTS["goto"].format(
+            server_url = self.config.playwright_url.format(
+                port = self.config.playwright_port
+            ),
+            url = url,
+            session_id = self.session_id
+        )
+
+        with span("browser.goto"):
+
+            response = self.post(
+                "goto", endpoint, url = url
+            )
+
+        if response is BrowserStatus.ERROR:
+
+            return BrowserStatus.ERROR
+
+        if response.status_code != 200:
+
+            return ServerError(
+                message = response.text,
+                status_code = response.status_code
+            )
+
+        return BrowserStatus.SUCCESS
+    
+    def observation(self) -> (BrowserObservation | ClientError):
+        """Attempt to generate an observation by connecting to the
+        Playwright server via the /observation endpoint.
+
+        Returns:
+
+        PlaywrightObservation | PlaywrightStatus | ServerError
+            The observation data, the status of the observation operation,
+            or an error if the server failed to generate an observation.
+
+        """
+
+        with span("browser.delay"):
+
+            time.sleep(
+                self.config.delays.get("observation", 0)
+                if self.config.delays is not None
+                and self.replayer is None else 0
+            )
+        
+        if not self.initialized:
+            
+            return BrowserStatus.ERROR
+
+        endpoint = ENDPOINTS["observation"].format(
+            server_url = self.config.playwright_url.format(
+                port = self.config.playwright_port
+            ),
+            session_id = self.session_id,
+            **self.get_observation_query()
+        )
+
+        with span("browser.observation"):
+
+            response = self.post(
+                "observation", endpoint,
+                headers = self.get_observation_headers()
+            )
+
+        return self.parse_observation(
+            response
+        )
+
+    def parse_observation(
+        self, response: requests.Response | RecordedResponse | BrowserStatus
+    ) -> (BrowserObservation | ClientError):
+        """Convert a response from the /observation endpoint of the
+        Playwright server into an observation.
+
+        Arguments:
+
+        response: requests.Response | RecordedResponse | BrowserStatus
+            The response from the server, or an error if every
+            attempt to reach the server failed.
+
+        Returns:
+
+        PlaywrightObservation | PlaywrightStatus | ServerError
+            The observation data, the status of the observation operation,
+            or an error if the server failed to generate an observation.
+
+        """
+
+        if response is BrowserStatus.ERROR:
+
+            return BrowserStatus.ERROR
+
+        if response.status_code != 200:
+
+            return ServerError(
+                message = response.text,
+                status_code = response.status_code
+            )
+
+        with span("browser.decode"):
+
+            obs_data = load_response_data(
+                response
+            )
+
+        return self.decode_observation(
+            obs_data
+        )
+
+    def decode_observation(
+        self, obs_data: dict
+    ) -> (BrowserObservation | ClientError):
+        """Convert the observation data sent by the Playwright server into
+        an observation, where the screenshot is decoded the first time
+        it is read from the observation.
+
+        Arguments:
+
+        obs_data: dict
+            Observation data with the keys "raw_html", "screenshot",
+            "metadata", and "current_url", where the screenshot is
+            PNG bytes, a base64 string when sent as JSON, or None when
+            screenshots are disabled.
+
+        Returns:
+
+        PlaywrightObservation | PlaywrightStatus
+            The observation data, or an error if keys are missing.
+
+        """
+
+        expected_keys = [
+            "raw_html",
+            "screenshot",
+            "metadata",
+            "current_url"
+        ]
+
+        all_keys_present = all([
+            key in obs_data
+            for key in expected_keys
+        ])
+
+        if not all_keys_present:
+
+            return BrowserStatus.ERROR
+
+        observation = BrowserObservation(
+            raw_html = obs_data["raw_html"],
+            screenshot = obs_data["screenshot"],
+            metadata = obs_data["metadata"],
+            current_url = obs_data["current_url"]
+        )
+
+        return observation
+    
+    def action(self, function_calls: List[FunctionCall]) -> ClientError:
+        """Attempt to perform a sequence of function calls in the browsing session
+        by connecting to the Playwright server via the /action endpoint.
+
+        Arguments:
+
+        function_calls: List[FunctionCall]
+            A sequence of function calls to perform in the web browsing session,
+            where each function calls is represented via a `dotpath` to a 
+            function in the Playwright API, and corresponding arguments to pass.
+
+        Returns:
+
+        PlaywrightObservation | PlaywrightStatus | ServerError
+            The observation data, the status of the observation operation,
+            or an error if the server failed to generate an observation.
+        
+        """
+
+        with span("browser.delay"):
+
+            time.sleep(
+                self.config.delays.get("action", 0)
+                if self.config.delays is not None
+                and self.replayer is None else 0
+            )
+        
+        if not self.initialized:
+            
+            return BrowserStatus.ERROR
+
+        endpoint = ENDPOINTS["action"].format(
+            server_url = self.config.playwright_url.format(
+                port = self.config.playwright_port
+            ),
+            session_id = self.session_id
+        )
+
+        action_json = [
+            {"dotpath": x.dotpath, "args": x.args}
+            for x in function_calls
+        ]
+
+        with span("browser.action"):
+
+            response = self.post(
+                "action", endpoint, json = action_json
+            )
+        
+        if response is BrowserStatus.ERROR:
+
+            return BrowserStatus.ERROR
+
+        if response.status_code != 200:
+
+            return ServerError(
+                message = response.text,
+                status_code = response.status_code
+            )
+
+        return BrowserStatus.SUCCESS
+
+    def step(self, function_calls: List[FunctionCall]) -> \
+            Tuple[ClientError, BrowserObservation | ClientError]:
+        """Attempt to perform a sequence of function calls in the browsing session,
+        and observe the webpage once it settles, in a single request to the
+        /step endpoint, or with /action and /observation for older servers.
+
+        Arguments:
+
+        function_calls: List[FunctionCall]
+            A sequence of function calls to perform in the web browsing session,
+            where each function calls is represented via a `dotpath` to a 
+            function in the Playwright API, and corresponding arguments to pass.
+
+        Returns:
+
+        Tuple[PlaywrightStatus | ServerError, PlaywrightObservation | PlaywrightStatus | ServerError]
+            The status of the action operation, and the observation data
+            if the action succeeded, or None if the action failed.
+        
+        """
+
+        if not self.supports_endpoint("step"):
+
+            action_status = self.action(
+                function_calls = function_calls
+            )
+
+            if action_status is not BrowserStatus.SUCCESS:
+
+                return action_status, None
+
+            return action_status, self.observation()
+
+        with span("browser.delay"):
+
+            time.sleep(
+                self.config.delays.get("action", 0)
+                if self.config.delays is not None else 0
+            )
+        
+        if not self.initialized:
+            
+            return BrowserStatus.ERROR, None
+
+        # the server waits before observing instead of the client
+        endpoint = ENDPOINTS["step"].format(
+            server_url = self.config.playwright_url.format(
+                port = self.config.playwright_port
+            ),
+            session_id = self.session_id,
+            settle_time = int(1000 * (
+                self.config.delays.get("observation", 0)
+                if self.config.delays is not None else 0
+            )),
+            **self.get_observation_query()
+        )
+
+        action_json = [
+            {"dotpath": x.dotpath, "args": x.args}
+            for x in function_calls
+        ]
+
+        with span("browser.step"):
+
+            response = self.post(
+                "step", endpoint, json = action_json,
+                headers = self.get_observation_headers()
+            )
+
+        return self.parse_step(
+            response
+        )
+
+    def parse_step(
+        self, response: requests.Response | BrowserStatus
+    ) -> Tuple[ClientError, BrowserObservation | ClientError]:
+        """Convert a response from the /step endpoint of the Playwright
+        server into the status of the action, and the observation.
+
+        Arguments:
 
+        response: requests.Response | BrowserStatus
+            The response from the server, or an error if every
+            attempt to reach the server failed.
 
-ENDPOINTS = {
-    "start": "{server_url}/start?width={width}&height={height}",
-    "close": "{server_url}/close?session_id={session_id}",
-    "goto": "{server_url}/goto?url={url}&session_id={session_id}",
-    "observation": "{server_url}/observation?session_id={session_id}",
-    "action": "{server_url}/action?session_id={session_id}",
-}
+        Returns:
 
+        Tuple[PlaywrightStatus | ServerError, PlaywrightObservation | PlaywrightStatus | ServerError]
+            The status of the action operation, and the observation data
+            if the action succeeded, or None if the action failed.
 
-ClientError = (
-    BrowserStatus | 
-    ServerError
-)
+        """
+        
+        if response is BrowserStatus.ERROR:
 
+            return BrowserStatus.ERROR, None
 
-class BrowserClient(object):
-    """Client for connecting to a serving running Playwright that
-    manages web browsing sessions, process observations that
-    contain the full state of webpages, and executing actions in
-    the full Playwright API via a dotpath syntax.
+        if response.status_code != 200:
+
+            return ServerError(
+                message = response.text,
+                status_code = response.status_code
+            ), None
+
+        with span("browser.decode"):
+
+            step_data = load_response_data(
+                response
+            )
+
+        # binary frames are only sent for observations
+        if is_observation_frame(response):
+
+            step_data = {"observation": step_data}
+
+        if "observation_error" in step_data:
+
+            return BrowserStatus.SUCCESS, ServerError(
+                message = step_data["observation_error"],
+                status_code = response.status_code
+            )
+
+        return BrowserStatus.SUCCESS, self.decode_observation(
+            step_data.get("observation") or {}
+        )
+
+
+class AsyncBrowserClient(BrowserClient):
+    """Client for connecting to a serving running Playwright from an
+    asyncio event loop, with the same sessions, observations, and actions
+    as BrowserClient, where requests and delays are awaited, so many
+    sessions are driven concurrently from a single thread.
 
     Attributes:
 
@@ -55,46 +1194,209 @@ class BrowserClient(object):
         Check whether the client has a valid session ID, indicating
         that a web browsing session is currently active.
 
+    recorder: SessionRecorder
+        Saves the server responses for each session to config.record_dir,
+        or None when recording is disabled.
+
+    replayer: SessionReplayer
+        Serves responses recorded in config.replay_dir instead of
+        connecting to the server, or None when replay is disabled.
+
+    server_endpoints: List[str]
+        Endpoints advertised by the Playwright server, or None until
+        the server is first asked for its capabilities.
+
     """
 
-    def __init__(self, config: BrowserConfig = DEFAULT_BROWSER_CONFIG):
-        """Client for connecting to a serving running Playwright that
-        manages web browsing sessions, process observations that
-        contain the full state of webpages, and executing actions in
-        the full Playwright API via a dotpath syntax.
+    @property
+    def http_session(self) -> "httpx.AsyncClient":
+        """Select the pooled non-blocking HTTP session for the Playwright
+        server of this client, shared with other clients on the event loop.
+
+        Returns:
+
+        httpx.AsyncClient
+            Session that reuses connections to the server.
+
+        """
+
+        return get_async_http_session(
+            self.config.playwright_url.format(
+                port = self.config.playwright_port
+            ),
+            pool_size = self.config.pool_size,
+            transport_retries = self.config.transport_retries
+        )
+
+    async def send_request(
+        self, endpoint: str, **kwargs
+    ) -> "httpx.Response":
+        """Send a POST request over the pooled non-blocking HTTP session,
+        bounding the time to connect and the time to read the response
+        separately, where the deadline cancels the request.
 
         Arguments:
 
-        config: EnvConfig
-            The configuration for the Playwright environment, refer to
-            insta/configs/env_config.py for more information.
-        
+        endpoint: str
+            Full URL of the endpoint on the Playwright server.
+
+        Returns:
+
+        httpx.Response
+            The response from the server.
+
         """
-        
-        self.config = config
 
-        self.session_id: str = None
+        import httpx
 
-    @property
-    def initialized(self) -> bool:
-        """Check whether the client has a valid session ID, indicating
-        that a web browsing session is currently active.
+        return await self.http_session.post(
+            endpoint,
+            timeout = httpx.Timeout(
+                self.config.read_timeout,
+                connect = self.config.connect_timeout
+            ),
+            **kwargs
+        )
+
+    async def supports_endpoint(self, endpoint_name: str) -> bool:
+        """Check whether the Playwright server advertises an endpoint, where
+        the server is asked once, and servers without the /capabilities
+        endpoint only serve the original endpoints.
+
+        Recording and replay only use the endpoints in RECORDED_ENDPOINTS,
+        so recordings can be replayed by any server.
+
+        Arguments:
+
+        endpoint_name: str
+            Name of the endpoint, such as "step".
 
         Returns:
 
-        initialized: bool
-            Whether the client has a valid session ID or not.
-        
+        bool
+            Whether the endpoint can be used with this server.
+
         """
 
-        return self.session_id is not None
+        if self.recorder is not None or self.replayer is not None:
 
-    def start(
+            return endpoint_name in RECORDED_ENDPOINTS
+
+        if self.server_endpoints is None:
+
+            endpoint = ENDPOINTS["capabilities"].format(
+                server_url = self.config.playwright_url.format(
+                    port = self.config.playwright_port
+                )
+            )
+
+            response = await async_safe_call(
+                self.send_request, endpoint,
+                catch_errors = True,
+                log_errors = False,
+                max_errors = 1
+            )
+
+            # ask again later when the server cannot be reached
+            if response is BrowserStatus.ERROR:
+
+                return False
+
+            self.server_endpoints = (
+                response.json().get("endpoints", [])
+                if response.status_code == 200 else []
+            )
+
+        return endpoint_name in self.server_endpoints
+
+    async def delay(self, endpoint_name: str) -> None:
+        """Wait before a request to the Playwright server without blocking
+        the event loop, where delays are skipped when replaying.
+
+        Arguments:
+
+        endpoint_name: str
+            Name of the endpoint, such as "observation".
+
+        """
+
+        with span("browser.delay"):
+
+            await asyncio.sleep(
+                self.config.delays.get(endpoint_name, 0)
+                if self.config.delays is not None
+                and self.replayer is None else 0
+            )
+
+    async def post(
+        self, endpoint_name: str, endpoint: str,
+        url: str = None, **kwargs
+    ) -> "httpx.Response | RecordedResponse | BrowserStatus":
+        """Send a request to an endpoint of the Playwright server, where the
+        response is saved when recording, and the recorded response is
+        returned without connecting to the server when replaying.
+
+        Arguments:
+
+        endpoint_name: str
+            Name of the endpoint, such as "observation".
+
+        endpoint: str
+            Full URL of the endpoint on the Playwright server.
+
+        url: str
+            URL requested by a goto, which names the recorded session.
+
+        Returns:
+
+        httpx.Response | RecordedResponse | BrowserStatus
+            The response from the server, or an error if every
+            attempt to reach the server failed.
+
+        """
+
+        if self.replayer is not None:
+
+            # sessions need no setup or teardown without a browser
+            if endpoint_name in ["start", "close"]:
+
+                return RecordedResponse(
+                    status_code = 200,
+                    text = "replay"
+                )
+
+            return self.replayer.next(
+                endpoint_name, url = url
+            )
+
+        response = await async_safe_call(
+            self.send_request, endpoint,
+            catch_errors = self.config.catch_errors,
+            log_errors = self.config.log_errors,
+            max_errors = self.config.max_errors,
+            **kwargs
+        )
+
+        record_response = (
+            self.recorder is not None and
+            endpoint_name in RECORDED_ENDPOINTS and
+            response is not BrowserStatus.ERROR
+        )
+
+        if record_response:
+
+            self.recorder.add(
+                endpoint_name, response, url = url
+            )
+
+        return response
+
+    async def start(
         self, browser_kwargs: dict = None,
         context_kwargs: dict = None,
     ) -> ClientError:
         """Attempt to start a new web browsing session by connecting to
-        the Playwrightserver via the /start endpoint, this will create a
+        the Playwright server via the /start endpoint, this will create a
         new browser and context for the session, and returns an ID
         that can be used to interact with the session.
 
@@ -117,7 +1419,7 @@ class BrowserClient(object):
         """
 
         # close the previous session, do not stop for errors
-        if self.initialized: self.close()
+        if self.initialized: await self.close()
 
         endpoint = ENDPOINTS["start"].format(
             server_url = self.config.playwright_url.format(
@@ -145,12 +1447,11 @@ class BrowserClient(object):
                 "context_kwargs": context_kwargs
             })
 
-        response = safe_call(
-            requests.post, endpoint, json = json_data,
-            catch_errors = self.config.catch_errors,
-            log_errors = self.config.log_errors,
-            max_errors = self.config.max_errors
-        )
+        with span("browser.start"):
+
+            response = await self.post(
+                "start", endpoint, json = json_data
+            )
 
         if response is BrowserStatus.ERROR:
 
@@ -166,8 +1467,8 @@ class BrowserClient(object):
         self.session_id = response.text
 
         return BrowserStatus.SUCCESS
-    
-    def close(self) -> ClientError:
+
+    async def close(self) -> ClientError:
         """Attempt to close the current session by connecting to the
         Playwright server via the /close endpoint, this will release
         any resources that were allocated in the backend server.
@@ -191,14 +1492,17 @@ class BrowserClient(object):
             session_id = self.session_id
         )
 
-        response = safe_call(
-            requests.post, endpoint,
-            catch_errors = self.config.catch_errors,
-            log_errors = self.config.log_errors,
-            max_errors = self.config.max_errors
-        )
+        with span("browser.close"):
+
+            response = await self.post(
+                "close", endpoint
+            )
 
         self.session_id = None
+
+        if self.recorder is not None:
+
+            self.recorder.save()
         
         if response is BrowserStatus.ERROR:
 
@@ -212,8 +1516,8 @@ class BrowserClient(object):
             )
 
         return BrowserStatus.SUCCESS
-    
-    def goto(self, url: str) -> ClientError:
+
+    async def goto(self, url: str) -> ClientError:
         """Attempt to navigate to a new URL by connecting to the
         Playwright server via the /goto endpoint, this will change the
         current URL of the web browsing session to the new URL.
@@ -231,10 +1535,7 @@ class BrowserClient(object):
         
         """
 
-        time.sleep(
-            self.config.delays.get("goto", 0)
-            if self.config.delays is not None else 0
-        )
+        await self.delay("goto")
         
         if not self.initialized:
             
@@ -248,12 +1549,11 @@ class BrowserClient(object):
             session_id = self.session_id
         )
 
-        response = safe_call(
-            requests.post, endpoint,
-            catch_errors = self.config.catch_errors,
-            log_errors = self.config.log_errors,
-            max_errors = self.config.max_errors
-        )
+        with span("browser.goto"):
+
+            response = await self.post(
+                "goto", endpoint, url = url
+            )
 
         if response is BrowserStatus.ERROR:
 
@@ -267,8 +1567,8 @@ class BrowserClient(object):
             )
 
         return BrowserStatus.SUCCESS
-    
-    def observation(self) -> (BrowserObservation | ClientError):
+
+    async def observation(self) -> (BrowserObservation | ClientError):
         """Attempt to generate an observation by connecting to the
         Playwright server via the /observation endpoint.
 
@@ -280,10 +1580,7 @@ class BrowserClient(object):
 
         """
 
-        time.sleep(
-            self.config.delays.get("observation", 0)
-            if self.config.delays is not None else 0
-        )
+        await self.delay("observation")
         
         if not self.initialized:
             
@@ -293,59 +1590,22 @@ class BrowserClient(object):
             server_url = self.config.playwright_url.format(
                 port = self.config.playwright_port
             ),
-            session_id = self.session_id
-        )
-
-        response = safe_call(
-            requests.post, endpoint,
-            catch_errors = self.config.catch_errors,
-            log_errors = self.config.log_errors,
-            max_errors = self.config.max_errors
+            session_id = self.session_id,
+            **self.get_observation_query()
         )
 
-        if response is BrowserStatus.ERROR:
-
-            return BrowserStatus.ERROR
-
-        if response.status_code != 200:
+        with span("browser.observation"):
 
-            return ServerError(
-                message = response.text,
-                status_code = response.status_code
+            response = await self.post(
+                "observation", endpoint,
+                headers = self.get_observation_headers()
             )
 
-        obs_data = response.json()
-
-        expected_keys = [
-            "raw_html",
-            "screenshot",
-            "metadata",
-            "current_url"
-        ]
-
-        all_keys_present = all([
-            key in obs_data
-            for key in expected_keys
-        ])
-
-        if not all_keys_present:
-
-            return BrowserStatus.ERROR
-            
-        screenshot = Image.open(io.BytesIO(
-            base64.b64decode(obs_data["screenshot"])
-        ))
-
-        observation = BrowserObservation(
-            raw_html = obs_data["raw_html"],
-            screenshot = screenshot,
-            metadata = obs_data["metadata"],
-            current_url = obs_data["current_url"]
+        return self.parse_observation(
+            response
         )
 
-        return observation
-    
-    def action(self, function_calls: List[FunctionCall]) -> ClientError:
+    async def action(self, function_calls: List[FunctionCall]) -> ClientError:
         """Attempt to perform a sequence of function calls in the browsing session
         by connecting to the Playwright server via the /action endpoint.
 
@@ -358,16 +1618,13 @@ class BrowserClient(object):
 
         Returns:
 
-        PlaywrightObservation | PlaywrightStatus | ServerError
-            The observation data, the status of the observation operation,
-            or an error if the server failed to generate an observation.
+        PlaywrightStatus | ServerError
+            The status of the action operation, or an error if the server
+            failed to perform the function calls.
         
         """
 
-        time.sleep(
-            self.config.delays.get("action", 0)
-            if self.config.delays is not None else 0
-        )
+        await self.delay("action")
         
         if not self.initialized:
             
@@ -385,12 +1642,11 @@ class BrowserClient(object):
             for x in function_calls
         ]
 
-        response = safe_call(
-            requests.post, endpoint, json = action_json,
-            catch_errors = self.config.catch_errors,
-            log_errors = self.config.log_errors,
-            max_errors = self.config.max_errors
-        )
+        with span("browser.action"):
+
+            response = await self.post(
+                "action", endpoint, json = action_json
+            )
         
         if response is BrowserStatus.ERROR:
 
@@ -404,3 +1660,71 @@ class BrowserClient(object):
             )
 
         return BrowserStatus.SUCCESS
+
+    async def step(self, function_calls: List[FunctionCall]) -> \
+            Tuple[ClientError, BrowserObservation | ClientError]:
+        """Attempt to perform a sequence of function calls in the browsing session,
+        and observe the webpage once it settles, in a single request to the
+        /step endpoint, or with /action and /observation for older servers.
+
+        Arguments:
+
+        function_calls: List[FunctionCall]
+            A sequence of function calls to perform in the web browsing session,
+            where each function calls is represented via a `dotpath` to a 
+            function in the Playwright API, and corresponding arguments to pass.
+
+        Returns:
+
+        Tuple[PlaywrightStatus | ServerError, PlaywrightObservation | PlaywrightStatus | ServerError]
+            The status of the action operation, and the observation data
+            if the action succeeded, or None if the action failed.
+        
+        """
+
+        if not await self.supports_endpoint("step"):
+
+            action_status = await self.action(
+                function_calls = function_calls
+            )
+
+            if action_status is not BrowserStatus.SUCCESS:
+
+                return action_status, None
+
+            return action_status, await self.observation()
+
+        await self.delay("action")
+        
+        if not self.initialized:
+            
+            return BrowserStatus.ERROR, None
+
+        # the server waits before observing instead of the client
+        endpoint = ENDPOINTS["step"].format(
+            server_url = self.config.playwright_url.format(
+                port = self.config.playwright_port
+            ),
+            session_id = self.session_id,
+            settle_time = int(1000 * (
+                self.config.delays.get("observation", 0)
+                if self.config.delays is not None else 0
+            )),
+            **self.get_observation_query()
+        )
+
+        action_json = [
+            {"dotpath": x.dotpath, "args": x.args}
+            for x in function_calls
+        ]
+
+        with span("browser.step"):
+
+            response = await self.post(
+                "step", endpoint, json = action_json,
+                headers = self.get_observation_headers()
+            )
+
+        return self.parse_step(
+            response
+        )
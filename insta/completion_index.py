@@ -0,0 +1,263 @@
+from insta.trajectory_store import (
+    list_identifiers
+)
+
+from typing import Dict, Set
+
+import os
+
+
+DEFAULT_JOURNAL_SUFFIX = ".completed"
+
+
+COMPLETION_KINDS = [
+    "observations",
+    "actions",
+    "judgments",
+    "task_proposals",
+]
+
+
+def get_journal_path(data_dir: str) -> str:
+    """Get the path of the journal for a data directory, which is stored
+    next to the directory, so scripts that list the directory
+    only see the saved JSON files.
+
+    Arguments:
+
+    data_dir: str
+        Directory where JSON files are saved, one per identifier.
+
+    Returns:
+
+    str
+        Path to the journal file for the directory.
+
+    """
+
+    return os.path.normpath(data_dir) + DEFAULT_JOURNAL_SUFFIX
+
+
+class CompletionIndex(object):
+    """Append-only journal of identifiers whose JSON file has been fully
+    written to a data directory, which is read in one shot on resume
+    instead of checking whether each file exists.
+
+    The journal is rebuilt from a single listing of the directory when
+    it is missing, so delete the journal after removing files by hand.
+
+    Attributes:
+
+    data_dir: str
+        Directory where JSON files are saved, one per identifier.
+
+    journal_path: str
+        Path to the journal file for the directory.
+
+    """
+
+    def __init__(self, data_dir: str, journal_path: str = None):
+        """Append-only journal of identifiers whose JSON file has been fully
+        written to a data directory, which is read in one shot on resume
+        instead of checking whether each file exists.
+
+        Arguments:
+
+        data_dir: str
+            Directory where JSON files are saved, one per identifier.
+
+        journal_path: str
+            Path to the journal file, stored next to the directory by default.
+
+        """
+
+        self.data_dir = data_dir
+
+        self.journal_path = (
+            journal_path or
+            get_journal_path(data_dir)
+        )
+
+        self._identifiers = None
+
+    def __getstate__(self) -> dict:
+
+        state = self.__dict__.copy()
+        state["_identifiers"] = None
+
+        return state
+
+    @property
+    def identifiers(self) -> Set[str]:
+        """Identifiers that have been saved, loaded on first access.
+
+        Returns:
+
+        Set[str]
+            Identifiers with a JSON file in the data directory.
+
+        """
+
+        if self._identifiers is None:
+
+            self._identifiers = self.load()
+
+        return self._identifiers
+
+    def __contains__(self, identifier: str) -> bool:
+
+        return identifier in self.identifiers
+
+    def __len__(self) -> int:
+
+        return len(self.identifiers)
+
+    def load(self) -> Set[str]:
+        """Read every identifier from the journal, and rebuild the journal
+        from the data directory if the journal does not exist yet.
+
+        Returns:
+
+        Set[str]
+            Identifiers with a JSON file in the data directory.
+
+        """
+
+        if not os.path.exists(self.journal_path):
+
+            return self.rebuild()
+
+        with open(self.journal_path, "r") as file:
+
+            return set(
+                line.rstrip("\n")
+                for line in file
+                if line.endswith("\n")
+            )
+
+    def rebuild(self) -> Set[str]:
+        """List the data directory once, and atomically replace the
+        journal with the identifiers of every record found.
+
+        Returns:
+
+        Set[str]
+            Identifiers with a JSON file in the data directory.
+
+        """
+
+        identifiers = list_identifiers(
+            self.data_dir
+        )
+
+        journal_dir = os.path.dirname(
+            self.journal_path
+        )
+
+        if journal_dir != "":
+
+            os.makedirs(
+                journal_dir,
+                exist_ok = True
+            )
+
+        temporary_path = "{}.{}.tmp".format(
+            self.journal_path,
+            os.getpid()
+        )
+
+        with open(temporary_path, "w") as file:
+
+            file.writelines(
+                "{}\n".format(identifier)
+                for identifier in sorted(identifiers)
+            )
+
+        os.replace(
+            temporary_path,
+            self.journal_path
+        )
+
+        self._identifiers = identifiers
+
+        return identifiers
+
+    def ensure_journal(self) -> None:
+        """Rebuild the journal if it does not exist, so a new journal
+        includes files saved before the journal was created, which should
+        be called once before several processes append to the journal.
+
+        """
+
+        if not os.path.exists(self.journal_path):
+
+            self.rebuild()
+
+    def add(self, identifier: str) -> None:
+        """Record that the JSON file for an identifier is fully written,
+        which should be called right after the file is closed.
+
+        Arguments:
+
+        identifier: str
+            Unique identifier for the task.
+
+        """
+
+        self.ensure_journal()
+
+        # single short lines in append mode do not interleave
+        with open(self.journal_path, "a") as file:
+
+            file.write("{}\n".format(identifier))
+
+        if self._identifiers is not None:
+
+            self._identifiers.add(identifier)
+
+
+def get_completion_indices(
+    observations_dir: str = None,
+    actions_dir: str = None,
+    judgments_dir: str = None,
+    task_proposals_dir: str = None,
+) -> Dict[str, CompletionIndex]:
+    """Create a completion index for each data directory that is used,
+    keyed by the kind of data saved in the directory.
+
+    Arguments:
+
+    observations_dir: str
+        Directory to save observations.
+
+    actions_dir: str
+        Directory to save actions.
+
+    judgments_dir: str
+        Directory to save judgments.
+
+    task_proposals_dir: str
+        Directory to save task proposals.
+
+    Returns:
+
+    Dict[str, CompletionIndex]
+        Completion index for each kind of data, or None if the
+        directory for that kind of data is None.
+
+    """
+
+    data_dirs = {
+        "observations": observations_dir,
+        "actions": actions_dir,
+        "judgments": judgments_dir,
+        "task_proposals": task_proposals_dir,
+    }
+
+    return {
+        kind: (
+            CompletionIndex(data_dirs[kind])
+            if data_dirs[kind] is not None else None
+        )
+        for kind in COMPLETION_KINDS
+    }
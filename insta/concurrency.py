@@ -0,0 +1,451 @@
+from typing import Callable, Dict, List
+
+from torch.multiprocessing import (
+    Queue,
+    Value
+)
+
+import threading
+import queue
+import json
+import time
+import os
+
+
+DEFAULT_TARGET_STEP_LATENCY = None
+DEFAULT_MIN_AGENTS = 1
+
+DEFAULT_CONTROL_INTERVAL = 30
+DEFAULT_MIN_LATENCY_SAMPLES = 10
+DEFAULT_DECREASE_FACTOR = 0.75
+DEFAULT_INCREASE_STEP = 1
+
+DEFAULT_SLOT_POLL_INTERVAL = 1
+DEFAULT_METRICS_QUEUE_SIZE = 100000
+
+
+LATENCY_KINDS = [
+    "queue_wait",
+    "browser",
+    "llm",
+    "step",
+    "trajectory",
+]
+
+
+def get_percentile(values: List[float], quantile: float) -> float | None:
+    """Select the value at a quantile of a list of measurements.
+
+    Arguments:
+
+    values: List[float]
+        Measurements in any order.
+
+    quantile: float
+        Quantile between 0 and 1, such as 0.99 for the p99.
+
+    Returns:
+
+    float | None
+        The measurement at the quantile, or None if there are no values.
+
+    """
+
+    if len(values) == 0:
+
+        return None
+
+    values = sorted(values)
+
+    return values[min(
+        int(quantile * len(values)),
+        len(values) - 1
+    )]
+
+
+class RolloutSlots(object):
+    """Handle shared by the agent processes and the concurrency controller,
+    where only the first `num_active` agents start new trajectories, and
+    agents report the latency of each stage back to the controller.
+
+    Attributes:
+
+    worker_ids: List[str]
+        Unique identifier for each agent, in the order slots are activated.
+
+    num_active: Value
+        Shared number of agents currently allowed to start trajectories.
+
+    metrics_queue: Queue
+        Queue of (kind, seconds) latency measurements sent by the agents.
+
+    """
+
+    def __init__(self, worker_ids: List[str], num_active: int,
+                 metrics_queue_size: int = DEFAULT_METRICS_QUEUE_SIZE):
+        """Handle shared by the agent processes and the concurrency controller,
+        where only the first `num_active` agents start new trajectories, and
+        agents report the latency of each stage back to the controller.
+
+        Arguments:
+
+        worker_ids: List[str]
+            Unique identifier for each agent, in the order slots are activated.
+
+        num_active: int
+            Number of agents initially allowed to start trajectories.
+
+        metrics_queue_size: int
+            Maximum number of measurements waiting to be read, where
+            measurements are dropped when the queue is full.
+
+        """
+
+        self.worker_ids = list(worker_ids)
+
+        self.num_active = Value(
+            "i", num_active
+        )
+
+        self.metrics_queue = Queue(
+            maxsize = metrics_queue_size
+        )
+
+    def is_active(self, worker_id: str) -> bool:
+        """Check whether an agent is allowed to start a new trajectory.
+
+        Arguments:
+
+        worker_id: str
+            Unique identifier for the agent.
+
+        Returns:
+
+        bool
+            Whether the slot of the agent is active.
+
+        """
+
+        return self.worker_ids.index(worker_id) < self.num_active.value
+
+    def wait_for_slot(self, worker_id: str,
+                      stop_fn: Callable[[], bool] = None) -> bool:
+        """Block until the slot of an agent is active, which is called
+        between trajectories, so a paused agent holds no leased tasks.
+
+        Arguments:
+
+        worker_id: str
+            Unique identifier for the agent.
+
+        stop_fn: Callable[[], bool]
+            Function that returns True when there is no work left, so a
+            paused agent exits instead of waiting for its slot.
+
+        Returns:
+
+        bool
+            Whether the slot is active, or False if the agent should stop.
+
+        """
+
+        start_time = time.time()
+
+        while not self.is_active(worker_id):
+
+            if stop_fn is not None and stop_fn():
+
+                return False
+
+            time.sleep(DEFAULT_SLOT_POLL_INTERVAL)
+
+        self.report(
+            "queue_wait",
+            time.time() - start_time
+        )
+
+        return True
+
+    def report(self, kind: str, seconds: float) -> None:
+        """Send a latency measurement to the controller, without blocking
+        the agent when the controller falls behind.
+
+        Arguments:
+
+        kind: str
+            Stage that was measured, one of LATENCY_KINDS.
+
+        seconds: float
+            Duration of the stage in seconds.
+
+        """
+
+        try: self.metrics_queue.put_nowait((kind, seconds))
+
+        except queue.Full: pass
+
+    def resize(self, num_active: int) -> None:
+        """Change the number of agents allowed to start trajectories, where
+        agents above the limit pause after their current trajectory.
+
+        Arguments:
+
+        num_active: int
+            Number of active slots.
+
+        """
+
+        self.num_active.value = num_active
+
+
+class ConcurrencyController(object):
+    """Adjust the number of active rollout slots with additive increase and
+    multiplicative decrease, where slots grow while the p99 step latency
+    stays under a target, and shrink as soon as the target is exceeded,
+    so the LLM endpoint and Playwright servers stay busy without queueing.
+
+    Every decision is printed and appended to an optional JSON lines file,
+    together with the latency and throughput measured in the interval.
+
+    Attributes:
+
+    rollout_slots: RolloutSlots
+        Handle shared with the agent processes.
+
+    target_step_latency: float
+        Target for the p99 latency of a browser action plus an LLM query.
+
+    min_slots: int
+        Minimum number of active slots.
+
+    max_slots: int
+        Maximum number of active slots, which is the number of agents.
+
+    control_interval: float
+        Number of seconds between decisions.
+
+    metrics_path: str
+        Path to a JSON lines file where decisions are saved.
+
+    history: List[Dict]
+        Metrics and decision for every interval.
+
+    """
+
+    def __init__(self, rollout_slots: RolloutSlots,
+                 target_step_latency: float,
+                 min_slots: int = DEFAULT_MIN_AGENTS,
+                 max_slots: int = None,
+                 control_interval: float = DEFAULT_CONTROL_INTERVAL,
+                 increase_step: int = DEFAULT_INCREASE_STEP,
+                 decrease_factor: float = DEFAULT_DECREASE_FACTOR,
+                 metrics_path: str = None):
+        """Adjust the number of active rollout slots with additive increase and
+        multiplicative decrease, where slots grow while the p99 step latency
+        stays under a target, and shrink as soon as the target is exceeded.
+
+        Arguments:
+
+        rollout_slots: RolloutSlots
+            Handle shared with the agent processes.
+
+        target_step_latency: float
+            Target for the p99 latency of a browser action plus an LLM query.
+
+        min_slots: int
+            Minimum number of active slots.
+
+        max_slots: int
+            Maximum number of active slots, by default the number of agents.
+
+        control_interval: float
+            Number of seconds between decisions.
+
+        increase_step: int
+            Number of slots added after an interval under the target.
+
+        decrease_factor: float
+            Fraction of slots kept after an interval over the target.
+
+        metrics_path: str
+            Path to a JSON lines file where decisions are saved.
+
+        """
+
+        self.rollout_slots = rollout_slots
+        self.target_step_latency = target_step_latency
+
+        self.max_slots = (
+            max_slots or
+            len(rollout_slots.worker_ids)
+        )
+
+        self.min_slots = max(1, min(
+            min_slots,
+            self.max_slots
+        ))
+
+        self.control_interval = control_interval
+        self.increase_step = increase_step
+        self.decrease_factor = decrease_factor
+
+        self.metrics_path = metrics_path
+
+        self.history = []
+
+        self.latencies = {
+            kind: []
+            for kind in LATENCY_KINDS
+        }
+
+        self.stop_event = threading.Event()
+        self.thread = None
+
+        self.last_update_time = time.time()
+
+    def drain(self) -> None:
+        """Read every latency measurement sent since the last decision.
+
+        """
+
+        while True:
+
+            try: kind, seconds = self.rollout_slots.metrics_queue.get_nowait()
+
+            except queue.Empty: break
+
+            if kind in self.latencies:
+
+                self.latencies[kind].append(seconds)
+
+    def update(self) -> Dict[str, float | int | str]:
+        """Measure the last interval, and grow, shrink, or hold the number
+        of active slots depending on the p99 step latency.
+
+        Returns:
+
+        Dict[str, float | int | str]
+            Metrics for the interval, and the decision that was made.
+
+        """
+
+        self.drain()
+
+        current_time = time.time()
+
+        elapsed_time = max(
+            current_time - self.last_update_time,
+            1e-6
+        )
+
+        num_slots = self.rollout_slots.num_active.value
+
+        step_latencies = self.latencies["step"]
+        p99_step_latency = get_percentile(step_latencies, 0.99)
+
+        decision = "hold"
+
+        if len(step_latencies) >= DEFAULT_MIN_LATENCY_SAMPLES:
+
+            if p99_step_latency > self.target_step_latency:
+
+                decision = "decrease"
+
+                num_slots = max(self.min_slots, min(
+                    num_slots - 1,
+                    int(num_slots * self.decrease_factor)
+                ))
+
+            elif num_slots < self.max_slots:
+
+                decision = "increase"
+
+                num_slots = min(
+                    self.max_slots,
+                    num_slots + self.increase_step
+                )
+
+        self.rollout_slots.resize(num_slots)
+
+        metrics = {
+            "time": current_time,
+            "decision": decision,
+            "active_slots": num_slots,
+            "target_step_latency": self.target_step_latency,
+            "p99_step_latency": p99_step_latency,
+            "p50_llm_latency": get_percentile(self.latencies["llm"], 0.5),
+            "p50_browser_latency": get_percentile(self.latencies["browser"], 0.5),
+            "p50_queue_wait": get_percentile(self.latencies["queue_wait"], 0.5),
+            "num_steps": len(step_latencies),
+            "trajectories_per_hour": (
+                len(self.latencies["trajectory"]) * 3600.0 / elapsed_time
+            ),
+        }
+
+        self.history.append(metrics)
+
+        print("Concurrency controller: {decision} to {active_slots} slots, "
+              "p99 step latency {p99_step_latency}, "
+              "{trajectories_per_hour:.1f} trajectories per hour".format(
+                  **metrics))
+
+        if self.metrics_path is not None:
+
+            metrics_dir = os.path.dirname(self.metrics_path)
+
+            if metrics_dir != "":
+
+                os.makedirs(
+                    metrics_dir,
+                    exist_ok = True
+                )
+
+            with open(self.metrics_path, "a") as file:
+
+                file.write(json.dumps(metrics) + "\n")
+
+        self.latencies = {
+            kind: []
+            for kind in LATENCY_KINDS
+        }
+
+        self.last_update_time = current_time
+
+        return metrics
+
+    def run(self) -> None:
+        """Make a decision every control interval until stopped.
+
+        """
+
+        while not self.stop_event.wait(self.control_interval):
+
+            self.update()
+
+    def start(self) -> None:
+        """Start making decisions in a background thread, which should
+        be called after the agent processes are started.
+
+        """
+
+        self.stop_event.clear()
+
+        self.thread = threading.Thread(
+            target = self.run,
+            name = "insta-concurrency",
+            daemon = True
+        )
+
+        self.thread.start()
+
+    def stop(self) -> None:
+        """Stop the background thread.
+
+        """
+
+        self.stop_event.set()
+
+        if self.thread is not None:
+
+            self.thread.join()
+            self.thread = None
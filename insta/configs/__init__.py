@@ -6,6 +6,8 @@ from insta.configs.browser_config import (
     FunctionCall,
     NodeToMetadata,
     NodeMetadata,
+    get_raw_screenshot,
+    decode_screenshot,
 )
 
 from insta.configs.agent_config import (
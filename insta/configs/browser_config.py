@@ -1,7 +1,10 @@
 from dataclasses import dataclass, asdict
-from typing import Tuple, Dict
+from typing import Any, Tuple, Dict, List
 from PIL import Image
 
+import base64
+import io
+
 
 @dataclass
 class BrowserConfig:
@@ -25,8 +28,21 @@ class BrowserConfig:
     log_errors: bool = True
     max_errors: int = 5
 
+    pool_size: int = 16
+    connect_timeout: float = 10.0
+    read_timeout: float = None
+    transport_retries: int = 3
+
+    binary_observations: bool = True
+
+    metadata_keys: List[str] = None
+    style_keys: List[str] = None
+
     delays: dict = None
 
+    record_dir: str = None
+    replay_dir: str = None
+
 
 @dataclass
 class NodeMetadata:
@@ -48,6 +64,83 @@ class NodeMetadata:
 NodeToMetadata = Dict[str, NodeMetadata]
 
 
+class LazyScreenshot(object):
+    """Field of an observation that stores the screenshot as it was sent
+    by the Playwright server, such as PNG bytes or a base64 string, and
+    decodes it into an image the first time the field is read, so steps
+    whose screenshot is never used skip the cost of decoding.
+
+    Attributes:
+
+    name: str
+        Name of the attribute where the stored screenshot is kept.
+
+    """
+
+    def __set_name__(self, owner: type, name: str) -> None:
+
+        self.name = "_" + name
+
+    def __get__(self, instance: Any, owner: type = None) -> Image.Image:
+
+        if instance is None:
+
+            return None  # the default value of the dataclass field
+
+        screenshot = getattr(
+            instance, self.name, None
+        )
+
+        if not isinstance(screenshot, Image.Image):
+
+            screenshot = decode_screenshot(
+                screenshot
+            )
+
+            setattr(
+                instance, self.name, screenshot
+            )
+
+        return screenshot
+
+    def __set__(self, instance: Any, screenshot: Any) -> None:
+
+        setattr(
+            instance, self.name, screenshot
+        )
+
+
+def decode_screenshot(screenshot: Any) -> Image.Image | None:
+    """Decode a screenshot as it was sent by the Playwright server, where
+    images that are already decoded are returned unchanged.
+
+    Arguments:
+
+    screenshot: Any
+        The screenshot as PNG bytes, a base64 string, an image, or None.
+
+    Returns:
+
+    Image.Image | None
+        The decoded image, or None if no screenshot was taken.
+
+    """
+
+    if isinstance(screenshot, str):
+
+        screenshot = base64.b64decode(
+            screenshot
+        )
+
+    if isinstance(screenshot, (bytes, bytearray, memoryview)):
+
+        screenshot = Image.open(io.BytesIO(
+            screenshot
+        )) if len(screenshot) > 0 else None
+
+    return screenshot
+
+
 @dataclass
 class BrowserObservation:
 
@@ -55,12 +148,34 @@ class BrowserObservation:
     raw_html: str = None
 
     processed_image: Image.Image = None
-    screenshot: Image.Image = None
+    screenshot: Image.Image = LazyScreenshot()
 
     metadata: NodeToMetadata = None
     current_url: str = None
 
 
+def get_raw_screenshot(observation: BrowserObservation) -> Any:
+    """Read the screenshot of an observation without decoding it, used to
+    copy the screenshot between observations.
+
+    Arguments:
+
+    observation: BrowserObservation
+        Observation returned by the browser.
+
+    Returns:
+
+    Any
+        The screenshot as PNG bytes, a base64 string, an image if it was
+        already decoded, or None if no screenshot was taken.
+
+    """
+
+    return getattr(
+        observation, "_screenshot", None
+    )
+
+
 @dataclass
 class FunctionCall:
 
@@ -0,0 +1,515 @@
+from insta.task_queue import (
+    SQLiteTaskQueue,
+    TASK_STATUS_LEASED,
+    DEFAULT_LEASE_TIMEOUT,
+    DEFAULT_SPECULATION_QUANTILE,
+    DEFAULT_MAX_LEASES_PER_DOMAIN,
+    DEFAULT_MIN_DOMAIN_INTERVAL,
+    DEFAULT_HEARTBEAT_INTERVAL
+)
+
+from http.server import (
+    BaseHTTPRequestHandler,
+    ThreadingHTTPServer
+)
+
+from typing import Any, Callable, Dict
+
+import threading
+import json
+import time
+
+
+DEFAULT_COORDINATOR_HOST = "0.0.0.0"
+DEFAULT_COORDINATOR_PORT = 5000
+
+DEFAULT_COORDINATOR_PATH = "coordinator.db"
+DEFAULT_NODE_TIMEOUT = 4 * DEFAULT_HEARTBEAT_INTERVAL
+
+
+class NodeState(object):
+    """Activity of a machine that has contacted the coordinator, used to
+    measure the throughput of the machine, and to release its leases
+    once the machine stops sending heartbeats.
+
+    Attributes:
+
+    node_id: str
+        Unique identifier for the machine and run.
+
+    first_seen: float
+        Time of the first request from the machine.
+
+    last_seen: float
+        Time of the latest request from the machine.
+
+    worker_ids: set
+        Identifiers of workers on the machine that have leased tasks.
+
+    num_leased: int
+        Number of tasks leased by workers on the machine.
+
+    num_completed: int
+        Number of tasks finished first by workers on the machine.
+
+    num_released: int
+        Number of leases returned to the queue for the machine.
+
+    alive: bool
+        Whether the machine has sent a heartbeat recently.
+
+    """
+
+    def __init__(self, node_id: str):
+        """Activity of a machine that has contacted the coordinator, used to
+        measure the throughput of the machine, and to release its leases
+        once the machine stops sending heartbeats.
+
+        Arguments:
+
+        node_id: str
+            Unique identifier for the machine and run.
+
+        """
+
+        self.node_id = node_id
+
+        self.first_seen = time.time()
+        self.last_seen = self.first_seen
+
+        self.worker_ids = set()
+
+        self.num_leased = 0
+        self.num_completed = 0
+        self.num_released = 0
+
+        self.alive = True
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Summarize the activity of the machine as JSON.
+
+        Returns:
+
+        Dict[str, Any]
+            Counts of tasks, and tasks finished per hour by the machine.
+
+        """
+
+        elapsed_time = max(
+            self.last_seen - self.first_seen,
+            1.0
+        )
+
+        return {
+            "alive": self.alive,
+            "first_seen": self.first_seen,
+            "last_seen": self.last_seen,
+            "num_workers": len(self.worker_ids),
+            "num_leased": self.num_leased,
+            "num_completed": self.num_completed,
+            "num_released": self.num_released,
+            "tasks_per_hour": (
+                self.num_completed * 3600.0 / elapsed_time
+            ),
+        }
+
+
+class TaskCoordinator(object):
+    """Serves a SQLite task queue to machines running data collection, where
+    machines join a run by populating the queue with the same tasks, and
+    leases held by a machine are returned to the queue once the machine
+    stops sending heartbeats, so crashed machines leave no missing tasks.
+
+    Requests are handled one at a time under a lock, and every worker
+    identifier is prefixed with the identifier of its machine.
+
+    Attributes:
+
+    task_queue: SQLiteTaskQueue
+        Queue of tasks shared by every machine.
+
+    node_timeout: float
+        Number of seconds without a request before a machine is
+        considered dead, and its leases are released.
+
+    nodes: Dict[str, NodeState]
+        Activity of every machine that has contacted the coordinator.
+
+    """
+
+    def __init__(self, task_queue: SQLiteTaskQueue,
+                 node_timeout: float = DEFAULT_NODE_TIMEOUT):
+        """Serves a SQLite task queue to machines running data collection, where
+        machines join a run by populating the queue with the same tasks, and
+        leases held by a machine are returned to the queue once the machine
+        stops sending heartbeats, so crashed machines leave no missing tasks.
+
+        Arguments:
+
+        task_queue: SQLiteTaskQueue
+            Queue of tasks shared by every machine.
+
+        node_timeout: float
+            Number of seconds without a request before a machine is
+            considered dead, and its leases are released.
+
+        """
+
+        self.task_queue = task_queue
+        self.node_timeout = node_timeout
+
+        self.nodes = {}
+
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+
+        self.methods = {
+            "heartbeat": self.heartbeat,
+            "populate": self.populate,
+            "lease": self.lease,
+            "complete": self.complete,
+            "is_complete": self.is_complete,
+            "is_speculated": self.is_speculated,
+            "can_speculate": self.can_speculate,
+            "release": self.release,
+            "release_worker": self.release_worker,
+            "stats": self.stats,
+            "nodes": self.get_nodes,
+        }
+
+    def call(self, method: str, node_id: str, **kwargs: Any) -> Any:
+        """Record a request from a machine, and call a method of the queue.
+
+        Arguments:
+
+        method: str
+            Name of the method to call.
+
+        node_id: str
+            Unique identifier for the machine sending the request.
+
+        **kwargs: Any
+            Arguments for the method.
+
+        Returns:
+
+        Any
+            JSON serializable value returned by the method.
+
+        """
+
+        if method not in self.methods:
+
+            raise KeyError(
+                "Unknown method: {}".format(method)
+            )
+
+        with self.lock:
+
+            node = self.nodes.get(node_id)
+
+            if node is None:
+
+                node = self.nodes[node_id] = NodeState(node_id)
+
+                print("Node {} joined the run".format(node_id))
+
+            elif not node.alive:
+
+                node.alive = True
+
+                print("Node {} rejoined the run".format(node_id))
+
+            node.last_seen = time.time()
+
+            return self.methods[method](
+                node, **kwargs
+            )
+
+    def heartbeat(self, node: NodeState) -> None:
+
+        return None
+
+    def populate(self, node: NodeState, example_ids: list,
+                 domains: list = None) -> None:
+
+        self.task_queue.populate(
+            example_ids,
+            domains = domains
+        )
+
+    def lease(self, node: NodeState, worker_id: str) -> int | None:
+
+        node.worker_ids.add(worker_id)
+
+        example_id = self.task_queue.lease(
+            worker_id = "{}/{}".format(node.node_id, worker_id)
+        )
+
+        if example_id is not None:
+
+            node.num_leased += 1
+
+        return example_id
+
+    def complete(self, node: NodeState, example_id: int,
+                 worker_id: str, skipped: bool = False) -> bool:
+
+        finished_first = self.task_queue.complete(
+            example_id = example_id,
+            worker_id = "{}/{}".format(node.node_id, worker_id),
+            skipped = skipped
+        )
+
+        if finished_first:
+
+            node.num_completed += 1
+
+        return finished_first
+
+    def is_complete(self, node: NodeState, example_id: int) -> bool:
+
+        return self.task_queue.is_complete(example_id)
+
+    def is_speculated(self, node: NodeState, example_id: int) -> bool:
+
+        return self.task_queue.is_speculated(example_id)
+
+    def can_speculate(self, node: NodeState, worker_id: str) -> bool:
+
+        # tasks leased by other machines return to the queue if those
+        # machines die, so idle workers keep asking until every task is done
+        leased_elsewhere = self.task_queue.connection.execute(
+            "SELECT 1 FROM tasks WHERE status = ? "
+            "AND worker_id NOT LIKE ? LIMIT 1",
+            (TASK_STATUS_LEASED, node.node_id + "/%")
+        ).fetchone()
+
+        return leased_elsewhere is not None or self.task_queue.can_speculate(
+            "{}/{}".format(node.node_id, worker_id)
+        )
+
+    def release(self, node: NodeState, example_id: int,
+                worker_id: str) -> None:
+
+        self.task_queue.release(
+            example_id = example_id,
+            worker_id = "{}/{}".format(node.node_id, worker_id)
+        )
+
+    def release_worker(self, node: NodeState, worker_id: str) -> int:
+
+        num_released = self.task_queue.release_worker(
+            worker_id = "{}/{}".format(node.node_id, worker_id)
+        )
+
+        node.num_released += num_released
+
+        return num_released
+
+    def stats(self, node: NodeState) -> Dict[str, int]:
+
+        return self.task_queue.stats()
+
+    def get_nodes(self, node: NodeState) -> Dict[str, Dict[str, Any]]:
+
+        return {
+            node_id: node_state.to_dict()
+            for node_id, node_state in self.nodes.items()
+        }
+
+    def release_dead_nodes(self) -> None:
+        """Return the leases of machines that have not sent a request
+        within the node timeout to the queue, for other machines to lease.
+
+        """
+
+        with self.lock:
+
+            current_time = time.time()
+
+            for node in self.nodes.values():
+
+                if not node.alive or current_time - node.last_seen \
+                        < self.node_timeout:
+
+                    continue
+
+                node.alive = False
+
+                num_released = sum(
+                    self.task_queue.release_worker(
+                        worker_id = "{}/{}".format(node.node_id, worker_id)
+                    )
+                    for worker_id in node.worker_ids
+                )
+
+                node.num_released += num_released
+
+                print(
+                    "Node {} stopped sending heartbeats, "
+                    "returning {} leased tasks to the queue".format(
+                        node.node_id, num_released
+                    )
+                )
+
+    def run(self) -> None:
+        """Check for dead machines several times per node timeout,
+        until stopped.
+
+        """
+
+        while not self.stop_event.wait(self.node_timeout / 4):
+
+            self.release_dead_nodes()
+
+
+def get_request_handler(coordinator: TaskCoordinator) -> Callable:
+    """Create a handler for HTTP requests to a coordinator, where each
+    request is a POST to the name of a method with JSON arguments, and
+    the response holds the value returned by the method.
+
+    Arguments:
+
+    coordinator: TaskCoordinator
+        The coordinator that requests are forwarded to.
+
+    Returns:
+
+    Callable
+        Request handler class for an HTTP server.
+
+    """
+
+    class CoordinatorRequestHandler(BaseHTTPRequestHandler):
+
+        def do_POST(self):
+
+            content_length = int(self.headers.get(
+                "Content-Length", 0
+            ))
+
+            try:
+
+                kwargs = json.loads(
+                    self.rfile.read(content_length) or b"{}"
+                )
+
+                result = coordinator.call(
+                    self.path.strip("/"), **kwargs
+                )
+
+                status_code = 200
+                response = json.dumps({"result": result})
+
+            except (KeyError, TypeError, ValueError) as error:
+
+                status_code = 400
+                response = json.dumps({"error": repr(error)})
+
+            response = response.encode("utf-8")
+
+            self.send_response(status_code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(response)))
+            self.end_headers()
+
+            self.wfile.write(response)
+
+        def log_message(self, format: str, *args: Any) -> None:
+
+            return None
+
+    return CoordinatorRequestHandler
+
+
+def serve_coordinator(
+    path: str = DEFAULT_COORDINATOR_PATH,
+    host: str = DEFAULT_COORDINATOR_HOST,
+    port: int = DEFAULT_COORDINATOR_PORT,
+    lease_timeout: float = DEFAULT_LEASE_TIMEOUT,
+    speculation_quantile: float = DEFAULT_SPECULATION_QUANTILE,
+    max_leases_per_domain: int = DEFAULT_MAX_LEASES_PER_DOMAIN,
+    min_domain_interval: float = DEFAULT_MIN_DOMAIN_INTERVAL,
+    node_timeout: float = DEFAULT_NODE_TIMEOUT,
+) -> None:
+    """Serve a task queue to machines running data collection until
+    interrupted, where machines point `task_queue_path` at the URL of
+    the coordinator, such as "http://coordinator-host:5000".
+
+    Arguments:
+
+    path: str
+        Path to the SQLite file storing the queue, where an existing
+        file resumes the run it holds.
+
+    host: str
+        Address for the server to listen on.
+
+    port: int
+        Port for the server to listen on.
+
+    lease_timeout: float
+        Number of seconds before a task leased to a worker expires,
+        and the task is handed to another worker.
+
+    speculation_quantile: float
+        Quantile of finished task durations, such as 0.95, after which
+        a running task is also leased to an idle worker, and the first
+        copy to finish is saved, or None to disable speculation.
+
+    max_leases_per_domain: int
+        Maximum number of running tasks on the same domain, where
+        tasks on other domains are leased while a domain is at the limit.
+
+    min_domain_interval: float
+        Minimum number of seconds between starting two tasks on the
+        same domain, or None to start tasks as soon as agents are idle.
+
+    node_timeout: float
+        Number of seconds without a request before a machine is
+        considered dead, and its leases are released.
+
+    """
+
+    coordinator = TaskCoordinator(
+        task_queue = SQLiteTaskQueue(
+            path = path,
+            lease_timeout = lease_timeout,
+            speculation_quantile = speculation_quantile,
+            max_leases_per_domain = max_leases_per_domain,
+            min_domain_interval = min_domain_interval
+        ),
+        node_timeout = node_timeout
+    )
+
+    server = ThreadingHTTPServer(
+        (host, port),
+        get_request_handler(coordinator)
+    )
+
+    reaper_thread = threading.Thread(
+        target = coordinator.run,
+        name = "insta-coordinator",
+        daemon = True
+    )
+
+    reaper_thread.start()
+
+    print("Coordinator listening on {}:{}".format(host, port))
+
+    try:
+
+        server.serve_forever()
+
+    except KeyboardInterrupt:
+
+        pass
+
+    finally:
+
+        coordinator.stop_event.set()
+        reaper_thread.join()
+
+        server.server_close()
+        coordinator.task_queue.close()
@@ -17,4 +17,14 @@ from insta.entry_points.annotate_task_proposer import (
 from insta.entry_points.annotate_judge import (
     annotate_judge_from_cli,
     start_annotate_judge
+)
+
+from insta.entry_points.insta_coordinator import (
+    serve_coordinator_from_cli,
+    start_insta_coordinator
+)
+
+from insta.entry_points.insta_replay import (
+    serve_replay_from_cli,
+    start_insta_replay_server
 )
\ No newline at end of file
@@ -7,6 +7,7 @@ from insta import (
 )
 
 from insta.pipeline import (
+    prepare_task,
     JUDGE_EXPLORATION_TEMPLATE,
     JUDGE_STEPS_TEMPLATE,
     JUDGE_CRITERIA_TEMPLATE,
@@ -23,6 +24,15 @@ from insta.entry_points.args import (
     set_annotate_mode
 )
 
+from insta.trajectory_store import (
+    open_trajectory_store
+)
+
+from insta.completion_index import (
+    CompletionIndex,
+    get_completion_indices
+)
+
 from insta.entry_points.insta_pipeline import (
     get_judge_config_from_cli,
     get_data_dirs_from_cli,
@@ -64,7 +74,8 @@ def query_judge(
         agent_response_key: str = DEFAULT_AGENT_RESPONSE_KEY,
         add_steps_to_judge: bool = True,
         add_criteria_to_judge: bool = True,
-        skip_finished: bool = False):
+        skip_finished: bool = False,
+        judgments_index: CompletionIndex = None):
     """Query the judge to annotate a single example from the dataset,
     and save the judgment to the judgments directory.
 
@@ -100,6 +111,10 @@ def query_judge(
     skip_finished: bool
         Whether to skip examples that have already been judged.
 
+    judgments_index: CompletionIndex
+        Journal of finished judgments, read once per worker to skip
+        examples that have already been judged.
+
     Returns:
 
     identifier: str or None
@@ -110,7 +125,7 @@ def query_judge(
 
     example_dict = dataset[example_id]
 
-    domain = example_dict.get(
+    website = example_dict.get(
         "website", example_dict.get("domain")
     )
 
@@ -128,9 +143,9 @@ def query_judge(
         )
     )
 
-    identifier = example_dict.get(
-        "identifier", domain
-    )
+    identifier = prepare_task(
+        example_dict
+    )["identifier"]
 
     steps = example_dict.get(
         "steps", DEFAULT_STEPS
@@ -164,42 +179,35 @@ def query_judge(
             criteria = format_criteria
         )
 
-    input_observations_path = os.path.join(
-        observations_dir,
-        "{}.json".format(identifier)
-    )
-
-    input_actions_path = os.path.join(
-        actions_dir,
-        "{}.json".format(identifier)
-    )
-
     output_judgment_path = os.path.join(
         judgments_dir,
         "{}.json".format(identifier)
     )
 
-    valid_example = (
-        os.path.exists(input_actions_path)
-        and os.path.exists(input_observations_path)
-        and not (skip_finished and os.path.exists(output_judgment_path))
-    )
+    if judgments_index is None:
+
+        judgments_index = CompletionIndex(
+            judgments_dir
+        )
 
-    if not valid_example:
+    if skip_finished and identifier in judgments_index:
 
         return None
 
-    with open(input_observations_path, "r") as file:
-        
-        try: observations = json.load(file)
+    # reads either one JSON file per trajectory, or sharded records
+    try: observations = open_trajectory_store(
+        observations_dir).read(identifier)
 
-        except: return None
+    except: return None
 
-    with open(input_actions_path, "r") as file:
-        
-        try: actions = json.load(file)
+    try: actions = open_trajectory_store(
+        actions_dir).read(identifier)
+
+    except: return None
+
+    if observations is None or actions is None:
 
-        except: return None
+        return None
     
     judge = BrowserJudge(
         config = judge_config
@@ -249,6 +257,10 @@ def query_judge(
             indent = 4
         )
 
+    judgments_index.add(
+        identifier
+    )
+
     return identifier
 
 
@@ -297,6 +309,38 @@ def annotate_judge_from_cli(args: argparse.Namespace):
         exist_ok = True
     )
 
+    completion_indices = get_completion_indices(
+        observations_dir = data_dirs["observations_dir"],
+        actions_dir = data_dirs["actions_dir"],
+        judgments_dir = data_dirs["judgments_dir"],
+        task_proposals_dir = data_dirs["task_proposals_dir"],
+    )
+
+    completion_indices["judgments"].ensure_journal()
+
+    if args.skip_finished:
+
+        # read each journal once, instead of checking files per example
+        unfinished_dataset_ids = []
+
+        for example_id in out_dataset_ids:
+
+            identifier = prepare_task(
+                dataset[example_id]
+            )["identifier"]
+
+            is_unfinished = (
+                identifier not in completion_indices["judgments"]
+                and identifier in completion_indices["observations"]
+                and identifier in completion_indices["actions"]
+            )
+
+            if is_unfinished:
+
+                unfinished_dataset_ids.append(example_id)
+
+        out_dataset_ids = unfinished_dataset_ids
+
     progress_bar = tqdm.tqdm(
         desc = "Processing",
         dynamic_ncols = True,
@@ -312,7 +356,8 @@ def annotate_judge_from_cli(args: argparse.Namespace):
         agent_response_key = args.agent_response_key,
         add_steps_to_judge = args.add_steps_to_judge,
         add_criteria_to_judge = args.add_criteria_to_judge,
-        skip_finished = args.skip_finished
+        skip_finished = args.skip_finished,
+        judgments_index = completion_indices["judgments"]
     )
     
     with Pool(processes = args.num_workers) as pool:
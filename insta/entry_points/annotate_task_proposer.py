@@ -7,6 +7,7 @@ from insta import (
 )
 
 from insta.pipeline import (
+    prepare_task,
     TASK_PROPOSER_EXPLORATION_TEMPLATE,
     TASK_PROPOSER_STEPS_TEMPLATE,
     TASK_PROPOSER_CRITERIA_TEMPLATE,
@@ -24,6 +25,15 @@ from insta.entry_points.args import (
     set_annotate_mode
 )
 
+from insta.trajectory_store import (
+    open_trajectory_store
+)
+
+from insta.completion_index import (
+    CompletionIndex,
+    get_completion_indices
+)
+
 from insta.entry_points.insta_pipeline import (
     get_task_proposer_config_from_cli,
     get_data_dirs_from_cli,
@@ -65,7 +75,8 @@ def query_task_proposer(
         judge_response_key: str = DEFAULT_JUDGE_RESPONSE_KEY,
         add_steps_to_task_proposer: bool = True,
         add_criteria_to_task_proposer: bool = True,
-        skip_finished: bool = False):
+        skip_finished: bool = False,
+        task_proposals_index: CompletionIndex = None):
     """Query the task proposer to annotate a single example from the dataset,
     and save the proposed task to the task proposals directory.
 
@@ -107,6 +118,10 @@ def query_task_proposer(
     skip_finished: bool
         Whether to skip examples that have already been assigned tasks.
 
+    task_proposals_index: CompletionIndex
+        Journal of finished task proposals, read once per worker to skip
+        examples that have already been assigned tasks.
+
     Returns:
 
     identifier: str or None
@@ -121,9 +136,9 @@ def query_task_proposer(
         "website", example_dict.get("domain")
     )
 
-    identifier = example_dict.get(
-        "identifier", website
-    )
+    identifier = prepare_task(
+        example_dict
+    )["identifier"]
 
     instruction = example_dict.get(
         "instruction", example_dict.get(
@@ -171,16 +186,6 @@ def query_task_proposer(
             criteria = format_criteria
         )
 
-    input_observations_path = os.path.join(
-        observations_dir,
-        "{}.json".format(identifier)
-    )
-
-    input_actions_path = os.path.join(
-        actions_dir,
-        "{}.json".format(identifier)
-    )
-
     input_judgment_path = os.path.join(
         judgments_dir,
         "{}.json".format(identifier)
@@ -191,28 +196,35 @@ def query_task_proposer(
         "{}.json".format(identifier)
     )
 
+    if task_proposals_index is None:
+
+        task_proposals_index = CompletionIndex(
+            task_proposals_dir
+        )
+
     valid_example = (
-        os.path.exists(input_actions_path)
-        and os.path.exists(input_observations_path)
-        and os.path.exists(input_judgment_path)
-        and not (skip_finished and os.path.exists(output_task_path))
+        os.path.exists(input_judgment_path)
+        and not (skip_finished and identifier in task_proposals_index)
     )
 
     if not valid_example:
 
         return None
 
-    with open(input_observations_path, "r") as file:
-        
-        try: observations = json.load(file)
+    # reads either one JSON file per trajectory, or sharded records
+    try: observations = open_trajectory_store(
+        observations_dir).read(identifier)
 
-        except: return None
+    except: return None
 
-    with open(input_actions_path, "r") as file:
-        
-        try: actions = json.load(file)
+    try: actions = open_trajectory_store(
+        actions_dir).read(identifier)
 
-        except: return None
+    except: return None
+
+    if observations is None or actions is None:
+
+        return None
 
     with open(input_judgment_path, "r") as file:
 
@@ -267,6 +279,10 @@ def query_task_proposer(
             indent = 4
         )
 
+    task_proposals_index.add(
+        identifier
+    )
+
     return identifier
 
 
@@ -315,6 +331,39 @@ def annotate_task_proposer_from_cli(args: argparse.Namespace):
         exist_ok = True
     )
 
+    completion_indices = get_completion_indices(
+        observations_dir = data_dirs["observations_dir"],
+        actions_dir = data_dirs["actions_dir"],
+        judgments_dir = data_dirs["judgments_dir"],
+        task_proposals_dir = data_dirs["task_proposals_dir"],
+    )
+
+    completion_indices["task_proposals"].ensure_journal()
+
+    if args.skip_finished:
+
+        # read each journal once, instead of checking files per example
+        unfinished_dataset_ids = []
+
+        for example_id in out_dataset_ids:
+
+            identifier = prepare_task(
+                dataset[example_id]
+            )["identifier"]
+
+            is_unfinished = (
+                identifier not in completion_indices["task_proposals"]
+                and identifier in completion_indices["observations"]
+                and identifier in completion_indices["actions"]
+                and identifier in completion_indices["judgments"]
+            )
+
+            if is_unfinished:
+
+                unfinished_dataset_ids.append(example_id)
+
+        out_dataset_ids = unfinished_dataset_ids
+
     progress_bar = tqdm.tqdm(
         desc = "Processing",
         dynamic_ncols = True,
@@ -333,6 +382,7 @@ def annotate_task_proposer_from_cli(args: argparse.Namespace):
         add_steps_to_task_proposer = args.add_steps_to_task_proposer,
         add_criteria_to_task_proposer = args.add_criteria_to_task_proposer,
         skip_finished = args.skip_finished,
+        task_proposals_index = completion_indices["task_proposals"]
     )
     
     with Pool(processes = args.num_workers) as pool:
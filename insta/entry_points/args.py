@@ -390,6 +390,55 @@ def add_playwright_args(parser: argparse.ArgumentParser):
         default = 1
     )
 
+    parser.add_argument(
+        "--record_dir",
+        type = str,
+        help = "Directory where Playwright server responses are recorded",
+        default = None
+    )
+
+    parser.add_argument(
+        "--replay_dir",
+        type = str,
+        help = "Replay recorded responses instead of running Playwright",
+        default = None
+    )
+
+    parser.add_argument(
+        "--pool_size",
+        type = int,
+        help = "Connections kept open to each Playwright server",
+        default = 16
+    )
+
+    parser.add_argument(
+        "--connect_timeout",
+        type = float,
+        help = "Seconds to wait when connecting to the Playwright server",
+        default = 10.0
+    )
+
+    parser.add_argument(
+        "--read_timeout",
+        type = float,
+        help = "Seconds to wait for a response from the Playwright server",
+        default = None
+    )
+
+    parser.add_argument(
+        "--transport_retries",
+        type = int,
+        help = "Retries for failed connections to the Playwright server",
+        default = 3
+    )
+
+    parser.add_argument(
+        "--disable_screenshots",
+        action = "store_true",
+        help = "Skip capturing screenshots for text-only agents",
+        default = False
+    )
+
     return parser
 
 
@@ -402,6 +451,126 @@ def add_pipeline_args(parser: argparse.ArgumentParser):
         default = 1
     )
 
+    parser.add_argument(
+        "--rollout_engine",
+        type = str,
+        help = "Run one process per agent, or all agents with asyncio",
+        choices = ["multiprocessing", "asyncio"],
+        default = "multiprocessing"
+    )
+
+    parser.add_argument(
+        "--max_concurrency",
+        type = int,
+        help = "Maximum concurrent trajectories for the asyncio engine",
+        default = 64
+    )
+
+    parser.add_argument(
+        "--task_queue_path",
+        type = str,
+        help = "SQLite file or coordinator URL where agents pull tasks from",
+        default = None
+    )
+
+    parser.add_argument(
+        "--lease_timeout",
+        type = float,
+        help = "Seconds before a task leased to an agent expires",
+        default = 3600
+    )
+
+    parser.add_argument(
+        "--speculation_quantile",
+        type = float,
+        help = "Relaunch tasks running longer than this quantile, such as 0.95",
+        default = None
+    )
+
+    parser.add_argument(
+        "--max_leases_per_domain",
+        type = int,
+        help = "Maximum number of tasks running on the same website at once",
+        default = None
+    )
+
+    parser.add_argument(
+        "--min_domain_interval",
+        type = float,
+        help = "Minimum seconds between starting two tasks on the same website",
+        default = None
+    )
+
+    parser.add_argument(
+        "--share_inference",
+        action = "store_true",
+        help = "Share one copy of a local vLLM model between every agent",
+        default = False
+    )
+
+    parser.add_argument(
+        "--max_batch_size",
+        type = int,
+        help = "Maximum prompts in each batch for the shared vLLM model",
+        default = 64
+    )
+
+    parser.add_argument(
+        "--pipeline_judging",
+        action = "store_true",
+        help = "Judge finished trajectories in separate workers",
+        default = False
+    )
+
+    parser.add_argument(
+        "--num_judge_workers",
+        type = int,
+        help = "Number of judge workers for pipelined judging",
+        default = 2
+    )
+
+    parser.add_argument(
+        "--judge_queue_size",
+        type = int,
+        help = "Maximum trajectories waiting to be judged",
+        default = 16
+    )
+
+    parser.add_argument(
+        "--target_step_latency",
+        type = float,
+        help = "Pause agents while the p99 step latency exceeds this many seconds",
+        default = None
+    )
+
+    parser.add_argument(
+        "--min_agents",
+        type = int,
+        help = "Minimum number of agents kept active by the controller",
+        default = 1
+    )
+
+    parser.add_argument(
+        "--concurrency_metrics_path",
+        type = str,
+        help = "JSON lines file where controller decisions are saved",
+        default = None
+    )
+
+    parser.add_argument(
+        "--profile_dir",
+        type = str,
+        help = "Directory where each worker saves the duration of every stage",
+        default = None
+    )
+
+    parser.add_argument(
+        "--profile_port",
+        type = int,
+        help = "Port serving stage durations in the Prometheus text format",
+        default = None
+    )
+
     parser.add_argument(
         "--max_actions",
         type = int,
@@ -423,6 +592,63 @@ def add_pipeline_args(parser: argparse.ArgumentParser):
         default = False
     )
 
+    parser.add_argument(
+        "--storage_format",
+        type = str,
+        help = "Save one JSON file per trajectory, or append to shards",
+        choices = ["json", "jsonl", "jsonl.zst"],
+        default = "json"
+    )
+
+    parser.add_argument(
+        "--num_writer_threads",
+        type = int,
+        help = "Threads that save trajectories while the next task runs",
+        default = 2
+    )
+
+    parser.add_argument(
+        "--task_timeout",
+        type = float,
+        help = "Seconds before an unfinished trajectory is abandoned",
+        default = None
+    )
+
+    parser.add_argument(
+        "--step_timeout",
+        type = float,
+        help = "Seconds allowed for each browser call and LLM query",
+        default = None
+    )
+
+    parser.add_argument(
+        "--num_samples",
+        type = int,
+        help = "Maximum number of samples per task, saving the best one",
+        default = 1
+    )
+
+    parser.add_argument(
+        "--success_threshold",
+        type = float,
+        help = "Stop sampling a task once a judged success exceeds this",
+        default = 0.5
+    )
+
+    parser.add_argument(
+        "--consistency_threshold",
+        type = float,
+        help = "Stop sampling a task once this fraction of samples failed",
+        default = None
+    )
+
+    parser.add_argument(
+        "--step_spool_dir",
+        type = str,
+        help = "Write screenshots and HTML of each step here as it finishes",
+        default = None
+    )
+
     parser.add_argument(
         "--set_exploration_mode",
         action = "store_true",
@@ -454,6 +680,93 @@ def add_pipeline_args(parser: argparse.ArgumentParser):
     return parser
 
 
+def add_coordinator_args(parser: argparse.ArgumentParser):
+
+    parser.add_argument(
+        "--coordinator_path",
+        type = str,
+        help = "SQLite file where the coordinator stores the task queue",
+        default = "coordinator.db"
+    )
+
+    parser.add_argument(
+        "--coordinator_host",
+        type = str,
+        help = "Address for the coordinator to listen on",
+        default = "0.0.0.0"
+    )
+
+    parser.add_argument(
+        "--coordinator_port",
+        type = int,
+        help = "Port for the coordinator to listen on",
+        default = 5000
+    )
+
+    parser.add_argument(
+        "--lease_timeout",
+        type = float,
+        help = "Seconds before a task leased to an agent expires",
+        default = 3600
+    )
+
+    parser.add_argument(
+        "--speculation_quantile",
+        type = float,
+        help = "Relaunch tasks running longer than this quantile, such as 0.95",
+        default = None
+    )
+
+    parser.add_argument(
+        "--max_leases_per_domain",
+        type = int,
+        help = "Maximum number of tasks running on the same website at once",
+        default = None
+    )
+
+    parser.add_argument(
+        "--min_domain_interval",
+        type = float,
+        help = "Minimum seconds between starting two tasks on the same website",
+        default = None
+    )
+
+    parser.add_argument(
+        "--node_timeout",
+        type = float,
+        help = "Seconds without a heartbeat before a node's tasks are reissued",
+        default = 120
+    )
+
+    return parser
+
+
+def add_replay_args(parser: argparse.ArgumentParser):
+
+    parser.add_argument(
+        "--replay_dir",
+        type = str,
+        help = "Directory where Playwright server responses were recorded",
+        required = True
+    )
+
+    parser.add_argument(
+        "--replay_host",
+        type = str,
+        help = "Address for the replay server to listen on",
+        default = "0.0.0.0"
+    )
+
+    parser.add_argument(
+        "--replay_port",
+        type = int,
+        help = "Port for the replay server to listen on",
+        default = 3000
+    )
+
+    return parser
+
+
 def add_annotate_args(parser: argparse.ArgumentParser):
 
     parser.add_argument(
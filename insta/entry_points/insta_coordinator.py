@@ -0,0 +1,55 @@
+from insta.coordinator import (
+    serve_coordinator
+)
+
+from insta.entry_points.args import (
+    add_coordinator_args
+)
+
+import argparse
+
+
+def serve_coordinator_from_cli(args: argparse.Namespace):
+    """Serve a task queue shared by data collection machines, refer to
+    the command line arguments in insta.args.
+
+    Arguments:
+
+    args: argparse.Namespace
+        The command line arguments for the coordinator.
+
+    """
+
+    serve_coordinator(
+        path = args.coordinator_path,
+        host = args.coordinator_host,
+        port = args.coordinator_port,
+        lease_timeout = args.lease_timeout,
+        speculation_quantile = args.speculation_quantile,
+        max_leases_per_domain = args.max_leases_per_domain,
+        min_domain_interval = args.min_domain_interval,
+        node_timeout = args.node_timeout
+    )
+
+
+def start_insta_coordinator():
+    """Run the coordinator for multi-node data collection, where each
+    machine runs start-insta-pipeline with --task_queue_path set to
+    the URL of the coordinator.
+
+    """
+
+    parser = argparse.ArgumentParser(
+        description = "Run the InSTA task coordinator."
+    )
+
+    parser = add_coordinator_args(parser)
+
+    serve_coordinator_from_cli(
+        args = parser.parse_args()
+    )
+
+
+if __name__ == "__main__":
+
+    start_insta_coordinator()
@@ -333,7 +333,14 @@ def get_pipeline_from_cli(args: argparse.Namespace):
 
     browser_config = get_browser_config(
         playwright_url = args.playwright_url,
-        playwright_port = args.playwright_port
+        playwright_port = args.playwright_port,
+        record_dir = args.record_dir,
+        replay_dir = args.replay_dir,
+        pool_size = args.pool_size,
+        connect_timeout = args.connect_timeout,
+        read_timeout = args.read_timeout,
+        transport_retries = args.transport_retries,
+        screenshot = not args.disable_screenshots
     )
 
     agent_config = get_agent_config_from_cli(
@@ -374,6 +381,14 @@ def get_pipeline_from_cli(args: argparse.Namespace):
         task_proposals_dir = data_dirs["task_proposals_dir"],
         skip_finished = args.skip_finished,
         prune_observations = args.prune_observations,
+        storage_format = args.storage_format,
+        num_writer_threads = args.num_writer_threads,
+        task_timeout = args.task_timeout,
+        step_timeout = args.step_timeout,
+        num_samples = args.num_samples,
+        success_threshold = args.success_threshold,
+        consistency_threshold = args.consistency_threshold,
+        step_spool_dir = args.step_spool_dir,
         add_steps_to_agent = args.add_steps_to_agent,
         add_criteria_to_agent = args.add_criteria_to_agent,
         add_steps_to_judge = args.add_steps_to_judge,
@@ -411,6 +426,23 @@ def launch_pipeline_from_cli(args: argparse.Namespace):
         dataset = dataset,
         num_agents = args.num_agents,
         playwright_workers = args.playwright_workers,
+        rollout_engine = args.rollout_engine,
+        max_concurrency = args.max_concurrency,
+        task_queue_path = args.task_queue_path,
+        lease_timeout = args.lease_timeout,
+        speculation_quantile = args.speculation_quantile,
+        max_leases_per_domain = args.max_leases_per_domain,
+        min_domain_interval = args.min_domain_interval,
+        share_inference = args.share_inference,
+        max_batch_size = args.max_batch_size,
+        pipeline_judging = args.pipeline_judging,
+        num_judge_workers = args.num_judge_workers,
+        judge_queue_size = args.judge_queue_size,
+        target_step_latency = args.target_step_latency,
+        min_agents = args.min_agents,
+        concurrency_metrics_path = args.concurrency_metrics_path,
+        profile_dir = args.profile_dir,
+        profile_port = args.profile_port,
         return_trajectories = False
     )
 
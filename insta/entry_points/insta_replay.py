@@ -0,0 +1,49 @@
+from insta.replay import (
+    serve_replay
+)
+
+from insta.entry_points.args import (
+    add_replay_args
+)
+
+import argparse
+
+
+def serve_replay_from_cli(args: argparse.Namespace):
+    """Serve recorded Playwright sessions, refer to the command line
+    arguments in insta.args.
+
+    Arguments:
+
+    args: argparse.Namespace
+        The command line arguments for the replay server.
+
+    """
+
+    serve_replay(
+        replay_dir = args.replay_dir,
+        host = args.replay_host,
+        port = args.replay_port
+    )
+
+
+def start_insta_replay_server():
+    """Run a stand-in for the Playwright server that replays sessions
+    recorded with --record_dir, so the pipeline runs without a browser.
+
+    """
+
+    parser = argparse.ArgumentParser(
+        description = "Replay recorded Playwright sessions."
+    )
+
+    parser = add_replay_args(parser)
+
+    serve_replay_from_cli(
+        args = parser.parse_args()
+    )
+
+
+if __name__ == "__main__":
+
+    start_insta_replay_server()
@@ -16,9 +16,12 @@ from insta.configs.agent_config import (
 )
 
 from insta.client import (
-    BrowserClient
+    BrowserClient,
+    AsyncBrowserClient
 )
 
+from insta.profiling import span
+
 from insta.observation_processors import (
     OBSERVATION_PROCESSORS
 )
@@ -26,7 +29,11 @@ from insta.observation_processors import (
 from typing import Tuple, Any
 from collections import namedtuple
 
+from concurrent.futures import Executor
+from functools import partial
+
 import gymnasium
+import asyncio
 
 
 InstaEnvResetOutput = namedtuple(
@@ -193,7 +200,29 @@ class InstaEnv(gymnasium.Env):
         
         """
         
-        obs = self.client.observation()
+        return self.process_obs(
+            self.client.observation()
+        )
+
+    def process_obs(self, obs: BrowserObservation | BrowserStatus
+                    | ServerError) -> BrowserObservation:
+        """Process an observation from the Playwright environment to find
+        interactive elements, and convert the HTML into an agent-readible
+        text format, or into an error message if the observation failed.
+
+        Arguments:
+
+        obs: PlaywrightObservation | PlaywrightStatus | ServerError
+            The observation data, or an error if the server failed
+            to generate an observation.
+
+        Returns:
+
+        PlaywrightObservation
+            An instance of PlaywrightObservation containing the processed
+            text or an error message if something failed.
+        
+        """
 
         if obs is BrowserStatus.ERROR:
 
@@ -212,12 +241,14 @@ class InstaEnv(gymnasium.Env):
                 obs.message
             )
         
-        return self.observation_processor.process(
-            obs, restrict_viewport = self.config.restrict_viewport,
-            require_visible = self.config.require_visible,
-            require_frontmost = self.config.require_frontmost,
-            remove_pii = self.config.remove_pii
-        )
+        with span("markdown.process"):
+
+            return self.observation_processor.process(
+                obs, restrict_viewport = self.config.restrict_viewport,
+                require_visible = self.config.require_visible,
+                require_frontmost = self.config.require_frontmost,
+                remove_pii = self.config.remove_pii
+            )
 
     def reset(self, url: str, browser_kwargs = None, context_kwargs = None
               ) -> Tuple[BrowserObservation, dict[str, Any]]:
@@ -318,7 +349,260 @@ class InstaEnv(gymnasium.Env):
                 info = {}
             )
 
-        action_status = self.client.action(
+        action_status, obs = self.client.step(
+            function_calls = action.function_calls
+        )
+
+        if action_status is BrowserStatus.ERROR:
+
+            return return_step_error(
+                EnvError.ACTION_FAILED_ERROR
+            )
+
+        if isinstance(action_status, ServerError):
+
+            return return_step_error(
+                action_status
+            )
+        
+        return InstaEnvStepOutput(
+            observation = self.process_obs(obs),
+            reward = 0.0,
+            done = False,
+            truncated = False,
+            info = {}
+        )
+
+
+class AsyncInstaEnv(InstaEnv):
+    """Initialize a web browsing environment for training LLM agents from an
+    asyncio event loop, with the same observations, actions, and errors as
+    InstaEnv, where browser requests are awaited, and webpages are processed
+    into text in an executor, so the event loop is never blocked.
+
+    Attributes:
+
+    config: EnvConfig
+        The configuration for the Playwright environment, refer to
+        insta/configs/env_config.py for more information.
+
+    client: AsyncBrowserClient
+        A client that connects to a server running Playwright and
+        manages web browsing sessions, actions, and observations.
+
+    observation_processor: BaseProcessor
+        A processor that converts HTML into text for the agent to read.
+
+    executor: Executor
+        The executor where webpages are processed into text, or None
+        to use the default executor of the event loop.
+
+    """
+
+    def __init__(self, config: BrowserConfig = DEFAULT_BROWSER_CONFIG,
+                 observation_processor: str = "markdown",
+                 executor: Executor = None):
+        """Initialize a web browsing environment for training LLM agents from an
+        asyncio event loop, with the same observations, actions, and errors as
+        InstaEnv, where browser requests are awaited, and webpages are processed
+        into text in an executor, so the event loop is never blocked.
+
+        Arguments:
+
+        config: EnvConfig
+            The configuration for the Playwright environment, refer to
+            insta/configs/env_config.py for more information.
+        
+        observation_processor: str
+            The observation processor to use for converting HTML to text,
+            currently you can select from: ["markdown"].
+
+        executor: Executor
+            The executor where webpages are processed into text, or None
+            to use the default executor of the event loop.
+
+        """
+
+        super(AsyncInstaEnv, self).__init__(
+            config = config,
+            observation_processor = observation_processor
+        )
+
+        self.client = AsyncBrowserClient(
+            config = config
+        )
+
+        self.executor = executor
+
+    async def get_obs(self) -> BrowserObservation:
+        """Get the current observation from the Playwright environment,
+        process the observation to find interactive elements, and
+        convert the HTML into an agent-readible text format.
+
+        Returns:
+
+        PlaywrightObservation
+            An instance of PlaywrightObservation containing the processed
+            text or an error message if something failed.
+        
+        """
+        
+        return await self.process_obs(
+            await self.client.observation()
+        )
+
+    async def process_obs(self, obs: BrowserObservation | BrowserStatus
+                          | ServerError) -> BrowserObservation:
+        """Process an observation from the Playwright environment to find
+        interactive elements, and convert the HTML into an agent-readible
+        text format in the executor, or into an error message if the
+        observation failed.
+
+        Arguments:
+
+        obs: PlaywrightObservation | PlaywrightStatus | ServerError
+            The observation data, or an error if the server failed
+            to generate an observation.
+
+        Returns:
+
+        PlaywrightObservation
+            An instance of PlaywrightObservation containing the processed
+            text or an error message if something failed.
+        
+        """
+
+        if obs is BrowserStatus.ERROR:
+
+            x = ERROR_TO_MESSAGE[
+                EnvError.PROCESSING_ERROR
+            ]
+            
+            return BrowserObservation(
+                processed_text = x
+            )
+        
+        if isinstance(obs, ServerError):
+            
+            return BrowserObservation(
+                processed_text = 
+                obs.message
+            )
+
+        loop = asyncio.get_running_loop()
+        
+        with span("markdown.process"):
+
+            return await loop.run_in_executor(
+                self.executor, partial(
+                    self.observation_processor.process,
+                    obs, restrict_viewport = self.config.restrict_viewport,
+                    require_visible = self.config.require_visible,
+                    require_frontmost = self.config.require_frontmost,
+                    remove_pii = self.config.remove_pii
+                )
+            )
+
+    async def reset(self, url: str, browser_kwargs = None, context_kwargs = None
+                    ) -> Tuple[BrowserObservation, dict[str, Any]]:
+        """Reset the Playwright environment to a new webpage and return
+        the initial observation from the browser, or return an error if
+        the environment fails to reset or initialize.
+
+        Arguments:
+
+        url: str
+            The URL of the webpage to reset the environment to.
+
+        browser_kwargs: dict
+            Keyword options to use when starting the Browser instance,
+            refer to the Playwright docs for more information.
+
+        context_kwargs: dict
+            Keyword options to use when starting the BrowserContext instance,
+            refer to the Playwright docs for more information.
+
+        Returns:
+
+        Tuple[PlaywrightObservation, dict[str, Any]]
+            An initial observation from the Playwright environment and 
+            metadata about the state of the browsing session.
+        
+        """
+
+        start_status = await self.client.start(
+            browser_kwargs = browser_kwargs,
+            context_kwargs = context_kwargs
+        )
+
+        if start_status is BrowserStatus.ERROR:
+
+            return return_reset_error(
+                EnvError.START_ERROR
+            )
+
+        if isinstance(start_status, ServerError):
+
+            return return_reset_error(
+                start_status
+            )
+
+        goto_status = await self.client.goto(url = url)
+
+        if goto_status is BrowserStatus.ERROR:
+
+            return return_reset_error(
+                EnvError.GOTO_ERROR
+            )
+
+        if isinstance(goto_status, ServerError):
+
+            return return_reset_error(
+                goto_status
+            )
+        
+        return InstaEnvResetOutput(
+            observation = await self.get_obs(), 
+            info = {}
+        )
+
+    async def step(self, action: BrowserAction) -> \
+            Tuple[BrowserObservation, float, bool, bool, dict[str, Any]]:
+        """Take an action, and return the next observation, the reward
+        for the action, whether the episode is done,  whether the environment
+        has finished early, and metadata about the web browsing session.
+
+        Arguments:
+
+        action: PlaywrightAction
+            The action to perform in the web browsing session, represented as a 
+            sequence of function calls within the Playwright API.
+
+        Returns:
+
+        Tuple[PlaywrightObservation, float, bool, bool, dict[str, Any]]
+            The next observation, the reward for the action, whether the episode
+            is done, whether the environment has finished early,
+            and metadata about the web browsing session.
+
+        """
+        
+        is_stop_action = (
+            action.function_calls[0].dotpath
+            .startswith("stop")
+        )
+
+        if is_stop_action:
+
+            return InstaEnvStepOutput(
+                observation = await self.get_obs(),
+                reward = 0.0,
+                done = True,
+                truncated = False,
+                info = {}
+            )
+
+        action_status, obs = await self.client.step(
             function_calls = action.function_calls
         )
 
@@ -335,7 +619,7 @@ class InstaEnv(gymnasium.Env):
             )
         
         return InstaEnvStepOutput(
-            observation = self.get_obs(),
+            observation = await self.process_obs(obs),
             reward = 0.0,
             done = False,
             truncated = False,
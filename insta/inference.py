@@ -0,0 +1,669 @@
+from insta.utils import (
+    DeadlineExceeded
+)
+
+from concurrent.futures import Future
+from typing import List, Dict, Any
+
+import concurrent.futures
+import threading
+import abc
+import traceback
+import asyncio
+import queue
+import time
+import os
+
+
+DEFAULT_MAX_BATCH_SIZE = 64
+DEFAULT_MAX_WAIT = 0.02
+
+
+STOP_SIGNAL = None
+
+
+FAKE_RESPONSE = """The fake inference engine always stops immediately.
+
+```json
+{
+    "action_key": "stop",
+    "action_kwargs": {
+        "answer": "The desired task is now complete."
+    },
+    "target_element_id": null
+}
+```"""
+
+
+class InferenceEngine(abc.ABC):
+    """Generates responses for a batch of conversations at once, and is
+    shared by every agent on a node through an inference broker.
+
+    """
+
+    @abc.abstractmethod
+    def generate(self, batch_messages: List[List[dict]]) -> List[str]:
+        """Generate one response for each conversation in the batch.
+
+        Arguments:
+
+        batch_messages: List[List[dict]]
+            Conversations in the OpenAI chat format.
+
+        Returns:
+
+        List[str]
+            The text response for each conversation.
+
+        """
+
+        raise NotImplementedError
+
+
+class VLLMInferenceEngine(InferenceEngine):
+    """Generates responses with a single local vLLM model, where the model
+    is loaded on the first call, so the engine can be sent to the
+    process that owns the GPUs before loading.
+
+    Attributes:
+
+    client_kwargs: Dict
+        Keyword arguments for constructing vllm.LLM.
+
+    generation_kwargs: Dict
+        Keyword arguments for constructing vllm.SamplingParams.
+
+    """
+
+    def __init__(self, client_kwargs: Dict, generation_kwargs: Dict):
+        """Generates responses with a single local vLLM model, where the model
+        is loaded on the first call, so the engine can be sent to the
+        process that owns the GPUs before loading.
+
+        Arguments:
+
+        client_kwargs: Dict
+            Keyword arguments for constructing vllm.LLM.
+
+        generation_kwargs: Dict
+            Keyword arguments for constructing vllm.SamplingParams.
+
+        """
+
+        self.client_kwargs = client_kwargs
+        self.generation_kwargs = generation_kwargs
+
+        self.llm_client = None
+        self.sampling_params = None
+
+    def __getstate__(self) -> dict:
+
+        state = self.__dict__.copy()
+
+        state["llm_client"] = None
+        state["sampling_params"] = None
+
+        return state
+
+    def load(self) -> None:
+        """Load the vLLM model and sampling parameters in this process.
+
+        """
+
+        os.environ['VLLM_WORKER_MULTIPROC_METHOD'] = 'spawn'
+
+        from vllm import (
+            LLM, SamplingParams
+        )
+
+        self.sampling_params = SamplingParams(
+            **self.generation_kwargs
+        )
+
+        self.llm_client = LLM(
+            **self.client_kwargs
+        )
+
+    def generate(self, batch_messages: List[List[dict]]) -> List[str]:
+
+        if self.llm_client is None:
+
+            self.load()
+
+        outputs = self.llm_client.chat(
+            messages = batch_messages,
+            sampling_params = self.sampling_params
+        )
+
+        return [
+            output.outputs[0].text
+            for output in outputs
+        ]
+
+
+class FakeInferenceEngine(InferenceEngine):
+    """Returns a fixed response without loading a model, for testing
+    the inference broker and data collection pipeline on a CPU.
+
+    Attributes:
+
+    response: str
+        The response returned for every conversation.
+
+    latency: float
+        Number of seconds to sleep for each batch.
+
+    batch_sizes: List[int]
+        Size of every batch generated so far.
+
+    """
+
+    def __init__(self, response: str = FAKE_RESPONSE, latency: float = 0.0):
+        """Returns a fixed response without loading a model, for testing
+        the inference broker and data collection pipeline on a CPU.
+
+        Arguments:
+
+        response: str
+            The response returned for every conversation.
+
+        latency: float
+            Number of seconds to sleep for each batch.
+
+        """
+
+        self.response = response
+        self.latency = latency
+
+        self.batch_sizes = []
+
+    def generate(self, batch_messages: List[List[dict]]) -> List[str]:
+
+        time.sleep(self.latency)
+
+        self.batch_sizes.append(
+            len(batch_messages)
+        )
+
+        return [
+            self.response
+            for messages in batch_messages
+        ]
+
+
+INFERENCE_ENGINES = {
+    "vllm": VLLMInferenceEngine,
+    "fake": FakeInferenceEngine,
+}
+
+
+def get_inference_engine(
+    client_type: str,
+    client_kwargs: Dict = None,
+    generation_kwargs: Dict = None,
+) -> InferenceEngine:
+    """Build an inference engine from the client settings of an agent,
+    judge, or task proposer config.
+
+    Arguments:
+
+    client_type: str
+        Either "vllm" for a local vLLM model, or "fake" for testing.
+
+    client_kwargs: Dict
+        Keyword arguments for constructing vllm.LLM.
+
+    generation_kwargs: Dict
+        Keyword arguments for constructing vllm.SamplingParams.
+
+    Returns:
+
+    InferenceEngine
+        The engine that generates responses in batches.
+
+    """
+
+    if client_type == "fake":
+
+        return FakeInferenceEngine()
+
+    return INFERENCE_ENGINES[client_type](
+        client_kwargs = client_kwargs,
+        generation_kwargs = generation_kwargs
+    )
+
+
+def collect_batch(
+    request_queue: queue.Queue,
+    max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+    max_wait: float = DEFAULT_MAX_WAIT,
+) -> List[Any] | None:
+    """Block until a request arrives, then keep collecting requests
+    until the batch is full, or `max_wait` seconds have passed.
+
+    Arguments:
+
+    request_queue: queue.Queue
+        Thread or process queue holding pending requests.
+
+    max_batch_size: int
+        Maximum number of requests in the batch.
+
+    max_wait: float
+        Number of seconds to wait for more requests after the first.
+
+    Returns:
+
+    List[Any] | None
+        The batch of requests, or None if the broker should stop.
+
+    """
+
+    first_request = request_queue.get()
+
+    if first_request is STOP_SIGNAL:
+
+        return None
+
+    batch = [first_request]
+
+    deadline = time.time() + max_wait
+
+    while len(batch) < max_batch_size:
+
+        try:
+
+            request = request_queue.get(
+                timeout = max(0.0, deadline - time.time())
+            )
+
+        except queue.Empty:
+
+            break
+
+        if request is STOP_SIGNAL:
+
+            # stop after this batch is finished
+            request_queue.put(STOP_SIGNAL)
+
+            break
+
+        batch.append(request)
+
+    return batch
+
+
+class InferenceBroker(object):
+    """Collects pending prompts from every concurrent trajectory in this
+    process, and runs them through one inference engine as a batch,
+    where agents submit prompts and wait on futures for responses.
+
+    Attributes:
+
+    engine: InferenceEngine
+        The engine that generates responses in batches.
+
+    max_batch_size: int
+        Maximum number of prompts in each batch.
+
+    max_wait: float
+        Number of seconds to wait for more prompts after the first.
+
+    """
+
+    def __init__(self, engine: InferenceEngine,
+                 max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+                 max_wait: float = DEFAULT_MAX_WAIT):
+        """Collects pending prompts from every concurrent trajectory in this
+        process, and runs them through one inference engine as a batch,
+        where agents submit prompts and wait on futures for responses.
+
+        Arguments:
+
+        engine: InferenceEngine
+            The engine that generates responses in batches.
+
+        max_batch_size: int
+            Maximum number of prompts in each batch.
+
+        max_wait: float
+            Number of seconds to wait for more prompts after the first.
+
+        """
+
+        self.engine = engine
+
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+
+        self.request_queue = queue.Queue()
+
+        self.thread = threading.Thread(
+            target = self.serve,
+            daemon = True
+        )
+
+        self.thread.start()
+
+    def serve(self) -> None:
+        """Generate responses for batches of pending prompts until the
+        broker is closed, and resolve the future for each prompt.
+
+        """
+
+        while True:
+
+            batch = collect_batch(
+                self.request_queue,
+                max_batch_size = self.max_batch_size,
+                max_wait = self.max_wait
+            )
+
+            if batch is None:
+
+                break
+
+            # skip prompts whose trajectories were cancelled
+            batch = [
+                (messages, future)
+                for messages, future in batch
+                if future.set_running_or_notify_cancel()
+            ]
+
+            if len(batch) == 0:
+
+                continue
+
+            try:
+
+                responses = self.engine.generate([
+                    messages for messages, future in batch
+                ])
+
+            except Exception as error:
+
+                for messages, future in batch:
+
+                    future.set_exception(error)
+
+                continue
+
+            for (messages, future), response in zip(batch, responses):
+
+                future.set_result(response)
+
+    def submit(self, messages: List[dict]) -> Future:
+        """Submit a conversation to be generated in the next batch.
+
+        Arguments:
+
+        messages: List[dict]
+            The conversation in the OpenAI chat format.
+
+        Returns:
+
+        Future
+            Future that resolves to the text response.
+
+        """
+
+        future = Future()
+
+        self.request_queue.put(
+            (messages, future)
+        )
+
+        return future
+
+    def generate(self, messages: List[dict], timeout: float = None) -> str:
+        """Submit a conversation, and block until the response is ready.
+
+        Arguments:
+
+        messages: List[dict]
+            The conversation in the OpenAI chat format.
+
+        timeout: float
+            Number of seconds to wait for the response, or None to
+            wait until the response is ready.
+
+        Returns:
+
+        str
+            The text response generated by the engine.
+
+        """
+
+        future = self.submit(messages)
+
+        try:
+
+            return future.result(
+                timeout = timeout
+            )
+
+        except concurrent.futures.TimeoutError:
+
+            # prompts that are still queued are skipped by the broker
+            future.cancel()
+
+            raise DeadlineExceeded(
+                "No response from the inference broker "
+                "after {:.1f} seconds".format(timeout)
+            )
+
+    async def agenerate(self, messages: List[dict]) -> str:
+        """Submit a conversation, and await the response from a coroutine.
+
+        Arguments:
+
+        messages: List[dict]
+            The conversation in the OpenAI chat format.
+
+        Returns:
+
+        str
+            The text response generated by the engine.
+
+        """
+
+        return await asyncio.wrap_future(
+            self.submit(messages)
+        )
+
+    def close(self) -> None:
+        """Stop the broker after pending batches are finished.
+
+        """
+
+        self.request_queue.put(STOP_SIGNAL)
+        self.thread.join()
+
+
+def serve_inference(
+    engine: InferenceEngine,
+    request_queue: Any,
+    response_queues: Dict[str, Any],
+    max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+    max_wait: float = DEFAULT_MAX_WAIT,
+) -> None:
+    """Run an inference broker in a dedicated process, where agents in
+    other processes send (worker_id, sequence_number, messages) requests,
+    and each response is sent back on the queue for that worker, tagged
+    with the sequence number of its request.
+
+    Arguments:
+
+    engine: InferenceEngine
+        The engine that generates responses in batches.
+
+    request_queue: multiprocessing.Queue
+        Queue shared by every agent for sending requests.
+
+    response_queues: Dict[str, multiprocessing.Queue]
+        Queue for sending responses back to each agent.
+
+    max_batch_size: int
+        Maximum number of prompts in each batch.
+
+    max_wait: float
+        Number of seconds to wait for more prompts after the first.
+
+    """
+
+    while True:
+
+        batch = collect_batch(
+            request_queue,
+            max_batch_size = max_batch_size,
+            max_wait = max_wait
+        )
+
+        if batch is None:
+
+            break
+
+        try:
+
+            responses = engine.generate([
+                messages for worker_id, sequence_number, messages in batch
+            ])
+
+        except Exception as error:
+
+            print(traceback.format_exc())
+
+            responses = [
+                RuntimeError(str(error))
+                for request in batch
+            ]
+
+        for (worker_id, sequence_number, messages), response in \
+                zip(batch, responses):
+
+            response_queues[worker_id].put(
+                (sequence_number, response)
+            )
+
+
+class InferenceClient(object):
+    """Handle for sending prompts from an agent process to an inference
+    broker running in another process on the same node.
+
+    Attributes:
+
+    worker_id: str
+        Unique identifier for the agent process.
+
+    request_queue: multiprocessing.Queue
+        Queue shared by every agent for sending requests.
+
+    response_queue: multiprocessing.Queue
+        Queue for receiving responses for this agent.
+
+    sequence_number: int
+        Number of requests sent so far, used to tag each request, so
+        responses to requests that timed out are dropped.
+
+    """
+
+    def __init__(self, worker_id: str, request_queue: Any,
+                 response_queue: Any):
+        """Handle for sending prompts from an agent process to an inference
+        broker running in another process on the same node.
+
+        Arguments:
+
+        worker_id: str
+            Unique identifier for the agent process.
+
+        request_queue: multiprocessing.Queue
+            Queue shared by every agent for sending requests.
+
+        response_queue: multiprocessing.Queue
+            Queue for receiving responses for this agent.
+
+        """
+
+        self.worker_id = worker_id
+
+        self.request_queue = request_queue
+        self.response_queue = response_queue
+
+        self.sequence_number = 0
+
+        self.lock = threading.Lock()
+
+    def __getstate__(self) -> dict:
+
+        state = self.__dict__.copy()
+        state.pop("lock")
+
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+
+    def generate(self, messages: List[dict], timeout: float = None) -> str:
+        """Send a conversation to the broker, and block until the
+        response for this agent is ready.
+
+        Arguments:
+
+        messages: List[dict]
+            The conversation in the OpenAI chat format.
+
+        timeout: float
+            Number of seconds to wait for the response, or None to
+            wait until the response is ready.
+
+        Returns:
+
+        str
+            The text response generated by the engine.
+
+        """
+
+        deadline = (
+            time.monotonic() + timeout
+            if timeout is not None else None
+        )
+
+        with self.lock:
+
+            self.sequence_number += 1
+
+            self.request_queue.put(
+                (self.worker_id, self.sequence_number, messages)
+            )
+
+            # responses to earlier requests that timed out are dropped
+            while True:
+
+                try:
+
+                    sequence_number, response = self.response_queue.get(
+                        timeout = (
+                            max(deadline - time.monotonic(), 0.0)
+                            if deadline is not None else None
+                        )
+                    )
+
+                except queue.Empty:
+
+                    raise DeadlineExceeded(
+                        "No response from the inference broker "
+                        "after {:.1f} seconds".format(timeout)
+                    )
+
+                if sequence_number == self.sequence_number:
+
+                    break
+
+        if isinstance(response, Exception):
+
+            raise response
+
+        return response
@@ -4,6 +4,7 @@ from insta.judge_prompts import (
 
 from insta.utils import (
     safe_call,
+    merge_timeout_kwargs,
     BrowserStatus
 )
 
@@ -13,6 +14,8 @@ from insta.configs.judge_config import (
     BrowserJudgment
 )
 
+from insta.profiling import span
+
 from typing import List, Callable
 from transformers import AutoTokenizer
 
@@ -148,19 +151,23 @@ class BrowserJudge(Callable):
             last_obs = last_obs
         )
 
-        if self.config.client_type == "vllm":
+        with span("judge.llm"):
 
-            response = self.llm_client.chat(
-                messages = messages,
-                sampling_params = self.sampling_params
-            )[0].outputs[0].text
+            if self.config.client_type == "vllm":
 
-        elif self.config.client_type == "openai":
+                response = self.llm_client.chat(
+                    messages = messages,
+                    sampling_params = self.sampling_params
+                )[0].outputs[0].text
 
-            response = self.llm_client.chat.completions.create(
-                messages = messages,
-                **self.config.generation_kwargs
-            ).choices[0].message.content
+            elif self.config.client_type == "openai":
+
+                response = self.llm_client.chat.completions.create(
+                    messages = messages,
+                    **merge_timeout_kwargs(
+                        self.config.generation_kwargs
+                    )
+                ).choices[0].message.content
 
         return self.judge_prompt.parse_judgment(
             response = response
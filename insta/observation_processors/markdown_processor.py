@@ -12,7 +12,8 @@ from insta.utils import (
 )
 
 from insta.configs.browser_config import (
-    BrowserObservation
+    BrowserObservation,
+    get_raw_screenshot
 )
 
 from insta.markdown import (
@@ -94,7 +95,7 @@ class MarkdownProcessor(BaseProcessor):
 
             return BrowserObservation(
                 raw_html = observation.raw_html,
-                screenshot = observation.screenshot,
+                screenshot = get_raw_screenshot(observation),
                 metadata = observation.metadata,
                 current_url = observation.current_url,
                 processed_text = FAILED_MESSAGE
@@ -112,7 +113,7 @@ class MarkdownProcessor(BaseProcessor):
 
             return BrowserObservation(
                 raw_html = observation.raw_html,
-                screenshot = observation.screenshot,
+                screenshot = get_raw_screenshot(observation),
                 metadata = observation.metadata,
                 current_url = observation.current_url,
                 processed_text = FAILED_MESSAGE
@@ -128,7 +129,7 @@ class MarkdownProcessor(BaseProcessor):
 
         return BrowserObservation(
             raw_html = observation.raw_html,
-            screenshot = observation.screenshot,
+            screenshot = get_raw_screenshot(observation),
             metadata = observation.metadata,
             current_url = observation.current_url,
             processed_text = processed_text
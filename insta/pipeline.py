@@ -1,12 +1,20 @@
-from typing import Callable, Tuple, List, Dict, Generator
-from collections import namedtuple
+from typing import Callable, Tuple, List, Dict, Generator, AsyncGenerator, Any
+from collections import namedtuple, deque
+from concurrent.futures import ThreadPoolExecutor, Future
+from functools import partial
+from urllib.parse import urlparse
 
-from dataclasses import asdict
-from itertools import count
+from dataclasses import replace
+
+from multiprocessing.connection import (
+    Connection,
+    wait,
+)
 
 from torch.multiprocessing import (
     Process,
     Queue,
+    Pipe,
 )
 
 from insta.configs import (
@@ -18,6 +26,8 @@ from insta.configs import (
     AgentConfig,
     JudgeConfig,
     TaskProposerConfig,
+    get_raw_screenshot,
+    decode_screenshot,
     get_browser_config,
     get_agent_config,
     get_judge_config,
@@ -44,20 +54,103 @@ from insta.task_proposer import (
     NULL_TASK_PROPOSAL
 )
 
+from insta.task_queue import (
+    TaskQueue,
+    get_task_queue,
+    is_task_queue_url,
+    DEFAULT_LEASE_TIMEOUT,
+    DEFAULT_SPECULATION_QUANTILE,
+    DEFAULT_MAX_LEASES_PER_DOMAIN,
+    DEFAULT_MIN_DOMAIN_INTERVAL,
+    DEFAULT_SPECULATION_POLL_INTERVAL,
+    DEFAULT_POLITENESS_POLL_INTERVAL
+)
+
+from insta.inference import (
+    InferenceClient,
+    INFERENCE_ENGINES,
+    STOP_SIGNAL,
+    DEFAULT_MAX_BATCH_SIZE,
+    get_inference_engine,
+    serve_inference
+)
+
+from insta.profiling import (
+    span,
+    enable_profiling,
+    disable_profiling,
+    serve_profiles,
+    DEFAULT_PROFILE_DIR,
+    DEFAULT_PROFILE_PORT
+)
+
+from insta.concurrency import (
+    RolloutSlots,
+    ConcurrencyController,
+    DEFAULT_TARGET_STEP_LATENCY,
+    DEFAULT_MIN_AGENTS,
+    DEFAULT_CONTROL_INTERVAL
+)
+
+from insta.step_spool import (
+    StepSpool,
+    is_spooled_step,
+    restore_spooled_step,
+    remove_spooled_steps,
+    DEFAULT_STEP_SPOOL_DIR
+)
+
+from insta.best_of_n import (
+    BestOfNSampler,
+    DEFAULT_NUM_SAMPLES,
+    DEFAULT_SUCCESS_THRESHOLD,
+    DEFAULT_CONSISTENCY_THRESHOLD
+)
+
+from insta.background_writer import (
+    BackgroundWriter,
+    DEFAULT_NUM_WRITER_THREADS,
+    DEFAULT_MAX_PENDING_WRITES
+)
+
+from insta.trajectory_store import (
+    TrajectoryStore,
+    DirectoryTrajectoryStore,
+    DEFAULT_STORAGE_FORMAT,
+    RecordLocation,
+    get_trajectory_stores,
+    open_trajectory_store,
+    read_record_location,
+    check_storage_format
+)
+
+from insta.completion_index import (
+    CompletionIndex,
+    get_completion_indices
+)
+
 from insta.utils import (
     prune_observation,
     METADATA_KEYS,
     BrowserStatus,
+    DeadlineExceeded,
+    TaskCancelled,
+    time_limit,
+    check_deadline,
     safe_call
 )
 
 
+import asyncio
 import torch
 import random
 
-import time
+import tempfile
+import shutil
+import queue
 import tqdm
 import json
+import time
 import os
 
 
@@ -72,6 +165,8 @@ DEFAULT_AGENT_RESPONSE_KEY = "response"
 DEFAULT_JUDGE_RESPONSE_KEY = "response"
 
 DEFAULT_MAX_ACTIONS = 30
+DEFAULT_TASK_TIMEOUT = None
+DEFAULT_STEP_TIMEOUT = None
 DEFAULT_SKIP_FINISHED = False
 DEFAULT_PRUNE_OBSERVATIONS = False
 
@@ -127,6 +222,18 @@ DEFAULT_WORLD_SIZE = 1
 DEFAULT_NUM_AGENTS = 8
 DEFAULT_PLAYWRIGHT_WORKERS = 8
 DEFAULT_RETURN_TRAJECTORIES = False
+DEFAULT_RETURN_HANDLES = False
+
+DEFAULT_ROLLOUT_ENGINE = "multiprocessing"
+DEFAULT_MAX_CONCURRENCY = 64
+
+DEFAULT_TASK_QUEUE_PATH = None
+
+DEFAULT_SHARE_INFERENCE = False
+
+DEFAULT_PIPELINE_JUDGING = False
+DEFAULT_NUM_JUDGE_WORKERS = 2
+DEFAULT_JUDGE_QUEUE_SIZE = 16
 
 DEFAULT_REWARD = 0.0
 DEFAULT_DONE = False
@@ -140,102 +247,308 @@ InstaPipelineOutput = namedtuple(
 )
 
 
-def generate_trajectory(
-    browser: InstaEnv | BrowserConfig,
-    agent: BrowserAgent | AgentConfig,
-    judge: BrowserJudge | JudgeConfig = None,
-    task_proposer: BrowserTaskProposer | TaskProposerConfig = None,
-    url: str = None, instruction: str = None,
-    agent_instruction: str = None,
-    judge_instruction: str = None,
-    task_proposer_instruction: str = None,
-    max_actions: int = DEFAULT_MAX_ACTIONS,
+# observations and actions are read back from the trajectory stores, so
+# passing a finished trajectory between processes costs a few kilobytes
+TrajectoryHandle = namedtuple(
+    "TrajectoryHandle",
+    ["identifier", "observations_dir", "actions_dir",
+     "judgment", "task_proposal",
+     "observations_location", "actions_location"],
+    defaults = [None, None]
+)
+
+
+JudgeRequest = namedtuple(
+    "JudgeRequest",
+    ["identifier", "url", "judge_instruction",
+     "task_proposer_instruction", "output"]
+)
+
+
+def judge_trajectory(
+    judge: BrowserJudge,
+    observations: List[Dict],
+    actions: List[Dict],
+    judge_instruction: str,
+    agent_response_key: str = DEFAULT_AGENT_RESPONSE_KEY,
+) -> Dict:
+    """Query the LLM judge to evaluate a finished trajectory, and return
+    the judgment as a dictionary that can be saved to disk.
+
+    Arguments:
+
+    judge: BrowserJudge
+        The LLM judge to evaluate the trajectory.
+
+    observations: List[Dict]
+        Observations along the trajectory.
+
+    actions: List[Dict]
+        Actions along the trajectory.
+
+    judge_instruction: str
+        Instruction for the judge.
+
+    agent_response_key: str
+        Key in the actions for the agent's response.
+
+    Returns:
+
+    Dict
+        The judgment for the trajectory.
+    
+    """
+
+    judgment = judge(
+        observations = [
+            x["processed_text"]
+            for x in observations
+        ],
+        actions = [
+            x[agent_response_key]
+            for x in actions
+        ],
+        instruction = judge_instruction
+    )
+
+    return {
+        "success": judgment.success,
+        "efficiency": judgment.efficiency,
+        "self_correction": judgment.self_correction,
+        "response": judgment.response,
+        "matched_response": judgment.matched_response,
+    }
+
+
+def propose_task(
+    task_proposer: BrowserTaskProposer,
+    observations: List[Dict],
+    actions: List[Dict],
+    judgment: Dict,
+    url: str,
+    task_proposer_instruction: str,
     agent_response_key: str = DEFAULT_AGENT_RESPONSE_KEY,
     judge_response_key: str = DEFAULT_JUDGE_RESPONSE_KEY,
-) -> Tuple[List[Dict], List[Dict], Dict]:
-    """Attempt a web navigation task using the LLM agent, and return the
-    observations and actions along the trajectory for later processing.
+) -> Dict:
+    """Query the LLM task proposer to propose a new task given a finished
+    trajectory, and return the task proposal as a dictionary.
+
+    The context for the task proposer is passed explicitly, so a single
+    task proposer can be shared between concurrent trajectories.
 
     Arguments:
 
-    env: InstaEnv | BrowserConfig
-        The web navigation environment running Playwright.
+    task_proposer: BrowserTaskProposer
+        The LLM task proposer to generate tasks for the agent to complete.
 
-    agent: BrowserAgent | AgentConfig
-        The LLM agent to use for the task.
+    observations: List[Dict]
+        Observations along the trajectory.
 
-    judge: BrowserJudge | JudgeConfig
+    actions: List[Dict]
+        Actions along the trajectory.
+
+    judgment: Dict
+        Judgment for the trajectory.
+
+    url: str
+        Starting URL for the agent.
+
+    task_proposer_instruction: str
+        Instruction for the task proposer.
+
+    Returns:
+
+    Dict
+        The task proposal for the trajectory.
+    
+    """
+
+    config = task_proposer.config
+
+    task_proposal = safe_call(
+        task_proposer.get_task_proposal,
+        observations = [[
+            x["processed_text"]
+            for x in observations
+        ]],
+        actions = [[
+            x[agent_response_key]
+            for x in actions
+        ]],
+        judgments = [
+            judgment[
+                judge_response_key
+            ]
+        ],
+        instructions = [
+            task_proposer_instruction
+        ],
+        task_proposals = [],
+        website = url,
+        last_judgments = config.last_judgments,
+        last_tasks = config.last_tasks,
+        last_trajectories = config.last_trajectories,
+        last_actions = config.last_actions,
+        last_obs = config.last_obs,
+        catch_errors = config.catch_errors,
+        max_errors = config.max_errors,
+        log_errors = config.log_errors
+    )
+
+    if task_proposal is BrowserStatus.ERROR:
+
+        task_proposal = NULL_TASK_PROPOSAL
+
+    return {
+        "proposed_task": task_proposal.proposed_task,
+        "steps": task_proposal.steps,
+        "criteria": task_proposal.criteria,
+        "response": task_proposal.response,
+        "matched_response": task_proposal.matched_response,
+    }
+
+
+def evaluate_trajectory(
+    judge: BrowserJudge = None,
+    task_proposer: BrowserTaskProposer = None,
+    observations: List[Dict] = None,
+    actions: List[Dict] = None,
+    url: str = None,
+    judge_instruction: str = None,
+    task_proposer_instruction: str = None,
+    agent_response_key: str = DEFAULT_AGENT_RESPONSE_KEY,
+    judge_response_key: str = DEFAULT_JUDGE_RESPONSE_KEY,
+) -> Tuple[Dict, Dict]:
+    """Judge a finished trajectory, and then propose a new task given
+    the judgment, skipping the judge or task proposer if None.
+
+    Arguments:
+
+    judge: BrowserJudge
         The LLM judge to evaluate the trajectory.
 
-    task_proposer: BrowserTaskProposer | TaskProposerConfig
+    task_proposer: BrowserTaskProposer
         The LLM task proposer to generate tasks for the agent to complete.
 
+    observations: List[Dict]
+        Observations along the trajectory.
+
+    actions: List[Dict]
+        Actions along the trajectory.
+
     url: str
         Starting URL for the agent.
 
-    instruction: str
-        Specific instruction for the agent.
+    judge_instruction: str
+        Instruction for the judge.
 
-    max_actions: int
-        Maximum number of actions per task.
+    task_proposer_instruction: str
+        Instruction for the task proposer.
 
     Returns:
 
-    Tuple[List[Dict], List[Dict], Dict]
-        Tuple containing observations, actions, and judgment for the trajectory
-        generated by running the agent with an instruction.
-    
+    Tuple[Dict, Dict]
+        The judgment and task proposal for the trajectory.
+
     """
 
-    if isinstance(browser, BrowserConfig):
+    judgment = {}
 
-        browser = InstaEnv(
-            config = browser
-        )
+    if judge is not None:
 
-    if isinstance(agent, AgentConfig):
+        with span("judge"):
 
-        agent = BrowserAgent(
-            config = agent
-        )
+            judgment = judge_trajectory(
+                judge = judge,
+                observations = observations,
+                actions = actions,
+                judge_instruction = judge_instruction,
+                agent_response_key = agent_response_key,
+            )
 
-    if judge is not None and \
-            isinstance(judge, JudgeConfig):
+    task_proposal = {}
 
-        judge = BrowserJudge(
-            config = judge
-        )
+    if task_proposer is not None:
 
-    if task_proposer is not None and \
-            isinstance(task_proposer, TaskProposerConfig):
+        with span("task_proposer"):
+
+            task_proposal = propose_task(
+                task_proposer = task_proposer,
+                observations = observations,
+                actions = actions,
+                judgment = judgment,
+                url = url,
+                task_proposer_instruction = task_proposer_instruction,
+                agent_response_key = agent_response_key,
+                judge_response_key = judge_response_key,
+            )
 
-        task_proposer = BrowserTaskProposer(
-            config = task_proposer
-        )
+    return judgment, task_proposal
 
-    agent_instruction = (
-        agent_instruction or 
-        instruction or 
-        AGENT_EXPLORATION_TEMPLATE.format(
-            website = url
-        )
-    )
 
-    judge_instruction = (
-        judge_instruction or
-        instruction or 
-        JUDGE_EXPLORATION_TEMPLATE.format(
-            website = url
-        )
-    )
+def rollout_trajectory(
+    browser: InstaEnv,
+    agent: BrowserAgent,
+    judge: BrowserJudge = None,
+    task_proposer: BrowserTaskProposer = None,
+    url: str = None,
+    agent_instruction: str = None,
+    judge_instruction: str = None,
+    task_proposer_instruction: str = None,
+    max_actions: int = DEFAULT_MAX_ACTIONS,
+    agent_response_key: str = DEFAULT_AGENT_RESPONSE_KEY,
+    judge_response_key: str = DEFAULT_JUDGE_RESPONSE_KEY,
+    step_timeout: float = DEFAULT_STEP_TIMEOUT,
+    cancel_fn: Callable[[], bool] = None,
+    latency_fn: Callable[[str, float], None] = None,
+    step_spool: StepSpool = None,
+) -> Tuple[List[Dict], List[Dict], Dict, Dict]:
+    """Run the agent in the browser until the task is finished or the
+    maximum number of actions is reached, then evaluate the trajectory,
+    where every call is bounded by the deadline of the calling context.
 
-    task_proposer_instruction = (
-        task_proposer_instruction or
-        instruction or 
-        TASK_PROPOSER_EXPLORATION_TEMPLATE.format(
-            website = url
-        )
-    )
+    Arguments:
+
+    browser: InstaEnv
+        The web navigation environment running Playwright.
+
+    agent: BrowserAgent
+        The LLM agent to use for the task.
+
+    judge: BrowserJudge
+        The LLM judge to evaluate the trajectory.
+
+    task_proposer: BrowserTaskProposer
+        The LLM task proposer to generate tasks for the agent to complete.
+
+    url: str
+        Starting URL for the agent.
+
+    max_actions: int
+        Maximum number of actions per task.
+
+    step_timeout: float
+        Number of seconds for each browser call and each LLM query.
+
+    cancel_fn: Callable[[], bool]
+        Function checked before each action that returns True when the
+        trajectory should stop, such as when another worker finished it.
+
+    latency_fn: Callable[[str, float], None]
+        Function called with the kind and duration in seconds of each
+        browser call, LLM query, and step, such as for a controller.
+
+    step_spool: StepSpool
+        Spool where the screenshot, raw HTML, and metadata of each step
+        are written as the step finishes, or None to keep them in memory.
+
+    Returns:
+
+    Tuple[List[Dict], List[Dict], Dict, Dict]
+        Tuple containing observations, actions, judgment, and task proposal
+        for the trajectory generated by running the agent with an instruction.
+
+    """
 
     observations = []
     actions = []
@@ -243,33 +556,45 @@ def generate_trajectory(
 
     for timestep in range(max_actions):
 
+        if cancel_fn is not None and cancel_fn():
+
+            raise TaskCancelled(
+                "Task was finished by another worker"
+            )
+
+        check_deadline()
+
         outputs = None
 
-        if last_action is not NULL_ACTION:
+        browser_start_time = time.time()
 
-            agent.push_action(
-                response = last_action.response
-            )
+        with time_limit(step_timeout):
 
-            outputs = browser.step(
-                action = last_action
-            )
+            if last_action is not NULL_ACTION:
+
+                agent.push_action(
+                    response = last_action.response
+                )
 
-        elif timestep == 0:
+                outputs = browser.step(
+                    action = last_action
+                )
 
-            agent.reset()
+            elif timestep == 0:
 
-            outputs = browser.reset(
-                url = url
-            )
+                agent.reset()
 
-        else: outputs = InstaEnvStepOutput(
-            observation = browser.get_obs(),
-            reward = DEFAULT_REWARD,
-            done = DEFAULT_DONE,
-            truncated = DEFAULT_TRUNCATED,
-            info = DEFAULT_INFO
-        )
+                outputs = browser.reset(
+                    url = url
+                )
+
+            else: outputs = InstaEnvStepOutput(
+                observation = browser.get_obs(),
+                reward = DEFAULT_REWARD,
+                done = DEFAULT_DONE,
+                truncated = DEFAULT_TRUNCATED,
+                info = DEFAULT_INFO
+            )
 
         is_finished = outputs is None or (
             isinstance(outputs, InstaEnvStepOutput)
@@ -280,6 +605,8 @@ def generate_trajectory(
             
             break
 
+        browser_latency = time.time() - browser_start_time
+
         obs = outputs.observation
 
         for key, value in (obs.metadata or {}).items():
@@ -289,21 +616,41 @@ def generate_trajectory(
                 for key in METADATA_KEYS
             } 
 
-        observations.append({
+        observation = {
             "current_url": obs.current_url,
             "processed_text": obs.processed_text,
             "raw_html": obs.raw_html,
-            "screenshot": obs.screenshot,
+            "screenshot": get_raw_screenshot(obs),
             "metadata": obs.metadata
-        })
+        }
+
+        if step_spool is not None:
+
+            with span("spool.step"):
+
+                observation = step_spool.add(observation)
+
+        observations.append(observation)
 
         agent.pop_observation()
         
-        last_action = agent(
-            observation = obs.processed_text,
-            instruction = agent_instruction,
-            current_url = obs.current_url
-        )
+        llm_start_time = time.time()
+
+        with time_limit(step_timeout):
+
+            last_action = agent(
+                observation = obs.processed_text,
+                instruction = agent_instruction,
+                current_url = obs.current_url
+            )
+
+        llm_latency = time.time() - llm_start_time
+
+        if latency_fn is not None:
+
+            latency_fn("browser", browser_latency)
+            latency_fn("llm", llm_latency)
+            latency_fn("step", browser_latency + llm_latency)
 
         function_calls = [
             {"dotpath": x.dotpath, "args": x.args}
@@ -328,104 +675,46 @@ def generate_trajectory(
             .format(outputs)
         )
 
-    judgment = {}
-
-    if judge is not None:
-
-        judgment = judge(
-            observations = [
-                x["processed_text"]
-                for x in observations
-            ],
-            actions = [
-                x[agent_response_key]
-                for x in actions
-            ],
-            instruction = judge_instruction
-        )
-
-        judgment = {
-            "success": judgment.success,
-            "efficiency": judgment.efficiency,
-            "self_correction": judgment.self_correction,
-            "response": judgment.response,
-            "matched_response": judgment.matched_response,
-        }
-
-    task_proposal = {}
-
-    if task_proposer is not None:
-
-        task_proposer.reset()
-
-        task_proposal = task_proposer(
-            instruction = task_proposer_instruction,
-            website = url,
-            observations = [
-                x["processed_text"]
-                for x in observations
-            ],
-            actions = [
-                x[agent_response_key]
-                for x in actions
-            ],
-            judgment = (
-                judgment[
-                    judge_response_key
-                ]
-            ),
-        )
-
-        task_proposal = {
-            "proposed_task": task_proposal.proposed_task,
-            "steps": task_proposal.steps,
-            "criteria": task_proposal.criteria,
-            "response": task_proposal.response,
-            "matched_response": task_proposal.matched_response,
-        }
+    judgment, task_proposal = evaluate_trajectory(
+        judge = judge,
+        task_proposer = task_proposer,
+        observations = observations,
+        actions = actions,
+        url = url,
+        judge_instruction = judge_instruction,
+        task_proposer_instruction = task_proposer_instruction,
+        agent_response_key = agent_response_key,
+        judge_response_key = judge_response_key,
+    )
 
     return observations, actions, judgment, task_proposal
 
 
-DEFAULT_WEBSITE = "duckduckgo.com"
-DEFAULT_STEPS = []
-DEFAULT_CRITERIA = []
-
-
-def iter_trajectories(
-    dataset: List[Dict[str, str]],
+def generate_trajectory(
     browser: InstaEnv | BrowserConfig,
     agent: BrowserAgent | AgentConfig,
     judge: BrowserJudge | JudgeConfig = None,
     task_proposer: BrowserTaskProposer | TaskProposerConfig = None,
-    seed: int = DEFAULT_SEED,
-    rank: int = DEFAULT_RANK,
-    world_size: int = DEFAULT_WORLD_SIZE,
-    observations_dir: str = DEFAULT_OBSERVATIONS_DIR,
-    screenshot_dir: str = DEFAULT_SCREENSHOT_DIR,
-    actions_dir: str = DEFAULT_ACTIONS_DIR,
-    judgments_dir: str = DEFAULT_JUDGMENTS_DIR,
-    task_proposals_dir: str = DEFAULT_TASK_PROPOSALS_DIR,
-    max_actions: int = DEFAULT_MAX_ACTIONS,
-    agent_response_key: str = DEFAULT_AGENT_RESPONSE_KEY,
+    url: str = None, instruction: str = None,
+    agent_instruction: str = None,
+    judge_instruction: str = None,
+    task_proposer_instruction: str = None,
+    max_actions: int = DEFAULT_MAX_ACTIONS,
+    agent_response_key: str = DEFAULT_AGENT_RESPONSE_KEY,
     judge_response_key: str = DEFAULT_JUDGE_RESPONSE_KEY,
-    skip_finished: bool = DEFAULT_SKIP_FINISHED,
-    prune_observations: bool = DEFAULT_PRUNE_OBSERVATIONS,
-    add_steps_to_agent: bool = DEFAULT_ADD_STEPS_TO_AGENT,
-    add_criteria_to_agent: bool = DEFAULT_ADD_CRITERIA_TO_AGENT,
-    add_steps_to_judge: bool = DEFAULT_ADD_STEPS_TO_JUDGE,
-    add_criteria_to_judge: bool = DEFAULT_ADD_CRITERIA_TO_JUDGE,
-    add_steps_to_task_proposer: bool = DEFAULT_ADD_STEPS_TO_TASK_PROPOSER,
-    add_criteria_to_task_proposer: bool = DEFAULT_ADD_CRITERIA_TO_TASK_PROPOSER,
-) -> Generator[InstaPipelineOutput, None, None]:
-    """Run the InSTA pipeline for internet-scale data collection, and yield
-    the observations, actions, and judgments for each task.
+    task_timeout: float = DEFAULT_TASK_TIMEOUT,
+    step_timeout: float = DEFAULT_STEP_TIMEOUT,
+    cancel_fn: Callable[[], bool] = None,
+    latency_fn: Callable[[str, float], None] = None,
+    step_spool: StepSpool = None,
+) -> Tuple[List[Dict], List[Dict], Dict]:
+    """Attempt a web navigation task using the LLM agent, and return the
+    observations and actions along the trajectory for later processing.
 
     Arguments:
 
-    dataset: List[Dict[str, str]]
-        Override the default dataset, and run the pipeline on custom tasks,
-        each entry must be a dictionary with keys "domain" and "task".
+    env: InstaEnv | BrowserConfig
+        The web navigation environment running Playwright.
 
     agent: BrowserAgent | AgentConfig
         The LLM agent to use for the task.
@@ -433,50 +722,45 @@ def iter_trajectories(
     judge: BrowserJudge | JudgeConfig
         The LLM judge to evaluate the trajectory.
 
-    browser: InstaEnv | BrowserConfig
-        The web navigation environment running Playwright.
-
-    rank: int
-        Rank of the process.
-
-    world_size: int
-        Number of data collection processes.
+    task_proposer: BrowserTaskProposer | TaskProposerConfig
+        The LLM task proposer to generate tasks for the agent to complete.
 
-    seed: int
-        Seed for the dataset.
+    url: str
+        Starting URL for the agent.
 
-    observations_dir: str
-        Directory to save observations.
+    instruction: str
+        Specific instruction for the agent.
 
-    screenshot_dir: str
-        Directory to save screenshots.
+    max_actions: int
+        Maximum number of actions per task.
 
-    actions_dir: str
-        Directory to save actions.
+    task_timeout: float
+        Number of seconds for the whole task, including the judge and
+        task proposer, after which the trajectory is abandoned.
 
-    judgments_dir: str
-        Directory to save judgments.
+    step_timeout: float
+        Number of seconds for each browser call and each LLM query.
 
-    max_actions: int
-        Maximum number of actions per task.
+    cancel_fn: Callable[[], bool]
+        Function checked before each action that returns True when the
+        trajectory should stop, such as when another worker finished it.
 
-    skip_finished: bool
-        Whether to skip tasks that are already attempted.
+    latency_fn: Callable[[str, float], None]
+        Function called with the kind and duration in seconds of each
+        browser call, LLM query, and step, such as for a controller.
 
-    prune_observations: bool
-        Whether to prune observations before saving.
+    step_spool: StepSpool
+        Spool where the screenshot, raw HTML, and metadata of each step
+        are written as the step finishes, or None to keep them in memory.
 
     Returns:
 
-    Generator[InstaPipelineOutput, None, None]
-        Generator for the observations, actions, and judgments for each task, 
-        which are saved to disk for later processing.
+    Tuple[List[Dict], List[Dict], Dict]
+        Tuple containing observations, actions, and judgment for the trajectory
+        generated by running the agent with an instruction.
     
     """
 
-    skip_judge = judge is None
-    skip_task_proposer = task_proposer is None
-
     if isinstance(browser, BrowserConfig):
 
         browser = InstaEnv(
@@ -489,393 +773,2098 @@ def iter_trajectories(
             config = agent
         )
 
-    if not skip_judge and isinstance(judge, JudgeConfig):
+    if judge is not None and \
+            isinstance(judge, JudgeConfig):
 
         judge = BrowserJudge(
             config = judge
         )
 
-    if not skip_task_proposer and isinstance(task_proposer, TaskProposerConfig):
+    if task_proposer is not None and \
+            isinstance(task_proposer, TaskProposerConfig):
 
         task_proposer = BrowserTaskProposer(
             config = task_proposer
         )
 
-    if observations_dir is not None:
-
-        os.makedirs(
-            observations_dir, 
-            exist_ok = True
+    agent_instruction = (
+        agent_instruction or 
+        instruction or 
+        AGENT_EXPLORATION_TEMPLATE.format(
+            website = url
         )
+    )
 
-    if screenshot_dir is not None:
+    judge_instruction = (
+        judge_instruction or
+        instruction or 
+        JUDGE_EXPLORATION_TEMPLATE.format(
+            website = url
+        )
+    )
 
-        os.makedirs(
-            screenshot_dir, 
-            exist_ok = True
+    task_proposer_instruction = (
+        task_proposer_instruction or
+        instruction or 
+        TASK_PROPOSER_EXPLORATION_TEMPLATE.format(
+            website = url
         )
+    )
 
-    if actions_dir is not None:
+    try:
+
+        with time_limit(task_timeout):
+
+            return rollout_trajectory(
+                browser = browser,
+                agent = agent,
+                judge = judge,
+                task_proposer = task_proposer,
+                url = url,
+                agent_instruction = agent_instruction,
+                judge_instruction = judge_instruction,
+                task_proposer_instruction = task_proposer_instruction,
+                max_actions = max_actions,
+                agent_response_key = agent_response_key,
+                judge_response_key = judge_response_key,
+                step_timeout = step_timeout,
+                cancel_fn = cancel_fn,
+                latency_fn = latency_fn,
+                step_spool = step_spool,
+            )
 
-        os.makedirs(
-            actions_dir, 
-            exist_ok = True
-        )
+    # release the browser session held by an abandoned trajectory
+    except (DeadlineExceeded, TaskCancelled):
 
-    if judgments_dir is not None:
+        browser.client.close()
 
-        os.makedirs(
-            judgments_dir, 
-            exist_ok = True
-        )
+        raise
 
-    if task_proposals_dir is not None:
 
-        os.makedirs(
-            task_proposals_dir, 
-            exist_ok = True
-        )
+DEFAULT_WEBSITE = "duckduckgo.com"
+DEFAULT_STEPS = []
+DEFAULT_CRITERIA = []
 
-    dataset_ids = list(range(len(dataset)))
 
-    random.seed(seed)
-    random.shuffle(dataset_ids)
+def prepare_task(
+    example_dict: Dict[str, str],
+    add_steps_to_agent: bool = DEFAULT_ADD_STEPS_TO_AGENT,
+    add_criteria_to_agent: bool = DEFAULT_ADD_CRITERIA_TO_AGENT,
+    add_steps_to_judge: bool = DEFAULT_ADD_STEPS_TO_JUDGE,
+    add_criteria_to_judge: bool = DEFAULT_ADD_CRITERIA_TO_JUDGE,
+    add_steps_to_task_proposer: bool = DEFAULT_ADD_STEPS_TO_TASK_PROPOSER,
+    add_criteria_to_task_proposer: bool = DEFAULT_ADD_CRITERIA_TO_TASK_PROPOSER,
+) -> Dict[str, str]:
+    """Read a single example from the dataset, and build the starting URL,
+    the identifier, and the instructions for the agent, judge, and
+    task proposer, optionally including the steps and criteria.
 
-    dataset_ids = dataset_ids[
-        rank::world_size
-    ]
+    Arguments:
 
-    progress_bar = tqdm.tqdm(
-        dataset_ids, desc = "Processing",
-        dynamic_ncols = True
-    )
+    example_dict: Dict[str, str]
+        An entry in the dataset, with keys "domain" and "task".
 
-    for example_id in progress_bar:
+    Returns:
 
-        example_dict = dataset[example_id]
+    Dict[str, str]
+        Dictionary with the keys "identifier", "domain", "url", "instruction",
+        "agent_instruction", "judge_instruction", and
+        "task_proposer_instruction" for the task.
+    
+    """
 
-        domain = example_dict.get(
-            "website", example_dict.get(
-                "domain", DEFAULT_WEBSITE
-            )
+    domain = example_dict.get(
+        "website", example_dict.get(
+            "domain", DEFAULT_WEBSITE
         )
+    )
 
-        instruction = example_dict.get(
-            "instruction", example_dict.get("task")
-        )
+    instruction = example_dict.get(
+        "instruction", example_dict.get("task")
+    )
 
-        agent_instruction = example_dict.get(
-            "agent_instruction", example_dict.get(
-                "agent_task", instruction
-            )
+    agent_instruction = example_dict.get(
+        "agent_instruction", example_dict.get(
+            "agent_task", instruction
         )
+    )
 
-        judge_instruction = example_dict.get(
-            "judge_instruction", example_dict.get(
-                "judge_task", instruction
-            )
+    judge_instruction = example_dict.get(
+        "judge_instruction", example_dict.get(
+            "judge_task", instruction
         )
+    )
 
-        task_proposer_instruction = example_dict.get(
-            "task_proposer_instruction", example_dict.get(
-                "task_proposer_task", instruction
-            )
+    task_proposer_instruction = example_dict.get(
+        "task_proposer_instruction", example_dict.get(
+            "task_proposer_task", instruction
         )
+    )
 
-        identifier = example_dict.get(
-            "identifier", domain
-        )
+    identifier = example_dict.get(
+        "identifier", domain
+    )
 
-        steps = example_dict.get(
-            "steps", DEFAULT_STEPS
-        )
+    steps = example_dict.get(
+        "steps", DEFAULT_STEPS
+    )
+
+    criteria = example_dict.get(
+        "criteria", DEFAULT_CRITERIA
+    )
+
+    format_steps = "\n".join(
+        "{n}. {part}".format(n = idx + 1, part = part)
+        for idx, part in enumerate(steps)
+    )
+
+    format_criteria = "\n".join(
+        "{n}. {part}".format(n = idx + 1, part = part)
+        for idx, part in enumerate(criteria)
+    )
+
+    if add_steps_to_agent and len(steps) > 0:
 
-        criteria = example_dict.get(
-            "criteria", DEFAULT_CRITERIA
+        agent_instruction = AGENT_STEPS_TEMPLATE.format(
+            instruction = agent_instruction,
+            steps = format_steps
         )
 
-        format_steps = "\n".join(
-            "{n}. {part}".format(n = idx + 1, part = part)
-            for idx, part in enumerate(steps)
+    if add_criteria_to_agent and len(criteria) > 0:
+
+        agent_instruction = AGENT_CRITERIA_TEMPLATE.format(
+            instruction = agent_instruction,
+            criteria = format_criteria
         )
 
-        format_criteria = "\n".join(
-            "{n}. {part}".format(n = idx + 1, part = part)
-            for idx, part in enumerate(criteria)
+    if add_steps_to_judge and len(steps) > 0:
+
+        judge_instruction = JUDGE_STEPS_TEMPLATE.format(
+            instruction = judge_instruction,
+            steps = format_steps
         )
 
-        if add_steps_to_agent and len(steps) > 0:
+    if add_criteria_to_judge and len(criteria) > 0:
 
-            agent_instruction = AGENT_STEPS_TEMPLATE.format(
-                instruction = agent_instruction,
-                steps = format_steps
-            )
+        judge_instruction = JUDGE_CRITERIA_TEMPLATE.format(
+            instruction = judge_instruction,
+            criteria = format_criteria
+        )
 
-        if add_criteria_to_agent and len(criteria) > 0:
+    if add_steps_to_task_proposer and len(steps) > 0:
 
-            agent_instruction = AGENT_CRITERIA_TEMPLATE.format(
-                instruction = agent_instruction,
-                criteria = format_criteria
-            )
+        task_proposer_instruction = TASK_PROPOSER_STEPS_TEMPLATE.format(
+            instruction = task_proposer_instruction,
+            steps = format_steps
+        )
 
-        if add_steps_to_judge and len(steps) > 0:
+    if add_criteria_to_task_proposer and len(criteria) > 0:
 
-            judge_instruction = JUDGE_STEPS_TEMPLATE.format(
-                instruction = judge_instruction,
-                steps = format_steps
-            )
+        task_proposer_instruction = TASK_PROPOSER_CRITERIA_TEMPLATE.format(
+            instruction = task_proposer_instruction,
+            criteria = format_criteria
+        )
 
-        if add_criteria_to_judge and len(criteria) > 0:
+    has_protocol = (
+        domain.startswith("http://")
+        or domain.startswith("https://")
+    )
 
-            judge_instruction = JUDGE_CRITERIA_TEMPLATE.format(
-                instruction = judge_instruction,
-                criteria = format_criteria
-            )
+    if not has_protocol:
 
-        if add_steps_to_task_proposer and len(steps) > 0:
+        url = "http://{domain}".format(
+            domain = domain
+        )
 
-            task_proposer_instruction = TASK_PROPOSER_STEPS_TEMPLATE.format(
-                instruction = task_proposer_instruction,
-                steps = format_steps
-            )
+    else: url = domain
 
-        if add_criteria_to_task_proposer and len(criteria) > 0:
+    return {
+        "identifier": identifier,
+        "domain": domain,
+        "url": url,
+        "instruction": instruction,
+        "agent_instruction": agent_instruction,
+        "judge_instruction": judge_instruction,
+        "task_proposer_instruction": task_proposer_instruction,
+    }
 
-            task_proposer_instruction = TASK_PROPOSER_CRITERIA_TEMPLATE.format(
-                instruction = task_proposer_instruction,
-                criteria = format_criteria
-            )
 
-        progress_bar.set_description(
-            "Processing: {}".format(
-                identifier
-            )
-        )
+def trajectory_exists(
+    identifier: str,
+    observations_dir: str = DEFAULT_OBSERVATIONS_DIR,
+    actions_dir: str = DEFAULT_ACTIONS_DIR,
+    judgments_dir: str = DEFAULT_JUDGMENTS_DIR,
+    task_proposals_dir: str = DEFAULT_TASK_PROPOSALS_DIR,
+    skip_judge: bool = False,
+    skip_task_proposer: bool = False,
+    completion_indices: Dict[str, CompletionIndex] = None,
+) -> bool:
+    """Check whether the observations, actions, judgment, and task proposal
+    for a task have already been saved to disk by a previous run.
 
-        if observations_dir is not None:
+    Arguments:
 
-            observations_path = os.path.join(
-                observations_dir,
-                "{}.json".format(identifier)
-            )
+    identifier: str
+        Unique identifier for the task.
 
-        if actions_dir is not None:
+    skip_judge: bool
+        Whether the judgment is not required for the task to be finished.
 
-            actions_path = os.path.join(
-                actions_dir,
-                "{}.json".format(identifier)
-            )
+    skip_task_proposer: bool
+        Whether the task proposal is not required for the task to be finished.
 
-        if judgments_dir is not None:
+    completion_indices: Dict[str, CompletionIndex]
+        Journals of saved identifiers for each data directory, which
+        replace checking whether each file exists on disk.
 
-            judgment_path = os.path.join(
-                judgments_dir,
-                "{}.json".format(identifier)
-            )
+    Returns:
 
-        if task_proposals_dir is not None:
+    bool
+        Whether all data for the task already exists.
+    
+    """
 
-            task_proposal_path = os.path.join(
-                task_proposals_dir,
-                "{}.json".format(identifier)
-            )
+    completion_indices = completion_indices or {}
 
-        if screenshot_dir is not None:
+    def is_saved(kind: str, data_dir: str) -> bool:
 
-            screenshot_domain_dir = os.path.join(
-                screenshot_dir,
-                "{}".format(identifier)
-            )
+        if data_dir is None:
 
-            os.makedirs(
-                screenshot_domain_dir,
-                exist_ok = True
-            )
+            return False
 
-        observations_exists = (
-            observations_dir is not None
-            and os.path.exists(observations_path)
-        )
+        if completion_indices.get(kind) is not None:
 
-        actions_exists = (
-            actions_dir is not None
-            and os.path.exists(actions_path)
-        )
+            return identifier in completion_indices[kind]
 
-        judgment_exists = (
-            judgments_dir is not None
-            and os.path.exists(judgment_path)
-        )
+        return os.path.exists(os.path.join(
+            data_dir,
+            "{}.json".format(identifier)
+        ))
 
-        task_proposal_exists = (
-            task_proposals_dir is not None
-            and os.path.exists(task_proposal_path)
-        )
+    observations_exists = is_saved(
+        "observations", observations_dir
+    )
 
-        all_data_exists = (
-            observations_exists and actions_exists
-            and (judgment_exists or skip_judge)
-            and (task_proposal_exists or skip_task_proposer)
-        )
+    actions_exists = is_saved(
+        "actions", actions_dir
+    )
 
-        skip_this_task = (
-            skip_finished
-            and all_data_exists
-        )
+    judgment_exists = is_saved(
+        "judgments", judgments_dir
+    )
 
-        if skip_this_task:
+    task_proposal_exists = is_saved(
+        "task_proposals", task_proposals_dir
+    )
 
-            continue
+    return (
+        observations_exists and actions_exists
+        and (judgment_exists or skip_judge)
+        and (task_proposal_exists or skip_task_proposer)
+    )
 
-        has_protocol = (
-            domain.startswith("http://")
-            or domain.startswith("https://")
-        )
 
-        if not has_protocol:
+def save_trajectory(
+    identifier: str,
+    observations: List[Dict],
+    actions: List[Dict],
+    judgment: Dict,
+    task_proposal: Dict,
+    observations_dir: str = DEFAULT_OBSERVATIONS_DIR,
+    screenshot_dir: str = DEFAULT_SCREENSHOT_DIR,
+    actions_dir: str = DEFAULT_ACTIONS_DIR,
+    judgments_dir: str = DEFAULT_JUDGMENTS_DIR,
+    task_proposals_dir: str = DEFAULT_TASK_PROPOSALS_DIR,
+    prune_observations: bool = DEFAULT_PRUNE_OBSERVATIONS,
+    completion_indices: Dict[str, CompletionIndex] = None,
+    trajectory_stores: Dict[str, TrajectoryStore] = None,
+    return_handle: bool = False,
+) -> InstaPipelineOutput | TrajectoryHandle:
+    """Save the screenshots, observations, actions, judgment, and task
+    proposal for a finished task, and skip data that is empty, where
+    steps written to a StepSpool are read back and their files consumed.
 
-            url = "http://{domain}".format(
-                domain = domain
-            )
+    Arguments:
 
-        else: url = domain
-        
-        trajectory = safe_call(
-            generate_trajectory, browser = browser, agent = agent,
-            judge = judge, task_proposer = task_proposer,
-            url = url, agent_instruction = agent_instruction,
-            judge_instruction = judge_instruction,
-            task_proposer_instruction = task_proposer_instruction,
-            instruction = instruction,
-            max_actions = max_actions,
-            agent_response_key = agent_response_key,
-            judge_response_key = judge_response_key,
-            catch_errors = True,
-            log_errors = True,
-            max_errors = 1,
-        )
+    identifier: str
+        Unique identifier for the task.
 
-        observations, actions, judgment, task_proposal = [], [], {}, {}
+    observations: List[Dict]
+        Observations along the trajectory.
 
-        if trajectory is not BrowserStatus.ERROR:
+    actions: List[Dict]
+        Actions along the trajectory.
 
-            observations, actions, judgment, task_proposal = trajectory
+    judgment: Dict
+        Judgment for the trajectory.
 
-        for step_idx, observation in enumerate(observations):
+    task_proposal: Dict
+        Task proposal for the trajectory.
 
-            if screenshot_dir is not None and \
-                    observation.get("screenshot") is not None:
+    prune_observations: bool
+        Whether to prune observations before saving.
 
-                screenshot_path = os.path.join(
-                    screenshot_domain_dir,
-                    "screenshot_{:02d}.jpg"
-                    .format(step_idx)
-                )
+    completion_indices: Dict[str, CompletionIndex]
+        Journals of saved identifiers, updated after each record is written.
 
-                screenshot = observation.pop(
-                    "screenshot"
-                )
+    trajectory_stores: Dict[str, TrajectoryStore]
+        Store for each kind of data, where data without a store is saved
+        as one pretty-printed JSON file per identifier.
 
-                screenshot.convert("RGB").save(
-                    screenshot_path
-                )
+    return_handle: bool
+        Whether to return a TrajectoryHandle holding the location of
+        each saved record, instead of the trajectory itself.
 
-                observation["screenshot_path"] = (
-                    screenshot_path
-                )
+    Returns:
 
-            if prune_observations:
-                
-                observations[step_idx] = (
-                    prune_observation(
-                        observation
-                    )
-                )
+    InstaPipelineOutput | TrajectoryHandle
+        The observations, actions, judgment, and task proposal, where
+        screenshots are replaced with their path when saved to disk.
+    
+    """
 
-        observations_valid = (
-            observations is not None and 
-            len(observations) > 0
-        )
+    if screenshot_dir is not None:
 
-        actions_valid = (
-            actions is not None and 
-            len(actions) > 0
+        screenshot_domain_dir = os.path.join(
+            screenshot_dir,
+            "{}".format(identifier)
         )
 
-        judgment_valid = (
-            judgment is not None and 
-            len(judgment) > 0
+        os.makedirs(
+            screenshot_domain_dir,
+            exist_ok = True
         )
 
-        task_proposal_valid = (
-            task_proposal is not None and 
-            len(task_proposal) > 0
-        )
+    for step_idx, observation in enumerate(observations):
 
-        trajectory_valid = (
-            observations_valid and actions_valid and 
-            (judgment_valid or skip_judge) and
-            (task_proposal_valid or skip_task_proposer)
-        )
+        screenshot_path = None
 
-        if observations_valid and \
-                observations_dir is not None:
-                
-            with open(observations_path, "w") as file:
-                
-                json.dump(
-                    observations, 
-                    file,
-                    indent = 4
-                )
+        if screenshot_dir is not None:
+
+            screenshot_path = os.path.join(
+                screenshot_domain_dir,
+                "screenshot_{:02d}.jpg"
+                .format(step_idx)
+            )
+
+        # spooled screenshots are moved into place, or converted from PNG
+        if is_spooled_step(observation):
+
+            observation = observations[step_idx] = restore_spooled_step(
+                observation, screenshot_path = screenshot_path
+            )
 
-        if actions_valid and \
-                actions_dir is not None:
+        # screenshots are decoded here on the writer, not during the rollout
+        if observation.get("screenshot") is not None:
 
-            with open(actions_path, "w") as file:
-                
-                json.dump(
-                    actions, 
-                    file,
-                    indent = 4
+            with span("save.decode"):
+
+                observation["screenshot"] = decode_screenshot(
+                    observation["screenshot"]
                 )
 
-        if judgment_valid and \
-                judgments_dir is not None:
+        if screenshot_path is not None and \
+                observation.get("screenshot") is not None:
+
+            screenshot = observation.pop(
+                "screenshot"
+            )
+
+            with span("save.screenshot"):
 
-            with open(judgment_path, "w") as file:
-                
-                json.dump(
-                    judgment, 
-                    file,
-                    indent = 4
+                screenshot.convert("RGB").save(
+                    screenshot_path
                 )
 
-        if task_proposal_valid and \
-                task_proposals_dir is not None:
+            observation["screenshot_path"] = (
+                screenshot_path
+            )
 
-            with open(task_proposal_path, "w") as file:
-                
-                json.dump(
-                    task_proposal, 
-                    file,
-                    indent = 4
+        if prune_observations:
+            
+            observations[step_idx] = (
+                prune_observation(
+                    observation
                 )
+            )
 
-        yield InstaPipelineOutput(
-            observations = observations,
-            actions = actions,
-            judgment = judgment,
-            task_proposal = task_proposal
+    observations_valid = (
+        observations is not None and 
+        len(observations) > 0
+    )
+
+    actions_valid = (
+        actions is not None and 
+        len(actions) > 0
+    )
+
+    judgment_valid = (
+        judgment is not None and 
+        len(judgment) > 0
+    )
+
+    task_proposal_valid = (
+        task_proposal is not None and 
+        len(task_proposal) > 0
+    )
+
+    completion_indices = completion_indices or {}
+    trajectory_stores = trajectory_stores or {}
+
+    record_locations = {}
+
+    def save_record(kind: str, data_dir: str, record: Any) -> None:
+
+        trajectory_store = trajectory_stores.get(kind)
+
+        if trajectory_store is None:
+
+            trajectory_store = DirectoryTrajectoryStore(
+                data_dir = data_dir
+            )
+
+        with span("save.{}".format(kind)):
+
+            record_locations[kind] = trajectory_store.write(
+                identifier, record
+            )
+
+        if completion_indices.get(kind) is not None:
+
+            completion_indices[kind].add(identifier)
+
+    if observations_valid and \
+            observations_dir is not None:
+
+        save_record(
+            "observations", observations_dir,
+            observations
         )
 
+    if actions_valid and \
+            actions_dir is not None:
 
-def list_trajectories(
+        save_record(
+            "actions", actions_dir,
+            actions
+        )
+
+    if judgment_valid and \
+            judgments_dir is not None:
+
+        save_record(
+            "judgments", judgments_dir,
+            judgment
+        )
+
+    if task_proposal_valid and \
+            task_proposals_dir is not None:
+
+        save_record(
+            "task_proposals", task_proposals_dir,
+            task_proposal
+        )
+
+    output = InstaPipelineOutput(
+        observations = observations,
+        actions = actions,
+        judgment = judgment,
+        task_proposal = task_proposal
+    )
+
+    if return_handle:
+
+        return get_trajectory_handle(
+            identifier = identifier,
+            output = output,
+            observations_dir = observations_dir,
+            actions_dir = actions_dir,
+            record_locations = record_locations
+        )
+
+    return output
+
+
+def get_trajectory_handle(
+    identifier: str,
+    output: InstaPipelineOutput,
+    observations_dir: str = DEFAULT_OBSERVATIONS_DIR,
+    actions_dir: str = DEFAULT_ACTIONS_DIR,
+    record_locations: Dict[str, RecordLocation] = None,
+) -> TrajectoryHandle | InstaPipelineOutput:
+    """Replace a saved trajectory with a handle to its records on disk,
+    so the trajectory is sent to another process without its content.
+
+    Arguments:
+
+    identifier: str
+        Unique identifier for the task.
+
+    output: InstaPipelineOutput
+        The trajectory returned by save_trajectory.
+
+    observations_dir: str
+        Directory where observations were saved.
+
+    actions_dir: str
+        Directory where actions were saved.
+
+    record_locations: Dict[str, RecordLocation]
+        Location returned by the store for each saved record, so the
+        records are read without loading the index of the directory.
+
+    Returns:
+
+    TrajectoryHandle | InstaPipelineOutput
+        Handle to the saved trajectory, or the trajectory itself when
+        its observations or actions were not saved to disk.
+
+    """
+
+    record_locations = record_locations or {}
+
+    is_saved = (
+        (observations_dir is not None or len(output.observations) == 0) and
+        (actions_dir is not None or len(output.actions) == 0)
+    )
+
+    if not is_saved:
+
+        return output
+
+    return TrajectoryHandle(
+        identifier = identifier,
+        observations_dir = (
+            observations_dir
+            if len(output.observations) > 0 else None
+        ),
+        actions_dir = (
+            actions_dir
+            if len(output.actions) > 0 else None
+        ),
+        judgment = output.judgment,
+        task_proposal = output.task_proposal,
+        observations_location = record_locations.get("observations"),
+        actions_location = record_locations.get("actions")
+    )
+
+
+def load_trajectory(
+    output: TrajectoryHandle | InstaPipelineOutput,
+) -> InstaPipelineOutput:
+    """Read the observations and actions for a trajectory handle from
+    the trajectory stores, in any storage format.
+
+    Arguments:
+
+    output: TrajectoryHandle | InstaPipelineOutput
+        Handle to a saved trajectory, or a trajectory that is
+        returned unchanged.
+
+    Returns:
+
+    InstaPipelineOutput
+        The observations, actions, judgment, and task proposal.
+
+    """
+
+    if not isinstance(output, TrajectoryHandle):
+
+        return output
+
+    def load_record(data_dir: str, location: RecordLocation) -> List[Dict]:
+
+        if data_dir is None:
+
+            return []
+
+        # handles from save_trajectory know where each record was written
+        if location is not None:
+
+            return read_record_location(location) or []
+
+        trajectory_store = open_trajectory_store(data_dir)
+
+        record = trajectory_store.read(output.identifier)
+
+        # the store caches shard indices, which miss records
+        # written by other processes since they were loaded
+        if record is None:
+
+            trajectory_store.refresh()
+
+            record = trajectory_store.read(output.identifier)
+
+        return record or []
+
+    return InstaPipelineOutput(
+        observations = load_record(
+            output.observations_dir,
+            output.observations_location
+        ),
+        actions = load_record(
+            output.actions_dir,
+            output.actions_location
+        ),
+        judgment = output.judgment,
+        task_proposal = output.task_proposal
+    )
+
+
+def shard_dataset_ids(
+    num_examples: int,
+    seed: int = DEFAULT_SEED,
+    rank: int = DEFAULT_RANK,
+    world_size: int = DEFAULT_WORLD_SIZE,
+) -> List[int]:
+    """Shuffle the indices of examples in the dataset, and select
+    a static shard of the indices for a single rank.
+
+    Arguments:
+
+    num_examples: int
+        Number of examples in the dataset.
+
+    seed: int
+        Seed for the dataset.
+
+    rank: int
+        Rank of the shard to select.
+
+    world_size: int
+        Number of shards.
+
+    Returns:
+
+    List[int]
+        Indices of examples in the dataset for this rank.
+
+    """
+
+    dataset_ids = list(range(num_examples))
+
+    random.seed(seed)
+    random.shuffle(dataset_ids)
+
+    return dataset_ids[
+        rank::world_size
+    ]
+
+
+def get_task_domains(
     dataset: List[Dict[str, str]],
-    browser: InstaEnv | BrowserConfig,
-    agent: BrowserAgent | AgentConfig,
-    judge: BrowserJudge | JudgeConfig = None,
-    task_proposer: BrowserTaskProposer | TaskProposerConfig = None,
+    dataset_ids: List[int],
+) -> List[str]:
+    """Select the website visited by each task, used by the task queue
+    to limit how many agents browse the same website at once.
+
+    Arguments:
+
+    dataset: List[Dict[str, str]]
+        Dataset of tasks, with keys "domain" and "task".
+
+    dataset_ids: List[int]
+        Indices of examples in the dataset.
+
+    Returns:
+
+    List[str]
+        Lowercase host name of the website for each example.
+
+    """
+
+    task_domains = []
+
+    for example_id in dataset_ids:
+
+        domain = dataset[example_id].get(
+            "website", dataset[example_id].get(
+                "domain", DEFAULT_WEBSITE
+            )
+        ).strip().lower()
+
+        if "://" in domain:
+
+            domain = urlparse(domain).netloc
+
+        domain = domain.split("/")[0]
+
+        if domain.startswith("www."):
+
+            domain = domain[4:]
+
+        task_domains.append(domain)
+
+    return task_domains
+
+
+def open_task_queue(
+    dataset: List[Dict[str, str]],
+    task_queue_path: str = DEFAULT_TASK_QUEUE_PATH,
+    seed: int = DEFAULT_SEED,
+    rank: int = DEFAULT_RANK,
+    world_size: int = DEFAULT_WORLD_SIZE,
+    skip_finished: bool = DEFAULT_SKIP_FINISHED,
+    lease_timeout: float = DEFAULT_LEASE_TIMEOUT,
+    speculation_quantile: float = DEFAULT_SPECULATION_QUANTILE,
+    max_leases_per_domain: int = DEFAULT_MAX_LEASES_PER_DOMAIN,
+    min_domain_interval: float = DEFAULT_MIN_DOMAIN_INTERVAL,
+) -> Tuple[TaskQueue, str | None]:
+    """Open the task queue shared by the agents on this machine, and add
+    the tasks for this rank, where a temporary queue is created when
+    no path is given.
+
+    Arguments:
+
+    dataset: List[Dict[str, str]]
+        Dataset of tasks, with keys "domain" and "task".
+
+    task_queue_path: str
+        Path to a SQLite file, or the URL of a coordinator shared by
+        every machine, or None to create a temporary queue.
+
+    seed: int
+        Seed for the dataset.
+
+    rank: int
+        Rank of the machine.
+
+    world_size: int
+        Number of data collection machines.
+
+    skip_finished: bool
+        Whether a persistent queue resumes where the previous run
+        stopped, instead of resetting every task to pending.
+
+    lease_timeout: float
+        Number of seconds before a leased task is returned to the queue.
+
+    speculation_quantile: float
+        Quantile of task durations after which a running task is
+        relaunched on an idle worker, or None to disable speculation.
+
+    max_leases_per_domain: int
+        Maximum number of tasks leased at once for the same website.
+
+    min_domain_interval: float
+        Minimum seconds between starting two tasks on the same website.
+
+    Returns:
+
+    Tuple[TaskQueue, str | None]
+        The task queue, and the temporary directory holding the queue,
+        which the caller removes after the queue is closed.
+
+    """
+
+    task_queue_dir = None
+
+    if task_queue_path is None:
+
+        task_queue_dir = tempfile.mkdtemp()
+
+        task_queue_path = os.path.join(
+            task_queue_dir,
+            "task_queue.db"
+        )
+
+    task_queue = get_task_queue(
+        task_queue_path = task_queue_path,
+        lease_timeout = lease_timeout,
+        speculation_quantile = speculation_quantile,
+        max_leases_per_domain = max_leases_per_domain,
+        min_domain_interval = min_domain_interval
+    )
+
+    # machines sharing a coordinator each add every task, and lease
+    # them on demand instead of pulling from a static shard
+    shared_queue = is_task_queue_url(task_queue_path)
+
+    # each machine pulls from its own shard, and with skip_finished
+    # a persistent queue resumes where the previous run stopped
+    dataset_ids = shard_dataset_ids(
+        len(dataset), seed = seed,
+        rank = 0 if shared_queue else rank,
+        world_size = 1 if shared_queue else world_size
+    )
+
+    task_queue.populate(
+        dataset_ids,
+        reset = not skip_finished,
+        domains = get_task_domains(
+            dataset, dataset_ids
+        )
+    )
+
+    return task_queue, task_queue_dir
+
+
+def get_lease_poll_interval(
+    task_queue: TaskQueue,
+    worker_id: str,
+) -> float | None:
+    """Choose how long an idle worker waits before leasing again, after
+    the task queue returned no task to lease.
+
+    Arguments:
+
+    task_queue: TaskQueue
+        Shared queue of tasks, where each task is leased to one worker.
+
+    worker_id: str
+        Unique identifier for the worker requesting tasks.
+
+    Returns:
+
+    float | None
+        Number of seconds to wait while pending tasks wait for the
+        per-website limits of the queue, or while a task running on another
+        worker may still be relaunched with speculation, otherwise None
+        when there are no tasks left to lease.
+
+    """
+
+    # pending tasks on throttled websites are leased once the
+    # politeness limits of the task queue allow
+    if task_queue.stats()["pending"] > 0:
+
+        return DEFAULT_POLITENESS_POLL_INTERVAL
+
+    if task_queue.can_speculate(worker_id):
+
+        return DEFAULT_SPECULATION_POLL_INTERVAL
+
+    return None
+
+
+def lease_dataset_ids(
+    task_queue: TaskQueue,
+    worker_id: str,
+    wait_for_stragglers: bool = False,
+    rollout_slots: RolloutSlots = None,
+) -> Generator[int | None, None, None]:
+    """Pull indices of examples from a shared task queue on demand,
+    until there are no tasks left to lease.
+
+    Arguments:
+
+    task_queue: TaskQueue
+        Shared queue of tasks, where each task is leased to one worker.
+
+    worker_id: str
+        Unique identifier for the worker requesting tasks.
+
+    wait_for_stragglers: bool
+        Whether an idle worker keeps polling while a task running on
+        another worker may still be relaunched with speculation, or while
+        pending tasks wait for the per-website limits of the queue, and
+        yields None before each wait, so the worker can finish its work.
+
+    rollout_slots: RolloutSlots
+        Shared slots set by the concurrency controller, where a worker
+        whose slot is paused yields None, and waits before leasing.
+
+    Returns:
+
+    Generator[int | None, None, None]
+        Generator for the indices of examples leased to this worker.
+
+    """
+
+    def no_pending_tasks() -> bool:
+
+        return task_queue.stats()["pending"] == 0
+
+    while True:
+
+        if rollout_slots is not None and \
+                not rollout_slots.is_active(worker_id):
+
+            yield None
+
+            slot_active = rollout_slots.wait_for_slot(
+                worker_id = worker_id,
+                stop_fn = no_pending_tasks
+            )
+
+            if not slot_active:
+
+                break
+
+        example_id = task_queue.lease(
+            worker_id = worker_id
+        )
+
+        if example_id is not None:
+
+            yield example_id
+
+            continue
+
+        poll_interval = None
+
+        if wait_for_stragglers:
+
+            poll_interval = get_lease_poll_interval(
+                task_queue = task_queue,
+                worker_id = worker_id
+            )
+
+        if poll_interval is None:
+
+            break
+
+        yield None
+
+        time.sleep(poll_interval)
+
+
+def iter_trajectories(
+    dataset: List[Dict[str, str]],
+    browser: InstaEnv | BrowserConfig,
+    agent: BrowserAgent | AgentConfig,
+    judge: BrowserJudge | JudgeConfig = None,
+    task_proposer: BrowserTaskProposer | TaskProposerConfig = None,
+    seed: int = DEFAULT_SEED,
+    rank: int = DEFAULT_RANK,
+    world_size: int = DEFAULT_WORLD_SIZE,
+    task_queue: TaskQueue = None,
+    worker_id: str = None,
+    judge_queue: Queue = None,
+    rollout_slots: RolloutSlots = None,
+    observations_dir: str = DEFAULT_OBSERVATIONS_DIR,
+    screenshot_dir: str = DEFAULT_SCREENSHOT_DIR,
+    actions_dir: str = DEFAULT_ACTIONS_DIR,
+    judgments_dir: str = DEFAULT_JUDGMENTS_DIR,
+    task_proposals_dir: str = DEFAULT_TASK_PROPOSALS_DIR,
+    max_actions: int = DEFAULT_MAX_ACTIONS,
+    agent_response_key: str = DEFAULT_AGENT_RESPONSE_KEY,
+    judge_response_key: str = DEFAULT_JUDGE_RESPONSE_KEY,
+    skip_finished: bool = DEFAULT_SKIP_FINISHED,
+    prune_observations: bool = DEFAULT_PRUNE_OBSERVATIONS,
+    storage_format: str = DEFAULT_STORAGE_FORMAT,
+    num_writer_threads: int = DEFAULT_NUM_WRITER_THREADS,
+    task_timeout: float = DEFAULT_TASK_TIMEOUT,
+    step_timeout: float = DEFAULT_STEP_TIMEOUT,
+    num_samples: int = DEFAULT_NUM_SAMPLES,
+    success_threshold: float = DEFAULT_SUCCESS_THRESHOLD,
+    consistency_threshold: float = DEFAULT_CONSISTENCY_THRESHOLD,
+    step_spool_dir: str = DEFAULT_STEP_SPOOL_DIR,
+    return_handles: bool = DEFAULT_RETURN_HANDLES,
+    add_steps_to_agent: bool = DEFAULT_ADD_STEPS_TO_AGENT,
+    add_criteria_to_agent: bool = DEFAULT_ADD_CRITERIA_TO_AGENT,
+    add_steps_to_judge: bool = DEFAULT_ADD_STEPS_TO_JUDGE,
+    add_criteria_to_judge: bool = DEFAULT_ADD_CRITERIA_TO_JUDGE,
+    add_steps_to_task_proposer: bool = DEFAULT_ADD_STEPS_TO_TASK_PROPOSER,
+    add_criteria_to_task_proposer: bool = DEFAULT_ADD_CRITERIA_TO_TASK_PROPOSER,
+) -> Generator[InstaPipelineOutput, None, None]:
+    """Run the InSTA pipeline for internet-scale data collection, and yield
+    the observations, actions, and judgments for each task.
+
+    Arguments:
+
+    dataset: List[Dict[str, str]]
+        Override the default dataset, and run the pipeline on custom tasks,
+        each entry must be a dictionary with keys "domain" and "task".
+
+    agent: BrowserAgent | AgentConfig
+        The LLM agent to use for the task.
+
+    judge: BrowserJudge | JudgeConfig
+        The LLM judge to evaluate the trajectory.
+
+    browser: InstaEnv | BrowserConfig
+        The web navigation environment running Playwright.
+
+    rank: int
+        Rank of the process.
+
+    world_size: int
+        Number of data collection processes.
+
+    task_queue: TaskQueue
+        Shared queue to pull tasks from on demand, replacing
+        the static shard selected by rank and world_size.
+
+    worker_id: str
+        Unique identifier for this worker in the task queue.
+
+    judge_queue: Queue
+        Bounded queue for handing finished trajectories to separate
+        judge workers, so the browser starts the next task immediately.
+
+    rollout_slots: RolloutSlots
+        Shared slots set by the concurrency controller, which pause this
+        worker between tasks, and receive the latency of each stage.
+
+    seed: int
+        Seed for the dataset.
+
+    observations_dir: str
+        Directory to save observations.
+
+    screenshot_dir: str
+        Directory to save screenshots.
+
+    actions_dir: str
+        Directory to save actions.
+
+    judgments_dir: str
+        Directory to save judgments.
+
+    max_actions: int
+        Maximum number of actions per task.
+
+    skip_finished: bool
+        Whether to skip tasks that are already attempted.
+
+    prune_observations: bool
+        Whether to prune observations before saving.
+
+    storage_format: str
+        Either "json" for one file per trajectory, "jsonl" for
+        line-delimited shards, or "jsonl.zst" for compressed shards.
+
+    num_writer_threads: int
+        Number of threads that save trajectories in the background,
+        or 0 to save each trajectory before starting the next task.
+
+    task_timeout: float
+        Number of seconds for each task, after which the trajectory
+        is abandoned and saved as a failed attempt.
+
+    step_timeout: float
+        Number of seconds for each browser call and each LLM query.
+
+    num_samples: int
+        Maximum number of samples drawn for each task, where each sample
+        is judged as it finishes, and the best sample is saved.
+
+    success_threshold: float
+        A sample with a judged success above this value is saved, and
+        no more samples are drawn for the task.
+
+    consistency_threshold: float
+        Fraction of the samples that must fail before the remaining
+        samples of a task are cancelled, or None to keep sampling.
+
+    step_spool_dir: str
+        Directory where the screenshot, raw HTML, and metadata of each
+        step are written as the step finishes, so memory does not grow
+        with the length of a trajectory, or None to keep them in memory.
+
+    return_handles: bool
+        Whether to yield a TrajectoryHandle for each saved trajectory
+        instead of its content, for sending results between processes.
+
+    Returns:
+
+    Generator[InstaPipelineOutput, None, None]
+        Generator for the observations, actions, and judgments for each task, 
+        which are saved to disk for later processing.
+    
+    """
+
+    skip_judge = judge is None
+    skip_task_proposer = task_proposer is None
+
+    if num_samples > 1 and skip_judge:
+
+        raise ValueError(
+            "Best-of-N rollouts require a judge to rank the samples"
+        )
+
+    # best-of-N judges each sample before drawing the next one
+    if num_samples > 1:
+
+        judge_queue = None
+
+    # judging is deferred to separate workers
+    if judge_queue is not None:
+
+        judge = None
+        task_proposer = None
+
+    if isinstance(browser, BrowserConfig):
+
+        browser = InstaEnv(
+            config = browser
+        )
+
+    if isinstance(agent, AgentConfig):
+
+        agent = BrowserAgent(
+            config = agent
+        )
+
+    if not skip_judge and isinstance(judge, JudgeConfig):
+
+        judge = BrowserJudge(
+            config = judge
+        )
+
+    if not skip_task_proposer and isinstance(task_proposer, TaskProposerConfig):
+
+        task_proposer = BrowserTaskProposer(
+            config = task_proposer
+        )
+
+    if observations_dir is not None:
+
+        os.makedirs(
+            observations_dir, 
+            exist_ok = True
+        )
+
+    if screenshot_dir is not None:
+
+        os.makedirs(
+            screenshot_dir, 
+            exist_ok = True
+        )
+
+    if actions_dir is not None:
+
+        os.makedirs(
+            actions_dir, 
+            exist_ok = True
+        )
+
+    if judgments_dir is not None:
+
+        os.makedirs(
+            judgments_dir, 
+            exist_ok = True
+        )
+
+    if task_proposals_dir is not None:
+
+        os.makedirs(
+            task_proposals_dir, 
+            exist_ok = True
+        )
+
+    trajectory_stores = get_trajectory_stores(
+        observations_dir = observations_dir,
+        actions_dir = actions_dir,
+        storage_format = storage_format,
+    )
+
+    completion_indices = get_completion_indices(
+        observations_dir = observations_dir,
+        actions_dir = actions_dir,
+        judgments_dir = judgments_dir,
+        task_proposals_dir = task_proposals_dir,
+    )
+
+    if task_queue is None:
+
+        dataset_ids = shard_dataset_ids(
+            len(dataset), seed = seed,
+            rank = rank, world_size = world_size
+        )
+
+    else:
+
+        dataset_ids = lease_dataset_ids(
+            task_queue = task_queue,
+            worker_id = worker_id,
+            wait_for_stragglers = True,
+            rollout_slots = rollout_slots
+        )
+
+    progress_bar = tqdm.tqdm(
+        dataset_ids, desc = "Processing",
+        dynamic_ncols = True
+    )
+
+    background_writer = BackgroundWriter(
+        num_threads = num_writer_threads,
+        max_pending = DEFAULT_MAX_PENDING_WRITES
+    )
+
+    pending_saves = deque()
+
+    step_spool = None
+
+    if step_spool_dir is not None:
+
+        step_spool = StepSpool(
+            spool_dir = step_spool_dir
+        )
+
+    def finish_save(
+        example_id: int,
+        task: Dict[str, str],
+        has_observations: bool,
+        save_future: Future,
+    ) -> InstaPipelineOutput | None:
+
+        # failed writes are reported by the writer, and the task is
+        # returned to the queue, so the task is attempted again
+        if save_future.exception() is not None:
+
+            if task_queue is not None:
+
+                task_queue.release(
+                    example_id = example_id,
+                    worker_id = worker_id
+                )
+
+            return None
+
+        output = save_future.result()
+
+        needs_judging = (
+            judge_queue is not None
+            and has_observations
+            and not (skip_judge and skip_task_proposer)
+        )
+
+        # blocks while the queue is full, so judging applies backpressure
+        if needs_judging:
+
+            judge_queue.put(JudgeRequest(
+                identifier = task["identifier"],
+                url = task["url"],
+                judge_instruction = task["judge_instruction"],
+                task_proposer_instruction = task["task_proposer_instruction"],
+                output = output
+            ))
+
+        return output
+
+    for example_id in progress_bar:
+
+        # finish every save while idle, so other workers see the tasks
+        # as completed instead of waiting to relaunch or lease them
+        if example_id is None:
+
+            while len(pending_saves) > 0:
+
+                output = finish_save(*pending_saves.popleft())
+
+                if output is not None:
+
+                    yield output
+
+            continue
+
+        task = prepare_task(
+            dataset[example_id],
+            add_steps_to_agent = add_steps_to_agent,
+            add_criteria_to_agent = add_criteria_to_agent,
+            add_steps_to_judge = add_steps_to_judge,
+            add_criteria_to_judge = add_criteria_to_judge,
+            add_steps_to_task_proposer = add_steps_to_task_proposer,
+            add_criteria_to_task_proposer = add_criteria_to_task_proposer,
+        )
+
+        identifier = task["identifier"]
+
+        progress_bar.set_description(
+            "Processing: {}".format(
+                identifier
+            )
+        )
+
+        skip_this_task = skip_finished and trajectory_exists(
+            identifier = identifier,
+            observations_dir = observations_dir,
+            actions_dir = actions_dir,
+            judgments_dir = judgments_dir,
+            task_proposals_dir = task_proposals_dir,
+            skip_judge = skip_judge,
+            skip_task_proposer = skip_task_proposer,
+            completion_indices = completion_indices,
+        )
+
+        if skip_this_task:
+
+            if task_queue is not None:
+
+                task_queue.complete(
+                    example_id = example_id,
+                    worker_id = worker_id,
+                    skipped = True
+                )
+
+            continue
+        
+        # stop early when another copy of this task has already finished
+        cancel_fn = None
+
+        if task_queue is not None:
+
+            cancel_fn = partial(
+                task_queue.is_complete,
+                example_id
+            )
+
+        sampler = BestOfNSampler(
+            num_samples = num_samples,
+            success_threshold = success_threshold,
+            consistency_threshold = consistency_threshold
+        )
+
+        start_time = time.time()
+
+        with span("trajectory"):
+
+            # samples are drawn until one succeeds, so easy tasks
+            # cost a single rollout
+            while not sampler.is_finished():
+
+                sampler.add(safe_call(
+                    generate_trajectory, browser = browser, agent = agent,
+                    judge = judge, task_proposer = task_proposer,
+                    url = task["url"],
+                    agent_instruction = task["agent_instruction"],
+                    judge_instruction = task["judge_instruction"],
+                    task_proposer_instruction = task["task_proposer_instruction"],
+                    instruction = task["instruction"],
+                    max_actions = max_actions,
+                    agent_response_key = agent_response_key,
+                    judge_response_key = judge_response_key,
+                    task_timeout = task_timeout,
+                    step_timeout = step_timeout,
+                    cancel_fn = cancel_fn,
+                    latency_fn = (
+                        rollout_slots.report
+                        if rollout_slots is not None else None
+                    ),
+                    step_spool = step_spool,
+                    catch_errors = True,
+                    log_errors = True,
+                    max_errors = 1,
+                ))
+
+                if cancel_fn is not None and cancel_fn():
+
+                    break
+
+        trajectory = sampler.get_best()
+
+        if rollout_slots is not None:
+
+            rollout_slots.report(
+                "trajectory",
+                time.time() - start_time
+            )
+
+        if task_queue is not None:
+
+            # a failed copy leaves the task to the copy that is still running
+            if trajectory is BrowserStatus.ERROR and \
+                    task_queue.is_speculated(example_id):
+
+                task_queue.release(
+                    example_id = example_id,
+                    worker_id = worker_id
+                )
+
+                continue
+
+            # the first copy of a task to finish is the one that is saved,
+            # so the task is completed before its trajectory is written
+            finished_first = task_queue.complete(
+                example_id = example_id,
+                worker_id = worker_id
+            )
+
+            if not finished_first:
+
+                if trajectory is not BrowserStatus.ERROR:
+
+                    remove_spooled_steps(trajectory[0])
+
+                continue
+
+        observations, actions, judgment, task_proposal = [], [], {}, {}
+
+        if trajectory is not BrowserStatus.ERROR:
+
+            observations, actions, judgment, task_proposal = trajectory
+
+        # the writer takes ownership of the trajectory, and encodes
+        # screenshots and files while the next task is running
+        pending_saves.append((example_id, task, len(observations) > 0,
+            background_writer.submit(
+                save_trajectory,
+                identifier = identifier,
+                observations = observations,
+                actions = actions,
+                judgment = judgment,
+                task_proposal = task_proposal,
+                observations_dir = observations_dir,
+                screenshot_dir = screenshot_dir,
+                actions_dir = actions_dir,
+                judgments_dir = judgments_dir,
+                task_proposals_dir = task_proposals_dir,
+                prune_observations = prune_observations,
+                completion_indices = completion_indices,
+                trajectory_stores = trajectory_stores,
+                return_handle = return_handles,
+            )
+        ))
+
+        while len(pending_saves) > 0 and pending_saves[0][-1].done():
+
+            output = finish_save(*pending_saves.popleft())
+
+            if output is not None:
+
+                yield output
+
+    while len(pending_saves) > 0:
+
+        output = finish_save(*pending_saves.popleft())
+
+        if output is not None:
+
+            yield output
+
+    background_writer.close()
+
+    if step_spool is not None:
+
+        step_spool.close()
+
+
+def list_trajectories(
+    dataset: List[Dict[str, str]],
+    browser: InstaEnv | BrowserConfig,
+    agent: BrowserAgent | AgentConfig,
+    judge: BrowserJudge | JudgeConfig = None,
+    task_proposer: BrowserTaskProposer | TaskProposerConfig = None,
+    seed: int = DEFAULT_SEED,
+    rank: int = DEFAULT_RANK,
+    world_size: int = DEFAULT_WORLD_SIZE,
+    task_queue: TaskQueue = None,
+    worker_id: str = None,
+    judge_queue: Queue = None,
+    rollout_slots: RolloutSlots = None,
+    observations_dir: str = DEFAULT_OBSERVATIONS_DIR,
+    screenshot_dir: str = DEFAULT_SCREENSHOT_DIR,
+    actions_dir: str = DEFAULT_ACTIONS_DIR,
+    judgments_dir: str = DEFAULT_JUDGMENTS_DIR,
+    task_proposals_dir: str = DEFAULT_TASK_PROPOSALS_DIR,
+    max_actions: int = DEFAULT_MAX_ACTIONS,
+    agent_response_key: str = DEFAULT_AGENT_RESPONSE_KEY,
+    judge_response_key: str = DEFAULT_JUDGE_RESPONSE_KEY,
+    skip_finished: bool = DEFAULT_SKIP_FINISHED,
+    prune_observations: bool = DEFAULT_PRUNE_OBSERVATIONS,
+    storage_format: str = DEFAULT_STORAGE_FORMAT,
+    num_writer_threads: int = DEFAULT_NUM_WRITER_THREADS,
+    task_timeout: float = DEFAULT_TASK_TIMEOUT,
+    step_timeout: float = DEFAULT_STEP_TIMEOUT,
+    num_samples: int = DEFAULT_NUM_SAMPLES,
+    success_threshold: float = DEFAULT_SUCCESS_THRESHOLD,
+    consistency_threshold: float = DEFAULT_CONSISTENCY_THRESHOLD,
+    step_spool_dir: str = DEFAULT_STEP_SPOOL_DIR,
+    add_steps_to_agent: bool = DEFAULT_ADD_STEPS_TO_AGENT,
+    add_criteria_to_agent: bool = DEFAULT_ADD_CRITERIA_TO_AGENT,
+    add_steps_to_judge: bool = DEFAULT_ADD_STEPS_TO_JUDGE,
+    add_criteria_to_judge: bool = DEFAULT_ADD_CRITERIA_TO_JUDGE,
+    add_steps_to_task_proposer: bool = DEFAULT_ADD_STEPS_TO_TASK_PROPOSER,
+    add_criteria_to_task_proposer: bool = DEFAULT_ADD_CRITERIA_TO_TASK_PROPOSER,
+) -> List[InstaPipelineOutput]:
+    """Run the InSTA pipeline for internet-scale data collection, and list
+    the observations, actions, and judgments for each task.
+
+    Arguments:
+
+    dataset: List[Dict[str, str]]
+        Override the default dataset, and run the pipeline on custom tasks,
+        each entry must be a dictionary with keys "domain" and "task".
+
+    agent: BrowserAgent | AgentConfig
+        The LLM agent to use for the task.
+
+    judge: BrowserJudge | JudgeConfig
+        The LLM judge to evaluate the trajectory.
+
+    browser: InstaEnv | BrowserConfig
+        The web navigation environment running Playwright.
+
+    rank: int
+        Rank of the process.
+
+    world_size: int
+        Number of data collection processes.
+
+    task_queue: TaskQueue
+        Shared queue to pull tasks from on demand, replacing
+        the static shard selected by rank and world_size.
+
+    worker_id: str
+        Unique identifier for this worker in the task queue.
+
+    judge_queue: Queue
+        Bounded queue for handing finished trajectories to separate
+        judge workers, so the browser starts the next task immediately.
+
+    rollout_slots: RolloutSlots
+        Shared slots set by the concurrency controller, which pause this
+        worker between tasks, and receive the latency of each stage.
+
+    seed: int
+        Seed for the dataset.
+
+    observations_dir: str
+        Directory to save observations.
+
+    screenshot_dir: str
+        Directory to save screenshots.
+
+    actions_dir: str
+        Directory to save actions.
+
+    judgments_dir: str
+        Directory to save judgments.
+
+    max_actions: int
+        Maximum number of actions per task.
+
+    skip_finished: bool
+        Whether to skip tasks that are already attempted.
+
+    prune_observations: bool
+        Whether to prune observations before saving.
+
+    storage_format: str
+        Either "json" for one file per trajectory, "jsonl" for
+        line-delimited shards, or "jsonl.zst" for compressed shards.
+
+    num_writer_threads: int
+        Number of threads that save trajectories in the background,
+        or 0 to save each trajectory before starting the next task.
+
+    task_timeout: float
+        Number of seconds for each task, after which the trajectory
+        is abandoned and saved as a failed attempt.
+
+    step_timeout: float
+        Number of seconds for each browser call and each LLM query.
+
+    num_samples: int
+        Maximum number of samples drawn for each task, where each sample
+        is judged as it finishes, and the best sample is saved.
+
+    success_threshold: float
+        A sample with a judged success above this value is saved, and
+        no more samples are drawn for the task.
+
+    consistency_threshold: float
+        Fraction of the samples that must fail before the remaining
+        samples of a task are cancelled, or None to keep sampling.
+
+    step_spool_dir: str
+        Directory where the screenshot, raw HTML, and metadata of each
+        step are written as the step finishes, so memory does not grow
+        with the length of a trajectory, or None to keep them in memory.
+
+    Returns:
+
+    List[InstaPipelineOutput]
+        List with observations, actions, and judgments for each task, 
+        which are saved to disk for later processing.
+    
+    """
+
+    return list(iter_trajectories(
+        dataset = dataset, browser = browser,
+        agent = agent, judge = judge,
+        task_proposer = task_proposer,
+        seed = seed, rank = rank, world_size = world_size,
+        task_queue = task_queue, worker_id = worker_id,
+        judge_queue = judge_queue,
+        rollout_slots = rollout_slots,
+        observations_dir = observations_dir,
+        screenshot_dir = screenshot_dir,
+        actions_dir = actions_dir,
+        judgments_dir = judgments_dir,
+        task_proposals_dir = task_proposals_dir,
+        max_actions = max_actions,
+        agent_response_key = agent_response_key,
+        judge_response_key = judge_response_key,
+        skip_finished = skip_finished,
+        prune_observations = prune_observations,
+        storage_format = storage_format,
+        num_writer_threads = num_writer_threads,
+        task_timeout = task_timeout,
+        step_timeout = step_timeout,
+        num_samples = num_samples,
+        success_threshold = success_threshold,
+        consistency_threshold = consistency_threshold,
+        step_spool_dir = step_spool_dir,
+        add_steps_to_agent = add_steps_to_agent,
+        add_criteria_to_agent = add_criteria_to_agent,
+        add_steps_to_judge = add_steps_to_judge,
+        add_criteria_to_judge = add_criteria_to_judge,
+        add_steps_to_task_proposer = add_steps_to_task_proposer,
+        add_criteria_to_task_proposer = add_criteria_to_task_proposer,
+    ))
+
+
+def save_trajectories(
+    dataset: List[Dict[str, str]],
+    browser: InstaEnv | BrowserConfig,
+    agent: BrowserAgent | AgentConfig,
+    judge: BrowserJudge | JudgeConfig = None,
+    task_proposer: BrowserTaskProposer | TaskProposerConfig = None,
+    seed: int = DEFAULT_SEED,
+    rank: int = DEFAULT_RANK,
+    world_size: int = DEFAULT_WORLD_SIZE,
+    task_queue: TaskQueue = None,
+    worker_id: str = None,
+    judge_queue: Queue = None,
+    rollout_slots: RolloutSlots = None,
+    observations_dir: str = DEFAULT_OBSERVATIONS_DIR,
+    screenshot_dir: str = DEFAULT_SCREENSHOT_DIR,
+    actions_dir: str = DEFAULT_ACTIONS_DIR,
+    judgments_dir: str = DEFAULT_JUDGMENTS_DIR,
+    task_proposals_dir: str = DEFAULT_TASK_PROPOSALS_DIR,
+    max_actions: int = DEFAULT_MAX_ACTIONS,
+    agent_response_key: str = DEFAULT_AGENT_RESPONSE_KEY,
+    judge_response_key: str = DEFAULT_JUDGE_RESPONSE_KEY,
+    skip_finished: bool = DEFAULT_SKIP_FINISHED,
+    prune_observations: bool = DEFAULT_PRUNE_OBSERVATIONS,
+    storage_format: str = DEFAULT_STORAGE_FORMAT,
+    num_writer_threads: int = DEFAULT_NUM_WRITER_THREADS,
+    task_timeout: float = DEFAULT_TASK_TIMEOUT,
+    step_timeout: float = DEFAULT_STEP_TIMEOUT,
+    num_samples: int = DEFAULT_NUM_SAMPLES,
+    success_threshold: float = DEFAULT_SUCCESS_THRESHOLD,
+    consistency_threshold: float = DEFAULT_CONSISTENCY_THRESHOLD,
+    step_spool_dir: str = DEFAULT_STEP_SPOOL_DIR,
+    return_handles: bool = DEFAULT_RETURN_HANDLES,
+    add_steps_to_agent: bool = DEFAULT_ADD_STEPS_TO_AGENT,
+    add_criteria_to_agent: bool = DEFAULT_ADD_CRITERIA_TO_AGENT,
+    add_steps_to_judge: bool = DEFAULT_ADD_STEPS_TO_JUDGE,
+    add_criteria_to_judge: bool = DEFAULT_ADD_CRITERIA_TO_JUDGE,
+    add_steps_to_task_proposer: bool = DEFAULT_ADD_STEPS_TO_TASK_PROPOSER,
+    add_criteria_to_task_proposer: bool = DEFAULT_ADD_CRITERIA_TO_TASK_PROPOSER,
+) -> None:
+    """Run the InSTA pipeline for internet-scale data collection, and save
+    the observations, actions, and judgments for each task.
+
+    Arguments:
+
+    dataset: List[Dict[str, str]]
+        Override the default dataset, and run the pipeline on custom tasks,
+        each entry must be a dictionary with keys "domain" and "task".
+
+    agent: BrowserAgent | AgentConfig
+        The LLM agent to use for the task.
+
+    judge: BrowserJudge | JudgeConfig
+        The LLM judge to evaluate the trajectory.
+
+    browser: InstaEnv | BrowserConfig
+        The web navigation environment running Playwright.
+
+    rank: int
+        Rank of the process.
+
+    world_size: int
+        Number of data collection processes.
+
+    task_queue: TaskQueue
+        Shared queue to pull tasks from on demand, replacing
+        the static shard selected by rank and world_size.
+
+    worker_id: str
+        Unique identifier for this worker in the task queue.
+
+    judge_queue: Queue
+        Bounded queue for handing finished trajectories to separate
+        judge workers, so the browser starts the next task immediately.
+
+    rollout_slots: RolloutSlots
+        Shared slots set by the concurrency controller, which pause this
+        worker between tasks, and receive the latency of each stage.
+
+    seed: int
+        Seed for the dataset.
+
+    observations_dir: str
+        Directory to save observations.
+
+    screenshot_dir: str
+        Directory to save screenshots.
+
+    actions_dir: str
+        Directory to save actions.
+
+    judgments_dir: str
+        Directory to save judgments.
+
+    max_actions: int
+        Maximum number of actions per task.
+
+    skip_finished: bool
+        Whether to skip tasks that are already attempted.
+
+    prune_observations: bool
+        Whether to prune observations before saving.
+
+    storage_format: str
+        Either "json" for one file per trajectory, "jsonl" for
+        line-delimited shards, or "jsonl.zst" for compressed shards.
+
+    num_writer_threads: int
+        Number of threads that save trajectories in the background,
+        or 0 to save each trajectory before starting the next task.
+
+    task_timeout: float
+        Number of seconds for each task, after which the trajectory
+        is abandoned and saved as a failed attempt.
+
+    step_timeout: float
+        Number of seconds for each browser call and each LLM query.
+
+    num_samples: int
+        Maximum number of samples drawn for each task, where each sample
+        is judged as it finishes, and the best sample is saved.
+
+    success_threshold: float
+        A sample with a judged success above this value is saved, and
+        no more samples are drawn for the task.
+
+    consistency_threshold: float
+        Fraction of the samples that must fail before the remaining
+        samples of a task are cancelled, or None to keep sampling.
+
+    step_spool_dir: str
+        Directory where the screenshot, raw HTML, and metadata of each
+        step are written as the step finishes, so memory does not grow
+        with the length of a trajectory, or None to keep them in memory.
+
+    return_handles: bool
+        Whether to yield a TrajectoryHandle for each saved trajectory
+        instead of its content, for sending results between processes.
+    
+    """
+
+    for x in iter_trajectories(
+        dataset = dataset, browser = browser,
+        agent = agent, judge = judge,
+        task_proposer = task_proposer,
+        seed = seed, rank = rank, world_size = world_size,
+        task_queue = task_queue, worker_id = worker_id,
+        judge_queue = judge_queue,
+        rollout_slots = rollout_slots,
+        observations_dir = observations_dir,
+        screenshot_dir = screenshot_dir,
+        actions_dir = actions_dir,
+        judgments_dir = judgments_dir,
+        task_proposals_dir = task_proposals_dir,
+        max_actions = max_actions,
+        agent_response_key = agent_response_key,
+        judge_response_key = judge_response_key,
+        skip_finished = skip_finished,
+        prune_observations = prune_observations,
+        storage_format = storage_format,
+        num_writer_threads = num_writer_threads,
+        task_timeout = task_timeout,
+        step_timeout = step_timeout,
+        num_samples = num_samples,
+        success_threshold = success_threshold,
+        consistency_threshold = consistency_threshold,
+        step_spool_dir = step_spool_dir,
+        return_handles = return_handles,
+        add_steps_to_agent = add_steps_to_agent,
+        add_criteria_to_agent = add_criteria_to_agent,
+        add_steps_to_judge = add_steps_to_judge,
+        add_criteria_to_judge = add_criteria_to_judge,
+        add_steps_to_task_proposer = add_steps_to_task_proposer,
+        add_criteria_to_task_proposer = add_criteria_to_task_proposer,
+    ):
+        
+        pass
+
+
+DONE_SIGNAL: str = "DONE_SIGNAL"
+JUDGED_SIGNAL: str = "JUDGED_SIGNAL"
+
+
+def multiprocessing_wrapper(
+    data_collection_fn: Callable,
+    dataset: List[Dict[str, str]],
+    agent_config: AgentConfig = DEFAULT_AGENT_CONFIG,
+    judge_config: JudgeConfig = DEFAULT_JUDGE_CONFIG,
+    task_proposer_config: TaskProposerConfig = DEFAULT_TASK_PROPOSER_CONFIG,
+    seed: int = DEFAULT_SEED,
+    task_queue: TaskQueue = None,
+    judge_queue: Queue = None,
+    rollout_slots: RolloutSlots = None,
+    observations_dir: str = DEFAULT_OBSERVATIONS_DIR,
+    screenshot_dir: str = DEFAULT_SCREENSHOT_DIR,
+    actions_dir: str = DEFAULT_ACTIONS_DIR,
+    judgments_dir: str = DEFAULT_JUDGMENTS_DIR,
+    task_proposals_dir: str = DEFAULT_TASK_PROPOSALS_DIR,
+    max_actions: int = DEFAULT_MAX_ACTIONS,
+    agent_response_key: str = DEFAULT_AGENT_RESPONSE_KEY,
+    judge_response_key: str = DEFAULT_JUDGE_RESPONSE_KEY,
+    skip_finished: bool = DEFAULT_SKIP_FINISHED,
+    prune_observations: bool = DEFAULT_PRUNE_OBSERVATIONS,
+    storage_format: str = DEFAULT_STORAGE_FORMAT,
+    num_writer_threads: int = DEFAULT_NUM_WRITER_THREADS,
+    task_timeout: float = DEFAULT_TASK_TIMEOUT,
+    step_timeout: float = DEFAULT_STEP_TIMEOUT,
+    num_samples: int = DEFAULT_NUM_SAMPLES,
+    success_threshold: float = DEFAULT_SUCCESS_THRESHOLD,
+    consistency_threshold: float = DEFAULT_CONSISTENCY_THRESHOLD,
+    step_spool_dir: str = DEFAULT_STEP_SPOOL_DIR,
+    profile_dir: str = DEFAULT_PROFILE_DIR,
+    add_steps_to_agent: bool = DEFAULT_ADD_STEPS_TO_AGENT,
+    add_criteria_to_agent: bool = DEFAULT_ADD_CRITERIA_TO_AGENT,
+    add_steps_to_judge: bool = DEFAULT_ADD_STEPS_TO_JUDGE,
+    add_criteria_to_judge: bool = DEFAULT_ADD_CRITERIA_TO_JUDGE,
+    add_steps_to_task_proposer: bool = DEFAULT_ADD_STEPS_TO_TASK_PROPOSER,
+    add_criteria_to_task_proposer: bool = DEFAULT_ADD_CRITERIA_TO_TASK_PROPOSER,
+):
+
+    def worker_fn(
+        output_connection: Connection,
+        browser_config: BrowserConfig,
+        rank: int,
+        world_size: int,
+        inference_client: InferenceClient = None,
+    ):
+        
+        os.environ['VLLM_WORKER_MULTIPROC_METHOD'] = 'spawn'
+
+        if profile_dir is not None:
+
+            enable_profiling(
+                worker_id = str(rank),
+                profile_dir = profile_dir
+            )
+
+        if torch.cuda.device_count() > 0:
+
+            os.environ["CUDA_VISIBLE_DEVICES"] = "{}".format(
+                rank % torch.cuda.device_count()
+            )
+
+        agent = agent_config
+
+        if inference_client is not None:
+
+            agent = BrowserAgent(
+                config = agent_config,
+                inference_client = inference_client
+            )
+
+        outputs = data_collection_fn(
+            dataset = dataset, browser = browser_config,
+            agent = agent,
+            judge = judge_config,
+            task_proposer = task_proposer_config,
+            seed = seed, rank = rank, world_size = world_size,
+            task_queue = task_queue, worker_id = str(rank),
+            judge_queue = judge_queue,
+            rollout_slots = rollout_slots,
+            observations_dir = observations_dir,
+            screenshot_dir = screenshot_dir,
+            actions_dir = actions_dir,
+            judgments_dir = judgments_dir,
+            task_proposals_dir = task_proposals_dir,
+            max_actions = max_actions,
+            agent_response_key = agent_response_key,
+            judge_response_key = judge_response_key,
+            skip_finished = skip_finished,
+            prune_observations = prune_observations,
+            storage_format = storage_format,
+            num_writer_threads = num_writer_threads,
+            task_timeout = task_timeout,
+            step_timeout = step_timeout,
+            num_samples = num_samples,
+            success_threshold = success_threshold,
+            consistency_threshold = consistency_threshold,
+            step_spool_dir = step_spool_dir,
+            return_handles = True,
+            add_steps_to_agent = add_steps_to_agent,
+            add_criteria_to_agent = add_criteria_to_agent,
+            add_steps_to_judge = add_steps_to_judge,
+            add_criteria_to_judge = add_criteria_to_judge,
+            add_steps_to_task_proposer = add_steps_to_task_proposer,
+            add_criteria_to_task_proposer = add_criteria_to_task_proposer,
+        )
+        
+        if outputs is not None:
+
+            for output in outputs:
+
+                output_connection.send(output)
+
+        disable_profiling()
+
+        output_connection.send(DONE_SIGNAL)
+        output_connection.close()
+
+    return worker_fn
+
+
+def judge_worker_fn(
+    judge_queue: Queue,
+    output_connection: Connection,
+    judge_config: JudgeConfig = DEFAULT_JUDGE_CONFIG,
+    task_proposer_config: TaskProposerConfig = DEFAULT_TASK_PROPOSER_CONFIG,
+    judgments_dir: str = DEFAULT_JUDGMENTS_DIR,
+    task_proposals_dir: str = DEFAULT_TASK_PROPOSALS_DIR,
+    agent_response_key: str = DEFAULT_AGENT_RESPONSE_KEY,
+    judge_response_key: str = DEFAULT_JUDGE_RESPONSE_KEY,
+    return_trajectories: bool = DEFAULT_RETURN_TRAJECTORIES,
+    worker_id: str = None,
+    profile_dir: str = DEFAULT_PROFILE_DIR,
+) -> None:
+    """Judge finished trajectories from a queue shared with the agents,
+    propose new tasks, and save the results as soon as each trajectory
+    is evaluated, in whatever order the trajectories finish.
+
+    Arguments:
+
+    judge_queue: Queue
+        Bounded queue of finished trajectories sent by the agents.
+
+    output_connection: Connection
+        Pipe for sending evaluated trajectories to the parent.
+
+    judge_config: JudgeConfig
+        Configuration for the LLM judge.
+
+    task_proposer_config: TaskProposerConfig
+        Configuration for the LLM task proposer.
+
+    judgments_dir: str
+        Directory to save judgments.
+
+    task_proposals_dir: str
+        Directory to save task proposals.
+
+    return_trajectories: bool
+        Whether to send evaluated trajectories to the parent.
+
+    worker_id: str
+        Unique identifier for this judge worker.
+
+    profile_dir: str
+        Directory where the duration of each stage is saved, or None
+        to disable profiling.
+
+    """
+
+    if profile_dir is not None:
+
+        enable_profiling(
+            worker_id = worker_id,
+            profile_dir = profile_dir
+        )
+
+    judge = None
+
+    if judge_config is not None:
+
+        judge = BrowserJudge(
+            config = judge_config
+        )
+
+    task_proposer = None
+
+    if task_proposer_config is not None:
+
+        task_proposer = BrowserTaskProposer(
+            config = task_proposer_config
+        )
+
+    for data_dir in [judgments_dir, task_proposals_dir]:
+
+        if data_dir is not None:
+
+            os.makedirs(
+                data_dir,
+                exist_ok = True
+            )
+
+    completion_indices = get_completion_indices(
+        judgments_dir = judgments_dir,
+        task_proposals_dir = task_proposals_dir,
+    )
+
+    while True:
+
+        request = judge_queue.get()
+
+        if request == DONE_SIGNAL:
+
+            break
+
+        # the parent re-queues this request if the worker exits before
+        # the judgment is saved
+        output_connection.send(request)
+
+        output = load_trajectory(request.output)
+
+        evaluation = safe_call(
+            evaluate_trajectory,
+            judge = judge,
+            task_proposer = task_proposer,
+            observations = output.observations,
+            actions = output.actions,
+            url = request.url,
+            judge_instruction = request.judge_instruction,
+            task_proposer_instruction = request.task_proposer_instruction,
+            agent_response_key = agent_response_key,
+            judge_response_key = judge_response_key,
+            catch_errors = True,
+            log_errors = True,
+            max_errors = 1,
+        )
+
+        judgment, task_proposal = {}, {}
+
+        if evaluation is not BrowserStatus.ERROR:
+
+            judgment, task_proposal = evaluation
+
+        save_trajectory(
+            identifier = request.identifier,
+            observations = [],
+            actions = [],
+            judgment = judgment,
+            task_proposal = task_proposal,
+            observations_dir = None,
+            screenshot_dir = None,
+            actions_dir = None,
+            judgments_dir = judgments_dir,
+            task_proposals_dir = task_proposals_dir,
+            completion_indices = completion_indices,
+        )
+
+        if return_trajectories:
+
+            output_connection.send(request.output._replace(
+                judgment = judgment,
+                task_proposal = task_proposal
+            ))
+
+        output_connection.send(JUDGED_SIGNAL)
+
+    disable_profiling()
+
+    output_connection.send(DONE_SIGNAL)
+    output_connection.close()
+
+
+def stream_data_collection(
+    dataset: List[Dict[str, str]],
+    browser_config: BrowserConfig = DEFAULT_BROWSER_CONFIG,
+    agent_config: AgentConfig = DEFAULT_AGENT_CONFIG,
+    judge_config: JudgeConfig = DEFAULT_JUDGE_CONFIG,
+    task_proposer_config: TaskProposerConfig = DEFAULT_TASK_PROPOSER_CONFIG,
     seed: int = DEFAULT_SEED,
     rank: int = DEFAULT_RANK,
     world_size: int = DEFAULT_WORLD_SIZE,
@@ -889,15 +2878,43 @@ def list_trajectories(
     judge_response_key: str = DEFAULT_JUDGE_RESPONSE_KEY,
     skip_finished: bool = DEFAULT_SKIP_FINISHED,
     prune_observations: bool = DEFAULT_PRUNE_OBSERVATIONS,
+    storage_format: str = DEFAULT_STORAGE_FORMAT,
+    num_writer_threads: int = DEFAULT_NUM_WRITER_THREADS,
+    task_timeout: float = DEFAULT_TASK_TIMEOUT,
+    step_timeout: float = DEFAULT_STEP_TIMEOUT,
+    num_samples: int = DEFAULT_NUM_SAMPLES,
+    success_threshold: float = DEFAULT_SUCCESS_THRESHOLD,
+    consistency_threshold: float = DEFAULT_CONSISTENCY_THRESHOLD,
+    step_spool_dir: str = DEFAULT_STEP_SPOOL_DIR,
     add_steps_to_agent: bool = DEFAULT_ADD_STEPS_TO_AGENT,
     add_criteria_to_agent: bool = DEFAULT_ADD_CRITERIA_TO_AGENT,
     add_steps_to_judge: bool = DEFAULT_ADD_STEPS_TO_JUDGE,
     add_criteria_to_judge: bool = DEFAULT_ADD_CRITERIA_TO_JUDGE,
     add_steps_to_task_proposer: bool = DEFAULT_ADD_STEPS_TO_TASK_PROPOSER,
     add_criteria_to_task_proposer: bool = DEFAULT_ADD_CRITERIA_TO_TASK_PROPOSER,
-) -> List[InstaPipelineOutput]:
-    """Run the InSTA pipeline for internet-scale data collection, and list
-    the observations, actions, and judgments for each task.
+    return_trajectories: bool = True,
+    num_agents: int = DEFAULT_NUM_AGENTS,
+    playwright_workers: int = DEFAULT_PLAYWRIGHT_WORKERS,
+    task_queue_path: str = DEFAULT_TASK_QUEUE_PATH,
+    lease_timeout: float = DEFAULT_LEASE_TIMEOUT,
+    speculation_quantile: float = DEFAULT_SPECULATION_QUANTILE,
+    max_leases_per_domain: int = DEFAULT_MAX_LEASES_PER_DOMAIN,
+    min_domain_interval: float = DEFAULT_MIN_DOMAIN_INTERVAL,
+    share_inference: bool = DEFAULT_SHARE_INFERENCE,
+    max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+    pipeline_judging: bool = DEFAULT_PIPELINE_JUDGING,
+    num_judge_workers: int = DEFAULT_NUM_JUDGE_WORKERS,
+    judge_queue_size: int = DEFAULT_JUDGE_QUEUE_SIZE,
+    target_step_latency: float = DEFAULT_TARGET_STEP_LATENCY,
+    min_agents: int = DEFAULT_MIN_AGENTS,
+    concurrency_metrics_path: str = None,
+    profile_dir: str = DEFAULT_PROFILE_DIR,
+    profile_port: int = DEFAULT_PROFILE_PORT,
+) -> Generator[InstaPipelineOutput, None, None]:
+    """Run parallel agents to complete web navigation tasks, and yield
+    each trajectory as soon as a worker finishes it, where workers block
+    on their pipe until the consumer asks for the next trajectory, so
+    memory stays constant, and closing the generator stops every worker.
 
     Arguments:
 
@@ -905,258 +2922,673 @@ def list_trajectories(
         Override the default dataset, and run the pipeline on custom tasks,
         each entry must be a dictionary with keys "domain" and "task".
 
-    agent: BrowserAgent | AgentConfig
+    browser: InstaEnv
+        The web navigation environment running Playwright.
+
+    agent: BrowserAgent
         The LLM agent to use for the task.
 
-    judge: BrowserJudge | JudgeConfig
+    judge: BrowserJudge
         The LLM judge to evaluate the trajectory.
 
-    browser: InstaEnv | BrowserConfig
-        The web navigation environment running Playwright.
+    observations_dir: str
+        Directory to save observations.
+
+    screenshot_dir: str
+        Directory to save screenshots.
+
+    actions_dir: str
+        Directory to save actions.
+
+    judgments_dir: str
+        Directory to save judgments.
+
+    max_actions: int
+        Maximum number of actions per task.
+
+    skip_finished: bool
+        Whether to skip tasks that are already attempted.
+
+    prune_observations: bool
+        Whether to prune observations before saving.
+
+    storage_format: str
+        Either "json" for one file per trajectory, "jsonl" for
+        line-delimited shards, or "jsonl.zst" for compressed shards.
+
+    num_writer_threads: int
+        Number of threads that save trajectories in the background,
+        or 0 to save each trajectory before starting the next task.
+
+    task_timeout: float
+        Number of seconds for each task, after which the trajectory
+        is abandoned and saved as a failed attempt.
+
+    step_timeout: float
+        Number of seconds for each browser call and each LLM query.
+
+    num_samples: int
+        Maximum number of samples drawn for each task, where each sample
+        is judged as it finishes, and the best sample is saved.
+
+    success_threshold: float
+        A sample with a judged success above this value is saved, and
+        no more samples are drawn for the task.
+
+    consistency_threshold: float
+        Fraction of the samples that must fail before the remaining
+        samples of a task are cancelled, or None to keep sampling.
+
+    step_spool_dir: str
+        Directory where the screenshot, raw HTML, and metadata of each
+        step are written as the step finishes, so memory does not grow
+        with the length of a trajectory, or None to keep them in memory.
+
+    seed: int
+        Seed for the dataset.
+
+    return_trajectories: bool
+        Whether workers send trajectories to be yielded, or just save them.
+        
+    num_agents: int
+        Number of parallel agents to run.
+
+    playwright_workers: int
+        Number of Playwright workers running.
 
     rank: int
-        Rank of the process.
+        Rank of the machine.
 
     world_size: int
-        Number of data collection processes.
+        Number of data collection machines.
+
+    task_queue_path: str
+        Path to the SQLite file where agents pull tasks from on demand,
+        by default a temporary file that is removed when finished, or the
+        URL of a coordinator shared by several machines, which replaces
+        the static sharding by rank and world_size.
+
+    lease_timeout: float
+        Number of seconds before a task leased to an agent expires,
+        and the task is handed to another agent.
+
+    speculation_quantile: float
+        Quantile of finished task durations, such as 0.95, after which
+        a running task is also leased to an idle agent, and the first
+        copy to finish is saved, or None to disable speculation.
+
+    max_leases_per_domain: int
+        Maximum number of running tasks on the same domain, where
+        tasks on other domains are leased while a domain is at the limit.
+
+    min_domain_interval: float
+        Minimum number of seconds between starting two tasks on the
+        same domain, or None to start tasks as soon as agents are idle.
+
+    share_inference: bool
+        Whether agents with a local vLLM model share one copy of the
+        model in a broker process, which batches prompts from every agent,
+        and runs on the GPUs visible to the launching process, instead of
+        one GPU per agent.
+
+    max_batch_size: int
+        Maximum number of prompts in each batch for the shared model.
+
+    pipeline_judging: bool
+        Whether agents hand finished trajectories to separate judge
+        workers, instead of waiting for the judge and task proposer.
+
+    num_judge_workers: int
+        Number of judge workers when pipeline_judging is enabled.
+
+    judge_queue_size: int
+        Maximum number of trajectories waiting to be judged, where agents
+        block when the queue is full.
+
+    target_step_latency: float
+        Target p99 seconds for a browser action plus an LLM query, where
+        a controller pauses and resumes agents to stay under the target,
+        or None to keep every agent running.
+
+    min_agents: int
+        Minimum number of agents the controller keeps running.
+
+    concurrency_metrics_path: str
+        Path to a JSON lines file where controller decisions are saved.
+
+    profile_dir: str
+        Directory where each worker saves the duration of every stage
+        of the rollout as JSON lines, or None to disable profiling.
+
+    profile_port: int
+        Port serving the latest durations from profile_dir in the
+        Prometheus text format at /metrics, or None to disable.
+
+    Returns:
+
+    Generator[InstaPipelineOutput, None, None]
+        Generator for the observations, actions, and judgments for each task, 
+        in the order that workers finish them.
+
+    """
+
+    # fail before any agent starts, instead of at the first write
+    check_storage_format(
+        storage_format
+    )
+
+    task_queue, task_queue_dir = open_task_queue(
+        dataset = dataset,
+        task_queue_path = task_queue_path,
+        seed = seed, rank = rank,
+        world_size = world_size,
+        skip_finished = skip_finished,
+        lease_timeout = lease_timeout,
+        speculation_quantile = speculation_quantile,
+        max_leases_per_domain = max_leases_per_domain,
+        min_domain_interval = min_domain_interval
+    )
+
+    # machines sharing a coordinator lease every task on demand
+    shared_queue = (
+        task_queue_path is not None and
+        is_task_queue_url(task_queue_path)
+    )
+
+    task_queue.close()
+
+    # build missing journals once, before workers start appending
+    for completion_index in get_completion_indices(
+        observations_dir = observations_dir,
+        actions_dir = actions_dir,
+        judgments_dir = judgments_dir,
+        task_proposals_dir = task_proposals_dir,
+    ).values():
+
+        if completion_index is not None:
+
+            completion_index.ensure_journal()
+
+    pipeline_judging = pipeline_judging and not (
+        judge_config is None and
+        task_proposer_config is None
+    )
+
+    judge_queue = None
+
+    if pipeline_judging:
+
+        judge_queue = Queue(
+            maxsize = judge_queue_size
+        )
+
+    total_agent_size = (
+        world_size * num_agents
+    )
+
+    agent_ranks = list(range(
+        rank * num_agents,
+        (rank + 1) * num_agents
+    ))
+
+    rollout_slots = None
+    concurrency_controller = None
+
+    # agents above the number of active slots pause between tasks
+    if target_step_latency is not None:
+
+        rollout_slots = RolloutSlots(
+            worker_ids = [
+                str(agent_rank)
+                for agent_rank in agent_ranks
+            ],
+            num_active = num_agents
+        )
+
+        concurrency_controller = ConcurrencyController(
+            rollout_slots = rollout_slots,
+            target_step_latency = target_step_latency,
+            min_slots = min_agents,
+            control_interval = DEFAULT_CONTROL_INTERVAL,
+            metrics_path = concurrency_metrics_path
+        )
+
+    # with pipelined judging, judge workers return the trajectories
+    worker_fn = (
+        iter_trajectories
+        if return_trajectories and not pipeline_judging else
+        save_trajectories
+    )
+
+    worker_fn = multiprocessing_wrapper(
+        worker_fn,
+        dataset = dataset,
+        agent_config = agent_config,
+        judge_config = judge_config,
+        task_proposer_config = task_proposer_config,
+        seed = seed,
+        task_queue = task_queue,
+        judge_queue = judge_queue,
+        rollout_slots = rollout_slots,
+        observations_dir = observations_dir,
+        screenshot_dir = screenshot_dir,
+        actions_dir = actions_dir,
+        judgments_dir = judgments_dir,
+        task_proposals_dir = task_proposals_dir,
+        max_actions = max_actions,
+        agent_response_key = agent_response_key,
+        judge_response_key = judge_response_key,
+        skip_finished = skip_finished,
+        prune_observations = prune_observations,
+        storage_format = storage_format,
+        num_writer_threads = num_writer_threads,
+        task_timeout = task_timeout,
+        step_timeout = step_timeout,
+        num_samples = num_samples,
+        success_threshold = success_threshold,
+        consistency_threshold = consistency_threshold,
+        step_spool_dir = step_spool_dir,
+        profile_dir = profile_dir,
+        add_steps_to_agent = add_steps_to_agent,
+        add_criteria_to_agent = add_criteria_to_agent,
+        add_steps_to_judge = add_steps_to_judge,
+        add_criteria_to_judge = add_criteria_to_judge,
+        add_steps_to_task_proposer = add_steps_to_task_proposer,
+        add_criteria_to_task_proposer = add_criteria_to_task_proposer,
+    )
+
+    inference_process = None
+    inference_clients = {
+        agent_rank: None
+        for agent_rank in agent_ranks
+    }
+
+    share_inference = (
+        share_inference and
+        agent_config.client_type in INFERENCE_ENGINES
+    )
+
+    if share_inference:
+
+        request_queue = Queue()
+
+        response_queues = {
+            str(agent_rank): Queue()
+            for agent_rank in agent_ranks
+        }
+
+        inference_engine = get_inference_engine(
+            client_type = agent_config.client_type,
+            client_kwargs = agent_config.client_kwargs,
+            generation_kwargs = agent_config.generation_kwargs
+        )
+
+        inference_process = Process(
+            target = serve_inference,
+            args = (
+                inference_engine,
+                request_queue,
+                response_queues,
+                max_batch_size
+            )
+        )
+
+        inference_process.start()
+
+        inference_clients = {
+            agent_rank: InferenceClient(
+                worker_id = str(agent_rank),
+                request_queue = request_queue,
+                response_queue = response_queues[str(agent_rank)]
+            )
+            for agent_rank in agent_ranks
+        }
+
+    worker_processes = {}
+    worker_connections = {}
+
+    for agent_rank in agent_ranks:
+
+        # copy every field of the config, such as record and replay
+        # directories, and only assign each agent a Playwright server
+        agent_browser_config = replace(
+            browser_config,
+            playwright_port = (
+                browser_config.playwright_port +
+                agent_rank % playwright_workers
+            )
+        )
+
+        output_reader, output_writer = Pipe(
+            duplex = False
+        )
+
+        worker_args = (
+            output_writer,
+            agent_browser_config,
+            agent_rank,
+            total_agent_size,
+            inference_clients[agent_rank]
+        )
+
+        worker_process = Process(
+            target = worker_fn,
+            args = worker_args
+        )
+
+        worker_process.start()
+
+        # the worker owns the write end, so close the copy in this process
+        output_writer.close()
+
+        worker_processes[agent_rank] = (
+            worker_process
+        )
+
+        worker_connections[agent_rank] = (
+            output_reader
+        )
+
+    judge_ranks = [
+        "judge_{}".format(judge_idx)
+        for judge_idx in range(
+            num_judge_workers
+            if pipeline_judging else 0
+        )
+    ]
+
+    for judge_rank in judge_ranks:
+
+        output_reader, output_writer = Pipe(
+            duplex = False
+        )
+
+        judge_process = Process(
+            target = judge_worker_fn,
+            kwargs = dict(
+                judge_queue = judge_queue,
+                output_connection = output_writer,
+                judge_config = judge_config,
+                task_proposer_config = task_proposer_config,
+                judgments_dir = judgments_dir,
+                task_proposals_dir = task_proposals_dir,
+                agent_response_key = agent_response_key,
+                judge_response_key = judge_response_key,
+                return_trajectories = return_trajectories,
+                worker_id = judge_rank,
+                profile_dir = profile_dir,
+            )
+        )
+
+        judge_process.start()
+
+        output_writer.close()
+
+        worker_processes[judge_rank] = (
+            judge_process
+        )
+
+        worker_connections[judge_rank] = (
+            output_reader
+        )
+
+    # the thread starts after every process is forked
+    if concurrency_controller is not None:
+
+        concurrency_controller.start()
+
+    profile_server = None
+
+    if profile_dir is not None and profile_port is not None:
+
+        profile_server = serve_profiles(
+            profile_dir = profile_dir,
+            port = profile_port
+        )
+
+    crashed_workers = {}
+    judges_signaled = False
+
+    # requests each judge worker is evaluating, requests waiting to be
+    # re-queued after their judge worker exited, and requests lost when
+    # a judge worker exits after the judges were told to stop
+    judge_requests = {}
+    requeued_requests = deque()
+    unjudged_identifiers = []
+
+    try:
+
+        while len(worker_connections) > 0:
+
+            ready_to_rank = {
+                worker_connections[agent_rank]: agent_rank
+                for agent_rank in worker_connections
+            }
+
+            ready_to_rank.update({
+                worker_processes[agent_rank].sentinel: agent_rank
+                for agent_rank in worker_connections
+            })
+
+            if inference_process is not None:
+
+                ready_to_rank[inference_process.sentinel] = None
+
+            # block until a worker sends an output or exits
+            for ready in wait(list(ready_to_rank)):
+
+                agent_rank = ready_to_rank[ready]
+
+                if agent_rank is None:
+
+                    raise RuntimeError(
+                        "Inference broker exited unexpectedly "
+                        "with code {}".format(
+                            inference_process.exitcode
+                        )
+                    )
+
+                if agent_rank not in worker_connections:
+
+                    continue
+
+                connection = worker_connections[agent_rank]
+
+                worker_finished = False
+                worker_exited = not (
+                    worker_processes[agent_rank]
+                    .is_alive()
+                )
+
+                try:
+
+                    while connection.poll():
+
+                        output = connection.recv()
+
+                        if isinstance(
+                            output, (TrajectoryHandle, InstaPipelineOutput)
+                        ):
+
+                            yield load_trajectory(output)
+
+                        elif isinstance(output, JudgeRequest):
+
+                            judge_requests[agent_rank] = output
+
+                        elif output == JUDGED_SIGNAL:
+
+                            judge_requests.pop(agent_rank, None)
+
+                        elif output == DONE_SIGNAL:
+
+                            worker_finished = True
+
+                            break
+
+                except EOFError:
+
+                    worker_exited = True
+
+                if not (worker_finished or worker_exited):
+
+                    continue
+
+                worker_connections.pop(agent_rank).close()
+                worker_processes[agent_rank].join()
+
+                if worker_finished:
+
+                    continue
+
+                crashed_workers[agent_rank] = (
+                    worker_processes[agent_rank].exitcode
+                )
+
+                num_released = task_queue.release_worker(
+                    worker_id = str(agent_rank)
+                )
+
+                print(
+                    "Worker {} exited unexpectedly with code {}, "
+                    "returning {} leased tasks to the queue".format(
+                        agent_rank, crashed_workers[agent_rank],
+                        num_released
+                    )
+                )
+
+                request = judge_requests.pop(agent_rank, None)
+
+                if request is None:
+
+                    continue
 
-    seed: int
-        Seed for the dataset.
+                # the task is already completed in the queue, so another
+                # judge worker evaluates the trajectory instead, while
+                # requests queued after the stop signals are never read
+                if judges_signaled:
 
-    observations_dir: str
-        Directory to save observations.
+                    unjudged_identifiers.append(
+                        request.identifier
+                    )
 
-    screenshot_dir: str
-        Directory to save screenshots.
+                else:
 
-    actions_dir: str
-        Directory to save actions.
+                    requeued_requests.append(request)
 
-    judgments_dir: str
-        Directory to save judgments.
+            # the parent keeps reading outputs while the judge queue is full
+            while len(requeued_requests) > 0:
 
-    max_actions: int
-        Maximum number of actions per task.
+                try:
 
-    skip_finished: bool
-        Whether to skip tasks that are already attempted.
+                    judge_queue.put_nowait(
+                        requeued_requests[0]
+                    )
 
-    prune_observations: bool
-        Whether to prune observations before saving.
+                except queue.Full:
 
-    Returns:
+                    break
 
-    List[InstaPipelineOutput]
-        List with observations, actions, and judgments for each task, 
-        which are saved to disk for later processing.
-    
-    """
+                requeued_requests.popleft()
 
-    return list(iter_trajectories(
-        dataset = dataset, browser = browser,
-        agent = agent, judge = judge,
-        task_proposer = task_proposer,
-        seed = seed, rank = rank, world_size = world_size,
-        observations_dir = observations_dir,
-        screenshot_dir = screenshot_dir,
-        actions_dir = actions_dir,
-        judgments_dir = judgments_dir,
-        task_proposals_dir = task_proposals_dir,
-        max_actions = max_actions,
-        agent_response_key = agent_response_key,
-        judge_response_key = judge_response_key,
-        skip_finished = skip_finished,
-        prune_observations = prune_observations,
-        add_steps_to_agent = add_steps_to_agent,
-        add_criteria_to_agent = add_criteria_to_agent,
-        add_steps_to_judge = add_steps_to_judge,
-        add_criteria_to_judge = add_criteria_to_judge,
-        add_steps_to_task_proposer = add_steps_to_task_proposer,
-        add_criteria_to_task_proposer = add_criteria_to_task_proposer,
-    ))
+            agents_running = any(
+                agent_rank in agent_ranks
+                for agent_rank in worker_connections
+            )
 
+            judges_running = any(
+                agent_rank in judge_ranks
+                for agent_rank in worker_connections
+            )
 
-def save_trajectories(
-    dataset: List[Dict[str, str]],
-    browser: InstaEnv | BrowserConfig,
-    agent: BrowserAgent | AgentConfig,
-    judge: BrowserJudge | JudgeConfig = None,
-    task_proposer: BrowserTaskProposer | TaskProposerConfig = None,
-    seed: int = DEFAULT_SEED,
-    rank: int = DEFAULT_RANK,
-    world_size: int = DEFAULT_WORLD_SIZE,
-    observations_dir: str = DEFAULT_OBSERVATIONS_DIR,
-    screenshot_dir: str = DEFAULT_SCREENSHOT_DIR,
-    actions_dir: str = DEFAULT_ACTIONS_DIR,
-    judgments_dir: str = DEFAULT_JUDGMENTS_DIR,
-    task_proposals_dir: str = DEFAULT_TASK_PROPOSALS_DIR,
-    max_actions: int = DEFAULT_MAX_ACTIONS,
-    agent_response_key: str = DEFAULT_AGENT_RESPONSE_KEY,
-    judge_response_key: str = DEFAULT_JUDGE_RESPONSE_KEY,
-    skip_finished: bool = DEFAULT_SKIP_FINISHED,
-    prune_observations: bool = DEFAULT_PRUNE_OBSERVATIONS,
-    add_steps_to_agent: bool = DEFAULT_ADD_STEPS_TO_AGENT,
-    add_criteria_to_agent: bool = DEFAULT_ADD_CRITERIA_TO_AGENT,
-    add_steps_to_judge: bool = DEFAULT_ADD_STEPS_TO_JUDGE,
-    add_criteria_to_judge: bool = DEFAULT_ADD_CRITERIA_TO_JUDGE,
-    add_steps_to_task_proposer: bool = DEFAULT_ADD_STEPS_TO_TASK_PROPOSER,
-    add_criteria_to_task_proposer: bool = DEFAULT_ADD_CRITERIA_TO_TASK_PROPOSER,
-) -> None:
-    """Run the InSTA pipeline for internet-scale data collection, and save
-    the observations, actions, and judgments for each task.
+            if pipeline_judging and agents_running and not judges_running:
 
-    Arguments:
+                raise RuntimeError(
+                    "Every judge worker exited unexpectedly "
+                    "with codes: {}".format(crashed_workers)
+                )
 
-    dataset: List[Dict[str, str]]
-        Override the default dataset, and run the pipeline on custom tasks,
-        each entry must be a dictionary with keys "domain" and "task".
+            # judge workers stop after every queued trajectory is judged
+            if pipeline_judging and not agents_running and not judges_signaled \
+                    and len(requeued_requests) == 0:
 
-    agent: BrowserAgent | AgentConfig
-        The LLM agent to use for the task.
+                for judge_rank in judge_ranks:
 
-    judge: BrowserJudge | JudgeConfig
-        The LLM judge to evaluate the trajectory.
+                    judge_queue.put(DONE_SIGNAL)
 
-    browser: InstaEnv | BrowserConfig
-        The web navigation environment running Playwright.
+                judges_signaled = True
 
-    rank: int
-        Rank of the process.
+        unjudged_identifiers.extend(
+            request.identifier
+            for request in requeued_requests
+        )
 
-    world_size: int
-        Number of data collection processes.
+        if len(unjudged_identifiers) > 0:
 
-    seed: int
-        Seed for the dataset.
+            raise RuntimeError(
+                "{} trajectories were saved without a judgment because "
+                "judge workers exited unexpectedly with codes: {}".format(
+                    len(unjudged_identifiers), crashed_workers
+                )
+            )
 
-    observations_dir: str
-        Directory to save observations.
+        task_stats = task_queue.stats()
 
-    screenshot_dir: str
-        Directory to save screenshots.
+        num_unfinished = (
+            task_stats["pending"] +
+            task_stats["leased"]
+        )
 
-    actions_dir: str
-        Directory to save actions.
+        # with a coordinator, the remaining machines finish these tasks
+        if len(crashed_workers) > 0 and num_unfinished > 0 and not shared_queue:
 
-    judgments_dir: str
-        Directory to save judgments.
+            raise RuntimeError(
+                "{} tasks were not finished because agents exited "
+                "unexpectedly with codes: {}".format(
+                    num_unfinished, crashed_workers
+                )
+            )
 
-    max_actions: int
-        Maximum number of actions per task.
+    finally:
 
-    skip_finished: bool
-        Whether to skip tasks that are already attempted.
+        if concurrency_controller is not None:
 
-    prune_observations: bool
-        Whether to prune observations before saving.
-    
-    """
+            concurrency_controller.stop()
 
-    for x in iter_trajectories(
-        dataset = dataset, browser = browser,
-        agent = agent, judge = judge,
-        task_proposer = task_proposer,
-        seed = seed, rank = rank, world_size = world_size,
-        observations_dir = observations_dir,
-        screenshot_dir = screenshot_dir,
-        actions_dir = actions_dir,
-        judgments_dir = judgments_dir,
-        task_proposals_dir = task_proposals_dir,
-        max_actions = max_actions,
-        agent_response_key = agent_response_key,
-        judge_response_key = judge_response_key,
-        skip_finished = skip_finished,
-        prune_observations = prune_observations,
-        add_steps_to_agent = add_steps_to_agent,
-        add_criteria_to_agent = add_criteria_to_agent,
-        add_steps_to_judge = add_steps_to_judge,
-        add_criteria_to_judge = add_criteria_to_judge,
-        add_steps_to_task_proposer = add_steps_to_task_proposer,
-        add_criteria_to_task_proposer = add_criteria_to_task_proposer,
-    ):
-        
-        pass
+        if profile_server is not None:
 
+            profile_server.shutdown()
+            profile_server.server_close()
 
-DONE_SIGNAL: str = "DONE_SIGNAL"
+        for worker_process in worker_processes.values():
 
+            if worker_process.is_alive():
 
-def multiprocessing_wrapper(
-    data_collection_fn: Callable,
-    dataset: List[Dict[str, str]],
-    agent_config: AgentConfig = DEFAULT_AGENT_CONFIG,
-    judge_config: JudgeConfig = DEFAULT_JUDGE_CONFIG,
-    task_proposer_config: TaskProposerConfig = DEFAULT_TASK_PROPOSER_CONFIG,
-    seed: int = DEFAULT_SEED,
-    observations_dir: str = DEFAULT_OBSERVATIONS_DIR,
-    screenshot_dir: str = DEFAULT_SCREENSHOT_DIR,
-    actions_dir: str = DEFAULT_ACTIONS_DIR,
-    judgments_dir: str = DEFAULT_JUDGMENTS_DIR,
-    task_proposals_dir: str = DEFAULT_TASK_PROPOSALS_DIR,
-    max_actions: int = DEFAULT_MAX_ACTIONS,
-    agent_response_key: str = DEFAULT_AGENT_RESPONSE_KEY,
-    judge_response_key: str = DEFAULT_JUDGE_RESPONSE_KEY,
-    skip_finished: bool = DEFAULT_SKIP_FINISHED,
-    prune_observations: bool = DEFAULT_PRUNE_OBSERVATIONS,
-    add_steps_to_agent: bool = DEFAULT_ADD_STEPS_TO_AGENT,
-    add_criteria_to_agent: bool = DEFAULT_ADD_CRITERIA_TO_AGENT,
-    add_steps_to_judge: bool = DEFAULT_ADD_STEPS_TO_JUDGE,
-    add_criteria_to_judge: bool = DEFAULT_ADD_CRITERIA_TO_JUDGE,
-    add_steps_to_task_proposer: bool = DEFAULT_ADD_STEPS_TO_TASK_PROPOSER,
-    add_criteria_to_task_proposer: bool = DEFAULT_ADD_CRITERIA_TO_TASK_PROPOSER,
-):
+                worker_process.terminate()
 
-    def worker_fn(
-        output_queue: Queue,
-        browser_config: BrowserConfig,
-        rank: int,
-        world_size: int,
-    ):
-        
-        os.environ['VLLM_WORKER_MULTIPROC_METHOD'] = 'spawn'
+            worker_process.join()
 
-        if torch.cuda.device_count() > 0:
+        if inference_process is not None:
 
-            os.environ["CUDA_VISIBLE_DEVICES"] = "{}".format(
-                rank % torch.cuda.device_count()
-            )
+            if inference_process.is_alive():
 
-        outputs = data_collection_fn(
-            dataset = dataset, browser = browser_config,
-            agent = agent_config,
-            judge = judge_config,
-            task_proposer = task_proposer_config,
-            seed = seed, rank = rank, world_size = world_size,
-            observations_dir = observations_dir,
-            screenshot_dir = screenshot_dir,
-            actions_dir = actions_dir,
-            judgments_dir = judgments_dir,
-            task_proposals_dir = task_proposals_dir,
-            max_actions = max_actions,
-            agent_response_key = agent_response_key,
-            judge_response_key = judge_response_key,
-            skip_finished = skip_finished,
-            prune_observations = prune_observations,
-            add_steps_to_agent = add_steps_to_agent,
-            add_criteria_to_agent = add_criteria_to_agent,
-            add_steps_to_judge = add_steps_to_judge,
-            add_criteria_to_judge = add_criteria_to_judge,
-            add_steps_to_task_proposer = add_steps_to_task_proposer,
-            add_criteria_to_task_proposer = add_criteria_to_task_proposer,
-        )
-        
-        if outputs is not None:
+                request_queue.put(STOP_SIGNAL)
 
-            for output in outputs:
+            inference_process.join(timeout = 60)
 
-                output_queue.put(output)
+            if inference_process.is_alive():
 
-        output_queue.put(DONE_SIGNAL)
+                inference_process.terminate()
 
-    return worker_fn
+        task_queue.close()
+
+        if task_queue_dir is not None:
 
+            shutil.rmtree(
+                task_queue_dir,
+                ignore_errors = True
+            )
 
-NULL_QUEUE = None
 
 
 def launch_data_collection(
@@ -1178,6 +3610,14 @@ def launch_data_collection(
     judge_response_key: str = DEFAULT_JUDGE_RESPONSE_KEY,
     skip_finished: bool = DEFAULT_SKIP_FINISHED,
     prune_observations: bool = DEFAULT_PRUNE_OBSERVATIONS,
+    storage_format: str = DEFAULT_STORAGE_FORMAT,
+    num_writer_threads: int = DEFAULT_NUM_WRITER_THREADS,
+    task_timeout: float = DEFAULT_TASK_TIMEOUT,
+    step_timeout: float = DEFAULT_STEP_TIMEOUT,
+    num_samples: int = DEFAULT_NUM_SAMPLES,
+    success_threshold: float = DEFAULT_SUCCESS_THRESHOLD,
+    consistency_threshold: float = DEFAULT_CONSISTENCY_THRESHOLD,
+    step_spool_dir: str = DEFAULT_STEP_SPOOL_DIR,
     add_steps_to_agent: bool = DEFAULT_ADD_STEPS_TO_AGENT,
     add_criteria_to_agent: bool = DEFAULT_ADD_CRITERIA_TO_AGENT,
     add_steps_to_judge: bool = DEFAULT_ADD_STEPS_TO_JUDGE,
@@ -1187,6 +3627,21 @@ def launch_data_collection(
     return_trajectories: bool = DEFAULT_RETURN_TRAJECTORIES,
     num_agents: int = DEFAULT_NUM_AGENTS,
     playwright_workers: int = DEFAULT_PLAYWRIGHT_WORKERS,
+    task_queue_path: str = DEFAULT_TASK_QUEUE_PATH,
+    lease_timeout: float = DEFAULT_LEASE_TIMEOUT,
+    speculation_quantile: float = DEFAULT_SPECULATION_QUANTILE,
+    max_leases_per_domain: int = DEFAULT_MAX_LEASES_PER_DOMAIN,
+    min_domain_interval: float = DEFAULT_MIN_DOMAIN_INTERVAL,
+    share_inference: bool = DEFAULT_SHARE_INFERENCE,
+    max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+    pipeline_judging: bool = DEFAULT_PIPELINE_JUDGING,
+    num_judge_workers: int = DEFAULT_NUM_JUDGE_WORKERS,
+    judge_queue_size: int = DEFAULT_JUDGE_QUEUE_SIZE,
+    target_step_latency: float = DEFAULT_TARGET_STEP_LATENCY,
+    min_agents: int = DEFAULT_MIN_AGENTS,
+    concurrency_metrics_path: str = None,
+    profile_dir: str = DEFAULT_PROFILE_DIR,
+    profile_port: int = DEFAULT_PROFILE_PORT,
 ) -> List[InstaPipelineOutput] | None:
     """Run parallel agents to complete web navigation tasks,
     such as for performing Deep Research across the whole internet.
@@ -1227,6 +3682,38 @@ def launch_data_collection(
     prune_observations: bool
         Whether to prune observations before saving.
 
+    storage_format: str
+        Either "json" for one file per trajectory, "jsonl" for
+        line-delimited shards, or "jsonl.zst" for compressed shards.
+
+    num_writer_threads: int
+        Number of threads that save trajectories in the background,
+        or 0 to save each trajectory before starting the next task.
+
+    task_timeout: float
+        Number of seconds for each task, after which the trajectory
+        is abandoned and saved as a failed attempt.
+
+    step_timeout: float
+        Number of seconds for each browser call and each LLM query.
+
+    num_samples: int
+        Maximum number of samples drawn for each task, where each sample
+        is judged as it finishes, and the best sample is saved.
+
+    success_threshold: float
+        A sample with a judged success above this value is saved, and
+        no more samples are drawn for the task.
+
+    consistency_threshold: float
+        Fraction of the samples that must fail before the remaining
+        samples of a task are cancelled, or None to keep sampling.
+
+    step_spool_dir: str
+        Directory where the screenshot, raw HTML, and metadata of each
+        step are written as the step finishes, so memory does not grow
+        with the length of a trajectory, or None to keep them in memory.
+
     seed: int
         Seed for the dataset.
 
@@ -1245,6 +3732,68 @@ def launch_data_collection(
     world_size: int
         Number of data collection machines.
 
+    task_queue_path: str
+        Path to the SQLite file where agents pull tasks from on demand,
+        by default a temporary file that is removed when finished, or the
+        URL of a coordinator shared by several machines, which replaces
+        the static sharding by rank and world_size.
+
+    lease_timeout: float
+        Number of seconds before a task leased to an agent expires,
+        and the task is handed to another agent.
+
+    speculation_quantile: float
+        Quantile of finished task durations, such as 0.95, after which
+        a running task is also leased to an idle agent, and the first
+        copy to finish is saved, or None to disable speculation.
+
+    max_leases_per_domain: int
+        Maximum number of running tasks on the same domain, where
+        tasks on other domains are leased while a domain is at the limit.
+
+    min_domain_interval: float
+        Minimum number of seconds between starting two tasks on the
+        same domain, or None to start tasks as soon as agents are idle.
+
+    share_inference: bool
+        Whether agents with a local vLLM model share one copy of the
+        model in a broker process, which batches prompts from every agent,
+        and runs on the GPUs visible to the launching process, instead of
+        one GPU per agent.
+
+    max_batch_size: int
+        Maximum number of prompts in each batch for the shared model.
+
+    pipeline_judging: bool
+        Whether agents hand finished trajectories to separate judge
+        workers, instead of waiting for the judge and task proposer.
+
+    num_judge_workers: int
+        Number of judge workers when pipeline_judging is enabled.
+
+    judge_queue_size: int
+        Maximum number of trajectories waiting to be judged, where agents
+        block when the queue is full.
+
+    target_step_latency: float
+        Target p99 seconds for a browser action plus an LLM query, where
+        a controller pauses and resumes agents to stay under the target,
+        or None to keep every agent running.
+
+    min_agents: int
+        Minimum number of agents the controller keeps running.
+
+    concurrency_metrics_path: str
+        Path to a JSON lines file where controller decisions are saved.
+
+    profile_dir: str
+        Directory where each worker saves the duration of every stage
+        of the rollout as JSON lines, or None to disable profiling.
+
+    profile_port: int
+        Port serving the latest durations from profile_dir in the
+        Prometheus text format at /metrics, or None to disable.
+
     Returns:
 
     List[InstaPipelineOutput] | None
@@ -1253,19 +3802,17 @@ def launch_data_collection(
     
     """
 
-    worker_fn = (
-        list_trajectories
-        if return_trajectories else
-        save_trajectories
-    )
+    pipeline_outputs = []
 
-    worker_fn = multiprocessing_wrapper(
-        worker_fn,
+    for output in stream_data_collection(
         dataset = dataset,
+        browser_config = browser_config,
         agent_config = agent_config,
         judge_config = judge_config,
         task_proposer_config = task_proposer_config,
         seed = seed,
+        rank = rank,
+        world_size = world_size,
         observations_dir = observations_dir,
         screenshot_dir = screenshot_dir,
         actions_dir = actions_dir,
@@ -1276,113 +3823,128 @@ def launch_data_collection(
         judge_response_key = judge_response_key,
         skip_finished = skip_finished,
         prune_observations = prune_observations,
+        storage_format = storage_format,
+        num_writer_threads = num_writer_threads,
+        task_timeout = task_timeout,
+        step_timeout = step_timeout,
+        num_samples = num_samples,
+        success_threshold = success_threshold,
+        consistency_threshold = consistency_threshold,
+        step_spool_dir = step_spool_dir,
         add_steps_to_agent = add_steps_to_agent,
-        add_criteria_to_agent = add_criteria_to_agent,
-        add_steps_to_judge = add_steps_to_judge,
-        add_criteria_to_judge = add_criteria_to_judge,
-        add_steps_to_task_proposer = add_steps_to_task_proposer,
-        add_criteria_to_task_proposer = add_criteria_to_task_proposer,
-    )
-
-    browser_config_dict = asdict(browser_config)
-
-    total_agent_size = (
-        world_size * num_agents
-    )
-
-    worker_processes = []
-    worker_queues = []
-
-    for agent_rank in range(
-            rank * num_agents,
-            (rank + 1) * num_agents):
-
-        browser_config = get_browser_config(
-            playwright_url = browser_config_dict["playwright_url"],
-            playwright_port = (
-                browser_config_dict["playwright_port"] +
-                agent_rank % playwright_workers
-            )
-        )
-
-        output_queue = Queue()
-
-        worker_args = (
-            output_queue,
-            browser_config,
-            agent_rank,
-            total_agent_size
-        )
+        add_criteria_to_agent = add_criteria_to_agent,
+        add_steps_to_judge = add_steps_to_judge,
+        add_criteria_to_judge = add_criteria_to_judge,
+        add_steps_to_task_proposer = add_steps_to_task_proposer,
+        add_criteria_to_task_proposer = add_criteria_to_task_proposer,
+        return_trajectories = return_trajectories,
+        num_agents = num_agents,
+        playwright_workers = playwright_workers,
+        task_queue_path = task_queue_path,
+        lease_timeout = lease_timeout,
+        speculation_quantile = speculation_quantile,
+        max_leases_per_domain = max_leases_per_domain,
+        min_domain_interval = min_domain_interval,
+        share_inference = share_inference,
+        max_batch_size = max_batch_size,
+        pipeline_judging = pipeline_judging,
+        num_judge_workers = num_judge_workers,
+        judge_queue_size = judge_queue_size,
+        target_step_latency = target_step_latency,
+        min_agents = min_agents,
+        concurrency_metrics_path = concurrency_metrics_path,
+        profile_dir = profile_dir,
+        profile_port = profile_port,
+    ):
 
-        worker_process = Process(
-            target = worker_fn,
-            args = worker_args
+        pipeline_outputs.append(
+            output
         )
 
-        worker_process.start()
-
-        worker_processes.append(
-            worker_process
-        )
+    if return_trajectories:
 
-        worker_queues.append(
-            output_queue
-        )
+        return pipeline_outputs
 
-    pipeline_outputs = []
-        
-    for idx, queue in (
-        x for repeat in count() 
-        for x in enumerate(worker_queues)
-    ):
 
-        time.sleep(0.01)
+WORKER_POOL_UNSUPPORTED_DEFAULTS = {
+    "task_queue_path": DEFAULT_TASK_QUEUE_PATH,
+    "pipeline_judging": DEFAULT_PIPELINE_JUDGING,
+    "num_judge_workers": DEFAULT_NUM_JUDGE_WORKERS,
+    "judge_queue_size": DEFAULT_JUDGE_QUEUE_SIZE,
+    "target_step_latency": DEFAULT_TARGET_STEP_LATENCY,
+    "min_agents": DEFAULT_MIN_AGENTS,
+    "concurrency_metrics_path": None,
+    "profile_dir": DEFAULT_PROFILE_DIR,
+    "profile_port": DEFAULT_PROFILE_PORT,
+}
 
-        all_queues_finished = all(
-            queue_i is NULL_QUEUE
-            for queue_i in worker_queues
-        )
 
-        if all_queues_finished:
-    
-            break
+def check_worker_pool_args(
+    worker_pool: "WorkerPool",
+    num_agents: int = DEFAULT_NUM_AGENTS,
+    playwright_workers: int = DEFAULT_PLAYWRIGHT_WORKERS,
+    share_inference: bool = DEFAULT_SHARE_INFERENCE,
+    max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+    **launch_kwargs: Any
+) -> None:
+    """Raise ValueError for settings that a running worker pool cannot
+    honor, where the agents and the shared model are fixed when the pool
+    starts, and each job uses its own temporary task queue.
 
-        queue_is_empty = (
-            queue is NULL_QUEUE
-            or queue.empty()
-        )
+    Arguments:
 
-        if queue_is_empty:
+    worker_pool: WorkerPool
+        The pool started by InstaPipeline.start_worker_pool.
 
-            continue
+    num_agents: int
+        Number of parallel agents requested for this run.
 
-        output = queue.get()
+    playwright_workers: int
+        Number of Playwright workers requested for this run.
 
-        worker_finished = (
-            output == DONE_SIGNAL
-        )
+    share_inference: bool
+        Whether agents should share one copy of a local model.
 
-        if worker_finished:
+    max_batch_size: int
+        Maximum number of prompts in each batch for the shared model.
 
-            worker_queues[idx] = (
-                NULL_QUEUE
-            )
+    launch_kwargs: Any
+        Remaining settings of the run, with a key for each setting
+        in WORKER_POOL_UNSUPPORTED_DEFAULTS.
 
-        elif isinstance(
-            output, InstaPipelineOutput
-        ):
+    """
 
-            pipeline_outputs.append(
-                output
+    # settings fixed by the pool are accepted at their default, or
+    # at the value the pool was started with
+    pool_settings = {
+        "num_agents": (num_agents, DEFAULT_NUM_AGENTS, worker_pool.num_agents),
+        "playwright_workers": (playwright_workers, DEFAULT_PLAYWRIGHT_WORKERS,
+                               worker_pool.playwright_workers),
+        "share_inference": (share_inference, DEFAULT_SHARE_INFERENCE,
+                            worker_pool.share_inference),
+        "max_batch_size": (max_batch_size, DEFAULT_MAX_BATCH_SIZE,
+                           worker_pool.max_batch_size),
+    }
+
+    for name, (value, default, pool_value) in pool_settings.items():
+
+        if value != default and value != pool_value:
+
+            raise ValueError(
+                "The worker pool was started with {} = {}, pass it to "
+                "start_worker_pool instead of {}".format(
+                    name, pool_value, value
+                )
             )
 
-    for worker_process in worker_processes:
+    for name, default in WORKER_POOL_UNSUPPORTED_DEFAULTS.items():
 
-        worker_process.join()
-
-    if return_trajectories:
+        if launch_kwargs[name] != default:
 
-        return pipeline_outputs
+            raise ValueError(
+                "The worker pool does not support {}, call close "
+                "on the pipeline before running with it".format(name)
+            )
 
 
 class InstaPipeline(Callable):
@@ -1425,6 +3987,14 @@ class InstaPipeline(Callable):
                  judge_response_key: str = DEFAULT_JUDGE_RESPONSE_KEY,
                  skip_finished: bool = DEFAULT_SKIP_FINISHED,
                  prune_observations: bool = DEFAULT_PRUNE_OBSERVATIONS,
+                 storage_format: str = DEFAULT_STORAGE_FORMAT,
+                 num_writer_threads: int = DEFAULT_NUM_WRITER_THREADS,
+                 task_timeout: float = DEFAULT_TASK_TIMEOUT,
+                 step_timeout: float = DEFAULT_STEP_TIMEOUT,
+                 num_samples: int = DEFAULT_NUM_SAMPLES,
+                 success_threshold: float = DEFAULT_SUCCESS_THRESHOLD,
+                 consistency_threshold: float = DEFAULT_CONSISTENCY_THRESHOLD,
+                 step_spool_dir: str = DEFAULT_STEP_SPOOL_DIR,
                  add_steps_to_agent: bool = DEFAULT_ADD_STEPS_TO_AGENT,
                  add_criteria_to_agent: bool = DEFAULT_ADD_CRITERIA_TO_AGENT,
                  add_steps_to_judge: bool = DEFAULT_ADD_STEPS_TO_JUDGE,
@@ -1475,9 +4045,45 @@ class InstaPipeline(Callable):
 
         prune_observations: bool
             Whether to prune observations before saving.
+
+        storage_format: str
+            Either "json" for one file per trajectory, "jsonl" for
+            line-delimited shards, or "jsonl.zst" for compressed shards.
+
+        num_writer_threads: int
+            Number of threads that save trajectories in the background,
+            or 0 to save each trajectory before starting the next task.
+
+        task_timeout: float
+            Number of seconds for each task, after which the trajectory
+            is abandoned and saved as a failed attempt.
+
+        step_timeout: float
+            Number of seconds for each browser call and each LLM query.
+
+        num_samples: int
+            Maximum number of samples drawn for each task, where each sample
+            is judged as it finishes, and the best sample is saved.
+
+        success_threshold: float
+            A sample with a judged success above this value is saved, and
+            no more samples are drawn for the task.
+
+        consistency_threshold: float
+            Fraction of the samples that must fail before the remaining
+            samples of a task are cancelled, or None to keep sampling.
+
+        step_spool_dir: str
+            Directory where the screenshot, raw HTML, and metadata of each
+            step are written as the step finishes, so memory does not grow
+            with the length of a trajectory, or None to keep them in memory.
         
         """
 
+        check_storage_format(
+            storage_format
+        )
+
         self.browser_config = browser_config
         self.agent_config = agent_config
         self.judge_config = judge_config
@@ -1499,6 +4105,14 @@ class InstaPipeline(Callable):
 
         self.skip_finished = skip_finished
         self.prune_observations = prune_observations
+        self.storage_format = storage_format
+        self.num_writer_threads = num_writer_threads
+        self.task_timeout = task_timeout
+        self.step_timeout = step_timeout
+        self.num_samples = num_samples
+        self.success_threshold = success_threshold
+        self.consistency_threshold = consistency_threshold
+        self.step_spool_dir = step_spool_dir
 
         self.add_steps_to_agent = add_steps_to_agent
         self.add_criteria_to_agent = add_criteria_to_agent
@@ -1509,6 +4123,8 @@ class InstaPipeline(Callable):
         self.add_steps_to_task_proposer = add_steps_to_task_proposer
         self.add_criteria_to_task_proposer = add_criteria_to_task_proposer
 
+        self.worker_pool = None
+
     def generate_trajectory(
         self, url: str, instruction: str
     ) -> Tuple[List[Dict], List[Dict], Dict]:
@@ -1563,6 +4179,8 @@ class InstaPipeline(Callable):
             max_actions = self.max_actions,
             agent_response_key = self.agent_response_key,
             judge_response_key = self.judge_response_key,
+            task_timeout = self.task_timeout,
+            step_timeout = self.step_timeout,
             catch_errors = True,
             log_errors = True,
             max_errors = 1,
@@ -1659,6 +4277,14 @@ class InstaPipeline(Callable):
             judge_response_key = self.judge_response_key,
             skip_finished = self.skip_finished,
             prune_observations = self.prune_observations,
+            storage_format = self.storage_format,
+            num_writer_threads = self.num_writer_threads,
+            task_timeout = self.task_timeout,
+            step_timeout = self.step_timeout,
+            num_samples = self.num_samples,
+            success_threshold = self.success_threshold,
+            consistency_threshold = self.consistency_threshold,
+            step_spool_dir = self.step_spool_dir,
             add_steps_to_agent = self.add_steps_to_agent,
             add_criteria_to_agent = self.add_criteria_to_agent,
             add_steps_to_judge = self.add_steps_to_judge,
@@ -1726,6 +4352,14 @@ class InstaPipeline(Callable):
             judge_response_key = self.judge_response_key,
             skip_finished = self.skip_finished,
             prune_observations = self.prune_observations,
+            storage_format = self.storage_format,
+            num_writer_threads = self.num_writer_threads,
+            task_timeout = self.task_timeout,
+            step_timeout = self.step_timeout,
+            num_samples = self.num_samples,
+            success_threshold = self.success_threshold,
+            consistency_threshold = self.consistency_threshold,
+            step_spool_dir = self.step_spool_dir,
             add_steps_to_agent = self.add_steps_to_agent,
             add_criteria_to_agent = self.add_criteria_to_agent,
             add_steps_to_judge = self.add_steps_to_judge,
@@ -1785,6 +4419,14 @@ class InstaPipeline(Callable):
             judge_response_key = self.judge_response_key,
             skip_finished = self.skip_finished,
             prune_observations = self.prune_observations,
+            storage_format = self.storage_format,
+            num_writer_threads = self.num_writer_threads,
+            task_timeout = self.task_timeout,
+            step_timeout = self.step_timeout,
+            num_samples = self.num_samples,
+            success_threshold = self.success_threshold,
+            consistency_threshold = self.consistency_threshold,
+            step_spool_dir = self.step_spool_dir,
             add_steps_to_agent = self.add_steps_to_agent,
             add_criteria_to_agent = self.add_criteria_to_agent,
             add_steps_to_judge = self.add_steps_to_judge,
@@ -1798,9 +4440,27 @@ class InstaPipeline(Callable):
         return_trajectories: bool = DEFAULT_RETURN_TRAJECTORIES,
         num_agents: int = DEFAULT_NUM_AGENTS,
         playwright_workers: int = DEFAULT_PLAYWRIGHT_WORKERS,
+        rollout_engine: str = DEFAULT_ROLLOUT_ENGINE,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        task_queue_path: str = DEFAULT_TASK_QUEUE_PATH,
+        lease_timeout: float = DEFAULT_LEASE_TIMEOUT,
+        speculation_quantile: float = DEFAULT_SPECULATION_QUANTILE,
+        max_leases_per_domain: int = DEFAULT_MAX_LEASES_PER_DOMAIN,
+        min_domain_interval: float = DEFAULT_MIN_DOMAIN_INTERVAL,
+        share_inference: bool = DEFAULT_SHARE_INFERENCE,
+        max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+        pipeline_judging: bool = DEFAULT_PIPELINE_JUDGING,
+        num_judge_workers: int = DEFAULT_NUM_JUDGE_WORKERS,
+        judge_queue_size: int = DEFAULT_JUDGE_QUEUE_SIZE,
+        target_step_latency: float = DEFAULT_TARGET_STEP_LATENCY,
+        min_agents: int = DEFAULT_MIN_AGENTS,
+        concurrency_metrics_path: str = None,
+        profile_dir: str = DEFAULT_PROFILE_DIR,
+        profile_port: int = DEFAULT_PROFILE_PORT,
     ) -> List[InstaPipelineOutput] | None:
         """Run parallel agents to complete web navigation tasks,
-        such as for performing Deep Research across the whole internet.
+        such as for performing Deep Research across the whole internet,
+        where the agents from start_worker_pool are used when running.
 
         Arguments:
 
@@ -1817,6 +4477,77 @@ class InstaPipeline(Callable):
         playwright_workers: int
             Number of Playwright workers running.
 
+        rollout_engine: str
+            Either "multiprocessing" to run one process per agent, or
+            "asyncio" to run every trajectory as a coroutine in one process.
+
+        max_concurrency: int
+            Maximum number of concurrent trajectories for the asyncio engine.
+
+        task_queue_path: str
+            Path to the SQLite file where agents pull tasks from on demand,
+            by default a temporary file that is removed when finished, or the
+            URL of a coordinator shared by several machines, which replaces
+            the static sharding by rank and world_size.
+
+        lease_timeout: float
+            Number of seconds before a task leased to an agent expires,
+            and the task is handed to another agent.
+
+        speculation_quantile: float
+            Quantile of finished task durations, such as 0.95, after which
+            a running task is also leased to an idle agent, and the first
+            copy to finish is saved, or None to disable speculation.
+
+        max_leases_per_domain: int
+            Maximum number of running tasks on the same domain, where
+            tasks on other domains are leased while a domain is at the limit.
+
+        min_domain_interval: float
+            Minimum number of seconds between starting two tasks on the
+            same domain, or None to start tasks as soon as agents are idle.
+
+        share_inference: bool
+            Whether agents with a local vLLM model share one copy of the
+            model in a broker process, which batches prompts from every agent,
+            and runs on the GPUs visible to the launching process, instead of
+            one GPU per agent.
+
+        max_batch_size: int
+            Maximum number of prompts in each batch for the shared model.
+
+        pipeline_judging: bool
+            Whether agents hand finished trajectories to separate judge
+            workers, instead of waiting for the judge and task proposer,
+            which the asyncio engine does not support.
+
+        num_judge_workers: int
+            Number of judge workers when pipeline_judging is enabled.
+
+        judge_queue_size: int
+            Maximum number of trajectories waiting to be judged, where agents
+            block when the queue is full.
+
+        target_step_latency: float
+            Target p99 seconds for a browser action plus an LLM query, where
+            a controller pauses and resumes agents to stay under the target,
+            or None to keep every agent running, which the asyncio engine
+            does not support.
+
+        min_agents: int
+            Minimum number of agents the controller keeps running.
+
+        concurrency_metrics_path: str
+            Path to a JSON lines file where controller decisions are saved.
+
+        profile_dir: str
+            Directory where each worker saves the duration of every stage
+            of the rollout as JSON lines, or None to disable profiling.
+
+        profile_port: int
+            Port serving the latest durations from profile_dir in the
+            Prometheus text format at /metrics, or None to disable.
+
         Returns:
 
         List[InstaPipelineOutput] | None
@@ -1825,6 +4556,86 @@ class InstaPipeline(Callable):
         
         """
 
+        if rollout_engine == "asyncio":
+
+            from insta.async_pipeline import (
+                launch_async_data_collection
+            )
+
+            return launch_async_data_collection(
+                dataset = dataset,
+                browser_config = self.browser_config,
+                agent_config = self.agent_config,
+                judge_config = self.judge_config,
+                task_proposer_config = self.task_proposer_config,
+                seed = self.seed,
+                rank = self.rank,
+                world_size = self.world_size,
+                observations_dir = self.observations_dir,
+                screenshot_dir = self.screenshot_dir,
+                actions_dir = self.actions_dir,
+                judgments_dir = self.judgments_dir,
+                task_proposals_dir = self.task_proposals_dir,
+                max_actions = self.max_actions,
+                agent_response_key = self.agent_response_key,
+                judge_response_key = self.judge_response_key,
+                skip_finished = self.skip_finished,
+                prune_observations = self.prune_observations,
+                storage_format = self.storage_format,
+                task_timeout = self.task_timeout,
+                step_timeout = self.step_timeout,
+                num_samples = self.num_samples,
+                success_threshold = self.success_threshold,
+                consistency_threshold = self.consistency_threshold,
+                step_spool_dir = self.step_spool_dir,
+                add_steps_to_agent = self.add_steps_to_agent,
+                add_criteria_to_agent = self.add_criteria_to_agent,
+                add_steps_to_judge = self.add_steps_to_judge,
+                add_criteria_to_judge = self.add_criteria_to_judge,
+                add_steps_to_task_proposer = self.add_steps_to_task_proposer,
+                add_criteria_to_task_proposer = self.add_criteria_to_task_proposer,
+                return_trajectories = return_trajectories,
+                max_concurrency = max_concurrency,
+                playwright_workers = playwright_workers,
+                task_queue_path = task_queue_path,
+                lease_timeout = lease_timeout,
+                speculation_quantile = speculation_quantile,
+                max_leases_per_domain = max_leases_per_domain,
+                min_domain_interval = min_domain_interval,
+                pipeline_judging = pipeline_judging,
+                target_step_latency = target_step_latency,
+                profile_dir = profile_dir,
+                profile_port = profile_port,
+            )
+
+        if self.worker_pool is not None:
+
+            check_worker_pool_args(
+                self.worker_pool,
+                num_agents = num_agents,
+                playwright_workers = playwright_workers,
+                task_queue_path = task_queue_path,
+                share_inference = share_inference,
+                max_batch_size = max_batch_size,
+                pipeline_judging = pipeline_judging,
+                num_judge_workers = num_judge_workers,
+                judge_queue_size = judge_queue_size,
+                target_step_latency = target_step_latency,
+                min_agents = min_agents,
+                concurrency_metrics_path = concurrency_metrics_path,
+                profile_dir = profile_dir,
+                profile_port = profile_port,
+            )
+
+            return self.worker_pool.launch(
+                dataset = dataset,
+                return_trajectories = return_trajectories,
+                lease_timeout = lease_timeout,
+                speculation_quantile = speculation_quantile,
+                max_leases_per_domain = max_leases_per_domain,
+                min_domain_interval = min_domain_interval
+            )
+
         return launch_data_collection(
             dataset = dataset,
             browser_config = self.browser_config,
@@ -1844,6 +4655,14 @@ class InstaPipeline(Callable):
             judge_response_key = self.judge_response_key,
             skip_finished = self.skip_finished,
             prune_observations = self.prune_observations,
+            storage_format = self.storage_format,
+            num_writer_threads = self.num_writer_threads,
+            task_timeout = self.task_timeout,
+            step_timeout = self.step_timeout,
+            num_samples = self.num_samples,
+            success_threshold = self.success_threshold,
+            consistency_threshold = self.consistency_threshold,
+            step_spool_dir = self.step_spool_dir,
             add_steps_to_agent = self.add_steps_to_agent,
             add_criteria_to_agent = self.add_criteria_to_agent,
             add_steps_to_judge = self.add_steps_to_judge,
@@ -1853,4 +4672,580 @@ class InstaPipeline(Callable):
             return_trajectories = return_trajectories,
             num_agents = num_agents,
             playwright_workers = playwright_workers,
+            task_queue_path = task_queue_path,
+            lease_timeout = lease_timeout,
+            speculation_quantile = speculation_quantile,
+            max_leases_per_domain = max_leases_per_domain,
+            min_domain_interval = min_domain_interval,
+            share_inference = share_inference,
+            max_batch_size = max_batch_size,
+            pipeline_judging = pipeline_judging,
+            num_judge_workers = num_judge_workers,
+            judge_queue_size = judge_queue_size,
+            target_step_latency = target_step_latency,
+            min_agents = min_agents,
+            concurrency_metrics_path = concurrency_metrics_path,
+            profile_dir = profile_dir,
+            profile_port = profile_port,
+        )
+
+    def stream(
+        self, dataset: List[Dict[str, str]],
+        num_agents: int = DEFAULT_NUM_AGENTS,
+        playwright_workers: int = DEFAULT_PLAYWRIGHT_WORKERS,
+        rollout_engine: str = DEFAULT_ROLLOUT_ENGINE,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        task_queue_path: str = DEFAULT_TASK_QUEUE_PATH,
+        lease_timeout: float = DEFAULT_LEASE_TIMEOUT,
+        speculation_quantile: float = DEFAULT_SPECULATION_QUANTILE,
+        max_leases_per_domain: int = DEFAULT_MAX_LEASES_PER_DOMAIN,
+        min_domain_interval: float = DEFAULT_MIN_DOMAIN_INTERVAL,
+        share_inference: bool = DEFAULT_SHARE_INFERENCE,
+        max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+        pipeline_judging: bool = DEFAULT_PIPELINE_JUDGING,
+        num_judge_workers: int = DEFAULT_NUM_JUDGE_WORKERS,
+        judge_queue_size: int = DEFAULT_JUDGE_QUEUE_SIZE,
+        target_step_latency: float = DEFAULT_TARGET_STEP_LATENCY,
+        min_agents: int = DEFAULT_MIN_AGENTS,
+        concurrency_metrics_path: str = None,
+        profile_dir: str = DEFAULT_PROFILE_DIR,
+        profile_port: int = DEFAULT_PROFILE_PORT,
+    ) -> Generator[InstaPipelineOutput, None, None]:
+        """Run parallel agents like launch, but yield each trajectory as
+        soon as it is finished, where agents wait for the consumer instead
+        of buffering the whole run, and closing the generator early, such
+        as by breaking out of a loop, stops every agent, where the agents
+        from start_worker_pool are used when running.
+
+        Arguments:
+
+        dataset: List[Dict[str, str]]
+            Override the default dataset, and run the pipeline on custom tasks,
+            each entry must be a dictionary with keys "domain" and "task".
+
+        num_agents: int
+            Number of parallel agents to run.
+
+        playwright_workers: int
+            Number of Playwright workers running.
+
+        rollout_engine: str
+            Either "multiprocessing" to run one process per agent, or
+            "asyncio" to run every trajectory as a coroutine in one process.
+
+        max_concurrency: int
+            Maximum number of concurrent trajectories for the asyncio engine.
+
+        task_queue_path: str
+            Path to the SQLite file where agents pull tasks from on demand,
+            by default a temporary file that is removed when finished, or the
+            URL of a coordinator shared by several machines, which replaces
+            the static sharding by rank and world_size.
+
+        lease_timeout: float
+            Number of seconds before a task leased to an agent expires,
+            and the task is handed to another agent.
+
+        speculation_quantile: float
+            Quantile of finished task durations, such as 0.95, after which
+            a running task is also leased to an idle agent, and the first
+            copy to finish is saved, or None to disable speculation.
+
+        max_leases_per_domain: int
+            Maximum number of running tasks on the same domain, where
+            tasks on other domains are leased while a domain is at the limit.
+
+        min_domain_interval: float
+            Minimum number of seconds between starting two tasks on the
+            same domain, or None to start tasks as soon as agents are idle.
+
+        share_inference: bool
+            Whether agents with a local vLLM model share one copy of the
+            model in a broker process, which batches prompts from every agent,
+            and runs on the GPUs visible to the launching process, instead of
+            one GPU per agent.
+
+        max_batch_size: int
+            Maximum number of prompts in each batch for the shared model.
+
+        pipeline_judging: bool
+            Whether agents hand finished trajectories to separate judge
+            workers, instead of waiting for the judge and task proposer,
+            which the asyncio engine does not support.
+
+        num_judge_workers: int
+            Number of judge workers when pipeline_judging is enabled.
+
+        judge_queue_size: int
+            Maximum number of trajectories waiting to be judged, where agents
+            block when the queue is full.
+
+        target_step_latency: float
+            Target p99 seconds for a browser action plus an LLM query, where
+            a controller pauses and resumes agents to stay under the target,
+            or None to keep every agent running, which the asyncio engine
+            does not support.
+
+        min_agents: int
+            Minimum number of agents the controller keeps running.
+
+        concurrency_metrics_path: str
+            Path to a JSON lines file where controller decisions are saved.
+
+        profile_dir: str
+            Directory where each worker saves the duration of every stage
+            of the rollout as JSON lines, or None to disable profiling.
+
+        profile_port: int
+            Port serving the latest durations from profile_dir in the
+            Prometheus text format at /metrics, or None to disable.
+
+        Returns:
+
+        Generator[InstaPipelineOutput, None, None]
+            Generator for the observations, actions, and judgments for each
+            task, in the order that agents finish them.
+        
+        """
+
+        if rollout_engine == "asyncio":
+
+            # run the event loop only while waiting for the next trajectory
+            event_loop = asyncio.new_event_loop()
+
+            pipeline_outputs = self.astream(
+                dataset = dataset,
+                playwright_workers = playwright_workers,
+                rollout_engine = rollout_engine,
+                max_concurrency = max_concurrency,
+                task_queue_path = task_queue_path,
+                lease_timeout = lease_timeout,
+                speculation_quantile = speculation_quantile,
+                max_leases_per_domain = max_leases_per_domain,
+                min_domain_interval = min_domain_interval,
+                pipeline_judging = pipeline_judging,
+                target_step_latency = target_step_latency,
+                profile_dir = profile_dir,
+                profile_port = profile_port,
+            )
+
+            try:
+
+                while True:
+
+                    try:
+
+                        output = event_loop.run_until_complete(
+                            pipeline_outputs.__anext__()
+                        )
+
+                    except StopAsyncIteration:
+
+                        break
+
+                    yield output
+
+            finally:
+
+                event_loop.run_until_complete(
+                    pipeline_outputs.aclose()
+                )
+
+                event_loop.close()
+
+            return
+
+        if self.worker_pool is not None:
+
+            check_worker_pool_args(
+                self.worker_pool,
+                num_agents = num_agents,
+                playwright_workers = playwright_workers,
+                task_queue_path = task_queue_path,
+                share_inference = share_inference,
+                max_batch_size = max_batch_size,
+                pipeline_judging = pipeline_judging,
+                num_judge_workers = num_judge_workers,
+                judge_queue_size = judge_queue_size,
+                target_step_latency = target_step_latency,
+                min_agents = min_agents,
+                concurrency_metrics_path = concurrency_metrics_path,
+                profile_dir = profile_dir,
+                profile_port = profile_port,
+            )
+
+            yield from self.worker_pool.stream(
+                dataset = dataset,
+                lease_timeout = lease_timeout,
+                speculation_quantile = speculation_quantile,
+                max_leases_per_domain = max_leases_per_domain,
+                min_domain_interval = min_domain_interval
+            )
+
+            return
+
+        yield from stream_data_collection(
+            dataset = dataset,
+            browser_config = self.browser_config,
+            agent_config = self.agent_config,
+            judge_config = self.judge_config,
+            task_proposer_config = self.task_proposer_config,
+            seed = self.seed,
+            rank = self.rank,
+            world_size = self.world_size,
+            observations_dir = self.observations_dir,
+            screenshot_dir = self.screenshot_dir,
+            actions_dir = self.actions_dir,
+            judgments_dir = self.judgments_dir,
+            task_proposals_dir = self.task_proposals_dir,
+            max_actions = self.max_actions,
+            agent_response_key = self.agent_response_key,
+            judge_response_key = self.judge_response_key,
+            skip_finished = self.skip_finished,
+            prune_observations = self.prune_observations,
+            storage_format = self.storage_format,
+            num_writer_threads = self.num_writer_threads,
+            task_timeout = self.task_timeout,
+            step_timeout = self.step_timeout,
+            num_samples = self.num_samples,
+            success_threshold = self.success_threshold,
+            consistency_threshold = self.consistency_threshold,
+            step_spool_dir = self.step_spool_dir,
+            add_steps_to_agent = self.add_steps_to_agent,
+            add_criteria_to_agent = self.add_criteria_to_agent,
+            add_steps_to_judge = self.add_steps_to_judge,
+            add_criteria_to_judge = self.add_criteria_to_judge,
+            add_steps_to_task_proposer = self.add_steps_to_task_proposer,
+            add_criteria_to_task_proposer = self.add_criteria_to_task_proposer,
+            return_trajectories = True,
+            num_agents = num_agents,
+            playwright_workers = playwright_workers,
+            task_queue_path = task_queue_path,
+            lease_timeout = lease_timeout,
+            speculation_quantile = speculation_quantile,
+            max_leases_per_domain = max_leases_per_domain,
+            min_domain_interval = min_domain_interval,
+            share_inference = share_inference,
+            max_batch_size = max_batch_size,
+            pipeline_judging = pipeline_judging,
+            num_judge_workers = num_judge_workers,
+            judge_queue_size = judge_queue_size,
+            target_step_latency = target_step_latency,
+            min_agents = min_agents,
+            concurrency_metrics_path = concurrency_metrics_path,
+            profile_dir = profile_dir,
+            profile_port = profile_port,
+        )
+
+    async def astream(
+        self, dataset: List[Dict[str, str]],
+        num_agents: int = DEFAULT_NUM_AGENTS,
+        playwright_workers: int = DEFAULT_PLAYWRIGHT_WORKERS,
+        rollout_engine: str = DEFAULT_ROLLOUT_ENGINE,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        task_queue_path: str = DEFAULT_TASK_QUEUE_PATH,
+        lease_timeout: float = DEFAULT_LEASE_TIMEOUT,
+        speculation_quantile: float = DEFAULT_SPECULATION_QUANTILE,
+        max_leases_per_domain: int = DEFAULT_MAX_LEASES_PER_DOMAIN,
+        min_domain_interval: float = DEFAULT_MIN_DOMAIN_INTERVAL,
+        share_inference: bool = DEFAULT_SHARE_INFERENCE,
+        max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+        pipeline_judging: bool = DEFAULT_PIPELINE_JUDGING,
+        num_judge_workers: int = DEFAULT_NUM_JUDGE_WORKERS,
+        judge_queue_size: int = DEFAULT_JUDGE_QUEUE_SIZE,
+        target_step_latency: float = DEFAULT_TARGET_STEP_LATENCY,
+        min_agents: int = DEFAULT_MIN_AGENTS,
+        concurrency_metrics_path: str = None,
+        profile_dir: str = DEFAULT_PROFILE_DIR,
+        profile_port: int = DEFAULT_PROFILE_PORT,
+    ) -> AsyncGenerator[InstaPipelineOutput, None]:
+        """Run parallel agents like stream, but yield each trajectory to an
+        async for loop, so an event loop, such as a web server, can handle
+        results incrementally, where cancelling the consumer stops every agent.
+
+        Arguments:
+
+        dataset: List[Dict[str, str]]
+            Override the default dataset, and run the pipeline on custom tasks,
+            each entry must be a dictionary with keys "domain" and "task".
+
+        num_agents: int
+            Number of parallel agents to run.
+
+        playwright_workers: int
+            Number of Playwright workers running.
+
+        rollout_engine: str
+            Either "multiprocessing" to run one process per agent, or
+            "asyncio" to run every trajectory as a coroutine in this event loop.
+
+        max_concurrency: int
+            Maximum number of concurrent trajectories for the asyncio engine.
+
+        task_queue_path: str
+            Path to the SQLite file where agents pull tasks from on demand,
+            by default a temporary file that is removed when finished, or the
+            URL of a coordinator shared by several machines, which replaces
+            the static sharding by rank and world_size.
+
+        lease_timeout: float
+            Number of seconds before a task leased to an agent expires,
+            and the task is handed to another agent.
+
+        speculation_quantile: float
+            Quantile of finished task durations, such as 0.95, after which
+            a running task is also leased to an idle agent, and the first
+            copy to finish is saved, or None to disable speculation.
+
+        max_leases_per_domain: int
+            Maximum number of running tasks on the same domain, where
+            tasks on other domains are leased while a domain is at the limit.
+
+        min_domain_interval: float
+            Minimum number of seconds between starting two tasks on the
+            same domain, or None to start tasks as soon as agents are idle.
+
+        share_inference: bool
+            Whether agents with a local vLLM model share one copy of the
+            model in a broker process, which batches prompts from every agent,
+            and runs on the GPUs visible to the launching process, instead of
+            one GPU per agent.
+
+        max_batch_size: int
+            Maximum number of prompts in each batch for the shared model.
+
+        pipeline_judging: bool
+            Whether agents hand finished trajectories to separate judge
+            workers, instead of waiting for the judge and task proposer,
+            which the asyncio engine does not support.
+
+        num_judge_workers: int
+            Number of judge workers when pipeline_judging is enabled.
+
+        judge_queue_size: int
+            Maximum number of trajectories waiting to be judged, where agents
+            block when the queue is full.
+
+        target_step_latency: float
+            Target p99 seconds for a browser action plus an LLM query, where
+            a controller pauses and resumes agents to stay under the target,
+            or None to keep every agent running, which the asyncio engine
+            does not support.
+
+        min_agents: int
+            Minimum number of agents the controller keeps running.
+
+        concurrency_metrics_path: str
+            Path to a JSON lines file where controller decisions are saved.
+
+        profile_dir: str
+            Directory where each worker saves the duration of every stage
+            of the rollout as JSON lines, or None to disable profiling.
+
+        profile_port: int
+            Port serving the latest durations from profile_dir in the
+            Prometheus text format at /metrics, or None to disable.
+
+        Returns:
+
+        AsyncGenerator[InstaPipelineOutput, None]
+            Generator for the observations, actions, and judgments for each
+            task, in the order that agents finish them.
+        
+        """
+
+        if rollout_engine == "asyncio":
+
+            from insta.async_pipeline import (
+                astream_data_collection
+            )
+
+            async for output in astream_data_collection(
+                dataset = dataset,
+                browser_config = self.browser_config,
+                agent_config = self.agent_config,
+                judge_config = self.judge_config,
+                task_proposer_config = self.task_proposer_config,
+                seed = self.seed,
+                rank = self.rank,
+                world_size = self.world_size,
+                observations_dir = self.observations_dir,
+                screenshot_dir = self.screenshot_dir,
+                actions_dir = self.actions_dir,
+                judgments_dir = self.judgments_dir,
+                task_proposals_dir = self.task_proposals_dir,
+                max_actions = self.max_actions,
+                agent_response_key = self.agent_response_key,
+                judge_response_key = self.judge_response_key,
+                skip_finished = self.skip_finished,
+                prune_observations = self.prune_observations,
+                storage_format = self.storage_format,
+                task_timeout = self.task_timeout,
+                step_timeout = self.step_timeout,
+                num_samples = self.num_samples,
+                success_threshold = self.success_threshold,
+                consistency_threshold = self.consistency_threshold,
+                step_spool_dir = self.step_spool_dir,
+                add_steps_to_agent = self.add_steps_to_agent,
+                add_criteria_to_agent = self.add_criteria_to_agent,
+                add_steps_to_judge = self.add_steps_to_judge,
+                add_criteria_to_judge = self.add_criteria_to_judge,
+                add_steps_to_task_proposer = self.add_steps_to_task_proposer,
+                add_criteria_to_task_proposer = self.add_criteria_to_task_proposer,
+                max_concurrency = max_concurrency,
+                playwright_workers = playwright_workers,
+                task_queue_path = task_queue_path,
+                lease_timeout = lease_timeout,
+                speculation_quantile = speculation_quantile,
+                max_leases_per_domain = max_leases_per_domain,
+                min_domain_interval = min_domain_interval,
+                pipeline_judging = pipeline_judging,
+                target_step_latency = target_step_latency,
+                profile_dir = profile_dir,
+                profile_port = profile_port,
+            ):
+
+                yield output
+
+            return
+
+        pipeline_outputs = self.stream(
+            dataset = dataset,
+            num_agents = num_agents,
+            playwright_workers = playwright_workers,
+            rollout_engine = rollout_engine,
+            task_queue_path = task_queue_path,
+            lease_timeout = lease_timeout,
+            speculation_quantile = speculation_quantile,
+            max_leases_per_domain = max_leases_per_domain,
+            min_domain_interval = min_domain_interval,
+            share_inference = share_inference,
+            max_batch_size = max_batch_size,
+            pipeline_judging = pipeline_judging,
+            num_judge_workers = num_judge_workers,
+            judge_queue_size = judge_queue_size,
+            target_step_latency = target_step_latency,
+            min_agents = min_agents,
+            concurrency_metrics_path = concurrency_metrics_path,
+            profile_dir = profile_dir,
+            profile_port = profile_port,
+        )
+
+        # one thread advances the generator, and closes it in order
+        event_loop = asyncio.get_running_loop()
+
+        executor = ThreadPoolExecutor(
+            max_workers = 1
+        )
+
+        try:
+
+            while True:
+
+                output = await event_loop.run_in_executor(
+                    executor, next, pipeline_outputs, None
+                )
+
+                if output is None:
+
+                    break
+
+                yield output
+
+        finally:
+
+            # stop the agents after the pending step, without blocking
+            executor.submit(pipeline_outputs.close)
+            executor.shutdown(wait = False)
+
+    def start_worker_pool(
+        self, num_agents: int = DEFAULT_NUM_AGENTS,
+        playwright_workers: int = DEFAULT_PLAYWRIGHT_WORKERS,
+        share_inference: bool = DEFAULT_SHARE_INFERENCE,
+        max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+    ) -> "WorkerPool":
+        """Start long-lived agent processes that keep their models and
+        tokenizers loaded, where later calls to launch and stream with
+        the multiprocessing engine run on these agents, until close.
+
+        Arguments:
+
+        num_agents: int
+            Number of parallel agents to run.
+
+        playwright_workers: int
+            Number of Playwright workers running.
+
+        share_inference: bool
+            Whether agents with a local vLLM model share one copy of the
+            model in a broker process, which batches prompts from every agent,
+            and runs on the GPUs visible to the launching process, instead of
+            one GPU per agent.
+
+        max_batch_size: int
+            Maximum number of prompts in each batch for the shared model.
+
+        Returns:
+
+        WorkerPool
+            The pool of warm agents used by this pipeline.
+
+        """
+
+        from insta.worker_pool import (
+            WorkerPool
+        )
+
+        self.close()
+
+        self.worker_pool = WorkerPool(
+            browser_config = self.browser_config,
+            agent_config = self.agent_config,
+            judge_config = self.judge_config,
+            task_proposer_config = self.task_proposer_config,
+            seed = self.seed,
+            rank = self.rank,
+            world_size = self.world_size,
+            num_agents = num_agents,
+            playwright_workers = playwright_workers,
+            share_inference = share_inference,
+            max_batch_size = max_batch_size,
+            collection_kwargs = dict(
+                observations_dir = self.observations_dir,
+                screenshot_dir = self.screenshot_dir,
+                actions_dir = self.actions_dir,
+                judgments_dir = self.judgments_dir,
+                task_proposals_dir = self.task_proposals_dir,
+                max_actions = self.max_actions,
+                agent_response_key = self.agent_response_key,
+                judge_response_key = self.judge_response_key,
+                skip_finished = self.skip_finished,
+                prune_observations = self.prune_observations,
+                storage_format = self.storage_format,
+                num_writer_threads = self.num_writer_threads,
+                task_timeout = self.task_timeout,
+                step_timeout = self.step_timeout,
+                num_samples = self.num_samples,
+                success_threshold = self.success_threshold,
+                consistency_threshold = self.consistency_threshold,
+                step_spool_dir = self.step_spool_dir,
+                add_steps_to_agent = self.add_steps_to_agent,
+                add_criteria_to_agent = self.add_criteria_to_agent,
+                add_steps_to_judge = self.add_steps_to_judge,
+                add_criteria_to_judge = self.add_criteria_to_judge,
+                add_steps_to_task_proposer = self.add_steps_to_task_proposer,
+                add_criteria_to_task_proposer = self.add_criteria_to_task_proposer,
+            )
         )
+
+        return self.worker_pool
+
+    def close(self) -> None:
+        """Stop the warm agents started by start_worker_pool, if any.
+
+        """
+
+        if self.worker_pool is not None:
+
+            self.worker_pool.close()
+            self.worker_pool = None
@@ -0,0 +1,565 @@
+from http.server import (
+    BaseHTTPRequestHandler,
+    ThreadingHTTPServer
+)
+
+from typing import Any, Dict, List
+
+import contextlib
+import bisect
+import threading
+import json
+import time
+import glob
+import os
+
+
+DEFAULT_PROFILE_DIR = None
+DEFAULT_PROFILE_PORT = None
+DEFAULT_PROFILE_FLUSH_INTERVAL = 30
+
+PROFILE_PREFIX = "profile-"
+PROFILE_QUANTILES = [0.5, 0.95, 0.99]
+
+
+# geometric buckets from one millisecond to about twenty minutes
+HISTOGRAM_BUCKETS = [
+    0.001 * 2 ** (bucket_idx / 4)
+    for bucket_idx in range(81)
+]
+
+
+NULL_SPAN = contextlib.nullcontext()
+
+
+class StageHistogram(object):
+    """Histogram of the durations of one stage of the rollout, with
+    geometric buckets, so quantiles are estimated in constant memory.
+
+    Attributes:
+
+    count: int
+        Number of durations recorded.
+
+    total: float
+        Sum of the durations recorded, in seconds.
+
+    maximum: float
+        Longest duration recorded, in seconds.
+
+    bucket_counts: List[int]
+        Number of durations in each bucket, where the last bucket holds
+        durations longer than the largest bucket boundary.
+
+    """
+
+    def __init__(self):
+        """Histogram of the durations of one stage of the rollout, with
+        geometric buckets, so quantiles are estimated in constant memory.
+
+        """
+
+        self.count = 0
+        self.total = 0.0
+        self.maximum = 0.0
+
+        self.bucket_counts = [0] * (
+            len(HISTOGRAM_BUCKETS) + 1
+        )
+
+    def add(self, seconds: float) -> None:
+        """Record the duration of the stage.
+
+        Arguments:
+
+        seconds: float
+            Duration of the stage in seconds.
+
+        """
+
+        self.count += 1
+        self.total += seconds
+        self.maximum = max(self.maximum, seconds)
+
+        self.bucket_counts[bisect.bisect_left(
+            HISTOGRAM_BUCKETS, seconds
+        )] += 1
+
+    def quantile(self, quantile: float) -> float | None:
+        """Estimate a quantile of the durations, as the upper boundary
+        of the bucket holding that quantile.
+
+        Arguments:
+
+        quantile: float
+            Quantile between 0 and 1, such as 0.99 for the p99.
+
+        Returns:
+
+        float | None
+            Estimated duration in seconds, or None if nothing was recorded.
+
+        """
+
+        if self.count == 0:
+
+            return None
+
+        target_count = quantile * self.count
+        cumulative_count = 0
+
+        for bucket_idx, bucket_count in enumerate(self.bucket_counts):
+
+            cumulative_count += bucket_count
+
+            if cumulative_count >= target_count and bucket_count > 0:
+
+                if bucket_idx == len(HISTOGRAM_BUCKETS):
+
+                    return self.maximum
+
+                return min(
+                    HISTOGRAM_BUCKETS[bucket_idx],
+                    self.maximum
+                )
+
+        return self.maximum
+
+    def to_dict(self) -> Dict[str, float | int]:
+        """Summarize the histogram as JSON.
+
+        Returns:
+
+        Dict[str, float | int]
+            Count, sum, maximum, and quantiles of the durations.
+
+        """
+
+        summary = {
+            "count": self.count,
+            "sum": self.total,
+            "max": self.maximum,
+        }
+
+        for quantile in PROFILE_QUANTILES:
+
+            summary["p{:g}".format(quantile * 100)] = (
+                self.quantile(quantile)
+            )
+
+        return summary
+
+
+class Profiler(object):
+    """Aggregates the duration of each stage of the rollout in one worker,
+    such as browser calls, observation processing, and LLM queries, and
+    appends a snapshot of every stage to a JSON lines file periodically.
+
+    Attributes:
+
+    worker_id: str
+        Unique identifier for the worker being profiled.
+
+    path: str
+        Path to the JSON lines file where snapshots are appended.
+
+    flush_interval: float
+        Number of seconds between snapshots.
+
+    stages: Dict[str, StageHistogram]
+        Histogram of durations for each stage.
+
+    """
+
+    def __init__(self, worker_id: str, path: str = None,
+                 flush_interval: float = DEFAULT_PROFILE_FLUSH_INTERVAL):
+        """Aggregates the duration of each stage of the rollout in one worker,
+        such as browser calls, observation processing, and LLM queries, and
+        appends a snapshot of every stage to a JSON lines file periodically.
+
+        Arguments:
+
+        worker_id: str
+            Unique identifier for the worker being profiled.
+
+        path: str
+            Path to the JSON lines file where snapshots are appended.
+
+        flush_interval: float
+            Number of seconds between snapshots.
+
+        """
+
+        self.worker_id = worker_id
+        self.path = path
+        self.flush_interval = flush_interval
+
+        self.stages = {}
+
+        self.lock = threading.Lock()
+        self.last_flush_time = time.time()
+
+    def record(self, stage: str, seconds: float) -> None:
+        """Record the duration of a stage, and append a snapshot when
+        the flush interval has passed since the last snapshot.
+
+        Arguments:
+
+        stage: str
+            Name of the stage, such as "browser.observation".
+
+        seconds: float
+            Duration of the stage in seconds.
+
+        """
+
+        with self.lock:
+
+            histogram = self.stages.get(stage)
+
+            if histogram is None:
+
+                histogram = self.stages[stage] = StageHistogram()
+
+            histogram.add(seconds)
+
+            flush_due = (
+                self.path is not None and
+                time.time() - self.last_flush_time > self.flush_interval
+            )
+
+            if flush_due:
+
+                self.last_flush_time = time.time()
+
+        if flush_due:
+
+            self.flush()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Summarize every stage recorded by the worker so far.
+
+        Returns:
+
+        Dict[str, Any]
+            Time, worker identifier, and summary of each stage.
+
+        """
+
+        with self.lock:
+
+            return {
+                "time": time.time(),
+                "worker_id": self.worker_id,
+                "stages": {
+                    stage: histogram.to_dict()
+                    for stage, histogram in sorted(self.stages.items())
+                },
+            }
+
+    def flush(self) -> None:
+        """Append a snapshot of every stage to the JSON lines file.
+
+        """
+
+        if self.path is None:
+
+            return
+
+        snapshot = self.snapshot()
+
+        with self.lock:
+
+            self.last_flush_time = snapshot["time"]
+
+            with open(self.path, "a") as file:
+
+                file.write(json.dumps(snapshot) + "\n")
+
+
+class Span(object):
+    """Context manager that records the time spent inside it as one
+    duration of a stage.
+
+    Attributes:
+
+    profiler: Profiler
+        Profiler that receives the duration.
+
+    stage: str
+        Name of the stage being measured.
+
+    """
+
+    __slots__ = ["profiler", "stage", "start_time"]
+
+    def __init__(self, profiler: Profiler, stage: str):
+
+        self.profiler = profiler
+        self.stage = stage
+
+    def __enter__(self) -> "Span":
+
+        self.start_time = time.perf_counter()
+
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+
+        self.profiler.record(
+            self.stage,
+            time.perf_counter() - self.start_time
+        )
+
+
+_profiler = None
+
+
+def enable_profiling(worker_id: str, profile_dir: str = None,
+                     flush_interval: float = DEFAULT_PROFILE_FLUSH_INTERVAL
+                     ) -> Profiler:
+    """Start profiling the stages of the rollout in this process, where
+    snapshots are appended to a file named after the worker.
+
+    Arguments:
+
+    worker_id: str
+        Unique identifier for the worker being profiled.
+
+    profile_dir: str
+        Directory where snapshots are saved, or None to keep them in memory.
+
+    flush_interval: float
+        Number of seconds between snapshots.
+
+    Returns:
+
+    Profiler
+        The profiler for this process.
+
+    """
+
+    global _profiler
+
+    path = None
+
+    if profile_dir is not None:
+
+        os.makedirs(
+            profile_dir,
+            exist_ok = True
+        )
+
+        path = os.path.join(
+            profile_dir,
+            "{}{}.jsonl".format(PROFILE_PREFIX, worker_id)
+        )
+
+    _profiler = Profiler(
+        worker_id = worker_id,
+        path = path,
+        flush_interval = flush_interval
+    )
+
+    return _profiler
+
+
+def disable_profiling() -> None:
+    """Save a final snapshot, and stop profiling in this process.
+
+    """
+
+    global _profiler
+
+    if _profiler is not None:
+
+        _profiler.flush()
+
+    _profiler = None
+
+
+def get_profiler() -> Profiler | None:
+    """Return the profiler for this process.
+
+    Returns:
+
+    Profiler | None
+        The profiler, or None if profiling is disabled.
+
+    """
+
+    return _profiler
+
+
+def span(stage: str) -> Span | contextlib.nullcontext:
+    """Measure the time spent in a stage of the rollout, which costs one
+    global lookup when profiling is disabled.
+
+    Arguments:
+
+    stage: str
+        Name of the stage, such as "browser.observation".
+
+    Returns:
+
+    Span | contextlib.nullcontext
+        Context manager wrapping the stage.
+
+    """
+
+    if _profiler is None:
+
+        return NULL_SPAN
+
+    return Span(_profiler, stage)
+
+
+def load_profiles(profile_dir: str) -> List[Dict[str, Any]]:
+    """Read the latest snapshot saved by every worker in a directory.
+
+    Arguments:
+
+    profile_dir: str
+        Directory where snapshots are saved.
+
+    Returns:
+
+    List[Dict[str, Any]]
+        Latest snapshot for each worker.
+
+    """
+
+    snapshots = []
+
+    for path in sorted(glob.glob(os.path.join(
+            profile_dir, PROFILE_PREFIX + "*.jsonl"))):
+
+        last_line = None
+
+        with open(path, "r") as file:
+
+            for line in file:
+
+                if line.endswith("\n"):
+
+                    last_line = line
+
+        if last_line is not None:
+
+            snapshots.append(json.loads(last_line))
+
+    return snapshots
+
+
+def render_prometheus(snapshots: List[Dict[str, Any]]) -> str:
+    """Format snapshots as Prometheus summaries, with one series per
+    worker and stage.
+
+    Arguments:
+
+    snapshots: List[Dict[str, Any]]
+        Latest snapshot for each worker.
+
+    Returns:
+
+    str
+        Metrics in the Prometheus text exposition format.
+
+    """
+
+    lines = [
+        "# HELP insta_stage_seconds Duration of each stage of the rollout.",
+        "# TYPE insta_stage_seconds summary",
+    ]
+
+    for snapshot in snapshots:
+
+        for stage, summary in snapshot["stages"].items():
+
+            labels = 'worker="{}",stage="{}"'.format(
+                snapshot["worker_id"], stage
+            )
+
+            for quantile in PROFILE_QUANTILES:
+
+                value = summary.get("p{:g}".format(quantile * 100))
+
+                if value is not None:
+
+                    lines.append(
+                        'insta_stage_seconds{{{},quantile="{:g}"}} {}'.format(
+                            labels, quantile, value
+                        )
+                    )
+
+            lines.append("insta_stage_seconds_sum{{{}}} {}".format(
+                labels, summary["sum"]
+            ))
+
+            lines.append("insta_stage_seconds_count{{{}}} {}".format(
+                labels, summary["count"]
+            ))
+
+    return "\n".join(lines) + "\n"
+
+
+def serve_profiles(profile_dir: str, port: int,
+                   host: str = "0.0.0.0") -> ThreadingHTTPServer:
+    """Serve the latest snapshot of every worker at /metrics in a
+    background thread, for scraping by Prometheus.
+
+    Arguments:
+
+    profile_dir: str
+        Directory where snapshots are saved.
+
+    port: int
+        Port for the server to listen on.
+
+    host: str
+        Address for the server to listen on.
+
+    Returns:
+
+    ThreadingHTTPServer
+        The running server, which is stopped with `shutdown`.
+
+    """
+
+    class ProfileRequestHandler(BaseHTTPRequestHandler):
+
+        def do_GET(self):
+
+            if self.path.split("?")[0] != "/metrics":
+
+                self.send_error(404)
+
+                return
+
+            response = render_prometheus(
+                load_profiles(profile_dir)
+            ).encode("utf-8")
+
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(response)))
+            self.end_headers()
+
+            self.wfile.write(response)
+
+        def log_message(self, format: str, *args: Any) -> None:
+
+            return None
+
+    server = ThreadingHTTPServer(
+        (host, port),
+        ProfileRequestHandler
+    )
+
+    threading.Thread(
+        target = server.serve_forever,
+        name = "insta-profiles",
+        daemon = True
+    ).start()
+
+    return server
@@ -0,0 +1,456 @@
+from http.server import (
+    BaseHTTPRequestHandler,
+    ThreadingHTTPServer
+)
+
+from urllib.parse import (
+    urlparse,
+    parse_qs
+)
+
+from typing import Any, Dict, List
+
+import threading
+import hashlib
+import json
+import uuid
+import os
+
+
+DEFAULT_REPLAY_HOST = "0.0.0.0"
+DEFAULT_REPLAY_PORT = 3000
+
+
+RECORDED_ENDPOINTS = [
+    "start",
+    "goto",
+    "observation",
+    "action",
+]
+
+
+def get_recording_path(record_dir: str, url: str) -> str:
+    """Select the file holding the recorded traffic of a session, named
+    after a hash of the first URL the session navigated to.
+
+    Arguments:
+
+    record_dir: str
+        Directory where recorded sessions are saved.
+
+    url: str
+        The first URL the session navigated to.
+
+    Returns:
+
+    str
+        Path to the JSON lines file for the session.
+
+    """
+
+    return os.path.join(
+        record_dir,
+        "{}.jsonl".format(hashlib.sha1(
+            url.encode("utf-8")
+        ).hexdigest())
+    )
+
+
+class RecordedResponse(object):
+    """Response from the Playwright server that was saved to disk, with
+    the subset of the `requests.Response` interface used by the client.
+
+    Attributes:
+
+    status_code: int
+        HTTP status code of the response.
+
+    text: str
+        Body of the response.
+
+    headers: Dict[str, str]
+        Headers of the response, which are not recorded.
+
+    """
+
+    def __init__(self, status_code: int, text: str):
+        """Response from the Playwright server that was saved to disk, with
+        the subset of the `requests.Response` interface used by the client.
+
+        Arguments:
+
+        status_code: int
+            HTTP status code of the response.
+
+        text: str
+            Body of the response.
+
+        """
+
+        self.status_code = status_code
+        self.text = text
+
+        self.headers = {}
+
+    @property
+    def content(self) -> bytes:
+
+        return self.text.encode("utf-8")
+
+    def json(self) -> Any:
+
+        return json.loads(self.text)
+
+
+class SessionRecorder(object):
+    """Captures the responses from the Playwright server for one browsing
+    session, and saves them once the session ends, so the session can be
+    replayed without a browser or network.
+
+    Attributes:
+
+    record_dir: str
+        Directory where recorded sessions are saved.
+
+    url: str
+        The first URL the session navigated to.
+
+    records: List[Dict[str, Any]]
+        Endpoint, status code, and body of each response in order.
+
+    """
+
+    def __init__(self, record_dir: str):
+        """Captures the responses from the Playwright server for one browsing
+        session, and saves them once the session ends, so the session can be
+        replayed without a browser or network.
+
+        Arguments:
+
+        record_dir: str
+            Directory where recorded sessions are saved.
+
+        """
+
+        self.record_dir = record_dir
+
+        self.url = None
+        self.records = []
+
+    def add(self, endpoint: str, response: Any, url: str = None) -> None:
+        """Capture a response from the Playwright server.
+
+        Arguments:
+
+        endpoint: str
+            Name of the endpoint, one of RECORDED_ENDPOINTS.
+
+        response: Any
+            Response with a status code and text body.
+
+        url: str
+            URL requested by a goto, which names the recording.
+
+        """
+
+        if endpoint == "goto" and self.url is None:
+
+            self.url = url
+
+        self.records.append({
+            "endpoint": endpoint,
+            "status_code": response.status_code,
+            "text": response.text,
+        })
+
+    def save(self) -> None:
+        """Write the captured responses to disk, replacing any earlier
+        recording of a session that started from the same URL, and start
+        capturing a new session.
+
+        """
+
+        if self.url is not None and len(self.records) > 0:
+
+            os.makedirs(
+                self.record_dir,
+                exist_ok = True
+            )
+
+            recording_path = get_recording_path(
+                self.record_dir, self.url
+            )
+
+            # workers recording the same URL never leave a partial file
+            temporary_path = "{}.{}.tmp".format(
+                recording_path, uuid.uuid4().hex
+            )
+
+            with open(temporary_path, "w") as file:
+
+                file.write(json.dumps({"url": self.url}) + "\n")
+
+                for record in self.records:
+
+                    file.write(json.dumps(record) + "\n")
+
+            os.replace(
+                temporary_path,
+                recording_path
+            )
+
+        self.url = None
+        self.records = []
+
+
+class SessionReplayer(object):
+    """Serves the recorded responses for one browsing session in order,
+    where each endpoint keeps its own position in the recording, so an
+    agent taking a different number of actions still sees the recorded
+    observations in the recorded order.
+
+    Attributes:
+
+    replay_dir: str
+        Directory where recorded sessions are saved.
+
+    records: Dict[str, List[Dict[str, Any]]]
+        Recorded responses for each endpoint, in order.
+
+    positions: Dict[str, int]
+        Number of responses already served for each endpoint.
+
+    """
+
+    def __init__(self, replay_dir: str):
+        """Serves the recorded responses for one browsing session in order,
+        where each endpoint keeps its own position in the recording, so an
+        agent taking a different number of actions still sees the recorded
+        observations in the recorded order.
+
+        Arguments:
+
+        replay_dir: str
+            Directory where recorded sessions are saved.
+
+        """
+
+        self.replay_dir = replay_dir
+
+        self.records = {}
+        self.positions = {}
+
+    def load(self, url: str) -> bool:
+        """Load the recording of a session that started from a URL.
+
+        Arguments:
+
+        url: str
+            The first URL the session navigated to.
+
+        Returns:
+
+        bool
+            Whether a recording was found for the URL.
+
+        """
+
+        self.records = {
+            endpoint: []
+            for endpoint in RECORDED_ENDPOINTS
+        }
+
+        self.positions = {
+            endpoint: 0
+            for endpoint in RECORDED_ENDPOINTS
+        }
+
+        recording_path = get_recording_path(
+            self.replay_dir, url
+        )
+
+        if not os.path.exists(recording_path):
+
+            return False
+
+        with open(recording_path, "r") as file:
+
+            next(file)
+
+            for line in file:
+
+                record = json.loads(line)
+
+                self.records[record["endpoint"]].append(
+                    record
+                )
+
+        return True
+
+    def next(self, endpoint: str, url: str = None) -> RecordedResponse:
+        """Serve the next recorded response for an endpoint, where a goto
+        loads the recording for its URL, and the last response recorded
+        for an endpoint is served again once its responses run out.
+
+        Arguments:
+
+        endpoint: str
+            Name of the endpoint, one of RECORDED_ENDPOINTS.
+
+        url: str
+            URL requested by a goto.
+
+        Returns:
+
+        RecordedResponse
+            The recorded response, or a 404 response if nothing was
+            recorded for the endpoint.
+
+        """
+
+        if endpoint == "goto" and not self.load(url):
+
+            return RecordedResponse(
+                status_code = 404,
+                text = "No recording for {}".format(url)
+            )
+
+        records = self.records.get(endpoint, [])
+
+        if len(records) == 0:
+
+            return RecordedResponse(
+                status_code = 404,
+                text = "No recorded {} response".format(endpoint)
+            )
+
+        position = min(
+            self.positions[endpoint],
+            len(records) - 1
+        )
+
+        self.positions[endpoint] += 1
+
+        return RecordedResponse(
+            status_code = records[position]["status_code"],
+            text = records[position]["text"]
+        )
+
+
+def serve_replay(
+    replay_dir: str,
+    host: str = DEFAULT_REPLAY_HOST,
+    port: int = DEFAULT_REPLAY_PORT,
+) -> None:
+    """Serve recorded sessions with the same endpoints as the Playwright
+    server until interrupted, so an unmodified client pointed at this
+    server replays the recordings without a browser or network.
+
+    Arguments:
+
+    replay_dir: str
+        Directory where recorded sessions are saved.
+
+    host: str
+        Address for the server to listen on.
+
+    port: int
+        Port for the server to listen on.
+
+    """
+
+    sessions = {}
+    lock = threading.Lock()
+
+    class ReplayRequestHandler(BaseHTTPRequestHandler):
+
+        def do_POST(self):
+
+            request = urlparse(self.path)
+            endpoint = request.path.strip("/")
+
+            query = {
+                key: values[0]
+                for key, values in parse_qs(request.query).items()
+            }
+
+            self.rfile.read(int(self.headers.get(
+                "Content-Length", 0
+            )))
+
+            with lock:
+
+                if endpoint == "start":
+
+                    session_id = uuid.uuid4().hex
+
+                    sessions[session_id] = SessionReplayer(
+                        replay_dir = replay_dir
+                    )
+
+                    response = RecordedResponse(
+                        status_code = 200,
+                        text = session_id
+                    )
+
+                elif query.get("session_id") not in sessions:
+
+                    response = RecordedResponse(
+                        status_code = 404,
+                        text = "Unknown session"
+                    )
+
+                elif endpoint == "close":
+
+                    sessions.pop(query["session_id"])
+
+                    response = RecordedResponse(
+                        status_code = 200,
+                        text = "closed"
+                    )
+
+                elif endpoint in RECORDED_ENDPOINTS:
+
+                    response = sessions[query["session_id"]].next(
+                        endpoint, url = query.get("url")
+                    )
+
+                else:
+
+                    response = RecordedResponse(
+                        status_code = 404,
+                        text = "Unknown endpoint"
+                    )
+
+            data = response.text.encode("utf-8")
+
+            self.send_response(response.status_code)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+
+            self.wfile.write(data)
+
+        def log_message(self, format: str, *args: Any) -> None:
+
+            return None
+
+    server = ThreadingHTTPServer(
+        (host, port),
+        ReplayRequestHandler
+    )
+
+    print("Replaying sessions from {} on {}:{}".format(
+        replay_dir, host, port
+    ))
+
+    try:
+
+        server.serve_forever()
+
+    except KeyboardInterrupt:
+
+        pass
+
+    finally:
+
+        server.server_close()
@@ -0,0 +1,259 @@
+from typing import Dict, List
+from PIL import Image
+
+import tempfile
+import base64
+import shutil
+import json
+import uuid
+import os
+
+
+DEFAULT_STEP_SPOOL_DIR = None
+
+
+SPOOLED_STEP_KEY = "step_path"
+SPOOLED_SCREENSHOT_KEY = "spooled_screenshot_path"
+
+
+class StepSpool(object):
+    """Writes the heavy fields of each observation to disk as soon as the
+    step finishes, such as the screenshot, raw HTML, and node metadata,
+    and keeps a compact record in memory with only the fields used by
+    the agent and judge prompts, so the memory held by a trajectory does
+    not grow with the number of steps.
+
+    Attributes:
+
+    spool_dir: str
+        Directory owned by this spool, where each step is written as a
+        JSON file and a screenshot named with a random identifier.
+
+    """
+
+    def __init__(self, spool_dir: str = DEFAULT_STEP_SPOOL_DIR):
+        """Writes the heavy fields of each observation to disk as soon as the
+        step finishes, such as the screenshot, raw HTML, and node metadata,
+        and keeps a compact record in memory with only the fields used by
+        the agent and judge prompts.
+
+        Arguments:
+
+        spool_dir: str
+            Parent directory for the spool, such as a local disk, or None
+            to use the default temporary directory.
+
+        """
+
+        if spool_dir is not None:
+
+            os.makedirs(
+                spool_dir,
+                exist_ok = True
+            )
+
+        self.spool_dir = tempfile.mkdtemp(
+            prefix = "insta-steps-",
+            dir = spool_dir
+        )
+
+    def add(self, observation: Dict) -> Dict:
+        """Write an observation to disk, and return its compact record.
+
+        Arguments:
+
+        observation: Dict
+            Observation with the keys "current_url", "processed_text",
+            "raw_html", "screenshot", and "metadata".
+
+        Returns:
+
+        Dict
+            Record with the URL, processed text, and path to the step,
+            which is restored to the full observation with
+            `restore_spooled_step` when the trajectory is saved.
+
+        """
+
+        step_id = uuid.uuid4().hex
+
+        step_path = os.path.join(
+            self.spool_dir,
+            "{}.json".format(step_id)
+        )
+
+        spooled_step = {
+            "current_url": observation["current_url"],
+            "processed_text": observation["processed_text"],
+            "raw_html": observation["raw_html"],
+            "metadata": observation["metadata"],
+        }
+
+        screenshot = observation.get("screenshot")
+
+        if isinstance(screenshot, str):
+
+            screenshot = base64.b64decode(
+                screenshot
+            )
+
+        # PNG bytes from the server are written without decoding, and
+        # converted to JPEG when the trajectory is saved
+        if isinstance(screenshot, (bytes, bytearray, memoryview)):
+
+            if len(screenshot) > 0:
+
+                screenshot_path = os.path.join(
+                    self.spool_dir,
+                    "{}.png".format(step_id)
+                )
+
+                with open(screenshot_path, "wb") as file:
+
+                    file.write(screenshot)
+
+                spooled_step[SPOOLED_SCREENSHOT_KEY] = screenshot_path
+
+        elif screenshot is not None:
+
+            screenshot_path = os.path.join(
+                self.spool_dir,
+                "{}.jpg".format(step_id)
+            )
+
+            screenshot.convert("RGB").save(
+                screenshot_path
+            )
+
+            spooled_step[SPOOLED_SCREENSHOT_KEY] = screenshot_path
+
+        with open(step_path, "w") as file:
+
+            json.dump(spooled_step, file)
+
+        return {
+            "current_url": observation["current_url"],
+            "processed_text": observation["processed_text"],
+            SPOOLED_STEP_KEY: step_path,
+        }
+
+    def close(self) -> None:
+        """Delete the spool, including steps of trajectories that were
+        abandoned before being saved.
+
+        """
+
+        shutil.rmtree(
+            self.spool_dir,
+            ignore_errors = True
+        )
+
+
+def is_spooled_step(observation: Dict) -> bool:
+    """Check whether an observation is a compact record written by a
+    StepSpool, whose heavy fields are stored on disk.
+
+    Arguments:
+
+    observation: Dict
+        Observation along a trajectory.
+
+    Returns:
+
+    bool
+        Whether the observation was spooled.
+
+    """
+
+    return SPOOLED_STEP_KEY in observation
+
+
+def restore_spooled_step(observation: Dict,
+                         screenshot_path: str = None) -> Dict:
+    """Read the full observation for a spooled step, and move its
+    screenshot to the final location, which consumes the spooled files,
+    where screenshots spooled as PNG bytes are converted to JPEG.
+
+    Arguments:
+
+    observation: Dict
+        Compact record returned by `StepSpool.add`.
+
+    screenshot_path: str
+        Final path for the screenshot, or None to delete the screenshot.
+
+    Returns:
+
+    Dict
+        Observation with the keys "current_url", "processed_text",
+        "raw_html", "metadata", and "screenshot_path" when the step had
+        a screenshot, matching observations saved without a spool.
+
+    """
+
+    step_path = observation[SPOOLED_STEP_KEY]
+
+    with open(step_path, "r") as file:
+
+        restored_observation = json.load(file)
+
+    os.remove(step_path)
+
+    spooled_screenshot_path = restored_observation.pop(
+        SPOOLED_SCREENSHOT_KEY, None
+    )
+
+    if spooled_screenshot_path is not None:
+
+        if screenshot_path is None:
+
+            os.remove(spooled_screenshot_path)
+
+        elif spooled_screenshot_path.endswith(".png"):
+
+            Image.open(spooled_screenshot_path).convert("RGB").save(
+                screenshot_path
+            )
+
+            os.remove(spooled_screenshot_path)
+
+            restored_observation["screenshot_path"] = screenshot_path
+
+        else:
+
+            shutil.move(
+                spooled_screenshot_path,
+                screenshot_path
+            )
+
+            restored_observation["screenshot_path"] = screenshot_path
+
+    return restored_observation
+
+
+def remove_spooled_steps(observations: List[Dict]) -> None:
+    """Delete the spooled files for a trajectory that will not be saved,
+    such as a sample that lost to a better sample.
+
+    Arguments:
+
+    observations: List[Dict]
+        Observations along the trajectory.
+
+    """
+
+    for observation in observations:
+
+        if not is_spooled_step(observation):
+
+            continue
+
+        step_path = observation[SPOOLED_STEP_KEY]
+
+        step_prefix = step_path[:-len(".json")]
+
+        for path in [step_path, step_prefix + ".jpg", step_prefix + ".png"]:
+
+            if os.path.exists(path):
+
+                os.remove(path)
@@ -4,6 +4,7 @@ from insta.task_proposer_prompts import (
 
 from insta.utils import (
     safe_call,
+    merge_timeout_kwargs,
     BrowserStatus
 )
 
@@ -13,6 +14,8 @@ from insta.configs.task_proposer_config import (
     BrowserTaskProposal
 )
 
+from insta.profiling import span
+
 from typing import Tuple, List, Callable
 from transformers import AutoTokenizer
 
@@ -199,19 +202,23 @@ class BrowserTaskProposer(Callable):
             last_obs = last_obs
         )
 
-        if self.config.client_type == "vllm":
+        with span("task_proposer.llm"):
 
-            response = self.llm_client.chat(
-                messages = messages,
-                sampling_params = self.sampling_params
-            )[0].outputs[0].text
+            if self.config.client_type == "vllm":
 
-        elif self.config.client_type == "openai":
+                response = self.llm_client.chat(
+                    messages = messages,
+                    sampling_params = self.sampling_params
+                )[0].outputs[0].text
 
-            response = self.llm_client.chat.completions.create(
-                messages = messages,
-                **self.config.generation_kwargs
-            ).choices[0].message.content
+            elif self.config.client_type == "openai":
+
+                response = self.llm_client.chat.completions.create(
+                    messages = messages,
+                    **merge_timeout_kwargs(
+                        self.config.generation_kwargs
+                    )
+                ).choices[0].message.content
 
         return self.task_proposer_prompt.parse_task(
             response = response
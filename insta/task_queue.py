@@ -0,0 +1,1135 @@
+from insta.utils import (
+    BrowserStatus,
+    safe_call
+)
+
+from typing import Any, List, Dict, Tuple
+
+import threading
+import abc
+import requests
+import sqlite3
+import socket
+import time
+import os
+
+
+DEFAULT_LEASE_TIMEOUT = 60 * 60
+DEFAULT_SQLITE_TIMEOUT = 60
+
+
+DEFAULT_SPECULATION_QUANTILE = None
+DEFAULT_MIN_SPECULATION_SAMPLES = 20
+DEFAULT_SPECULATION_POLL_INTERVAL = 5
+
+
+DEFAULT_MAX_LEASES_PER_DOMAIN = None
+DEFAULT_MIN_DOMAIN_INTERVAL = None
+DEFAULT_POLITENESS_POLL_INTERVAL = 1
+
+
+DEFAULT_COORDINATOR_REQUEST_TIMEOUT = 60
+DEFAULT_COORDINATOR_MAX_ERRORS = 5
+DEFAULT_HEARTBEAT_INTERVAL = 30
+
+
+TASK_STATUS_PENDING = "pending"
+TASK_STATUS_LEASED = "leased"
+TASK_STATUS_DONE = "done"
+
+
+CREATE_TASKS_TABLE = """
+CREATE TABLE IF NOT EXISTS tasks (
+    example_id INTEGER PRIMARY KEY,
+    position INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    worker_id TEXT,
+    lease_expiry REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    leased_at REAL,
+    duration REAL,
+    speculative_worker_id TEXT,
+    domain TEXT
+)
+"""
+
+
+# columns added after the first release, for queues created before them
+ADDED_TASK_COLUMNS = {
+    "leased_at": "REAL",
+    "duration": "REAL",
+    "speculative_worker_id": "TEXT",
+    "domain": "TEXT",
+}
+
+
+CREATE_POSITION_INDEX = """
+CREATE INDEX IF NOT EXISTS tasks_by_status
+ON tasks (status, position)
+"""
+
+
+CREATE_LEASED_AT_INDEX = """
+CREATE INDEX IF NOT EXISTS tasks_by_leased_at
+ON tasks (leased_at)
+"""
+
+
+class TaskQueue(abc.ABC):
+    """Shared queue of dataset examples that workers pull from on demand,
+    where each pulled task is leased to a worker, and the lease expires
+    if the worker dies before the task is marked as complete.
+
+    """
+
+    @abc.abstractmethod
+    def lease(self, worker_id: str) -> int | None:
+        """Lease the next available task to a worker.
+
+        Arguments:
+
+        worker_id: str
+            Unique identifier for the worker requesting a task.
+
+        Returns:
+
+        int | None
+            Index of the example in the dataset, or None if there
+            are no tasks left to lease.
+
+        """
+
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def complete(self, example_id: int, worker_id: str,
+                 skipped: bool = False) -> bool:
+        """Mark a leased task as finished, so it is never leased again.
+
+        Arguments:
+
+        example_id: int
+            Index of the example in the dataset.
+
+        worker_id: str
+            Unique identifier for the worker that holds the lease.
+
+        skipped: bool
+            Whether the task was already on disk, and skipped without
+            running, so its duration is not used for speculation.
+
+        Returns:
+
+        bool
+            Whether this worker finished the task first, which is False
+            when another attempt of the same task already finished.
+
+        """
+
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def is_complete(self, example_id: int) -> bool:
+        """Check whether a task has been finished by any worker, so
+        workers can stop a duplicate attempt of the same task.
+
+        Arguments:
+
+        example_id: int
+            Index of the example in the dataset.
+
+        Returns:
+
+        bool
+            Whether the task is marked as finished.
+
+        """
+
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def is_speculated(self, example_id: int) -> bool:
+        """Check whether two workers are attempting the same task, because
+        the task ran for long enough to be leased to a second worker.
+
+        Arguments:
+
+        example_id: int
+            Index of the example in the dataset.
+
+        Returns:
+
+        bool
+            Whether a second attempt of the task is running.
+
+        """
+
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def can_speculate(self, worker_id: str) -> bool:
+        """Check whether a task running on another worker could still be
+        leased to this worker as a second copy, so an idle worker should
+        keep asking for tasks instead of stopping.
+
+        Arguments:
+
+        worker_id: str
+            Unique identifier for the worker requesting a task.
+
+        Returns:
+
+        bool
+            Whether a second copy of a running task may be leased later.
+
+        """
+
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def release(self, example_id: int, worker_id: str) -> None:
+        """Return a leased task to the queue, so another worker
+        can attempt the task immediately, which also reopens a task this
+        worker completed if its trajectory failed to save.
+
+        Arguments:
+
+        example_id: int
+            Index of the example in the dataset.
+
+        worker_id: str
+            Unique identifier for the worker that holds the lease.
+
+        """
+
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def release_worker(self, worker_id: str) -> int:
+        """Return every task leased by a worker to the queue, such as
+        after the worker process has exited unexpectedly.
+
+        Arguments:
+
+        worker_id: str
+            Unique identifier for the worker.
+
+        Returns:
+
+        int
+            Number of tasks returned to the queue.
+
+        """
+
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def stats(self) -> Dict[str, int]:
+        """Count the number of tasks with each status.
+
+        Returns:
+
+        Dict[str, int]
+            Number of pending, leased, and done tasks.
+
+        """
+
+        raise NotImplementedError
+
+
+class SQLiteTaskQueue(TaskQueue):
+    """Task queue backed by a local SQLite file, shared by worker processes
+    on the same machine, where leases are claimed in a transaction, and
+    expired leases are handed to the next worker that asks for a task.
+
+    With speculation enabled, a worker that finds no pending tasks is
+    given a second copy of a task that has run longer than a quantile
+    of the durations of finished tasks, and the first copy to finish
+    completes the task, which bounds the tail latency of a run.
+
+    With politeness limits, tasks on a domain that has too many running
+    tasks, or that started a task too recently, are skipped in favor of
+    later tasks on other domains, so agents do not trigger rate limits.
+
+    Attributes:
+
+    path: str
+        Path to the SQLite file storing the queue.
+
+    lease_timeout: float
+        Number of seconds before a lease expires.
+
+    speculation_quantile: float
+        Quantile of finished task durations, such as 0.95, after which
+        a running task is leased to a second worker, or None to disable.
+
+    max_leases_per_domain: int
+        Maximum number of running tasks on the same domain, or None.
+
+    min_domain_interval: float
+        Minimum number of seconds between starting two tasks on the
+        same domain, or None.
+
+    """
+
+    def __init__(self, path: str, lease_timeout: float = DEFAULT_LEASE_TIMEOUT,
+                 speculation_quantile: float = DEFAULT_SPECULATION_QUANTILE,
+                 max_leases_per_domain: int = DEFAULT_MAX_LEASES_PER_DOMAIN,
+                 min_domain_interval: float = DEFAULT_MIN_DOMAIN_INTERVAL):
+        """Task queue backed by a local SQLite file, shared by worker processes
+        on the same machine, where leases are claimed in a transaction, and
+        expired leases are handed to the next worker that asks for a task.
+
+        Arguments:
+
+        path: str
+            Path to the SQLite file storing the queue.
+
+        lease_timeout: float
+            Number of seconds before a lease expires.
+
+        speculation_quantile: float
+            Quantile of finished task durations, such as 0.95, after which
+            a running task is leased to a second worker, or None to disable.
+
+        max_leases_per_domain: int
+            Maximum number of running tasks on the same domain, or None.
+
+        min_domain_interval: float
+            Minimum number of seconds between starting two tasks on the
+            same domain, or None.
+
+        """
+
+        self.path = path
+        self.lease_timeout = lease_timeout
+        self.speculation_quantile = speculation_quantile
+
+        self.max_leases_per_domain = max_leases_per_domain
+        self.min_domain_interval = min_domain_interval
+
+        self._connection = None
+
+    def __getstate__(self) -> dict:
+
+        state = self.__dict__.copy()
+        state["_connection"] = None
+
+        return state
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """Open a connection to the SQLite file for this process, and
+        create the tasks table if it does not already exist.
+
+        Returns:
+
+        sqlite3.Connection
+            Connection in autocommit mode, where transactions are explicit.
+
+        """
+
+        if self._connection is None:
+
+            # callers sharing the queue across threads hold their own lock
+            self._connection = sqlite3.connect(
+                self.path,
+                timeout = DEFAULT_SQLITE_TIMEOUT,
+                isolation_level = None,
+                check_same_thread = False
+            )
+
+            self._connection.execute(
+                "PRAGMA journal_mode=WAL"
+            )
+
+            self._connection.execute(
+                CREATE_TASKS_TABLE
+            )
+
+            existing_columns = set(
+                row[1] for row in self._connection.execute(
+                    "PRAGMA table_info(tasks)"
+                )
+            )
+
+            for column, column_type in ADDED_TASK_COLUMNS.items():
+
+                if column not in existing_columns:
+
+                    self._connection.execute(
+                        "ALTER TABLE tasks ADD COLUMN {} {}".format(
+                            column, column_type
+                        )
+                    )
+
+            self._connection.execute(
+                CREATE_POSITION_INDEX
+            )
+
+            self._connection.execute(
+                CREATE_LEASED_AT_INDEX
+            )
+
+        return self._connection
+
+    def populate(self, example_ids: List[int], reset: bool = False,
+                 domains: List[str] = None) -> None:
+        """Add tasks to the queue in the provided order, where tasks that
+        already exist in the queue keep their current status.
+
+        Arguments:
+
+        example_ids: List[int]
+            Indices of examples in the dataset, in the order to lease them.
+
+        reset: bool
+            Whether to remove all existing tasks from the queue first.
+
+        domains: List[str]
+            Domain of each task, used for politeness limits, or None.
+
+        """
+
+        if domains is None:
+
+            domains = [None] * len(example_ids)
+
+        connection = self.connection
+        connection.execute("BEGIN IMMEDIATE")
+
+        try:
+
+            if reset:
+
+                connection.execute(
+                    "DELETE FROM tasks"
+                )
+
+            connection.executemany(
+                "INSERT OR IGNORE INTO tasks "
+                "(example_id, position, status, domain) VALUES (?, ?, ?, ?)",
+                [
+                    (example_id, position, TASK_STATUS_PENDING, domain)
+                    for position, (example_id, domain) in enumerate(
+                        zip(example_ids, domains)
+                    )
+                ]
+            )
+
+            connection.execute("COMMIT")
+
+        except BaseException:
+
+            connection.execute("ROLLBACK")
+
+            raise
+
+    def lease(self, worker_id: str) -> int | None:
+
+        connection = self.connection
+        connection.execute("BEGIN IMMEDIATE")
+
+        try:
+
+            current_time = time.time()
+
+            politeness_condition, politeness_args = (
+                self.get_politeness_condition(current_time)
+            )
+
+            row = connection.execute(
+                "SELECT example_id FROM tasks "
+                "WHERE (status = ? OR (status = ? AND lease_expiry < ?)) "
+                + politeness_condition +
+                "ORDER BY position LIMIT 1",
+                (TASK_STATUS_PENDING, TASK_STATUS_LEASED, current_time)
+                + politeness_args
+            ).fetchone()
+
+            if row is not None:
+
+                connection.execute(
+                    "UPDATE tasks SET status = ?, worker_id = ?, "
+                    "lease_expiry = ?, attempts = attempts + 1, "
+                    "leased_at = ?, speculative_worker_id = NULL "
+                    "WHERE example_id = ?",
+                    (
+                        TASK_STATUS_LEASED, worker_id,
+                        current_time + self.lease_timeout,
+                        current_time, row[0]
+                    )
+                )
+
+            elif self.speculation_quantile is not None:
+
+                row = self.lease_straggler(
+                    worker_id = worker_id,
+                    current_time = current_time
+                )
+
+            connection.execute("COMMIT")
+
+        except BaseException:
+
+            connection.execute("ROLLBACK")
+
+            raise
+
+        return row[0] if row is not None else None
+
+    def get_politeness_condition(self, current_time: float) -> Tuple[str, tuple]:
+        """Build an SQL condition that skips tasks on throttled domains,
+        which have reached the maximum number of running tasks, or have
+        started a task within the minimum interval.
+
+        Arguments:
+
+        current_time: float
+            Time at which the lease is claimed.
+
+        Returns:
+
+        Tuple[str, tuple]
+            SQL condition starting with "AND", or an empty string when
+            there are no politeness limits, and values for its placeholders.
+
+        """
+
+        throttled_queries = []
+        throttled_args = ()
+
+        if self.max_leases_per_domain is not None:
+
+            throttled_queries.append(
+                "SELECT domain FROM tasks WHERE status = ? "
+                "AND lease_expiry >= ? AND domain IS NOT NULL "
+                "GROUP BY domain HAVING COUNT(*) >= ?"
+            )
+
+            throttled_args += (
+                TASK_STATUS_LEASED, current_time,
+                self.max_leases_per_domain
+            )
+
+        if self.min_domain_interval is not None:
+
+            throttled_queries.append(
+                "SELECT domain FROM tasks WHERE leased_at > ? "
+                "AND domain IS NOT NULL"
+            )
+
+            throttled_args += (
+                current_time - self.min_domain_interval,
+            )
+
+        if len(throttled_queries) == 0:
+
+            return "", ()
+
+        return (
+            "AND (domain IS NULL OR domain NOT IN (" +
+            " UNION ".join(throttled_queries) + ")) ",
+            throttled_args
+        )
+
+    def get_duration_quantile(self) -> float | None:
+        """Compute the speculation quantile of the durations of finished
+        tasks, once enough tasks have finished for a stable estimate.
+
+        Returns:
+
+        float | None
+            Duration in seconds at the quantile, or None if too few
+            tasks have finished.
+
+        """
+
+        num_durations = self.connection.execute(
+            "SELECT COUNT(*) FROM tasks "
+            "WHERE status = ? AND duration IS NOT NULL",
+            (TASK_STATUS_DONE,)
+        ).fetchone()[0]
+
+        if num_durations < DEFAULT_MIN_SPECULATION_SAMPLES:
+
+            return None
+
+        return self.connection.execute(
+            "SELECT duration FROM tasks "
+            "WHERE status = ? AND duration IS NOT NULL "
+            "ORDER BY duration LIMIT 1 OFFSET ?",
+            (
+                TASK_STATUS_DONE,
+                int(self.speculation_quantile * (num_durations - 1))
+            )
+        ).fetchone()[0]
+
+    def lease_straggler(self, worker_id: str,
+                        current_time: float) -> tuple | None:
+        """Lease a second copy of the longest running task that has run
+        past the speculation quantile, which must be called inside the
+        transaction of `lease`, once no pending tasks are left.
+
+        Arguments:
+
+        worker_id: str
+            Unique identifier for the worker requesting a task.
+
+        current_time: float
+            Time at which the lease is claimed.
+
+        Returns:
+
+        tuple | None
+            Row holding the index of the example in the dataset, or None
+            if no task has run past the speculation quantile.
+
+        """
+
+        duration_quantile = self.get_duration_quantile()
+
+        if duration_quantile is None:
+
+            return None
+
+        row = self.connection.execute(
+            "SELECT example_id FROM tasks "
+            "WHERE status = ? AND speculative_worker_id IS NULL "
+            "AND worker_id != ? AND leased_at < ? "
+            "ORDER BY leased_at LIMIT 1",
+            (
+                TASK_STATUS_LEASED, worker_id,
+                current_time - duration_quantile
+            )
+        ).fetchone()
+
+        if row is not None:
+
+            self.connection.execute(
+                "UPDATE tasks SET speculative_worker_id = ?, "
+                "attempts = attempts + 1 WHERE example_id = ?",
+                (worker_id, row[0])
+            )
+
+        return row
+
+    def complete(self, example_id: int, worker_id: str,
+                 skipped: bool = False) -> bool:
+
+        # the first attempt to finish wins, and later attempts are ignored
+        # skipped tasks store no duration, since they finish immediately
+        cursor = self.connection.execute(
+            "UPDATE tasks SET status = ?, lease_expiry = NULL, "
+            "duration = ? - leased_at, "
+            "worker_id = ?, speculative_worker_id = NULL "
+            "WHERE example_id = ? AND status = ? "
+            "AND (worker_id = ? OR speculative_worker_id = ?)",
+            (
+                TASK_STATUS_DONE,
+                None if skipped else time.time(), worker_id,
+                example_id, TASK_STATUS_LEASED,
+                worker_id, worker_id
+            )
+        )
+
+        return cursor.rowcount > 0
+
+    def is_complete(self, example_id: int) -> bool:
+
+        row = self.connection.execute(
+            "SELECT status FROM tasks WHERE example_id = ?",
+            (example_id,)
+        ).fetchone()
+
+        return row is not None and row[0] == TASK_STATUS_DONE
+
+    def is_speculated(self, example_id: int) -> bool:
+
+        row = self.connection.execute(
+            "SELECT speculative_worker_id FROM tasks "
+            "WHERE example_id = ? AND status = ?",
+            (example_id, TASK_STATUS_LEASED)
+        ).fetchone()
+
+        return row is not None and row[0] is not None
+
+    def can_speculate(self, worker_id: str) -> bool:
+
+        if self.speculation_quantile is None:
+
+            return False
+
+        row = self.connection.execute(
+            "SELECT 1 FROM tasks WHERE status = ? "
+            "AND speculative_worker_id IS NULL "
+            "AND worker_id != ? LIMIT 1",
+            (TASK_STATUS_LEASED, worker_id)
+        ).fetchone()
+
+        return row is not None
+
+    def release(self, example_id: int, worker_id: str) -> None:
+
+        # tasks are completed before saving, so a failed save reopens them
+        self.connection.execute(
+            "UPDATE tasks SET status = ?, worker_id = NULL, "
+            "lease_expiry = NULL, leased_at = NULL, duration = NULL "
+            "WHERE example_id = ? AND worker_id = ? AND status = ?",
+            (
+                TASK_STATUS_PENDING, example_id,
+                worker_id, TASK_STATUS_DONE
+            )
+        )
+
+        self.release_leases(
+            "example_id = ? AND ", (example_id,),
+            worker_id = worker_id
+        )
+
+    def release_worker(self, worker_id: str) -> int:
+
+        return self.release_leases(
+            "", (), worker_id = worker_id
+        )
+
+    def release_leases(self, condition: str, condition_args: tuple,
+                       worker_id: str) -> int:
+        """Drop the leases held by a worker that match a condition, where
+        a second copy of a released task takes over the task, and tasks
+        without a second copy are returned to the queue.
+
+        Arguments:
+
+        condition: str
+            SQL condition on the tasks to release, ending in "AND".
+
+        condition_args: tuple
+            Values for the placeholders in the condition.
+
+        worker_id: str
+            Unique identifier for the worker.
+
+        Returns:
+
+        int
+            Number of tasks returned to the queue.
+
+        """
+
+        connection = self.connection
+        connection.execute("BEGIN IMMEDIATE")
+
+        try:
+
+            connection.execute(
+                "UPDATE tasks SET speculative_worker_id = NULL "
+                "WHERE " + condition + "speculative_worker_id = ? "
+                "AND status = ?",
+                condition_args + (worker_id, TASK_STATUS_LEASED)
+            )
+
+            connection.execute(
+                "UPDATE tasks SET worker_id = speculative_worker_id, "
+                "speculative_worker_id = NULL "
+                "WHERE " + condition + "worker_id = ? AND status = ? "
+                "AND speculative_worker_id IS NOT NULL",
+                condition_args + (worker_id, TASK_STATUS_LEASED)
+            )
+
+            cursor = connection.execute(
+                "UPDATE tasks SET status = ?, worker_id = NULL, "
+                "lease_expiry = NULL, leased_at = NULL "
+                "WHERE " + condition + "worker_id = ? AND status = ?",
+                (TASK_STATUS_PENDING,) + condition_args +
+                (worker_id, TASK_STATUS_LEASED)
+            )
+
+            connection.execute("COMMIT")
+
+        except BaseException:
+
+            connection.execute("ROLLBACK")
+
+            raise
+
+        return cursor.rowcount
+
+    def stats(self) -> Dict[str, int]:
+
+        task_stats = {
+            TASK_STATUS_PENDING: 0,
+            TASK_STATUS_LEASED: 0,
+            TASK_STATUS_DONE: 0,
+        }
+
+        for status, num_tasks in self.connection.execute(
+            "SELECT status, COUNT(*) FROM tasks GROUP BY status"
+        ):
+
+            task_stats[status] = num_tasks
+
+        return task_stats
+
+    def close(self) -> None:
+        """Close the connection to the SQLite file for this process.
+
+        """
+
+        if self._connection is not None:
+
+            self._connection.close()
+            self._connection = None
+
+    def remove(self) -> None:
+        """Close the connection, and delete the SQLite file and its
+        write-ahead log from disk.
+
+        """
+
+        self.close()
+
+        for suffix in ["", "-wal", "-shm"]:
+
+            if os.path.exists(self.path + suffix):
+
+                os.remove(self.path + suffix)
+
+
+class HTTPTaskQueue(TaskQueue):
+    """Task queue served by a coordinator in `insta.coordinator`, shared by
+    machines running data collection, which can join or leave a run at any
+    time, where leases held by a machine that stops sending heartbeats are
+    handed to the remaining machines.
+
+    Worker identifiers are prefixed with the identifier of the machine, so
+    agents with the same rank on different machines hold separate leases,
+    and the lease timeout and speculation are configured on the coordinator.
+
+    Attributes:
+
+    url: str
+        URL of the coordinator, such as "http://localhost:5000".
+
+    node_id: str
+        Unique identifier for this machine and run.
+
+    heartbeat_interval: float
+        Number of seconds between heartbeats sent to the coordinator.
+
+    """
+
+    def __init__(self, url: str, node_id: str = None,
+                 heartbeat_interval: float = DEFAULT_HEARTBEAT_INTERVAL):
+        """Task queue served by a coordinator in `insta.coordinator`, shared by
+        machines running data collection, which can join or leave a run at any
+        time, where leases held by a machine that stops sending heartbeats are
+        handed to the remaining machines.
+
+        Arguments:
+
+        url: str
+            URL of the coordinator, such as "http://localhost:5000".
+
+        node_id: str
+            Unique identifier for this machine and run, by default the
+            hostname and the id of the process creating the queue.
+
+        heartbeat_interval: float
+            Number of seconds between heartbeats sent to the coordinator.
+
+        """
+
+        self.url = url.rstrip("/")
+
+        self.node_id = node_id or "{}-{}".format(
+            socket.gethostname(),
+            os.getpid()
+        )
+
+        self.heartbeat_interval = heartbeat_interval
+
+        self._session = None
+        self._heartbeat_stop = None
+
+    def __getstate__(self) -> dict:
+
+        state = self.__dict__.copy()
+
+        state["_session"] = None
+        state["_heartbeat_stop"] = None
+
+        return state
+
+    @property
+    def session(self) -> requests.Session:
+        """Open a session with the coordinator for this process, and start
+        sending heartbeats in a background thread while the session is open.
+
+        Returns:
+
+        requests.Session
+            Session that reuses connections to the coordinator.
+
+        """
+
+        if self._session is None:
+
+            self._session = requests.Session()
+
+            self._heartbeat_stop = threading.Event()
+
+            threading.Thread(
+                target = self.send_heartbeats,
+                args = (self._heartbeat_stop,),
+                name = "insta-heartbeat",
+                daemon = True
+            ).start()
+
+        return self._session
+
+    def send_heartbeats(self, stop_event: threading.Event) -> None:
+        """Tell the coordinator this machine is alive until stopped, so the
+        leases of long running tasks are not handed to other machines.
+
+        Arguments:
+
+        stop_event: threading.Event
+            Event that is set when the session is closed.
+
+        """
+
+        while not stop_event.wait(self.heartbeat_interval):
+
+            # a failed heartbeat must not stop later heartbeats, or the
+            # leases of this machine expire while its tasks are running
+            try:
+
+                self.call("heartbeat")
+
+            except Exception as error:
+
+                print("Failed to send heartbeat to {}: {}".format(
+                    self.url, error
+                ))
+
+    def call(self, method: str, **kwargs: Any) -> Any:
+        """Call a method of the task queue on the coordinator, retrying
+        with exponential backoff while the coordinator is unreachable.
+
+        Arguments:
+
+        method: str
+            Name of the task queue method to call.
+
+        **kwargs: Any
+            JSON serializable arguments for the method.
+
+        Returns:
+
+        Any
+            The value returned by the method on the coordinator.
+
+        """
+
+        response = safe_call(
+            self.session.post,
+            "{}/{}".format(self.url, method),
+            json = {"node_id": self.node_id, **kwargs},
+            timeout = DEFAULT_COORDINATOR_REQUEST_TIMEOUT,
+            max_errors = DEFAULT_COORDINATOR_MAX_ERRORS,
+            error_class = requests.RequestException,
+            timeout_kwarg = "timeout"
+        )
+
+        if response is BrowserStatus.ERROR:
+
+            raise ConnectionError(
+                "Coordinator unreachable at {}".format(self.url)
+            )
+
+        if response.status_code != 200:
+
+            raise RuntimeError(
+                "Coordinator failed to {}: {}".format(
+                    method, response.text
+                )
+            )
+
+        return response.json()["result"]
+
+    def populate(self, example_ids: List[int], reset: bool = False,
+                 domains: List[str] = None) -> None:
+        """Add tasks to the queue in the provided order, where tasks that
+        already exist in the queue keep their current status, and every
+        machine may add the same tasks when joining a run.
+
+        Arguments:
+
+        example_ids: List[int]
+            Indices of examples in the dataset, in the order to lease them.
+
+        reset: bool
+            Ignored, since other machines may hold leases in the queue,
+            and a run is reset by restarting the coordinator instead.
+
+        domains: List[str]
+            Domain of each task, used for politeness limits set on the
+            coordinator, or None.
+
+        """
+
+        self.call(
+            "populate",
+            example_ids = list(example_ids),
+            domains = domains
+        )
+
+    def lease(self, worker_id: str) -> int | None:
+
+        return self.call(
+            "lease",
+            worker_id = worker_id
+        )
+
+    def complete(self, example_id: int, worker_id: str,
+                 skipped: bool = False) -> bool:
+
+        return self.call(
+            "complete",
+            example_id = example_id,
+            worker_id = worker_id,
+            skipped = skipped
+        )
+
+    def is_complete(self, example_id: int) -> bool:
+
+        return self.call(
+            "is_complete",
+            example_id = example_id
+        )
+
+    def is_speculated(self, example_id: int) -> bool:
+
+        return self.call(
+            "is_speculated",
+            example_id = example_id
+        )
+
+    def can_speculate(self, worker_id: str) -> bool:
+
+        return self.call(
+            "can_speculate",
+            worker_id = worker_id
+        )
+
+    def release(self, example_id: int, worker_id: str) -> None:
+
+        self.call(
+            "release",
+            example_id = example_id,
+            worker_id = worker_id
+        )
+
+    def release_worker(self, worker_id: str) -> int:
+
+        return self.call(
+            "release_worker",
+            worker_id = worker_id
+        )
+
+    def stats(self) -> Dict[str, int]:
+
+        return self.call("stats")
+
+    def close(self) -> None:
+        """Stop sending heartbeats, and close the session for this process.
+
+        """
+
+        if self._session is not None:
+
+            self._heartbeat_stop.set()
+
+            self._session.close()
+            self._session = None
+
+    def remove(self) -> None:
+        """Close the session, where the queue itself stays on the
+        coordinator for the other machines in the run.
+
+        """
+
+        self.close()
+
+
+def is_task_queue_url(task_queue_path: str | None) -> bool:
+    """Check whether a task queue path points to a coordinator.
+
+    Arguments:
+
+    task_queue_path: str | None
+        Path to a SQLite file, or URL of a coordinator.
+
+    Returns:
+
+    bool
+        Whether the path is the URL of a coordinator.
+
+    """
+
+    return task_queue_path is not None and (
+        task_queue_path.startswith("http://") or
+        task_queue_path.startswith("https://")
+    )
+
+
+def get_task_queue(
+    task_queue_path: str,
+    lease_timeout: float = DEFAULT_LEASE_TIMEOUT,
+    speculation_quantile: float = DEFAULT_SPECULATION_QUANTILE,
+    max_leases_per_domain: int = DEFAULT_MAX_LEASES_PER_DOMAIN,
+    min_domain_interval: float = DEFAULT_MIN_DOMAIN_INTERVAL,
+) -> TaskQueue:
+    """Create a task queue for a local SQLite file, or for a coordinator
+    shared by several machines when the path is a URL.
+
+    Arguments:
+
+    task_queue_path: str
+        Path to a SQLite file, or URL of a coordinator.
+
+    lease_timeout: float
+        Number of seconds before a lease expires, for SQLite files.
+
+    speculation_quantile: float
+        Quantile of finished task durations after which a running task is
+        leased to a second worker, for SQLite files.
+
+    max_leases_per_domain: int
+        Maximum number of running tasks on the same domain, for SQLite files.
+
+    min_domain_interval: float
+        Minimum number of seconds between starting two tasks on the
+        same domain, for SQLite files.
+
+    Returns:
+
+    TaskQueue
+        The task queue for the path.
+
+    """
+
+    if is_task_queue_url(task_queue_path):
+
+        return HTTPTaskQueue(
+            url = task_queue_path
+        )
+
+    return SQLiteTaskQueue(
+        path = task_queue_path,
+        lease_timeout = lease_timeout,
+        speculation_quantile = speculation_quantile,
+        max_leases_per_domain = max_leases_per_domain,
+        min_domain_interval = min_domain_interval
+    )
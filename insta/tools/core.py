@@ -305,6 +305,8 @@ def interact_with_browser(
             session_id = random.choice(SESSION_NAMES)
 
         active_sessions[session_id] = session_data
+
+    obs = None
         
     if len(action) > 0:  # take an action
 
@@ -317,7 +319,7 @@ def interact_with_browser(
 
             return return_error(EnvError.ACTION_PARSE_ERROR)
 
-        action_status = client.action(
+        action_status, obs = client.step(
             function_calls = action.function_calls
         )
 
@@ -340,8 +342,10 @@ def interact_with_browser(
         if isinstance(goto_status, ServerError):
 
             return return_error(goto_status)
+
+    if obs is None:  # observe unless the action returned an observation
         
-    obs = client.observation()
+        obs = client.observation()
 
     if obs is BrowserStatus.ERROR:
 
@@ -0,0 +1,677 @@
+from typing import Any, Dict, Set, Tuple
+
+
+RecordLocation = Tuple[str, int | None, int | None]
+
+import importlib.util
+import functools
+import abc
+import threading
+import socket
+import json
+import time
+import os
+
+
+DEFAULT_STORAGE_FORMAT = "json"
+
+STORAGE_FORMATS = [
+    "json",
+    "jsonl",
+    "jsonl.zst",
+]
+
+
+DEFAULT_MAX_SHARD_SIZE = 1024 * 1024 * 1024
+DEFAULT_ZSTD_LEVEL = 3
+
+
+SHARD_PREFIX = "shard-"
+SHARD_INDEX_SUFFIX = ".index"
+
+
+class TrajectoryStore(abc.ABC):
+    """Saves one JSON record per identifier to a data directory, such as
+    the observations or actions for a single trajectory.
+
+    """
+
+    @abc.abstractmethod
+    def write(self, identifier: str, record: Any) -> RecordLocation:
+        """Save the record for an identifier, replacing any earlier
+        record saved for the same identifier.
+
+        Arguments:
+
+        identifier: str
+            Unique identifier for the task.
+
+        record: Any
+            JSON serializable data to save.
+
+        Returns:
+
+        RecordLocation
+            Path, byte offset, and length of the record, which is read
+            with `read_record_location` without loading any index.
+
+        """
+
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def read(self, identifier: str) -> Any | None:
+        """Load the record for an identifier.
+
+        Arguments:
+
+        identifier: str
+            Unique identifier for the task.
+
+        Returns:
+
+        Any | None
+            The saved record, or None if no record was saved.
+
+        """
+
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def identifiers(self) -> Set[str]:
+        """List every identifier with a saved record.
+
+        Returns:
+
+        Set[str]
+            Identifiers with a saved record.
+
+        """
+
+        raise NotImplementedError
+
+
+class DirectoryTrajectoryStore(TrajectoryStore):
+    """Saves each record as a separate pretty-printed JSON file named after
+    its identifier, which is the original layout of the data directories.
+
+    Attributes:
+
+    data_dir: str
+        Directory where JSON files are saved, one per identifier.
+
+    """
+
+    def __init__(self, data_dir: str):
+        """Saves each record as a separate pretty-printed JSON file named after
+        its identifier, which is the original layout of the data directories.
+
+        Arguments:
+
+        data_dir: str
+            Directory where JSON files are saved, one per identifier.
+
+        """
+
+        self.data_dir = data_dir
+
+    def write(self, identifier: str, record: Any) -> RecordLocation:
+
+        record_path = os.path.join(
+            self.data_dir,
+            "{}.json".format(identifier)
+        )
+
+        with open(record_path, "w") as file:
+
+            json.dump(
+                record,
+                file,
+                indent = 4
+            )
+
+        return record_path, None, None
+
+    def read(self, identifier: str) -> Any | None:
+
+        record_path = os.path.join(
+            self.data_dir,
+            "{}.json".format(identifier)
+        )
+
+        if not os.path.exists(record_path):
+
+            return None
+
+        with open(record_path, "r") as file:
+
+            return json.load(file)
+
+    def identifiers(self) -> Set[str]:
+
+        return list_identifiers(self.data_dir)
+
+
+class ShardedTrajectoryStore(TrajectoryStore):
+    """Appends compact records to size-bounded shard files, where each
+    process writes to its own shards, and a sidecar index stores the
+    byte offset and length of every record in the shard.
+
+    Records are compressed one at a time with zstd when enabled, so any
+    record can be read without decompressing the rest of the shard.
+    Reading falls back to the original layout with one JSON file per
+    identifier, so a directory can hold data saved in both layouts.
+
+    Attributes:
+
+    data_dir: str
+        Directory where shard files and their indices are saved.
+
+    compression: str
+        Either None for line-delimited JSON, or "zstd" to compress records.
+
+    max_shard_size: int
+        Number of bytes after which a new shard file is started.
+
+    """
+
+    def __init__(self, data_dir: str, compression: str = None,
+                 max_shard_size: int = DEFAULT_MAX_SHARD_SIZE,
+                 compression_level: int = DEFAULT_ZSTD_LEVEL):
+        """Appends compact records to size-bounded shard files, where each
+        process writes to its own shards, and a sidecar index stores the
+        byte offset and length of every record in the shard.
+
+        Arguments:
+
+        data_dir: str
+            Directory where shard files and their indices are saved.
+
+        compression: str
+            Either None for line-delimited JSON, or "zstd" to compress records.
+
+        max_shard_size: int
+            Number of bytes after which a new shard file is started.
+
+        compression_level: int
+            Compression level for zstd, where higher levels are smaller.
+
+        """
+
+        self.data_dir = data_dir
+        self.compression = compression
+
+        self.max_shard_size = max_shard_size
+        self.compression_level = compression_level
+
+        self.lock = threading.Lock()
+
+        self._shard_path = None
+        self._record_offsets = None
+        self._compressor = None
+
+    def __getstate__(self) -> dict:
+
+        state = self.__dict__.copy()
+
+        state.pop("lock")
+
+        state["_shard_path"] = None
+        state["_record_offsets"] = None
+        state["_compressor"] = None
+
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+
+    def encode(self, record: Any) -> bytes:
+        """Serialize a record without whitespace, and compress the record
+        as a standalone zstd frame when compression is enabled.
+
+        Arguments:
+
+        record: Any
+            JSON serializable data to save.
+
+        Returns:
+
+        bytes
+            The encoded record, ending in a newline when uncompressed.
+
+        """
+
+        data = json.dumps(
+            record,
+            separators = (",", ":")
+        ).encode("utf-8")
+
+        if self.compression != "zstd":
+
+            return data + b"\n"
+
+        if self._compressor is None:
+
+            import zstandard
+
+            self._compressor = zstandard.ZstdCompressor(
+                level = self.compression_level
+            )
+
+        return self._compressor.compress(data)
+
+    def next_shard_path(self) -> str:
+        """Choose a new shard file owned by this process, named after the
+        host and process id, so concurrent writers never share a shard.
+
+        Returns:
+
+        str
+            Path to a shard file that does not exist yet.
+
+        """
+
+        extension = (
+            ".jsonl.zst"
+            if self.compression == "zstd"
+            else ".jsonl"
+        )
+
+        shard_idx = 0
+
+        while True:
+
+            shard_path = os.path.join(
+                self.data_dir,
+                "{}{}-{}-{:05d}{}".format(
+                    SHARD_PREFIX,
+                    socket.gethostname(),
+                    os.getpid(),
+                    shard_idx,
+                    extension
+                )
+            )
+
+            if not os.path.exists(shard_path):
+
+                return shard_path
+
+            shard_idx += 1
+
+    def write(self, identifier: str, record: Any) -> RecordLocation:
+
+        with self.lock:
+
+            data = self.encode(record)
+
+            shard_full = (
+                self._shard_path is None or
+                os.path.getsize(self._shard_path) + len(data)
+                > self.max_shard_size
+            )
+
+            if shard_full:
+
+                self._shard_path = self.next_shard_path()
+
+            with open(self._shard_path, "ab") as file:
+
+                offset = file.tell()
+                file.write(data)
+
+            # the record is indexed only after it is fully written, with
+            # the time of the write to order records across shards
+            with open(self._shard_path + SHARD_INDEX_SUFFIX, "a") as file:
+
+                file.write("{}\t{}\t{}\t{}\n".format(
+                    identifier, offset, len(data),
+                    time.time_ns()
+                ))
+
+            if self._record_offsets is not None:
+
+                self._record_offsets[identifier] = (
+                    self._shard_path, offset, len(data)
+                )
+
+            return self._shard_path, offset, len(data)
+
+    @property
+    def record_offsets(self) -> Dict[str, Tuple[str, int, int]]:
+        """Location of every record in the shards of the data directory,
+        loaded from the sidecar indices on first access.
+
+        Returns:
+
+        Dict[str, Tuple[str, int, int]]
+            Shard path, byte offset, and length of each record.
+
+        """
+
+        if self._record_offsets is None:
+
+            self._record_offsets = load_record_offsets(
+                self.data_dir
+            )
+
+        return self._record_offsets
+
+    def refresh(self) -> None:
+        """Reload the sidecar indices on the next read, to find records
+        written by other processes since the indices were loaded.
+
+        """
+
+        self._record_offsets = None
+
+    def read(self, identifier: str) -> Any | None:
+
+        location = self.record_offsets.get(identifier)
+
+        if location is None:
+
+            return DirectoryTrajectoryStore(
+                self.data_dir
+            ).read(identifier)
+
+        return read_record_location(
+            location
+        )
+
+    def identifiers(self) -> Set[str]:
+
+        return list_identifiers(self.data_dir)
+
+
+def read_record_location(location: RecordLocation) -> Any:
+    """Read a record at the location returned when it was written, in
+    either layout, without loading the index of its data directory.
+
+    Arguments:
+
+    location: RecordLocation
+        Path, byte offset, and length of the record, where the offset
+        and length are None for a file holding one record.
+
+    Returns:
+
+    Any
+        The saved record.
+
+    """
+
+    record_path, offset, length = location
+
+    if offset is None:
+
+        with open(record_path, "r") as file:
+
+            return json.load(file)
+
+    with open(record_path, "rb") as file:
+
+        file.seek(offset)
+        data = file.read(length)
+
+    if record_path.endswith(".zst"):
+
+        import zstandard
+
+        data = zstandard.ZstdDecompressor().decompress(data)
+
+    return json.loads(data)
+
+
+def load_record_offsets(data_dir: str) -> Dict[str, Tuple[str, int, int]]:
+    """Read the sidecar index of every shard in a data directory, where
+    the most recently written record for an identifier replaces earlier
+    ones, regardless of which shard holds it.
+
+    Arguments:
+
+    data_dir: str
+        Directory where shard files and their indices are saved.
+
+    Returns:
+
+    Dict[str, Tuple[str, int, int]]
+        Shard path, byte offset, and length of each record.
+
+    """
+
+    record_offsets = {}
+    write_times = {}
+
+    if not os.path.isdir(data_dir):
+
+        return record_offsets
+
+    index_names = sorted(
+        entry.name for entry in os.scandir(data_dir)
+        if entry.name.startswith(SHARD_PREFIX)
+        and entry.name.endswith(SHARD_INDEX_SUFFIX)
+    )
+
+    for index_name in index_names:
+
+        shard_path = os.path.join(
+            data_dir,
+            index_name[:-len(SHARD_INDEX_SUFFIX)]
+        )
+
+        with open(os.path.join(data_dir, index_name), "r") as file:
+
+            for line in file:
+
+                # skip a line left incomplete by a crashed writer
+                if not line.endswith("\n"):
+
+                    continue
+
+                identifier, offset, length, *write_time = (
+                    line.rstrip("\n").split("\t")
+                )
+
+                # indices written without a time sort before every record
+                # with one, and by shard name among themselves
+                write_time = int(write_time[0]) if write_time else 0
+
+                if write_time < write_times.get(identifier, 0):
+
+                    continue
+
+                write_times[identifier] = write_time
+
+                record_offsets[identifier] = (
+                    shard_path, int(offset), int(length)
+                )
+
+    return record_offsets
+
+
+def list_identifiers(data_dir: str) -> Set[str]:
+    """List every identifier saved in a data directory in either layout,
+    reading the directory once, plus the sidecar index of each shard.
+
+    Arguments:
+
+    data_dir: str
+        Directory where records are saved.
+
+    Returns:
+
+    Set[str]
+        Identifiers with a saved record.
+
+    """
+
+    identifiers = set()
+
+    if not os.path.isdir(data_dir):
+
+        return identifiers
+
+    with os.scandir(data_dir) as entries:
+
+        for entry in entries:
+
+            if entry.name.endswith(".json"):
+
+                identifiers.add(
+                    entry.name[:-len(".json")]
+                )
+
+    identifiers.update(load_record_offsets(
+        data_dir
+    ).keys())
+
+    return identifiers
+
+
+def check_storage_format(storage_format: str) -> None:
+    """Check that a storage format is known, and that its optional
+    dependencies are installed, before any trajectory is collected.
+
+    Arguments:
+
+    storage_format: str
+        Either "json" for one pretty-printed file per identifier, "jsonl"
+        for line-delimited shards, or "jsonl.zst" for compressed shards.
+
+    """
+
+    if storage_format not in STORAGE_FORMATS:
+
+        raise ValueError(
+            "Unknown storage format: {}".format(storage_format)
+        )
+
+    if storage_format == "jsonl.zst" and \
+            importlib.util.find_spec("zstandard") is None:
+
+        raise ImportError(
+            "The jsonl.zst storage format requires the zstandard package, "
+            "install it with the zstd extra, or choose another format"
+        )
+
+
+def get_trajectory_store(
+    data_dir: str,
+    storage_format: str = DEFAULT_STORAGE_FORMAT,
+    max_shard_size: int = DEFAULT_MAX_SHARD_SIZE,
+) -> TrajectoryStore:
+    """Create a store for saving records to a data directory.
+
+    Arguments:
+
+    data_dir: str
+        Directory where records are saved.
+
+    storage_format: str
+        Either "json" for one pretty-printed file per identifier, "jsonl"
+        for line-delimited shards, or "jsonl.zst" for compressed shards.
+
+    max_shard_size: int
+        Number of bytes after which a new shard file is started.
+
+    Returns:
+
+    TrajectoryStore
+        The store for saving records to the data directory.
+
+    """
+
+    if storage_format == "json":
+
+        return DirectoryTrajectoryStore(
+            data_dir = data_dir
+        )
+
+    check_storage_format(
+        storage_format
+    )
+
+    return ShardedTrajectoryStore(
+        data_dir = data_dir,
+        compression = (
+            "zstd" if storage_format == "jsonl.zst"
+            else None
+        ),
+        max_shard_size = max_shard_size
+    )
+
+
+@functools.lru_cache(maxsize = None)
+def open_trajectory_store(data_dir: str) -> TrajectoryStore:
+    """Open a data directory for reading records saved in any layout,
+    including directories with one JSON file per identifier, where the
+    store is cached, so the shard indices are read once per process.
+
+    Arguments:
+
+    data_dir: str
+        Directory where records are saved.
+
+    Returns:
+
+    TrajectoryStore
+        The store for reading records from the data directory.
+
+    """
+
+    return ShardedTrajectoryStore(
+        data_dir = data_dir
+    )
+
+
+def get_trajectory_stores(
+    observations_dir: str = None,
+    actions_dir: str = None,
+    storage_format: str = DEFAULT_STORAGE_FORMAT,
+    max_shard_size: int = DEFAULT_MAX_SHARD_SIZE,
+) -> Dict[str, TrajectoryStore]:
+    """Create stores for the observations and actions, which hold most of
+    the data on disk, where judgments and task proposals remain small
+    JSON files that annotation scripts read and write directly.
+
+    Arguments:
+
+    observations_dir: str
+        Directory to save observations.
+
+    actions_dir: str
+        Directory to save actions.
+
+    storage_format: str
+        Either "json" for one pretty-printed file per identifier, "jsonl"
+        for line-delimited shards, or "jsonl.zst" for compressed shards.
+
+    max_shard_size: int
+        Number of bytes after which a new shard file is started.
+
+    Returns:
+
+    Dict[str, TrajectoryStore]
+        Store for each kind of data, or None if the directory for that
+        kind of data is None.
+
+    """
+
+    data_dirs = {
+        "observations": observations_dir,
+        "actions": actions_dir,
+    }
+
+    return {
+        kind: (
+            get_trajectory_store(
+                data_dir = data_dir,
+                storage_format = storage_format,
+                max_shard_size = max_shard_size
+            )
+            if data_dir is not None else None
+        )
+        for kind, data_dir in data_dirs.items()
+    }
@@ -1,7 +1,10 @@
 from dataclasses import dataclass
-from typing import Any, Callable
+from typing import Any, Callable, Generator
 from enum import Enum
 
+import contextlib
+import contextvars
+import asyncio
 import time
 import traceback
 
@@ -110,6 +113,183 @@ BrowserStatus = Enum("PlaywrightStatus", [
 ])
 
 
+class DeadlineExceeded(TimeoutError):
+    """Raised when a task or a step runs past its wall-clock deadline.
+
+    """
+
+
+class TaskCancelled(Exception):
+    """Raised when a task is stopped before finishing, such as when
+    another worker already finished the same task.
+
+    """
+
+
+# absolute time.monotonic() deadline for the current thread or coroutine
+CURRENT_DEADLINE = contextvars.ContextVar(
+    "insta_deadline", default = None
+)
+
+
+@contextlib.contextmanager
+def time_limit(timeout: float = None) -> Generator[None, None, None]:
+    """Bound the wall-clock time of every `safe_call` made inside the
+    context, where nested limits keep the earliest deadline, so a step
+    limit never extends the limit of the task that contains it.
+
+    Arguments:
+
+    timeout: float
+        Number of seconds from now until the deadline, or None to keep
+        the deadline of the enclosing context.
+
+    """
+
+    if timeout is None:
+
+        yield
+
+        return
+
+    deadline = time.monotonic() + timeout
+    enclosing_deadline = CURRENT_DEADLINE.get()
+
+    if enclosing_deadline is not None:
+
+        deadline = min(deadline, enclosing_deadline)
+
+    token = CURRENT_DEADLINE.set(deadline)
+
+    try: yield
+
+    finally: CURRENT_DEADLINE.reset(token)
+
+
+def get_remaining_time() -> float | None:
+    """Get the number of seconds left before the current deadline.
+
+    Returns:
+
+    float | None
+        Seconds until the deadline, which are negative once the deadline
+        has passed, or None if no deadline is set.
+
+    """
+
+    deadline = CURRENT_DEADLINE.get()
+
+    if deadline is None:
+
+        return None
+
+    return deadline - time.monotonic()
+
+
+def check_deadline() -> None:
+    """Raise an error if the current deadline has passed.
+
+    """
+
+    remaining_time = get_remaining_time()
+
+    if remaining_time is not None and remaining_time <= 0:
+
+        raise DeadlineExceeded(
+            "Deadline exceeded by {:.1f} seconds".format(
+                -remaining_time
+            )
+        )
+
+
+def get_timeout_kwargs(timeout_kwarg: str = "timeout") -> dict:
+    """Build keyword arguments that bound a network call, such as an
+    HTTP request or an LLM query, by the time left before the deadline.
+
+    Arguments:
+
+    timeout_kwarg: str
+        Name of the keyword argument the call uses for its timeout.
+
+    Returns:
+
+    dict
+        The timeout keyword argument, or an empty dict if no deadline
+        is set, so the default timeout of the call is kept.
+
+    """
+
+    remaining_time = get_remaining_time()
+
+    if remaining_time is None:
+
+        return {}
+
+    return {timeout_kwarg: max(remaining_time, 0.001)}
+
+
+def merge_timeout_kwargs(kwargs: dict, timeout_kwarg: str = "timeout") -> dict:
+    """Add the timeout from get_timeout_kwargs to keyword arguments that
+    may already set a timeout, such as generation_kwargs, where the
+    shorter of the two timeouts is kept.
+
+    Arguments:
+
+    kwargs: dict
+        Keyword arguments for the call, which are not modified.
+
+    timeout_kwarg: str
+        Name of the keyword argument the call uses for its timeout.
+
+    Returns:
+
+    dict
+        Copy of the keyword arguments with a single timeout.
+
+    """
+
+    merged_kwargs = {
+        **kwargs,
+        **get_timeout_kwargs(timeout_kwarg)
+    }
+
+    timeout = kwargs.get(timeout_kwarg)
+
+    # timeouts given as objects, such as httpx.Timeout, give way to the deadline
+    if isinstance(timeout, (int, float)) and \
+            timeout_kwarg in merged_kwargs:
+
+        merged_kwargs[timeout_kwarg] = min(
+            timeout, merged_kwargs[timeout_kwarg]
+        )
+
+    return merged_kwargs
+
+
+def get_backoff_delay(delay: float) -> float:
+    """Shorten a retry delay so the delay ends by the current deadline.
+
+    Arguments:
+
+    delay: float
+        Number of seconds to wait before the next retry.
+
+    Returns:
+
+    float
+        Number of seconds to wait, which is never past the deadline.
+
+    """
+
+    remaining_time = get_remaining_time()
+
+    if remaining_time is None:
+
+        return delay
+
+    return max(min(delay, remaining_time), 0.0)
+
+
 def safe_call(
     func: Callable, *func_args: Any,
     catch_errors: bool = True,
@@ -119,12 +299,15 @@ def safe_call(
     exponential_backoff_factor: float = 1.5,
     error_class: type = Exception,
     error_callback_func: Callable = None,
+    timeout_kwarg: str = None,
     **func_kwargs: Any
 ) -> BrowserStatus | Any:
     """Call a function, and catch any errors that occur during the execution,
     with the option to retry the function call a specified number of times,
     with an exponential backoff delay between retries.
 
+    Retries stop once the deadline set by `time_limit` has passed.
+
     Arguments:
 
     func: Callable
@@ -154,6 +337,10 @@ def safe_call(
     error_callback_func: Callable
         A callback function to execute when an error is caught.
 
+    timeout_kwarg: str
+        Name of the keyword argument the function uses for its timeout,
+        which is set to the time left before the deadline on each attempt.
+
     **func_kwargs: Any
         The keyword arguments to pass to the function.
 
@@ -168,10 +355,30 @@ def safe_call(
 
     if not catch_errors: 
 
+        check_deadline()
+
+        if timeout_kwarg is not None:
+
+            func_kwargs.update(get_timeout_kwargs(
+                timeout_kwarg = timeout_kwarg
+            ))
+
         return func(*func_args, **func_kwargs)
 
     for error_idx in range(max_errors):
 
+        remaining_time = get_remaining_time()
+
+        if remaining_time is not None and remaining_time <= 0:
+
+            break
+
+        if timeout_kwarg is not None:
+
+            func_kwargs.update(get_timeout_kwargs(
+                timeout_kwarg = timeout_kwarg
+            ))
+
         try: return func(*func_args, **func_kwargs)
 
         except error_class as error:
@@ -188,10 +395,116 @@ def safe_call(
 
                 return BrowserStatus.ERROR
                 
-        if exponential_backoff: time.sleep(
+        if exponential_backoff: time.sleep(get_backoff_delay(
             exponential_backoff_factor 
             ** error_idx
+        ))
+            
+    return BrowserStatus.ERROR
+
+
+async def async_safe_call(
+    func: Callable, *func_args: Any,
+    catch_errors: bool = True,
+    log_errors: bool = True,
+    max_errors: int = 3,
+    exponential_backoff: bool = True,
+    exponential_backoff_factor: float = 1.5,
+    error_class: type = Exception,
+    error_callback_func: Callable = None,
+    **func_kwargs: Any
+) -> BrowserStatus | Any:
+    """Await a coroutine function, and catch any errors that occur during
+    the execution, with the same retry semantics as `safe_call`, where
+    the exponential backoff delay does not block the event loop.
+
+    Each attempt is cancelled once the deadline set by `time_limit` passes.
+
+    Arguments:
+
+    func: Callable
+        The coroutine function to await.
+    
+    *func_args: Any
+        The positional arguments to pass to the function.
+
+    catch_errors: bool
+        Whether to catch errors that occur during the function call.
+
+    log_errors: bool
+        Whether to log errors that occur during the function call.
+
+    max_errors: int
+        The maximum number of times to retry the function call.
+
+    exponential_backoff: bool
+        Whether to use an exponential backoff delay between retries.
+
+    exponential_backoff_factor: float
+        The factor by which to increase the delay between retries.
+
+    error_class: type
+        The error class to catch during the function call.
+
+    error_callback_func: Callable
+        A callback function to execute when an error is caught.
+
+    **func_kwargs: Any
+        The keyword arguments to pass to the function.
+
+    Returns:
+
+    PlaywrightStatus | Any
+        The result of awaiting the `func` argument, or a PlaywrightStatus
+        indicating whether the function call was successful,
+        or an error occurred during the function call.
+    
+    """
+
+    if not catch_errors: 
+
+        check_deadline()
+
+        return await asyncio.wait_for(
+            func(*func_args, **func_kwargs),
+            timeout = get_remaining_time()
+        )
+
+    for error_idx in range(max_errors):
+
+        remaining_time = get_remaining_time()
+
+        if remaining_time is not None and remaining_time <= 0:
+
+            break
+
+        try: return await asyncio.wait_for(
+            func(*func_args, **func_kwargs),
+            timeout = remaining_time
         )
+
+        except asyncio.CancelledError:
+
+            raise
+
+        except error_class as error:
+
+            if log_errors: print(
+                traceback.format_exc()
+            )
+
+            callback_status = error_callback_func({
+                "error": error, "error_idx": error_idx,
+            }) if error_callback_func is not None else None
+
+            if callback_status is BrowserStatus.ERROR:
+
+                return BrowserStatus.ERROR
+                
+        if exponential_backoff: await asyncio.sleep(get_backoff_delay(
+            exponential_backoff_factor 
+            ** error_idx
+        ))
             
     return BrowserStatus.ERROR
 
@@ -0,0 +1,797 @@
+from typing import List, Dict, Generator
+from collections import namedtuple
+from itertools import count
+
+from multiprocessing.connection import (
+    Connection,
+    wait
+)
+
+from torch.multiprocessing import (
+    Process,
+    Queue,
+    Pipe
+)
+
+from insta.configs import (
+    BrowserConfig,
+    AgentConfig,
+    JudgeConfig,
+    TaskProposerConfig,
+    DEFAULT_BROWSER_CONFIG,
+    DEFAULT_AGENT_CONFIG,
+)
+
+from insta.gym_env import (
+    InstaEnv
+)
+
+from insta.agent import (
+    BrowserAgent
+)
+
+from insta.judge import (
+    BrowserJudge
+)
+
+from insta.task_proposer import (
+    BrowserTaskProposer
+)
+
+from insta.task_queue import (
+    SQLiteTaskQueue,
+    DEFAULT_LEASE_TIMEOUT,
+    DEFAULT_SPECULATION_QUANTILE,
+    DEFAULT_MAX_LEASES_PER_DOMAIN,
+    DEFAULT_MIN_DOMAIN_INTERVAL
+)
+
+from insta.inference import (
+    InferenceClient,
+    INFERENCE_ENGINES,
+    STOP_SIGNAL,
+    DEFAULT_MAX_BATCH_SIZE,
+    get_inference_engine,
+    serve_inference
+)
+
+from insta.completion_index import (
+    get_completion_indices
+)
+
+from insta.pipeline import (
+    InstaPipelineOutput,
+    iter_trajectories,
+    load_trajectory,
+    shard_dataset_ids,
+    get_task_domains,
+    DONE_SIGNAL,
+    DEFAULT_SEED,
+    DEFAULT_RANK,
+    DEFAULT_WORLD_SIZE,
+    DEFAULT_NUM_AGENTS,
+    DEFAULT_PLAYWRIGHT_WORKERS,
+    DEFAULT_RETURN_TRAJECTORIES,
+    DEFAULT_SHARE_INFERENCE,
+)
+
+from dataclasses import replace
+
+import torch
+import tempfile
+import shutil
+import os
+
+
+DEFAULT_SHUTDOWN_TIMEOUT = 60
+
+
+PoolJob = namedtuple(
+    "PoolJob",
+    ["job_id", "dataset", "task_queue", "return_trajectories"]
+)
+
+
+PoolMessage = namedtuple(
+    "PoolMessage",
+    ["job_id", "output"]
+)
+
+
+def pool_worker_fn(
+    job_queue: Queue,
+    output_connection: Connection,
+    browser_config: BrowserConfig,
+    agent_config: AgentConfig,
+    judge_config: JudgeConfig,
+    task_proposer_config: TaskProposerConfig,
+    worker_id: str,
+    gpu_rank: int,
+    inference_client: InferenceClient = None,
+    collection_kwargs: Dict = None,
+) -> None:
+    """Build the browser, agent, judge, and task proposer once, and then
+    run jobs from the pool until the pool is closed, leasing the tasks
+    for each job from a queue shared by every worker in the pool.
+
+    Arguments:
+
+    job_queue: Queue
+        Queue of jobs sent by the pool to this worker.
+
+    output_connection: Connection
+        Pipe for sending trajectories to the pool.
+
+    browser_config: BrowserConfig
+        Configuration for the browser environment.
+
+    agent_config: AgentConfig
+        Configuration for the LLM agent.
+
+    judge_config: JudgeConfig
+        Configuration for the LLM judge, or None to skip judging.
+
+    task_proposer_config: TaskProposerConfig
+        Configuration for the LLM task proposer, or None to skip proposing.
+
+    worker_id: str
+        Unique identifier for this worker in the task queue.
+
+    gpu_rank: int
+        Rank used for choosing a GPU for this worker.
+
+    inference_client: InferenceClient
+        Handle for a shared inference broker, or None for a private client.
+
+    collection_kwargs: Dict
+        Keyword arguments for iter_trajectories, such as data directories.
+
+    """
+
+    os.environ['VLLM_WORKER_MULTIPROC_METHOD'] = 'spawn'
+
+    if torch.cuda.device_count() > 0:
+
+        os.environ["CUDA_VISIBLE_DEVICES"] = "{}".format(
+            gpu_rank % torch.cuda.device_count()
+        )
+
+    browser = InstaEnv(
+        config = browser_config
+    )
+
+    agent = BrowserAgent(
+        config = agent_config,
+        inference_client = inference_client
+    )
+
+    judge = None
+
+    if judge_config is not None:
+
+        judge = BrowserJudge(
+            config = judge_config
+        )
+
+    task_proposer = None
+
+    if task_proposer_config is not None:
+
+        task_proposer = BrowserTaskProposer(
+            config = task_proposer_config
+        )
+
+    while True:
+
+        job = job_queue.get()
+
+        if job == DONE_SIGNAL:
+
+            break
+
+        for output in iter_trajectories(
+            dataset = job.dataset,
+            browser = browser,
+            agent = agent,
+            judge = judge,
+            task_proposer = task_proposer,
+            task_queue = job.task_queue,
+            worker_id = worker_id,
+            return_handles = True,
+            **(collection_kwargs or {})
+        ):
+
+            if job.return_trajectories:
+
+                output_connection.send(PoolMessage(
+                    job_id = job.job_id,
+                    output = output
+                ))
+
+        job.task_queue.close()
+
+        output_connection.send(PoolMessage(
+            job_id = job.job_id,
+            output = DONE_SIGNAL
+        ))
+
+    output_connection.close()
+
+
+class WorkerPool(object):
+    """Long-lived agent processes that keep their browser, LLM clients,
+    and tokenizers loaded between datasets, so each new dataset starts
+    browsing immediately, instead of paying for process startup.
+
+    Jobs run one at a time, every worker leases tasks for the current job
+    from a shared queue, and workers that exit unexpectedly are restarted
+    when the next job starts. Call close to stop the workers.
+
+    Attributes:
+
+    num_agents: int
+        Number of agent processes in the pool.
+
+    playwright_workers: int
+        Number of Playwright workers shared by the agents.
+
+    share_inference: bool
+        Whether the pool was asked to share one copy of a local model.
+
+    max_batch_size: int
+        Maximum number of prompts in each batch for the shared model.
+
+    worker_processes: Dict[int, Process]
+        Running agent process for each agent rank.
+
+    """
+
+    def __init__(self, browser_config: BrowserConfig = DEFAULT_BROWSER_CONFIG,
+                 agent_config: AgentConfig = DEFAULT_AGENT_CONFIG,
+                 judge_config: JudgeConfig = None,
+                 task_proposer_config: TaskProposerConfig = None,
+                 seed: int = DEFAULT_SEED,
+                 rank: int = DEFAULT_RANK,
+                 world_size: int = DEFAULT_WORLD_SIZE,
+                 num_agents: int = DEFAULT_NUM_AGENTS,
+                 playwright_workers: int = DEFAULT_PLAYWRIGHT_WORKERS,
+                 share_inference: bool = DEFAULT_SHARE_INFERENCE,
+                 max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+                 collection_kwargs: Dict = None):
+        """Long-lived agent processes that keep their browser, LLM clients,
+        and tokenizers loaded between datasets, so each new dataset starts
+        browsing immediately, instead of paying for process startup.
+
+        Arguments:
+
+        browser_config: BrowserConfig
+            Configuration for the browser environment.
+
+        agent_config: AgentConfig
+            Configuration for the LLM agent.
+
+        judge_config: JudgeConfig
+            Configuration for the LLM judge, or None to skip judging.
+
+        task_proposer_config: TaskProposerConfig
+            Configuration for the LLM task proposer, or None to skip proposing.
+
+        seed: int
+            Seed for the order of tasks in each dataset.
+
+        rank: int
+            Rank of this machine, which runs one shard of each dataset.
+
+        world_size: int
+            Number of machines running the same datasets.
+
+        num_agents: int
+            Number of agent processes in the pool.
+
+        playwright_workers: int
+            Number of Playwright workers running.
+
+        share_inference: bool
+            Whether agents with a local vLLM model share one copy of the
+            model in a broker process, which batches prompts from every agent,
+            and runs on the GPUs visible to the launching process, instead of
+            one GPU per agent.
+
+        max_batch_size: int
+            Maximum number of prompts in each batch for the shared model.
+
+        collection_kwargs: Dict
+            Keyword arguments for iter_trajectories, such as data directories.
+
+        """
+
+        self.browser_config = browser_config
+        self.agent_config = agent_config
+        self.judge_config = judge_config
+        self.task_proposer_config = task_proposer_config
+
+        self.seed = seed
+        self.rank = rank
+        self.world_size = world_size
+
+        self.num_agents = num_agents
+        self.playwright_workers = playwright_workers
+
+        self.share_inference = share_inference
+        self.max_batch_size = max_batch_size
+
+        self.collection_kwargs = collection_kwargs or {}
+
+        self.agent_ranks = list(range(
+            rank * num_agents,
+            (rank + 1) * num_agents
+        ))
+
+        self.task_queue_dir = tempfile.mkdtemp()
+        self.job_ids = count()
+
+        self.job_queues = {}
+        self.worker_processes = {}
+        self.worker_connections = {}
+
+        self.request_queue = None
+        self.inference_process = None
+
+        self.inference_clients = {
+            agent_rank: None
+            for agent_rank in self.agent_ranks
+        }
+
+        share_inference = (
+            share_inference and
+            agent_config.client_type in INFERENCE_ENGINES
+        )
+
+        if share_inference:
+
+            self.request_queue = Queue()
+
+            response_queues = {
+                str(agent_rank): Queue()
+                for agent_rank in self.agent_ranks
+            }
+
+            inference_engine = get_inference_engine(
+                client_type = agent_config.client_type,
+                client_kwargs = agent_config.client_kwargs,
+                generation_kwargs = agent_config.generation_kwargs
+            )
+
+            self.inference_process = Process(
+                target = serve_inference,
+                args = (
+                    inference_engine,
+                    self.request_queue,
+                    response_queues,
+                    max_batch_size
+                )
+            )
+
+            self.inference_process.start()
+
+            self.inference_clients = {
+                agent_rank: InferenceClient(
+                    worker_id = str(agent_rank),
+                    request_queue = self.request_queue,
+                    response_queue = response_queues[str(agent_rank)]
+                )
+                for agent_rank in self.agent_ranks
+            }
+
+        self.start_workers()
+
+    def __enter__(self) -> "WorkerPool":
+
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+
+        self.close()
+
+    def start_workers(self) -> None:
+        """Start an agent process for every agent rank without a running
+        process, such as when the pool is created, or after a crash.
+
+        """
+
+        for agent_rank in self.agent_ranks:
+
+            worker_running = (
+                agent_rank in self.worker_processes and
+                self.worker_processes[agent_rank].is_alive()
+            )
+
+            if worker_running:
+
+                continue
+
+            if agent_rank in self.worker_processes:
+
+                self.stop_worker(agent_rank)
+
+            # copy every field of the config, such as record and replay
+            # directories, and only assign each agent a Playwright server
+            browser_config = replace(
+                self.browser_config,
+                playwright_port = (
+                    self.browser_config.playwright_port +
+                    agent_rank % self.playwright_workers
+                )
+            )
+
+            output_reader, output_writer = Pipe(
+                duplex = False
+            )
+
+            job_queue = Queue()
+
+            worker_process = Process(
+                target = pool_worker_fn,
+                kwargs = dict(
+                    job_queue = job_queue,
+                    output_connection = output_writer,
+                    browser_config = browser_config,
+                    agent_config = self.agent_config,
+                    judge_config = self.judge_config,
+                    task_proposer_config = self.task_proposer_config,
+                    worker_id = str(agent_rank),
+                    gpu_rank = agent_rank,
+                    inference_client = self.inference_clients[agent_rank],
+                    collection_kwargs = self.collection_kwargs,
+                )
+            )
+
+            worker_process.start()
+
+            # the worker owns the write end, so close the copy in this process
+            output_writer.close()
+
+            self.job_queues[agent_rank] = job_queue
+            self.worker_processes[agent_rank] = worker_process
+            self.worker_connections[agent_rank] = output_reader
+
+    def stop_worker(self, agent_rank: int) -> None:
+        """Remove an agent process that has exited from the pool.
+
+        Arguments:
+
+        agent_rank: int
+            Rank of the agent process.
+
+        """
+
+        self.worker_connections.pop(agent_rank).close()
+        self.worker_processes.pop(agent_rank).join()
+        self.job_queues.pop(agent_rank)
+
+    def stream(
+        self, dataset: List[Dict[str, str]],
+        return_trajectories: bool = True,
+        lease_timeout: float = DEFAULT_LEASE_TIMEOUT,
+        speculation_quantile: float = DEFAULT_SPECULATION_QUANTILE,
+        max_leases_per_domain: int = DEFAULT_MAX_LEASES_PER_DOMAIN,
+        min_domain_interval: float = DEFAULT_MIN_DOMAIN_INTERVAL,
+    ) -> Generator[InstaPipelineOutput, None, None]:
+        """Run a dataset on the warm agents, and yield each trajectory as
+        soon as it is finished, where closing the generator cancels the
+        tasks that have not started, and agents finish their current task.
+
+        Arguments:
+
+        dataset: List[Dict[str, str]]
+            Tasks to run, each entry must be a dictionary with keys
+            "domain" and "task".
+
+        return_trajectories: bool
+            Whether agents send trajectories to be yielded, or just save them.
+
+        lease_timeout: float
+            Number of seconds before a task leased to an agent expires,
+            and the task is handed to another agent.
+
+        speculation_quantile: float
+            Quantile of finished task durations, such as 0.95, after which
+            a running task is also leased to an idle worker, and the first
+            copy to finish is saved, or None to disable speculation.
+
+        max_leases_per_domain: int
+            Maximum number of running tasks on the same domain, where
+            tasks on other domains are leased while a domain is at the limit.
+
+        min_domain_interval: float
+            Minimum number of seconds between starting two tasks on the
+            same domain, or None to start tasks as soon as agents are idle.
+
+        Returns:
+
+        Generator[InstaPipelineOutput, None, None]
+            Generator for the observations, actions, and judgments for each
+            task, in the order that agents finish them.
+
+        """
+
+        job_id = next(self.job_ids)
+
+        task_queue = SQLiteTaskQueue(
+            path = os.path.join(
+                self.task_queue_dir,
+                "job_{}.db".format(job_id)
+            ),
+            lease_timeout = lease_timeout,
+            speculation_quantile = speculation_quantile,
+            max_leases_per_domain = max_leases_per_domain,
+            min_domain_interval = min_domain_interval
+        )
+
+        dataset_ids = shard_dataset_ids(
+            len(dataset), seed = self.seed,
+            rank = self.rank, world_size = self.world_size
+        )
+
+        task_queue.populate(
+            dataset_ids,
+            reset = True,
+            domains = get_task_domains(
+                dataset, dataset_ids
+            )
+        )
+
+        task_queue.close()
+
+        # build missing journals once, before workers start appending
+        for completion_index in get_completion_indices(
+            observations_dir = self.collection_kwargs.get("observations_dir"),
+            actions_dir = self.collection_kwargs.get("actions_dir"),
+            judgments_dir = self.collection_kwargs.get("judgments_dir"),
+            task_proposals_dir = self.collection_kwargs.get("task_proposals_dir"),
+        ).values():
+
+            if completion_index is not None:
+
+                completion_index.ensure_journal()
+
+        self.start_workers()
+
+        for job_queue in self.job_queues.values():
+
+            job_queue.put(PoolJob(
+                job_id = job_id,
+                dataset = dataset,
+                task_queue = task_queue,
+                return_trajectories = return_trajectories
+            ))
+
+        running_ranks = set(self.worker_processes)
+        crashed_workers = {}
+
+        job_finished = False
+
+        try:
+
+            while len(running_ranks) > 0:
+
+                ready_to_rank = {
+                    self.worker_connections[agent_rank]: agent_rank
+                    for agent_rank in running_ranks
+                }
+
+                ready_to_rank.update({
+                    self.worker_processes[agent_rank].sentinel: agent_rank
+                    for agent_rank in running_ranks
+                })
+
+                if self.inference_process is not None:
+
+                    ready_to_rank[self.inference_process.sentinel] = None
+
+                # block until a worker sends an output or exits
+                for ready in wait(list(ready_to_rank)):
+
+                    agent_rank = ready_to_rank[ready]
+
+                    if agent_rank is None:
+
+                        raise RuntimeError(
+                            "Inference broker exited unexpectedly "
+                            "with code {}".format(
+                                self.inference_process.exitcode
+                            )
+                        )
+
+                    if agent_rank not in running_ranks:
+
+                        continue
+
+                    connection = self.worker_connections[agent_rank]
+
+                    worker_exited = not (
+                        self.worker_processes[agent_rank]
+                        .is_alive()
+                    )
+
+                    try:
+
+                        while agent_rank in running_ranks and \
+                                connection.poll():
+
+                            message = connection.recv()
+
+                            # skip outputs from a cancelled job
+                            if message.job_id != job_id:
+
+                                continue
+
+                            if message.output == DONE_SIGNAL:
+
+                                running_ranks.discard(agent_rank)
+
+                            else:
+
+                                yield load_trajectory(message.output)
+
+                    except EOFError:
+
+                        worker_exited = True
+
+                    if agent_rank not in running_ranks or not worker_exited:
+
+                        continue
+
+                    running_ranks.discard(agent_rank)
+
+                    crashed_workers[agent_rank] = (
+                        self.worker_processes[agent_rank].exitcode
+                    )
+
+                    self.stop_worker(agent_rank)
+
+                    num_released = task_queue.release_worker(
+                        worker_id = str(agent_rank)
+                    )
+
+                    print(
+                        "Worker {} exited unexpectedly with code {}, "
+                        "returning {} leased tasks to the queue".format(
+                            agent_rank, crashed_workers[agent_rank],
+                            num_released
+                        )
+                    )
+
+            task_stats = task_queue.stats()
+
+            num_unfinished = (
+                task_stats["pending"] +
+                task_stats["leased"]
+            )
+
+            job_finished = True
+
+            if len(crashed_workers) > 0 and num_unfinished > 0:
+
+                raise RuntimeError(
+                    "{} tasks were not finished because agents exited "
+                    "unexpectedly with codes: {}".format(
+                        num_unfinished, crashed_workers
+                    )
+                )
+
+        finally:
+
+            # agents still running this job find no more tasks to lease
+            if not job_finished:
+
+                task_queue.populate(
+                    [], reset = True
+                )
+
+            task_queue.close()
+
+    def launch(
+        self, dataset: List[Dict[str, str]],
+        return_trajectories: bool = DEFAULT_RETURN_TRAJECTORIES,
+        lease_timeout: float = DEFAULT_LEASE_TIMEOUT,
+        speculation_quantile: float = DEFAULT_SPECULATION_QUANTILE,
+        max_leases_per_domain: int = DEFAULT_MAX_LEASES_PER_DOMAIN,
+        min_domain_interval: float = DEFAULT_MIN_DOMAIN_INTERVAL,
+    ) -> List[InstaPipelineOutput] | None:
+        """Run a dataset on the warm agents, and wait for every task.
+
+        Arguments:
+
+        dataset: List[Dict[str, str]]
+            Tasks to run, each entry must be a dictionary with keys
+            "domain" and "task".
+
+        return_trajectories: bool
+            Whether to return trajectories or just save them.
+
+        lease_timeout: float
+            Number of seconds before a task leased to an agent expires,
+            and the task is handed to another agent.
+
+        speculation_quantile: float
+            Quantile of finished task durations, such as 0.95, after which
+            a running task is also leased to an idle worker, and the first
+            copy to finish is saved, or None to disable speculation.
+
+        max_leases_per_domain: int
+            Maximum number of running tasks on the same domain, where
+            tasks on other domains are leased while a domain is at the limit.
+
+        min_domain_interval: float
+            Minimum number of seconds between starting two tasks on the
+            same domain, or None to start tasks as soon as agents are idle.
+
+        Returns:
+
+        List[InstaPipelineOutput] | None
+            List with observations, actions, and judgments for each task,
+            which are saved to disk for later processing.
+
+        """
+
+        pipeline_outputs = list(self.stream(
+            dataset = dataset,
+            return_trajectories = return_trajectories,
+            lease_timeout = lease_timeout,
+            speculation_quantile = speculation_quantile,
+            max_leases_per_domain = max_leases_per_domain,
+            min_domain_interval = min_domain_interval
+        ))
+
+        if return_trajectories:
+
+            return pipeline_outputs
+
+    def close(self, timeout: float = DEFAULT_SHUTDOWN_TIMEOUT) -> None:
+        """Stop every agent after its current job, stop the inference
+        broker, and remove the task queues for every job.
+
+        Arguments:
+
+        timeout: float
+            Number of seconds to wait for each process before terminating.
+
+        """
+
+        for agent_rank, worker_process in self.worker_processes.items():
+
+            if worker_process.is_alive():
+
+                self.job_queues[agent_rank].put(DONE_SIGNAL)
+
+        for agent_rank in list(self.worker_processes):
+
+            worker_process = self.worker_processes[agent_rank]
+
+            worker_process.join(timeout = timeout)
+
+            if worker_process.is_alive():
+
+                worker_process.terminate()
+
+            self.stop_worker(agent_rank)
+
+        if self.inference_process is not None:
+
+            if self.inference_process.is_alive():
+
+                self.request_queue.put(STOP_SIGNAL)
+
+            self.inference_process.join(timeout = timeout)
+
+            if self.inference_process.is_alive():
+
+                self.inference_process.terminate()
+
+            self.inference_process = None
+
+        shutil.rmtree(
+            self.task_queue_dir,
+            ignore_errors = True
+        )
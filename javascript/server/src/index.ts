@@ -53,18 +53,35 @@ POST `/goto?url=$URL&session_id=$SESSION_ID`
 
 ## Extract metadata from the webpage.
 
-POST `/observation?session_id=$SESSION_ID`:
+POST `/observation?session_id=$SESSION_ID&screenshot=$SCREENSHOT&metadata_keys=$METADATA_KEYS&style_keys=$STYLE_KEYS`:
 
-- Query parameters: `session_id`
+- Query parameters: `session_id`, `screenshot`, `metadata_keys`, `style_keys`
     - `session_id`: unique session ID for the browsing session
+    - `screenshot`: set to `false` to skip the screenshot (default: `true`)
+    - `metadata_keys`: comma-separated metadata fields sent for each
+      DOM node (default: every field)
+    - `style_keys`: comma-separated computed styles sent for each DOM
+      node, or `*` for every style (default: `display`)
 
 - Return value: `playwright_observation`
     - `playwright_observation`: dictionary containing the following keys:
         - `raw_html`: raw HTML content of the webpage
-        - `screenshot`: base64-encoded PNG screenshot of the webpage
-        - `metadata`: dictionary of metadata for each DOM node
+        - `screenshot`: base64-encoded PNG screenshot of the webpage,
+          or null when the screenshot is skipped
+        - `metadata`: dictionary of metadata for each DOM node, with
+          the fields in `metadata_keys`, and the styles in `style_keys`
         - `current_url`: current URL of the webpage (after redirects)
 
+- Binary format: sent instead of JSON when the `Accept` header includes
+  `application/x-insta-observation`, which holds the following parts:
+    - 4 bytes: big-endian length of the compressed JSON section
+    - JSON section: the keys above except `screenshot`, compressed with
+      the first codec listed in the `X-Observation-Accept-Encoding`
+      header that the server supports, from `zstd` and `gzip`, and
+      named by the `X-Observation-Encoding` response header
+    - remaining bytes: the PNG screenshot of the webpage, which is
+      empty when the screenshot is skipped
+
 ---
 
 ## Execute an action in the browsing session.
@@ -78,6 +95,36 @@ POST `/action?session_id=$SESSION_ID`:
     - `action`: list of dictionaries containing the following keys for each function call:
         - `dotpath`: dot-separated path to the function in the Playwright API
         - `args`: string containing function arguments
+
+---
+
+## Execute an action, and extract metadata once the webpage settles.
+
+POST `/step?session_id=$SESSION_ID&settle_time=$SETTLE_TIME&screenshot=$SCREENSHOT&metadata_keys=$METADATA_KEYS&style_keys=$STYLE_KEYS`:
+
+- Query parameters: `session_id`, `settle_time`, `screenshot`,
+  `metadata_keys`, `style_keys`
+    - `session_id`: unique session ID for the browsing session
+    - `settle_time`: milliseconds to wait after the action (default: 0)
+    - `screenshot`, `metadata_keys`, `style_keys`: same as `/observation`
+
+- JSON body: `action`
+    - `action`: list of function calls, with the same format as `/action`
+
+- Return value: dictionary containing one of the following keys:
+    - `observation`: dictionary with the same keys as `/observation`,
+      or the binary format of `/observation` when accepted
+    - `observation_error`: error message if the action succeeded,
+      but the observation failed
+
+---
+
+## List the endpoints served by this server.
+
+POST `/capabilities`:
+
+- Return value: dictionary containing the following keys:
+    - `endpoints`: list of endpoint names, such as `step`
  
  */
 
@@ -86,6 +133,7 @@ import express from 'express';
 import { chromium } from 'playwright-extra';
 import StealthPlugin from "puppeteer-extra-plugin-stealth";
 import crypto from 'crypto';
+import zlib from 'zlib';
 import vm from 'vm';
 
 
@@ -117,6 +165,12 @@ const SESSION_TIMEOUT_THRESHOLD = 30 * 60 * 1000;
 const SESSION_TIMEOUT_INTERVAL = 30 * 1000;
 
 
+// keep idle client connections open between agent steps
+// so pooled clients reuse connections while the agent thinks
+const KEEP_ALIVE_TIMEOUT = 5 * 60 * 1000;
+const HEADERS_TIMEOUT = KEEP_ALIVE_TIMEOUT + 1000;
+
+
 // configure the default viewport size for the browsing session
 // standard desktop browsing resolution
 const DEFAULT_WIDTH = 1920;
@@ -130,6 +184,50 @@ const MAX_HTML_SIZE = 10000000;
 const MAX_CHAINED_CALLS = 3;
 
 
+// wait for navigations started by an action before observing
+// pages that never finish loading are observed after the timeout
+const STEP_LOAD_TIMEOUT = 10 * 1000;
+
+
+// binary observations send raw screenshot bytes and compressed JSON
+// clients opt in with the Accept header, and list codecs they can decode
+const OBSERVATION_CONTENT_TYPE = 'application/x-insta-observation';
+const OBSERVATION_ACCEPT_ENCODING_HEADER = 'X-Observation-Accept-Encoding';
+const OBSERVATION_ENCODING_HEADER = 'X-Observation-Encoding';
+const OBSERVATION_GZIP_LEVEL = 1;
+
+
+// endpoints served by this server, listed by /capabilities
+// clients use combined endpoints such as /step only when listed
+const SERVER_ENDPOINTS = [
+    'start',
+    'close',
+    'goto',
+    'observation',
+    'action',
+    'step',
+    'capabilities'
+];
+
+
+// metadata fields and computed styles sent for each DOM node by default
+// clients request others with the metadata_keys and style_keys parameters
+const DEFAULT_METADATA_KEYS = [
+    'backend_node_id',
+    'bounding_client_rect',
+    'computed_style',
+    'scroll_left',
+    'scroll_top',
+    'editable_value',
+    'is_visible',
+    'is_frontmost'
+];
+const DEFAULT_STYLE_KEYS = [
+    'display'
+];
+const ALL_STYLE_KEYS = '*';
+
+
 // skip certain tags when extracting metadata
 // these tags contain little useful information for agents
 const SKIP_TAGS = [
@@ -167,11 +265,33 @@ const generate_session_id = (): string => {
 };
 
 
+// read a comma-separated list of keys from a query parameter
+// missing or empty parameters select the default keys
+const parse_key_list = (
+    value: any, default_keys: string[]
+): string[] => {
+
+    if (typeof value !== 'string' || value.length === 0) {
+
+        return default_keys;
+
+    }
+
+    return value.split(',').map(
+        key => key.trim()
+    ).filter(
+        key => key.length > 0
+    );
+
+};
+
+
 // extract metadata from the webpage for agents
-// includes all data needed to reconstruct the webpage
+// includes the requested fields needed to reconstruct the webpage
 const process_observation = ([
-    MAX_NODE_SIZE, MAX_HTML_SIZE, SKIP_TAGS
-]: [number, number, string[]]) => {
+    MAX_NODE_SIZE, MAX_HTML_SIZE, SKIP_TAGS,
+    METADATA_KEYS, STYLE_KEYS, ALL_STYLE_KEYS
+]: [number, number, string[], string[], string[], string]) => {
 
     function elementFromPoint(x: number, y: number) {
 
@@ -191,6 +311,13 @@ const process_observation = ([
 
     const metadata: { [key: number]: any } = {};
 
+    // reading every computed style of every node dominates the cost
+    // of an observation, so only the requested styles are read
+
+    const include_computed_style = METADATA_KEYS.includes('computed_style');
+    const include_is_frontmost = METADATA_KEYS.includes('is_frontmost');
+    const include_all_styles = STYLE_KEYS.includes(ALL_STYLE_KEYS);
+
     const preprocess_node = (node: Element, backend_node_id: number) => {
 
         if (node.tagName in SKIP_TAGS) {
@@ -207,19 +334,30 @@ const process_observation = ([
         const bounding_client_rect = 
             node.getBoundingClientRect();
 
-        const raw_computed_style = 
-            window.getComputedStyle(node);
-            
-        const computed_style: { [key: string]: string } = {};
+        let computed_style: { [key: string]: string } | null = null;
 
-        for (let idx = 0; idx < raw_computed_style.length; idx++) {
+        if (include_computed_style) {
 
-            const propertyName = raw_computed_style[idx];
-            computed_style[propertyName] = (
-                raw_computed_style
-                .getPropertyValue("" + propertyName)
+            const raw_computed_style = 
+                window.getComputedStyle(node);
+
+            const style_keys = (
+                include_all_styles ?
+                Array.from(raw_computed_style) : STYLE_KEYS
             );
 
+            computed_style = {};
+
+            for (let idx = 0; idx < style_keys.length; idx++) {
+
+                const propertyName = style_keys[idx];
+                computed_style[propertyName] = (
+                    raw_computed_style
+                    .getPropertyValue("" + propertyName)
+                );
+
+            }
+
         }
 
         const scroll_left = node.scrollLeft;
@@ -261,7 +399,7 @@ const process_observation = ([
 
         let is_frontmost = false;
 
-        if (is_visible) {
+        if (is_visible && include_is_frontmost) {
 
             let top_element = elementFromPoint(
                 bounding_client_rect.x +
@@ -306,7 +444,7 @@ const process_observation = ([
 
         }
 
-        metadata[backend_node_id] = {
+        const node_metadata: { [key: string]: any } = {
             'backend_node_id': backend_node_id,
             'bounding_client_rect': bounding_client_rect,
             'computed_style': computed_style,
@@ -317,6 +455,14 @@ const process_observation = ([
             'is_frontmost': is_frontmost
         };
 
+        metadata[backend_node_id] = Object.fromEntries(
+            METADATA_KEYS.filter(
+                key => key in node_metadata
+            ).map(
+                key => [key, node_metadata[key]]
+            )
+        );
+
     }
 
     let allNodes = Array.from(document.body.getElementsByTagName('*'));
@@ -486,6 +632,253 @@ const playwright_function_call = async (
 };
 
 
+// check that an action is a list of function calls with dotpaths and args
+// returns an error message for the agent, or null if the action is valid
+const validate_action = (action: any): string | null => {
+
+    if (action === undefined) {
+
+        return 'Action not provided';
+
+    }
+
+    // check that actions is a list dotpaths and args
+
+    if (!Array.isArray(action)) {
+
+        return 'Action must be a list of dotpaths and args';
+
+    }
+
+    if (action.length === 0) {
+
+        return 'Action must contain at least one function call';
+
+    }
+
+    if (action.length > MAX_CHAINED_CALLS) {
+
+        return 'Action must contain at most 3 function calls';
+
+    }
+
+    for (let idx = 0; idx < action.length; idx++) {
+
+        const function_call = action[idx];
+        
+        // check that each action item is an object with a dotpath and args
+
+        if (typeof function_call !== 'object') {
+
+            return 'Action item must be an object';
+
+        }
+
+        if (function_call['dotpath'] === undefined) {
+
+            return 'Action item must contain a dotpath';
+
+        }
+
+        if (function_call['args'] === undefined) {
+
+            return 'Action item must contain args';
+
+        }
+
+        // check that the dotpath is a string
+
+        if (typeof function_call['dotpath'] !== 'string') {
+
+            return 'Dotpath must be a string';
+
+        }
+
+        // check that the args is a string
+        
+        if (typeof function_call['args'] !== 'string') {
+
+            return 'Args must be a string';
+
+        }
+
+    }
+
+    return null;
+
+};
+
+
+// capture the metadata, HTML, screenshot, and URL of the webpage
+// throws an error with a message for the agent if any stage fails
+const capture_observation = async (
+    page: any, capture_screenshot: boolean,
+    metadata_keys: string[], style_keys: string[]
+): Promise<{ [key: string]: any }> => {
+
+    let metadata: { [key: number]: any };
+    let raw_html: string;
+
+    try {
+
+        [ metadata, raw_html ] = await page.evaluate(process_observation, [
+            MAX_NODE_SIZE, MAX_HTML_SIZE, SKIP_TAGS,
+            metadata_keys, style_keys, ALL_STYLE_KEYS
+        ]);
+
+    } catch (error) {
+
+        throw new Error(
+            'Failed to extract metadata: ' + error
+        );
+
+    }
+
+    if (metadata === undefined || metadata === null || raw_html === undefined || raw_html === null) {
+
+        throw new Error(
+            'Failed to extract metadata and HTML'
+        );
+
+    }
+
+    // text-only agents skip the screenshot entirely
+
+    let screenshot_bytes: Buffer | null = null;
+
+    try {
+
+        if (capture_screenshot) {
+
+            screenshot_bytes = await page.screenshot({
+                type: 'png'
+            });
+
+        }
+
+    } catch (error) {
+
+        throw new Error(
+            'Failed to capture screenshot: ' + error
+        );
+
+    }
+
+    if (screenshot_bytes === undefined) {
+
+        throw new Error(
+            'Failed to capture screenshot'
+        );
+
+    }
+
+    let current_url: string;
+
+    try {
+
+        current_url = page.url();
+
+    } catch (error) {
+
+        throw new Error(
+            'Failed to extract current URL: ' + error
+        );
+
+    }
+
+    if (current_url === undefined) {
+
+        throw new Error(
+            'Failed to extract current URL'
+        );
+
+    }
+
+    return {
+        'raw_html': raw_html,
+        'screenshot': screenshot_bytes,
+        'metadata': metadata,
+        'current_url': current_url
+    };
+
+};
+
+
+// send an observation as JSON with a base64 screenshot, or as a binary
+// frame with compressed JSON and raw screenshot bytes when accepted
+const send_observation = (
+    req: any, res: any,
+    playwright_observation: { [key: string]: any },
+    wrap_observation: boolean
+) => {
+
+    const { screenshot, ...observation_fields } = playwright_observation;
+
+    const accepts_binary = (
+        req.get('Accept') || ''
+    ).includes(OBSERVATION_CONTENT_TYPE);
+
+    if (!accepts_binary) {
+
+        const json_observation = {
+            ...observation_fields,
+            'screenshot': (
+                screenshot === null ? null :
+                screenshot.toString('base64')
+            )
+        };
+
+        res.status(200).send(
+            wrap_observation ?
+            { 'observation': json_observation } :
+            json_observation
+        );
+
+        return;
+
+    }
+
+    const accepted_encodings = (
+        req.get(OBSERVATION_ACCEPT_ENCODING_HEADER) || ''
+    ).split(',').map((x: string) => x.trim());
+
+    let encoding = 'identity';
+    let json_section = Buffer.from(
+        JSON.stringify(observation_fields)
+    );
+
+    // zstd is only available in recent versions of Node.js
+
+    const zstd_compress = (zlib as any).zstdCompressSync;
+
+    if (accepted_encodings.includes('zstd') && typeof zstd_compress === 'function') {
+
+        encoding = 'zstd';
+        json_section = zstd_compress(json_section);
+
+    } else if (accepted_encodings.includes('gzip')) {
+
+        encoding = 'gzip';
+        json_section = zlib.gzipSync(json_section, {
+            level: OBSERVATION_GZIP_LEVEL
+        });
+
+    }
+
+    const json_section_size = Buffer.alloc(4);
+    json_section_size.writeUInt32BE(json_section.length);
+
+    res.status(200)
+        .set('Content-Type', OBSERVATION_CONTENT_TYPE)
+        .set(OBSERVATION_ENCODING_HEADER, encoding)
+        .send(Buffer.concat([
+            json_section_size, json_section,
+            screenshot || Buffer.alloc(0)
+        ]));
+
+};
+
+
 // start a new browsing session for a swarm of agents
 // agents will make a post request to this endpoint and receive a session ID
 APP.post('/start', async (req, res) => {
@@ -802,121 +1195,132 @@ APP.post('/observation', async (req, res) => {
 
     }
 
-    let metadata: { [key: number]: any };
-    let raw_html: string;
+    let playwright_observation: { [key: string]: any };
 
     try {
 
-        [ metadata, raw_html ] = await page.evaluate(process_observation, [
-            MAX_NODE_SIZE, MAX_HTML_SIZE, SKIP_TAGS
-        ]);
+        playwright_observation = await capture_observation(
+            page, req.query.screenshot !== 'false',
+            parse_key_list(req.query.metadata_keys, DEFAULT_METADATA_KEYS),
+            parse_key_list(req.query.style_keys, DEFAULT_STYLE_KEYS)
+        );
 
     } catch (error) {
 
         res.status(400).send(
-            'Failed to extract metadata: ' + error
+            (error as Error).message
         );
 
         return;
 
     }
 
-    if (metadata === undefined || metadata === null || raw_html === undefined || raw_html === null) {
+    try {
 
-        res.status(400).send(
-            'Failed to extract metadata and HTML'
+        send_observation(
+            req, res, playwright_observation, false
         );
 
-        return;
+    } catch (error) {
+
+        res.status(400).send(
+            'Failed to send observation: ' + error
+        );
 
     }
 
-    let screenshot_bytes: Buffer;
+});
 
-    try {
 
-        screenshot_bytes = await page.screenshot({
-            type: 'png'
-        });
+// execute an action in the browsing session by making function calls
+// agents must post a json object in the format: [{ "dotpath": "page.locator", "args": "[backend_node_id='5']" }]
+//   - `dotpath`: a string representing the path to the function in the Playwright API
+//   - `args`: a string representing arguments to pass to the function
+APP.post('/action', async (req, res) => {
 
-    } catch (error) {
+    const session_id = req.query.session_id as string;
+
+    if (session_id === undefined) {
 
         res.status(400).send(
-            'Failed to capture screenshot: ' + error
+            'Session ID not provided'
         );
 
         return;
 
     }
 
-    if (screenshot_bytes === undefined) {
+    const session_data = ACTIVE_SESSIONS[session_id];
+
+    if (session_data === undefined) {
 
         res.status(400).send(
-            'Failed to capture screenshot'
+            'Session ID not found'
         );
 
         return;
 
     }
 
-    const screenshot_base64 = 
-        screenshot_bytes.toString('base64');
-
-    let current_url: string;
-
-    try {
-
-        current_url = page.url();
+    const browser = session_data.browser;
+    const context = session_data.context;
+    const page = session_data.page;
+    session_data.timestamp = Date.now();
 
-    } catch (error) {
+    if (browser === undefined || context === undefined || page === undefined) {
 
         res.status(400).send(
-            'Failed to extract current URL: ' + error
+            'Session ID not found'
         );
 
         return;
 
     }
 
-    if (current_url === undefined) {
+    // read the action json from the request body
+
+    const action = req.body;
+    const action_error = validate_action(action);
+
+    if (action_error !== null) {
 
         res.status(400).send(
-            'Failed to extract current URL'
+            action_error
         );
 
         return;
 
     }
 
-    const playwright_observation = {
-        'raw_html': raw_html,
-        'screenshot': screenshot_base64,
-        'metadata': metadata,
-        'current_url': current_url
-    };
-
     try {
 
-        res.status(200).send(
-            playwright_observation
+        // Execute the provided javascript in a separate namespace
+        // with the browser, context, and page objects
+        
+        const result = await playwright_function_call(
+            action, browser, context, page
         );
 
     } catch (error) {
 
         res.status(400).send(
-            'Failed to send observation: ' + error
+            'Failed to execute action: ' + error
         );
 
+        return;
+
     }
 
+    res.status(200).send(
+        'Action successfully executed'
+    );
+
 });
 
 
-// execute an action in the browsing session by making function calls
-// agents must post a json object in the format: [{ "dotpath": "page.locator", "args": "[backend_node_id='5']" }]
-//   - `dotpath`: a string representing the path to the function in the Playwright API
-//   - `args`: a string representing arguments to pass to the function
-APP.post('/action', async (req, res) => {
+// execute an action, wait for the webpage to settle, and extract metadata
+// saves a round trip per step compared to /action followed by /observation
+APP.post('/step', async (req, res) => {
 
     const session_id = req.query.session_id as string;
 
@@ -957,148 +1361,134 @@ APP.post('/action', async (req, res) => {
 
     }
 
-    // read the action json from the request body
-
-    const action = req.body;
+    const settle_time = parseInt(
+        (req.query.settle_time as string) || '0'
+    );
 
-    if (action === undefined) {
+    if (isNaN(settle_time) || settle_time < 0) {
 
         res.status(400).send(
-            'Action not provided'
+            'Invalid settle time'
         );
 
         return;
 
     }
 
-    // check that actions is a list dotpaths and args
+    // read the action json from the request body
 
-    if (!Array.isArray(action)) {
+    const action = req.body;
+    const action_error = validate_action(action);
+
+    if (action_error !== null) {
 
         res.status(400).send(
-            'Action must be a list of dotpaths and args'
+            action_error
         );
 
         return;
 
     }
 
-    if (action.length === 0) {
+    try {
 
-        res.status(400).send(
-            'Action must contain at least one function call'
+        // Execute the provided javascript in a separate namespace
+        // with the browser, context, and page objects
+        
+        const result = await playwright_function_call(
+            action, browser, context, page
         );
 
-        return;
-
-    }
-
-    if (action.length > MAX_CHAINED_CALLS) {
+    } catch (error) {
 
         res.status(400).send(
-            'Action must contain at most 3 function calls'
+            'Failed to execute action: ' + error
         );
 
         return;
 
     }
 
-    for (let idx = 0; idx < action.length; idx++) {
-
-        const function_call = action[idx];
-        
-        // check that each action item is an object with a dotpath and args
-
-        if (typeof function_call !== 'object') {
-
-            res.status(400).send(
-                'Action item must be an object'
-            );
-
-            return;
-
-        }
-
-        if (function_call['dotpath'] === undefined) {
-
-            res.status(400).send(
-                'Action item must contain a dotpath'
-            );
-
-            return;
-
-        }
+    // wait for navigations started by the action to finish loading
 
-        if (function_call['args'] === undefined) {
+    try {
 
-            res.status(400).send(
-                'Action item must contain args'
-            );
+        await page.waitForLoadState('load', {
+            timeout: STEP_LOAD_TIMEOUT
+        });
 
-            return;
+    } catch (error) {
 
-        }
+        // observe pages that never finish loading
 
-        // check that the dotpath is a string
+    }
 
-        if (typeof function_call['dotpath'] !== 'string') {
+    await new Promise(
+        resolve => setTimeout(resolve, settle_time)
+    );
 
-            res.status(400).send(
-                'Dotpath must be a string'
-            );
+    // the action succeeded, so observation errors are returned
+    // separately for the agent to see as the next observation
 
-            return;
+    let playwright_observation: { [key: string]: any };
 
-        }
+    try {
 
-        // check that the args is a string
-        
-        if (typeof function_call['args'] !== 'string') {
+        playwright_observation = await capture_observation(
+            page, req.query.screenshot !== 'false',
+            parse_key_list(req.query.metadata_keys, DEFAULT_METADATA_KEYS),
+            parse_key_list(req.query.style_keys, DEFAULT_STYLE_KEYS)
+        );
 
-            res.status(400).send(
-                'Args must be a string'
-            );
+    } catch (error) {
 
-            return;
+        res.status(200).send({
+            'observation_error': (error as Error).message
+        });
 
-        }
+        return;
 
     }
 
     try {
 
-        // Execute the provided javascript in a separate namespace
-        // with the browser, context, and page objects
-        
-        const result = await playwright_function_call(
-            action, browser, context, page
+        send_observation(
+            req, res, playwright_observation, true
         );
 
     } catch (error) {
 
         res.status(400).send(
-            'Failed to execute action: ' + error
+            'Failed to send observation: ' + error
         );
 
-        return;
-
     }
 
-    res.status(200).send(
-        'Action successfully executed'
-    );
+});
+
+
+// list the endpoints served by this server
+// clients check for combined endpoints such as /step before using them
+APP.post('/capabilities', async (req, res) => {
+
+    res.status(200).send({
+        'endpoints': SERVER_ENDPOINTS
+    });
 
 });
 
 
 // start the Playwright server and listen on the specified port
 // currently only accepts POST requests
-APP.listen(PORT, async () => {
+const SERVER = APP.listen(PORT, async () => {
 
     return console.log(`Serving Playwright: http://localhost:${PORT}`);
 
 });
 
+SERVER.keepAliveTimeout = KEEP_ALIVE_TIMEOUT;
+SERVER.headersTimeout = HEADERS_TIMEOUT;
+
 
 // check for idle sessions and close them after a timeout
 // prevents memory leaks and resource exhaustion
@@ -16,6 +16,7 @@ REQUIREMENTS = [
     'gradio',
     'gradio_client',
     'langchain',
+    'httpx',
 ]
 
 URL = (
@@ -48,6 +49,8 @@ ENTRY_POINTS = {
         'start-insta-pipeline=insta.entry_points.insta_pipeline:start_insta_pipeline',
         'start-annotate-judge=insta.entry_points.annotate_judge:start_annotate_judge',
         'start-annotate-task-proposer=insta.entry_points.annotate_task_proposer:start_annotate_task_proposer',
+        'start-insta-coordinator=insta.entry_points.insta_coordinator:start_insta_coordinator',
+        'start-insta-replay-server=insta.entry_points.insta_replay:start_insta_replay_server',
     ]
 }
 
@@ -71,5 +74,8 @@ setuptools.setup(
             'scrubadub',
             'scrubadub_spacy',
         ],
+        'zstd': [
+            'zstandard',
+        ],
     },
 )